@@ -0,0 +1,228 @@
+"""
+账号群组检测的后台刷新
+自动匹配群组所属账号需要对每个账号调用 /v2/groups。原先在缓存过期后由请求线程逐个账号串行调用，
+一个响应缓慢的账号会拖慢所有爬取任务的启动。现在检测结果持久化在账号库（account_groups 表），
+请求路径只读取持久化结果；刷新在后台线程中进行：
+- 各账号并发请求，每个账号有独立的超时，失败时保留上一次的结果并记录错误；
+- 检测结果超过刷新间隔即视为过期，读取时触发后台刷新（同一时间只有一轮刷新）；
+- snapshot() 提供各账号检测结果的年龄，用于观察映射是否过期。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .accounts_sql_manager import get_accounts_sql_manager
+from .logger_config import log_info, log_warning
+
+DEFAULT_REFRESH_INTERVAL_SECONDS = 300
+DEFAULT_ACCOUNT_TIMEOUT_SECONDS = 15
+# 刷新失败的账号至少间隔这么久再重试，避免每次读取都触发请求
+RETRY_INTERVAL_SECONDS = 60
+# 读取路径检查是否过期的最小间隔
+STALE_CHECK_INTERVAL_SECONDS = 5
+
+GroupsFetcher = Callable[[str, float], List[Dict[str, Any]]]
+
+
+def _age_seconds(iso_time: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    if not iso_time:
+        return None
+    try:
+        return max(0.0, ((now or datetime.now()) - datetime.fromisoformat(iso_time)).total_seconds())
+    except ValueError:
+        return None
+
+
+def _is_valid_cookie(cookie: Optional[str]) -> bool:
+    return bool(cookie) and cookie != "your_cookie_here"
+
+
+class AccountGroupRefresher:
+    """账号群组检测的后台刷新器（线程安全）"""
+
+    def __init__(self, fetcher: GroupsFetcher,
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL_SECONDS,
+                 account_timeout: float = DEFAULT_ACCOUNT_TIMEOUT_SECONDS,
+                 max_workers: int = 4):
+        self._fetcher = fetcher
+        self.refresh_interval = refresh_interval
+        self.account_timeout = account_timeout
+        self.max_workers = max(1, int(max_workers))
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pending_force = False
+        self._last_stale_check = 0.0
+        self.last_run: Dict[str, Any] = {}
+
+    def _is_due(self, state: Dict[str, Any], now: datetime) -> bool:
+        if not _is_valid_cookie(state.get("cookie")):
+            return False
+        age = _age_seconds(state.get("refreshed_at"), now)
+        if age is not None and age < self.refresh_interval:
+            return False
+        attempt_age = _age_seconds(state.get("last_attempt_at"), now)
+        return attempt_age is None or attempt_age >= RETRY_INTERVAL_SECONDS
+
+    def is_refreshing(self) -> bool:
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        启动一轮后台刷新，返回是否新启动了刷新线程
+        force=True 时刷新所有账号；已有刷新进行中时，强制刷新会在当前一轮结束后再执行一次。
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                if force:
+                    self._pending_force = True
+                return False
+            self._thread = threading.Thread(target=self._run, args=(force,), daemon=True,
+                                            name="account-group-refresh")
+            self._thread.start()
+            return True
+
+    def refresh_if_stale(self):
+        """读取路径调用：存在过期的账号时启动后台刷新，本身不发起网络请求"""
+        now_mono = time.monotonic()
+        with self._lock:
+            if now_mono - self._last_stale_check < STALE_CHECK_INTERVAL_SECONDS:
+                return
+            self._last_stale_check = now_mono
+        try:
+            now = datetime.now()
+            states = get_accounts_sql_manager().get_account_group_refresh_states()
+            if any(self._is_due(state, now) for state in states):
+                self.refresh()
+        except Exception as e:
+            log_warning(f"检查账号群组检测是否过期失败: {e}")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待当前一轮刷新结束，返回是否已结束"""
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def wait_for_unrefreshed(self, timeout: float) -> bool:
+        """
+        存在从未刷新成功的账号且刷新正在进行时，最多等待 timeout 秒让本轮刷新结束
+        用于新添加账号后的首次匹配，避免在检测结果写入前就回退到默认 Cookie；返回是否有等待
+        """
+        if not self.is_refreshing():
+            return False
+        try:
+            states = get_accounts_sql_manager().get_account_group_refresh_states()
+        except Exception as e:
+            log_warning(f"读取账号群组检测状态失败: {e}")
+            return False
+        if not any(_is_valid_cookie(state.get("cookie")) and not state.get("refreshed_at") for state in states):
+            return False
+        self.wait(timeout)
+        return True
+
+    def _refresh_account(self, account_id: str, cookie: str) -> int:
+        try:
+            groups = self._fetcher(cookie, self.account_timeout)
+            return get_accounts_sql_manager().replace_account_groups(account_id, groups or [])
+        except Exception as e:
+            get_accounts_sql_manager().record_account_groups_failure(account_id, str(e))
+            raise
+
+    def _run(self, force: bool):
+        while True:
+            self._run_once(force)
+            with self._lock:
+                if not self._pending_force:
+                    return
+                self._pending_force = False
+                force = True
+
+    def _run_once(self, force: bool):
+        started = time.time()
+        sql_mgr = get_accounts_sql_manager()
+        now = datetime.now()
+        try:
+            states = sql_mgr.get_account_group_refresh_states()
+        except Exception as e:
+            log_warning(f"读取账号列表失败，跳过群组检测刷新: {e}")
+            return
+        due = [
+            state for state in states
+            if _is_valid_cookie(state.get("cookie")) and (force or self._is_due(state, now))
+        ]
+        if not due:
+            return
+
+        refreshed, failed = 0, []
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(due)),
+                                      thread_name_prefix="account-group-fetch")
+        try:
+            futures = {
+                executor.submit(self._refresh_account, state["account_id"], state["cookie"]): state
+                for state in due
+            }
+            # 请求本身带有超时，这里额外留出余量，防止个别连接卡住整轮刷新
+            done, not_done = wait(futures, timeout=self.account_timeout + 5)
+            for future in done:
+                state = futures[future]
+                try:
+                    future.result()
+                    refreshed += 1
+                except Exception as e:
+                    failed.append(state["account_id"])
+                    log_warning(f"刷新账号 {state.get('name') or state['account_id']} 的群组失败: {e}")
+            for future in not_done:
+                state = futures[future]
+                failed.append(state["account_id"])
+                sql_mgr.record_account_groups_failure(state["account_id"], "请求超时")
+                log_warning(f"刷新账号 {state.get('name') or state['account_id']} 的群组超时")
+        finally:
+            executor.shutdown(wait=False)
+
+        duration = round(time.time() - started, 2)
+        self.last_run = {
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "duration_seconds": duration,
+            "refreshed": refreshed,
+            "failed": failed,
+        }
+        log_info(f"账号群组检测刷新完成: 成功 {refreshed} 个, 失败 {len(failed)} 个, 耗时 {duration}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """各账号检测结果的年龄与刷新状态"""
+        now = datetime.now()
+        accounts = []
+        max_age: Optional[float] = None
+        for state in get_accounts_sql_manager().get_account_group_refresh_states():
+            if not _is_valid_cookie(state.get("cookie")):
+                continue
+            age = _age_seconds(state.get("refreshed_at"), now)
+            stale = age is None or age >= self.refresh_interval
+            if age is not None:
+                max_age = age if max_age is None else max(max_age, age)
+            accounts.append({
+                "account_id": state["account_id"],
+                "name": state.get("name"),
+                "refreshed_at": state.get("refreshed_at"),
+                "age_seconds": round(age, 1) if age is not None else None,
+                "stale": stale,
+                "groups_count": state.get("groups_count", 0),
+                "last_attempt_at": state.get("last_attempt_at"),
+                "last_error": state.get("last_error"),
+            })
+        return {
+            "refresh_interval_seconds": self.refresh_interval,
+            "account_timeout_seconds": self.account_timeout,
+            "refreshing": self.is_refreshing(),
+            "max_age_seconds": round(max_age, 1) if max_age is not None else None,
+            "stale_accounts": sum(1 for acc in accounts if acc["stale"]),
+            "never_refreshed_accounts": sum(1 for acc in accounts if acc["refreshed_at"] is None),
+            "accounts": accounts,
+            "last_run": dict(self.last_run),
+        }
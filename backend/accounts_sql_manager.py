@@ -97,6 +97,35 @@ class AccountsSQLManager:
             self.cursor.execute(
                 "CREATE INDEX IF NOT EXISTS idx_group_account_map_account_id ON group_account_map(account_id)"
             )
+
+            # 自动检测的账号可访问群组（后台定期调用 /v2/groups 刷新）
+            self.cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS account_groups (
+                    account_id TEXT NOT NULL,
+                    group_id TEXT NOT NULL,
+                    group_name TEXT,
+                    refreshed_at TEXT NOT NULL,
+                    PRIMARY KEY (account_id, group_id),
+                    FOREIGN KEY (account_id) REFERENCES accounts(id) ON DELETE CASCADE
+                )
+                """
+            )
+            self.cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS account_group_refresh (
+                    account_id TEXT PRIMARY KEY,
+                    refreshed_at TEXT,
+                    last_attempt_at TEXT,
+                    last_error TEXT,
+                    groups_count INTEGER DEFAULT 0,
+                    FOREIGN KEY (account_id) REFERENCES accounts(id) ON DELETE CASCADE
+                )
+                """
+            )
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_account_groups_group_id ON account_groups(group_id)"
+            )
             self.conn.commit()
 
     def get_accounts(self, mask_cookie: bool = True) -> List[Dict[str, Any]]:
@@ -276,6 +305,108 @@ class AccountsSQLManager:
             "cookie": acc.get("cookie"),  # 已掩码
         }
 
+    def replace_account_groups(self, account_id: str, groups: List[Dict[str, Any]]) -> int:
+        """用最新获取的群组列表替换账号的检测结果，返回群组数量"""
+        now = _now_iso()
+        rows = []
+        for group in groups or []:
+            gid = str(group.get("group_id") or "")
+            if gid:
+                rows.append((account_id, gid, group.get("name"), now))
+
+        with _lock:
+            if not self.get_account_by_id(account_id):
+                return 0  # 刷新期间账号已被删除
+            try:
+                self.cursor.execute("DELETE FROM account_groups WHERE account_id = ?", (account_id,))
+                self.cursor.executemany(
+                    """
+                    INSERT OR REPLACE INTO account_groups (account_id, group_id, group_name, refreshed_at)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    rows,
+                )
+                self.cursor.execute(
+                    """
+                    INSERT INTO account_group_refresh (account_id, refreshed_at, last_attempt_at, last_error, groups_count)
+                    VALUES (?, ?, ?, NULL, ?)
+                    ON CONFLICT(account_id) DO UPDATE SET
+                        refreshed_at = excluded.refreshed_at,
+                        last_attempt_at = excluded.last_attempt_at,
+                        last_error = NULL,
+                        groups_count = excluded.groups_count
+                    """,
+                    (account_id, now, now, len(rows)),
+                )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            return len(rows)
+
+    def record_account_groups_failure(self, account_id: str, error: str):
+        """记录账号群组刷新失败（保留上一次的检测结果）"""
+        with _lock:
+            if not self.get_account_by_id(account_id):
+                return
+            self.cursor.execute(
+                """
+                INSERT INTO account_group_refresh (account_id, last_attempt_at, last_error)
+                VALUES (?, ?, ?)
+                ON CONFLICT(account_id) DO UPDATE SET
+                    last_attempt_at = excluded.last_attempt_at,
+                    last_error = excluded.last_error
+                """,
+                (account_id, _now_iso(), str(error)[:500]),
+            )
+            self.conn.commit()
+
+    def get_detected_group_accounts(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取持久化的群组→账号检测结果
+        同一群组可被多个账号访问时取创建时间最早的账号；返回值包含未掩码的 cookie，仅供内部使用。
+        """
+        with _lock:
+            self.cursor.execute(
+                """
+                SELECT ag.group_id, a.id, a.name, a.created_at, a.cookie
+                FROM account_groups ag
+                JOIN accounts a ON a.id = ag.account_id
+                ORDER BY a.created_at ASC, a.id ASC
+                """
+            )
+            rows = self.cursor.fetchall()
+        result: Dict[str, Dict[str, Any]] = {}
+        for group_id, acc_id, name, created_at, cookie in rows:
+            if group_id not in result:
+                result[group_id] = {"id": acc_id, "name": name or acc_id, "created_at": created_at, "cookie": cookie}
+        return result
+
+    def get_account_group_refresh_states(self) -> List[Dict[str, Any]]:
+        """获取各账号群组检测的刷新状态（包含未掩码的 cookie，仅供内部使用）"""
+        with _lock:
+            self.cursor.execute(
+                """
+                SELECT a.id, a.name, a.cookie, r.refreshed_at, r.last_attempt_at, r.last_error, r.groups_count
+                FROM accounts a
+                LEFT JOIN account_group_refresh r ON r.account_id = a.id
+                ORDER BY a.created_at ASC
+                """
+            )
+            rows = self.cursor.fetchall()
+        return [
+            {
+                "account_id": row[0],
+                "name": row[1],
+                "cookie": row[2],
+                "refreshed_at": row[3],
+                "last_attempt_at": row[4],
+                "last_error": row[5],
+                "groups_count": row[6] or 0,
+            }
+            for row in rows
+        ]
+
     def close(self):
         """关闭数据库连接"""
         with _lock:
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+社群差异备份
+每次导出社群都会重新打包整个目录。这里为社群导出增加备份索引（包内 backup_index.json）：
+- 普通文件记录大小、mtime_ns 与 sha256；
+- SQLite 数据库按 rowid 顺序每 ROW_CHUNK_SIZE 行记录一个区块的边界与摘要（行的高水位与内容校验）。
+差异备份以某次备份的索引为基准，只打包新增/变化的文件；数据库只打包内容变化的 rowid 区间
+（新增行、被修改或删除过的区块）为 .sqlite-delta 文件，并列出基准之后被删除的文件。
+导入端按备份链（完整备份 → 差异备份 → 差异备份 …）依次应用，每个差异包只能应用在其基准备份之上。
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zipfile
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .db_path_manager import get_db_path_manager
+from .sqlite_connection import connect_sqlite
+from .zip_export import (
+    ExportEntry,
+    StreamSink,
+    is_sqlite_file,
+    iter_write_file,
+    remove_quietly,
+    snapshot_sqlite,
+)
+
+BACKUP_INDEX_NAME = "backup_index.json"
+BACKUP_INDEX_VERSION = 1
+DB_DELTA_SUFFIX = ".sqlite-delta"
+ROW_CHUNK_SIZE = 1000
+
+_DELTA_RANGES_TABLE = "_zsxq_delta_ranges"
+_DELTA_INDEXES_TABLE = "_zsxq_delta_indexes"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+# =========================
+# SQLite 行区块摘要与差异
+# =========================
+
+def _user_tables(conn: sqlite3.Connection, schema: str = "main") -> Dict[str, str]:
+    """
+    参与按 rowid 摘要与差异的普通表
+    虚拟表（FTS5 全文索引）及其影子表、WITHOUT ROWID 表没有可比较的 rowid，不参与差异；
+    全文索引在应用差异后由数据库自身重建。
+    """
+    rows = conn.execute(
+        f"SELECT name, sql FROM {schema}.sqlite_master "
+        "WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name NOT LIKE '_zsxq_delta_%'"
+    ).fetchall()
+    virtual = [name for name, sql in rows if (sql or "").lstrip().upper().startswith("CREATE VIRTUAL TABLE")]
+    tables = {}
+    for name, sql in rows:
+        if name in virtual or any(name.startswith(f"{vtab}_") for vtab in virtual):
+            continue
+        try:
+            conn.execute(f"SELECT rowid FROM {schema}.{_quote(name)} LIMIT 0")
+        except sqlite3.OperationalError:
+            continue  # WITHOUT ROWID
+        tables[name] = sql
+    return tables
+
+
+def _table_triggers(conn: sqlite3.Connection, tables: Iterable[str]) -> List[Tuple[str, str]]:
+    """指定表上的触发器 (名称, 建立语句)"""
+    tables = list(tables)
+    if not tables:
+        return []
+    placeholders = ", ".join("?" for _ in tables)
+    return conn.execute(
+        f"SELECT name, sql FROM main.sqlite_master WHERE type = 'trigger' AND tbl_name IN ({placeholders}) "
+        "AND sql IS NOT NULL",
+        tables,
+    ).fetchall()
+
+
+def _table_columns(conn: sqlite3.Connection, table: str, schema: str = "main") -> Tuple[List[str], bool]:
+    """返回列名列表，以及是否存在 INTEGER PRIMARY KEY（rowid 别名，SELECT * 已包含 rowid）"""
+    info = conn.execute(f"PRAGMA {schema}.table_info({_quote(table)})").fetchall()
+    columns = [row[1] for row in info]
+    pk_columns = [row for row in info if row[5]]
+    has_rowid_alias = len(pk_columns) == 1 and (pk_columns[0][2] or "").upper() == "INTEGER"
+    return columns, has_rowid_alias
+
+
+def _copy_columns(conn: sqlite3.Connection, table: str, schema: str = "main") -> str:
+    """复制行时使用的列清单：没有 rowid 别名的表显式带上 rowid，保证区间边界一致"""
+    columns, has_rowid_alias = _table_columns(conn, table, schema)
+    names = [_quote(column) for column in columns]
+    if not has_rowid_alias:
+        names.insert(0, "rowid")
+    return ", ".join(names)
+
+
+def _range_condition(lo: Optional[int], hi: Optional[int]) -> Tuple[str, List[int]]:
+    clauses, params = [], []
+    if lo is not None:
+        clauses.append("rowid > ?")
+        params.append(lo)
+    if hi is not None:
+        clauses.append("rowid <= ?")
+        params.append(hi)
+    return (" AND ".join(clauses) or "1"), params
+
+
+def summarize_sqlite(db_path: str) -> Dict[str, Any]:
+    """计算数据库各表的行数、最大 rowid 以及按 rowid 分块的内容摘要"""
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {}
+        for table in _user_tables(conn):
+            columns, _ = _table_columns(conn, table)
+            chunks: List[List[Any]] = []
+            hasher = hashlib.sha1()
+            count = 0
+            last_rowid = None
+            for row in conn.execute(f"SELECT rowid, * FROM {_quote(table)} ORDER BY rowid"):
+                hasher.update(repr(row).encode("utf-8"))
+                count += 1
+                last_rowid = row[0]
+                if count % ROW_CHUNK_SIZE == 0:
+                    chunks.append([last_rowid, hasher.hexdigest()])
+                    hasher = hashlib.sha1()
+            if count % ROW_CHUNK_SIZE:
+                chunks.append([last_rowid, hasher.hexdigest()])
+            tables[table] = {
+                "columns": columns,
+                "rows": count,
+                "max_rowid": last_rowid,
+                "chunks": chunks,
+            }
+        return {"tables": tables}
+    finally:
+        conn.close()
+
+
+def build_sqlite_delta(db_path: str, baseline: Dict[str, Any], dest_path: str) -> Optional[Dict[str, int]]:
+    """
+    对比基准摘要，把变化的 rowid 区间写入 dest_path 的差异库；没有变化时返回 None
+    表结构变化或基准中不存在的表整表重建。
+    """
+    base_tables = (baseline or {}).get("tables", {})
+    conn = sqlite3.connect(db_path)
+    try:
+        ranges: List[Tuple[str, Optional[int], Optional[int], int, Optional[str]]] = []
+        for table, create_sql in _user_tables(conn).items():
+            base = base_tables.get(table)
+            columns, _ = _table_columns(conn, table)
+            if base is None or base.get("columns") != columns:
+                ranges.append((table, None, None, 1, create_sql))
+                continue
+
+            boundaries = [chunk[0] for chunk in base["chunks"]]
+            hashers = [hashlib.sha1() for _ in boundaries]
+            has_tail = False
+            for row in conn.execute(f"SELECT rowid, * FROM {_quote(table)} ORDER BY rowid"):
+                position = bisect.bisect_left(boundaries, row[0])
+                if position == len(boundaries):
+                    has_tail = True
+                    break  # 按 rowid 排序，之后的行都在基准最大 rowid 之后
+                hashers[position].update(repr(row).encode("utf-8"))
+
+            for position, (last_rowid, digest) in enumerate(base["chunks"]):
+                if hashers[position].hexdigest() != digest:
+                    lo = boundaries[position - 1] if position else None
+                    ranges.append((table, lo, last_rowid, 0, None))
+            if has_tail:
+                ranges.append((table, boundaries[-1] if boundaries else None, None, 0, None))
+    finally:
+        conn.close()
+
+    if not ranges:
+        return None
+
+    remove_quietly(dest_path)
+    delta = sqlite3.connect(dest_path)
+    delta.isolation_level = None
+    stats = {"tables": len({item[0] for item in ranges}), "ranges": len(ranges), "rows": 0}
+    try:
+        delta.execute("ATTACH DATABASE ? AS src", (db_path,))
+        delta.execute("BEGIN")
+        delta.execute(
+            f"CREATE TABLE {_DELTA_RANGES_TABLE} "
+            "(table_name TEXT, lo INTEGER, hi INTEGER, recreate INTEGER, create_sql TEXT)"
+        )
+        delta.execute(f"CREATE TABLE {_DELTA_INDEXES_TABLE} (table_name TEXT, sql TEXT)")
+        src_tables = _user_tables(delta, "src")
+        for table in {item[0] for item in ranges}:
+            delta.execute(src_tables[table])
+            for (index_sql,) in delta.execute(
+                "SELECT sql FROM src.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (table,),
+            ).fetchall():
+                delta.execute(f"INSERT INTO {_DELTA_INDEXES_TABLE} VALUES (?, ?)", (table, index_sql))
+        for table, lo, hi, recreate, create_sql in ranges:
+            delta.execute(f"INSERT INTO {_DELTA_RANGES_TABLE} VALUES (?, ?, ?, ?, ?)",
+                          (table, lo, hi, recreate, create_sql))
+            columns = _copy_columns(delta, table, "src")
+            condition, params = _range_condition(lo, hi)
+            cursor = delta.execute(
+                f"INSERT INTO main.{_quote(table)} ({columns}) "
+                f"SELECT {columns} FROM src.{_quote(table)} WHERE {condition}",
+                params,
+            )
+            stats["rows"] += max(cursor.rowcount, 0)
+        delta.execute("COMMIT")
+        delta.execute("DETACH DATABASE src")
+    finally:
+        delta.close()
+    return stats
+
+
+def apply_sqlite_delta(db_path: str, delta_path: str) -> Dict[str, int]:
+    """
+    在一个事务中把差异库应用到基准数据库：替换变化的 rowid 区间，重建结构变化的表
+    应用期间暂时移除相关表上的触发器（例如删除话题时同步清理全文索引的触发器），应用完成后原样恢复；
+    全文索引不在差异之内，需要调用方随后重建。
+    """
+    conn = connect_sqlite(db_path)
+    conn.isolation_level = None
+    stats = {"ranges": 0, "rows": 0}
+    try:
+        conn.execute("ATTACH DATABASE ? AS delta", (delta_path,))
+        ranges = conn.execute(
+            f"SELECT table_name, lo, hi, recreate, create_sql FROM delta.{_DELTA_RANGES_TABLE}"
+        ).fetchall()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            triggers = _table_triggers(conn, {item[0] for item in ranges})
+            for name, _ in triggers:
+                conn.execute(f"DROP TRIGGER IF EXISTS main.{_quote(name)}")
+            for table, lo, hi, recreate, create_sql in ranges:
+                if recreate:
+                    conn.execute(f"DROP TABLE IF EXISTS main.{_quote(table)}")
+                    conn.execute(create_sql)
+                    for (index_sql,) in conn.execute(
+                        f"SELECT sql FROM delta.{_DELTA_INDEXES_TABLE} WHERE table_name = ?", (table,)
+                    ).fetchall():
+                        conn.execute(index_sql)
+                condition, params = _range_condition(lo, hi)
+                conn.execute(f"DELETE FROM main.{_quote(table)} WHERE {condition}", params)
+                columns = _copy_columns(conn, table, "delta")
+                cursor = conn.execute(
+                    f"INSERT INTO main.{_quote(table)} ({columns}) "
+                    f"SELECT {columns} FROM delta.{_quote(table)} WHERE {condition}",
+                    params,
+                )
+                stats["ranges"] += 1
+                stats["rows"] += max(cursor.rowcount, 0)
+            for _, trigger_sql in triggers:
+                conn.execute(trigger_sql)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("DETACH DATABASE delta")
+    finally:
+        conn.close()
+    return stats
+
+
+# =========================
+# 备份包写入
+# =========================
+
+def _iter_write_database(zf: zipfile.ZipFile, zip_name: str, file_path: str,
+                         baseline: Optional[Dict[str, Any]], index: Dict[str, Any]) -> Iterator[None]:
+    snapshot_path = snapshot_sqlite(file_path)
+    if not snapshot_path:
+        yield from _iter_write_plain_file(zf, zip_name, file_path, baseline, index)
+        return
+    delta_path = snapshot_path + DB_DELTA_SUFFIX
+    try:
+        index["databases"][zip_name] = summarize_sqlite(snapshot_path)
+        base_summary = (baseline or {}).get("databases", {}).get(zip_name)
+        if base_summary is None:
+            yield from iter_write_file(zf, zip_name, snapshot_path, stat_path=file_path)
+            return
+        if build_sqlite_delta(snapshot_path, base_summary, delta_path) is not None:
+            index["db_deltas"].append(zip_name)
+            yield from iter_write_file(zf, zip_name + DB_DELTA_SUFFIX, delta_path, stat_path=file_path)
+    finally:
+        remove_quietly(snapshot_path)
+        remove_quietly(delta_path)
+
+
+def _iter_write_plain_file(zf: zipfile.ZipFile, zip_name: str, file_path: str,
+                           baseline: Optional[Dict[str, Any]], index: Dict[str, Any]) -> Iterator[None]:
+    st = os.stat(file_path)
+    base = (baseline or {}).get("files", {}).get(zip_name)
+    if base and base.get("size") == st.st_size and base.get("mtime_ns") == st.st_mtime_ns:
+        index["files"][zip_name] = base
+        return
+    if base and base.get("size") == st.st_size and base.get("sha256") == file_sha256(file_path):
+        index["files"][zip_name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": base["sha256"]}
+        return
+    hasher = hashlib.sha256()
+    yield from iter_write_file(zf, zip_name, file_path, hasher=hasher)
+    index["files"][zip_name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": hasher.hexdigest()}
+
+
+def iter_backup_stream(manifest: Dict[str, Any], entries: Iterable[ExportEntry],
+                       baseline: Optional[Dict[str, Any]] = None,
+                       on_complete: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[bytes]:
+    """
+    生成社群备份的 zip 字节流；baseline 为基准备份索引时生成差异包。
+    manifest["backup"] 需包含 backup_id / base_backup_id / group_id；完整写出后回调 on_complete(索引)。
+    """
+    backup = manifest["backup"]
+    index: Dict[str, Any] = {
+        "index_version": BACKUP_INDEX_VERSION,
+        "backup_id": backup["backup_id"],
+        "base_backup_id": backup.get("base_backup_id"),
+        "group_id": backup["group_id"],
+        "mode": backup["mode"],
+        "created_at": manifest.get("exported_at"),
+        "files": {},
+        "databases": {},
+        "db_deltas": [],
+        "deleted": [],
+    }
+    sink = StreamSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+        for zip_name, file_path in entries:
+            if file_path is None:
+                zf.writestr(zip_name.rstrip("/") + "/", "")
+                writer = iter(())
+            elif is_sqlite_file(file_path):
+                writer = _iter_write_database(zf, zip_name, file_path, baseline, index)
+            else:
+                writer = _iter_write_plain_file(zf, zip_name, file_path, baseline, index)
+            for _ in writer:
+                data = sink.drain()
+                if data:
+                    yield data
+            data = sink.drain()
+            if data:
+                yield data
+
+        if baseline:
+            present = set(index["files"]) | set(index["databases"])
+            previous = set(baseline.get("files", {})) | set(baseline.get("databases", {}))
+            index["deleted"] = sorted(previous - present)
+        zf.writestr(BACKUP_INDEX_NAME, json.dumps(index, ensure_ascii=False))
+    data = sink.drain()
+    if data:
+        yield data
+    if on_complete:
+        on_complete(index)
+
+
+# =========================
+# 备份索引持久化
+# =========================
+
+class BackupIndexStore:
+    """
+    备份索引与导入状态
+    数据库存放路径：DatabasePathManager.get_config_db_path()（不会被导出）
+    表：group_backups（本机导出的备份索引）, group_backup_state（本机最近应用的备份，用于校验备份链）
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        pm = get_db_path_manager()
+        self.db_path = db_path or pm.get_config_db_path()
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = connect_sqlite(self.db_path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS group_backups (
+                backup_id TEXT PRIMARY KEY,
+                group_id TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                base_backup_id TEXT,
+                created_at TEXT,
+                files_count INTEGER DEFAULT 0,
+                index_json TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_group_backups_group ON group_backups(group_id, created_at)")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS group_backup_state (
+                group_id TEXT PRIMARY KEY,
+                backup_id TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def save(self, index: Dict[str, Any]):
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO group_backups
+                    (backup_id, group_id, mode, base_backup_id, created_at, files_count, index_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (index["backup_id"], str(index["group_id"]), index["mode"], index.get("base_backup_id"),
+                 index.get("created_at"), len(index.get("files", {})) + len(index.get("databases", {})),
+                 json.dumps(index, ensure_ascii=False)),
+            )
+            self.conn.commit()
+
+    def get(self, backup_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT index_json FROM group_backups WHERE backup_id = ?", (backup_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def latest(self, group_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT index_json FROM group_backups WHERE group_id = ? ORDER BY created_at DESC, rowid DESC LIMIT 1",
+                (str(group_id),),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self, group_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT backup_id, mode, base_backup_id, created_at, files_count
+                FROM group_backups WHERE group_id = ? ORDER BY created_at DESC, rowid DESC
+                """,
+                (str(group_id),),
+            ).fetchall()
+        return [
+            {"backup_id": row[0], "mode": row[1], "base_backup_id": row[2], "created_at": row[3], "files_count": row[4]}
+            for row in rows
+        ]
+
+    def get_applied(self, group_id: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT backup_id FROM group_backup_state WHERE group_id = ?", (str(group_id),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_applied(self, group_id: str, backup_id: str):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO group_backup_state (group_id, backup_id, applied_at) VALUES (?, ?, ?)",
+                (str(group_id), backup_id, datetime.now().isoformat(timespec="seconds")),
+            )
+            self.conn.commit()
+
+    def clear_applied(self, group_id: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM group_backup_state WHERE group_id = ?", (str(group_id),))
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+
+
+_store_singleton: Optional[BackupIndexStore] = None
+_store_lock = threading.Lock()
+
+
+def get_backup_index_store() -> BackupIndexStore:
+    global _store_singleton
+    if _store_singleton is None:
+        with _store_lock:
+            if _store_singleton is None:
+                _store_singleton = BackupIndexStore()
+    return _store_singleton
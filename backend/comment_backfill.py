@@ -0,0 +1,131 @@
+"""
+话题评论补全队列
+话题列表接口每个话题只返回少量评论（show_comments），评论较多的话题需要逐页调用评论接口补全。
+原先在导入每页话题时同步补全，一页热门话题会让时间线翻页停顿数分钟。
+这里把补全任务放入队列，由独立的工作线程按节流间隔获取并通过 import_additional_comments 写入，
+时间线爬取按自己的节奏继续翻页；本地评论已齐全的话题直接跳过，已同步过的话题只获取新评论
+（见 ZSXQInteractiveCrawler.sync_topic_comments）。
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from .zsxq_database import ZSXQDatabase
+
+# 话题列表接口内嵌的评论数量上限，超过时才需要单独补全
+INLINE_COMMENTS_LIMIT = 8
+
+
+class CommentBackfillQueue:
+    """单个采集器的评论补全队列（线程安全）"""
+
+    def __init__(self, crawler, max_workers: int = 1):
+        self.crawler = crawler
+        self.max_workers = max(1, int(max_workers))
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._pending = set()
+        self._threads: List[threading.Thread] = []
+        self.stats = {'queued': 0, 'skipped': 0, 'completed': 0, 'imported_comments': 0, 'failed': 0}
+
+    def enqueue_topics(self, topics: List[Dict[str, Any]], db: ZSXQDatabase) -> int:
+        """把评论未补全的话题加入队列，返回新加入的数量"""
+        candidates = {}
+        for topic in topics:
+            topic_id = topic.get('topic_id')
+            comments_count = topic.get('comments_count', 0) or 0
+            if topic_id and comments_count > INLINE_COMMENTS_LIMIT:
+                candidates[topic_id] = comments_count
+        if not candidates:
+            return 0
+
+        needed = db.filter_topics_needing_comment_sync(candidates)
+        added = 0
+        with self._lock:
+            self.stats['skipped'] += len(candidates) - len(needed)
+            for topic_id, comments_count in needed.items():
+                if topic_id in self._pending:
+                    continue
+                self._queue.append((topic_id, comments_count))
+                self._pending.add(topic_id)
+                added += 1
+            self.stats['queued'] += added
+
+            self._threads = [t for t in self._threads if t.is_alive()]
+            spawn = min(self.max_workers - len(self._threads), len(self._queue))
+            for _ in range(max(spawn, 0)):
+                thread = threading.Thread(target=self._worker, daemon=True,
+                                          name=f"comment-backfill-{self.crawler.group_id}")
+                self._threads.append(thread)
+                thread.start()
+        return added
+
+    def _next_job(self) -> Optional[tuple]:
+        """取出下一个话题；队列为空或任务已停止时注销当前工作线程并返回 None"""
+        with self._lock:
+            if not self._queue or self.crawler.is_stopped():
+                if threading.current_thread() in self._threads:
+                    self._threads.remove(threading.current_thread())
+                return None
+            return self._queue.popleft()
+
+    def _worker(self):
+        """工作线程：使用独立的数据库连接和 HTTP 会话，队列为空或任务停止时退出"""
+        db = None
+        session = requests.Session()
+        try:
+            while True:
+                job = self._next_job()
+                if job is None:
+                    break
+                topic_id, comments_count = job
+                try:
+                    self.crawler.comment_request_delay()
+                    if self.crawler.is_stopped():
+                        continue
+                    if db is None:
+                        db = ZSXQDatabase(self.crawler.db_path)
+                    result = self.crawler.sync_topic_comments(topic_id, comments_count, db=db, session=session)
+                    if result['comments']:
+                        mode_label = '增量' if result['mode'] == 'incremental' else '完整'
+                        self.crawler.log(f"✅ 话题 {topic_id} {mode_label}同步 {result['comments']} 条评论")
+                    elif result['mode'] != 'skipped':
+                        self.crawler.log(f"ℹ️ 话题 {topic_id} 无法获取更多评论，可能是权限限制")
+                    with self._lock:
+                        self.stats['completed'] += 1
+                        self.stats['imported_comments'] += result['comments']
+                except Exception as e:
+                    self.crawler.log(f"⚠️ 话题 {topic_id} 获取评论时出错: {e}")
+                    with self._lock:
+                        self.stats['failed'] += 1
+                finally:
+                    with self._lock:
+                        self._pending.discard(topic_id)
+        finally:
+            session.close()
+            if db is not None:
+                db.close()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def wait(self):
+        """等待队列处理完毕；任务停止时丢弃未处理的话题（下次爬取时会按评论数重新入队）"""
+        while True:
+            with self._lock:
+                threads = [t for t in self._threads if t.is_alive()]
+            if not threads:
+                break
+            for thread in threads:
+                thread.join()
+
+        with self._lock:
+            dropped = len(self._queue)
+            for topic_id, _ in self._queue:
+                self._pending.discard(topic_id)
+            self._queue.clear()
+        return dropped
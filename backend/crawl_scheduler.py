@@ -0,0 +1,143 @@
+"""
+多群组爬取调度器
+每个群组单独起线程爬取时，各线程各自计算请求间隔与长休眠：同一账号下的多个群组同时爬取会叠加请求频率，
+而串行执行又无法利用多个账号。调度器按账号把群组爬取任务排队：
+- 不同账号的队列由各自的工作线程并发执行；
+- 同一账号最多同时爬取 max_groups 个群组，所有请求共用该账号的令牌桶（DownloadRateGovernor），
+  一个群组等待或处理页面时令牌可以被另一个群组使用，账号的总请求频率始终不超过设定的间隔，
+  长休眠也按账号统一进行。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .download_governor import DownloadRateGovernor
+from .logger_config import log_error
+
+# 与 ZSXQInteractiveCrawler 的默认间隔保持一致
+DEFAULT_INTERVAL_RANGE = (2.0, 5.0)
+DEFAULT_LONG_SLEEP_RANGE = (180.0, 300.0)
+DEFAULT_PAGES_PER_BATCH = 15
+DEFAULT_GROUPS_PER_ACCOUNT = 2
+
+CrawlJobRunner = Callable[[Dict[str, Any], DownloadRateGovernor], None]
+
+
+class CrawlScheduler:
+    """按账号分队列的群组爬取调度器（线程安全）"""
+
+    def __init__(self, runner: CrawlJobRunner):
+        self._runner = runner
+        self._lock = threading.Lock()
+        self._accounts: Dict[str, Dict[str, Any]] = {}
+
+    def _get_account(self, account_id: str) -> Dict[str, Any]:
+        """获取账号的调度状态（调用方需持有锁）"""
+        account = self._accounts.get(account_id)
+        if account is None:
+            account = {
+                'queue': deque(),
+                'running': {},
+                'workers': 0,
+                'max_groups': DEFAULT_GROUPS_PER_ACCOUNT,
+                'completed': 0,
+                'governor': DownloadRateGovernor(DEFAULT_INTERVAL_RANGE, DEFAULT_LONG_SLEEP_RANGE,
+                                                 DEFAULT_PAGES_PER_BATCH, label='话题请求'),
+            }
+            self._accounts[account_id] = account
+        return account
+
+    def is_scheduled(self, group_id: str) -> bool:
+        """群组是否已在队列中或正在爬取"""
+        group_id = str(group_id)
+        with self._lock:
+            return any(
+                job['group_id'] == group_id
+                for account in self._accounts.values()
+                for job in list(account['queue']) + list(account['running'].values())
+            )
+
+    def submit(self, account_id: str, job: Dict[str, Any],
+               interval_range: Optional[Tuple[float, float]] = None,
+               long_sleep_range: Optional[Tuple[float, float]] = None,
+               pages_per_batch: Optional[int] = None,
+               max_groups: Optional[int] = None) -> int:
+        """
+        把群组爬取任务加入账号队列，返回任务前面排队的数量
+        job 至少包含 task_id 和 group_id；间隔参数为空时沿用该账号当前的设置。
+        """
+        with self._lock:
+            account = self._get_account(account_id)
+            governor = account['governor']
+            if interval_range or long_sleep_range or pages_per_batch:
+                governor.configure(interval_range or governor.interval_range,
+                                   long_sleep_range or governor.long_sleep_range,
+                                   pages_per_batch or governor.files_per_batch)
+            if max_groups:
+                account['max_groups'] = max(1, int(max_groups))
+
+            job = dict(job, group_id=str(job['group_id']), account_id=account_id, queued_at=time.time())
+            ahead = len(account['queue'])
+            account['queue'].append(job)
+
+            spawn = account['workers'] < account['max_groups']
+            if spawn:
+                account['workers'] += 1
+
+        if spawn:
+            threading.Thread(target=self._worker, args=(account_id,), daemon=True,
+                             name=f"crawl-scheduler-{account_id}").start()
+        return ahead
+
+    def _worker(self, account_id: str):
+        """账号工作线程：依次取出队列中的群组执行，队列为空时退出"""
+        while True:
+            with self._lock:
+                account = self._accounts[account_id]
+                if not account['queue'] or account['workers'] > account['max_groups']:
+                    account['workers'] -= 1
+                    return
+                job = account['queue'].popleft()
+                job['started_at'] = time.time()
+                account['running'][job['task_id']] = job
+
+            try:
+                self._runner(job, account['governor'])
+            except Exception as e:
+                log_error(f"调度的爬取任务异常: task_id={job['task_id']}, group_id={job['group_id']}, error={e}",
+                          exception=e)
+            finally:
+                with self._lock:
+                    account['running'].pop(job['task_id'], None)
+                    account['completed'] += 1
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """各账号的队列、正在爬取的群组和限速器状态"""
+        now = time.time()
+        with self._lock:
+            result = []
+            for account_id, account in self._accounts.items():
+                governor = account['governor']
+                result.append({
+                    'account_id': account_id,
+                    'max_groups': account['max_groups'],
+                    'workers': account['workers'],
+                    'running': [
+                        {'task_id': job['task_id'], 'group_id': job['group_id'], 'mode': job.get('mode'),
+                         'running_seconds': round(now - job['started_at'], 1)}
+                        for job in account['running'].values()
+                    ],
+                    'queued': [
+                        {'task_id': job['task_id'], 'group_id': job['group_id'], 'mode': job.get('mode'),
+                         'waiting_seconds': round(now - job['queued_at'], 1)}
+                        for job in account['queue']
+                    ],
+                    'completed': account['completed'],
+                    'requests_granted': governor.granted,
+                    'interval_range': list(governor.interval_range),
+                    'long_sleep_range': list(governor.long_sleep_range),
+                    'pages_per_batch': governor.files_per_batch,
+                })
+            return result
@@ -20,6 +20,26 @@ dir = "downloads"
 [database]
 # 可选：自定义数据库路径；留空则由路径管理器自动管理
 # path = ""
+
+[database.sqlite]
+# 各群组数据库（话题 / 文件 / 专栏）的 SQLite 性能参数，修改后重启生效
+# WAL 允许采集写入的同时读取页面数据；NORMAL 在 WAL 模式下兼顾安全与写入速度
+journal_mode = "WAL"
+synchronous = "NORMAL"
+# 内存映射读取上限（字节），0 表示关闭
+mmap_size = 268435456
+# 页缓存大小，负数单位为 KiB（-65536 即 64MB）
+cache_size = -65536
+# 临时表与排序使用内存
+temp_store = "MEMORY"
+# 数据库被锁定时的等待时间（毫秒）
+busy_timeout = 5000
+
+[cache.images]
+# 图片缓存容量上限（MB），超出后在后台按最近访问时间淘汰；0 表示不限制，修改后重启生效
+# 置顶话题与导出过的话题引用的图片不会被淘汰
+group_max_mb = 0
+total_max_mb = 0
 """
 
 
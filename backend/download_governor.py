@@ -0,0 +1,109 @@
+"""
+文件下载限速器
+并发下载时，真正触发风控的是获取签名下载链接（/v2/files/{id}/download_url）的请求频率，
+CDN 上的字节传输可以并行。这里用令牌桶统一节流同一账号的下载链接请求：
+每发放一个令牌后按下载间隔（可随机）补充下一个，每发放 files_per_batch 个令牌后进入一次长休眠。
+多群组爬取调度器（crawl_scheduler）也用同一个限速器为每个账号的话题请求节流。
+"""
+
+import hashlib
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+class DownloadRateGovernor:
+    """下载链接请求的令牌桶限速器（线程安全，可被多个下载器共享）"""
+
+    def __init__(self, interval_range: Tuple[float, float] = (1.0, 1.0),
+                 long_sleep_range: Tuple[float, float] = (60.0, 60.0),
+                 files_per_batch: int = 10, burst: int = 1, label: str = '下载链接'):
+        self._lock = threading.Lock()
+        self.label = label  # 日志中对令牌所代表请求的称呼
+        self.configure(interval_range, long_sleep_range, files_per_batch, burst)
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._next_interval = self._draw_interval()
+        self._paused_until = 0.0
+        self.granted = 0
+
+    def configure(self, interval_range: Tuple[float, float], long_sleep_range: Tuple[float, float],
+                  files_per_batch: int, burst: int = 1):
+        """更新限速参数（同一账号的新任务以最新设置为准）"""
+        with self._lock:
+            self.interval_range = (min(interval_range), max(interval_range))
+            self.long_sleep_range = (min(long_sleep_range), max(long_sleep_range))
+            self.files_per_batch = max(1, int(files_per_batch))
+            self.burst = max(1, int(burst))
+
+    def _draw_interval(self) -> float:
+        return random.uniform(*self.interval_range)
+
+    def _refill(self, now: float):
+        if self._next_interval <= 0:
+            self._tokens = float(self.burst)
+        else:
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) / self._next_interval)
+        self._last_refill = now
+
+    def _try_acquire(self) -> Tuple[bool, float, Optional[float]]:
+        """尝试取一个令牌，返回 (是否成功, 需等待秒数, 本次触发的长休眠秒数)"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                self._last_refill = now
+                return False, self._paused_until - now, None
+
+            self._refill(now)
+            if self._tokens < 1:
+                return False, (1 - self._tokens) * self._next_interval, None
+
+            self._tokens -= 1
+            self._next_interval = self._draw_interval()
+            self.granted += 1
+
+            long_sleep = None
+            if self.granted % self.files_per_batch == 0:
+                long_sleep = random.uniform(*self.long_sleep_range)
+                self._paused_until = now + long_sleep
+                self._tokens = 0.0
+            return True, 0.0, long_sleep
+
+    def acquire(self, stop_check: Optional[Callable[[], bool]] = None,
+                log: Optional[Callable[[str], None]] = None) -> bool:
+        """阻塞直到获得令牌；等待期间被停止时返回 False"""
+        announced = False
+        while True:
+            if stop_check and stop_check():
+                return False
+
+            granted, wait_seconds, long_sleep = self._try_acquire()
+            if granted:
+                if long_sleep and log:
+                    log(f"😴 已发放 {self.files_per_batch} 个{self.label}，后续请求长休眠 {long_sleep:.0f} 秒")
+                return True
+
+            if log and not announced and wait_seconds >= 5:
+                log(f"⏱️ {self.label}限速，等待 {wait_seconds:.0f} 秒...")
+                announced = True
+            # 分段等待，保证停止信号能及时生效
+            time.sleep(min(wait_seconds, 1.0))
+
+
+_governors: Dict[str, DownloadRateGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_download_governor(cookie: str, interval_range: Tuple[float, float],
+                          long_sleep_range: Tuple[float, float], files_per_batch: int) -> DownloadRateGovernor:
+    """获取账号共享的限速器（按 Cookie 区分账号），并应用本次任务的间隔设置"""
+    key = hashlib.sha1((cookie or '').encode('utf-8')).hexdigest()
+    with _governors_lock:
+        governor = _governors.get(key)
+        if governor is None:
+            governor = DownloadRateGovernor(interval_range, long_sleep_range, files_per_batch)
+            _governors[key] = governor
+            return governor
+    governor.configure(interval_range, long_sleep_range, files_per_batch)
+    return governor
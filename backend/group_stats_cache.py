@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+群组统计与占用空间缓存
+/api/groups 原先每次都遍历所有群组的下载、图片等目录统计占用大小，并对本地群逐个打开数据库做 COUNT 统计。
+这里把每个群的内容大小与话题统计持久化到配置库（zsxq_config.db 的 group_stats 表）：
+- 内容大小只统计群组目录下的子目录（downloads、images 等），并记录各子目录的 mtime 作为签名；
+  读取时签名不一致（例如手动删除了文件）即视为过期，由调用方安排后台重扫；
+- 下载器、图片缓存写入文件后增量累加大小并刷新该目录的签名，爬虫导入话题后累加话题数，
+  正常使用时无需重扫；
+- 群组目录一级的数据库等文件写入频繁，读取时直接 stat，不进入缓存。
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .db_path_manager import get_db_path_manager
+from .sqlite_connection import connect_sqlite
+
+_lock = threading.Lock()
+
+_STAT_FIELDS = (
+    "topics_count", "answers_count", "digests_count", "users_count", "files_count",
+    "first_topic_time", "last_topic_time", "name", "type", "background_url",
+)
+
+
+def _mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def compute_dir_signature(group_dirs: Iterable[str]) -> Dict[str, int]:
+    """群组目录下各一级子目录的 mtime（子目录中文件增删会改变其 mtime）"""
+    signature: Dict[str, int] = {}
+    for group_dir in group_dirs:
+        try:
+            entries = list(os.scandir(group_dir))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    signature[os.path.abspath(entry.path)] = entry.stat(follow_symlinks=False).st_mtime_ns
+            except OSError:
+                continue
+    return signature
+
+
+def top_level_files_size(group_dirs: Iterable[str]) -> int:
+    """群组目录一级文件（数据库、元数据等）的大小，读取时实时统计"""
+    total = 0
+    for group_dir in group_dirs:
+        try:
+            entries = list(os.scandir(group_dir))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False) and not entry.name.endswith(("-wal", "-shm")):
+                    total += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                continue
+    return total
+
+
+class GroupStatsCache:
+    """
+    群组统计缓存
+    数据库存放路径：DatabasePathManager.get_config_db_path()
+    表：group_stats
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        pm = get_db_path_manager()
+        self.db_path = db_path or pm.get_config_db_path()
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = connect_sqlite(self.db_path)
+        self.cursor = self.conn.cursor()
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        with _lock:
+            self.cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS group_stats (
+                    group_id INTEGER PRIMARY KEY,
+                    content_bytes INTEGER DEFAULT 0,
+                    dir_signature TEXT,
+                    topics_count INTEGER DEFAULT 0,
+                    answers_count INTEGER DEFAULT 0,
+                    digests_count INTEGER DEFAULT 0,
+                    users_count INTEGER DEFAULT 0,
+                    files_count INTEGER DEFAULT 0,
+                    first_topic_time TEXT,
+                    last_topic_time TEXT,
+                    name TEXT,
+                    type TEXT,
+                    background_url TEXT,
+                    stats_stale INTEGER DEFAULT 0,
+                    size_scanned_at TEXT,
+                    stats_updated_at TEXT
+                )
+                """
+            )
+            self.conn.commit()
+
+    def _get_row(self, group_id: int) -> Optional[Dict[str, Any]]:
+        self.cursor.execute("SELECT * FROM group_stats WHERE group_id = ?", (int(group_id),))
+        row = self.cursor.fetchone()
+        if not row:
+            return None
+        return dict(zip([d[0] for d in self.cursor.description], row))
+
+    def lookup(self, group_id: int, group_dirs: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的统计，size_bytes 为缓存的内容大小加上实时统计的一级文件大小。
+        从未扫描过返回 None；size_stale / stats_stale 表示需要后台重扫。
+        """
+        with _lock:
+            row = self._get_row(group_id)
+        if not row or not row["size_scanned_at"]:
+            return None
+
+        stored_signature = json.loads(row["dir_signature"]) if row["dir_signature"] else None
+        row["size_stale"] = stored_signature != compute_dir_signature(group_dirs)
+        row["stats_stale"] = bool(row["stats_stale"])
+        row["size_bytes"] = int(row["content_bytes"] or 0) + top_level_files_size(group_dirs)
+        row.pop("dir_signature", None)
+        return row
+
+    def store_scan(self, group_id: int, content_bytes: Optional[int] = None,
+                   dir_signature: Optional[Dict[str, int]] = None,
+                   stats: Optional[Dict[str, Any]] = None):
+        """写入一次完整扫描的结果（大小与统计可分别更新）"""
+        now = datetime.now().isoformat(timespec="seconds")
+        with _lock:
+            self.cursor.execute("INSERT OR IGNORE INTO group_stats (group_id) VALUES (?)", (int(group_id),))
+            if content_bytes is not None:
+                self.cursor.execute(
+                    "UPDATE group_stats SET content_bytes = ?, dir_signature = ?, size_scanned_at = ? WHERE group_id = ?",
+                    (int(content_bytes), json.dumps(dir_signature or {}), now, int(group_id)),
+                )
+            if stats is not None:
+                fields = [field for field in _STAT_FIELDS if field in stats]
+                assignments = ", ".join(f"{field} = ?" for field in fields)
+                self.cursor.execute(
+                    f"UPDATE group_stats SET {assignments}{', ' if fields else ''}stats_stale = 0, stats_updated_at = ? "
+                    "WHERE group_id = ?",
+                    [stats[field] for field in fields] + [now, int(group_id)],
+                )
+            self.conn.commit()
+
+    def record_file_added(self, group_id: int, file_path: str, size: Optional[int] = None):
+        """下载器/图片缓存写入新文件后累加内容大小，并刷新所在目录的签名"""
+        try:
+            if size is None:
+                size = os.path.getsize(file_path)
+        except OSError:
+            return
+        directory = os.path.abspath(os.path.dirname(file_path))
+        with _lock:
+            row = self._get_row(group_id)
+            if not row or not row["dir_signature"]:
+                return  # 尚未扫描过，首次读取时会完整统计
+            signature = json.loads(row["dir_signature"])
+            if directory not in signature:
+                # 新建的子目录：签名无法增量对齐，留给重扫
+                return
+            signature[directory] = _mtime_ns(directory)
+            self.cursor.execute(
+                "UPDATE group_stats SET content_bytes = content_bytes + ?, dir_signature = ? WHERE group_id = ?",
+                (int(size), json.dumps(signature), int(group_id)),
+            )
+            self.conn.commit()
+
+    def record_topics_added(self, group_id: int, new_topics: int,
+                            oldest_time: Optional[str] = None, newest_time: Optional[str] = None):
+        """爬虫导入话题后累加话题数并扩展话题时间范围"""
+        if not new_topics and not oldest_time and not newest_time:
+            return
+        with _lock:
+            self.cursor.execute(
+                """
+                UPDATE group_stats SET
+                    topics_count = topics_count + ?,
+                    first_topic_time = CASE WHEN ? IS NOT NULL AND (first_topic_time IS NULL OR ? < first_topic_time)
+                                            THEN ? ELSE first_topic_time END,
+                    last_topic_time = CASE WHEN ? IS NOT NULL AND (last_topic_time IS NULL OR ? > last_topic_time)
+                                           THEN ? ELSE last_topic_time END
+                WHERE group_id = ?
+                """,
+                (int(new_topics or 0), oldest_time, oldest_time, oldest_time,
+                 newest_time, newest_time, newest_time, int(group_id)),
+            )
+            self.conn.commit()
+
+    def mark_stats_stale(self, group_id: int):
+        """话题被删除、导入整包等无法增量计算的变化后标记统计过期"""
+        with _lock:
+            self.cursor.execute("UPDATE group_stats SET stats_stale = 1 WHERE group_id = ?", (int(group_id),))
+            self.conn.commit()
+
+    def invalidate(self, group_id: int):
+        """清空缓存的签名与统计标记，下次读取时重扫"""
+        with _lock:
+            self.cursor.execute(
+                "UPDATE group_stats SET dir_signature = '{}', stats_stale = 1 WHERE group_id = ?",
+                (int(group_id),),
+            )
+            self.conn.commit()
+
+    def remove(self, group_id: int):
+        with _lock:
+            self.cursor.execute("DELETE FROM group_stats WHERE group_id = ?", (int(group_id),))
+            self.conn.commit()
+
+    def close(self):
+        with _lock:
+            try:
+                self.cursor.close()
+            except Exception:
+                pass
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+
+
+_cache_singleton: Optional[GroupStatsCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_group_stats_cache() -> GroupStatsCache:
+    global _cache_singleton
+    if _cache_singleton is None:
+        with _cache_lock:
+            if _cache_singleton is None:
+                _cache_singleton = GroupStatsCache()
+    return _cache_singleton
+
+
+def record_file_added(group_id: Any, file_path: str, size: Optional[int] = None):
+    """供下载器等模块调用的便捷入口，统计缓存异常不影响主流程"""
+    try:
+        get_group_stats_cache().record_file_added(int(group_id), file_path, size)
+    except Exception as e:
+        print(f"⚠️ 更新群组占用空间缓存失败: {e}")
+
+
+def record_topics_added(group_id: Any, new_topics: int,
+                        oldest_time: Optional[str] = None, newest_time: Optional[str] = None):
+    try:
+        get_group_stats_cache().record_topics_added(int(group_id), new_topics, oldest_time, newest_time)
+    except Exception as e:
+        print(f"⚠️ 更新群组统计缓存失败: {e}")
+
+
+def record_file_removed(group_id: Any, file_path: str, size: int):
+    """图片缓存淘汰等删除文件后扣减内容大小（文件已删除，需由调用方提供大小）"""
+    try:
+        get_group_stats_cache().record_file_added(int(group_id), file_path, -int(size))
+    except Exception as e:
+        print(f"⚠️ 更新群组占用空间缓存失败: {e}")
@@ -0,0 +1,226 @@
+"""
+图片内容寻址存储
+图片缓存按 URL 的 md5 命名且每个群组一个目录：同一张图片经由不同的签名 URL 或出现在多个群组时会被重复保存。
+这里在数据库目录下维护一个按内容 sha256 寻址的 blob 目录（_image_blobs/），各群组的缓存文件是 blob 的硬链接：
+- 群组目录中的文件仍是普通文件，导出、导入、直接访问都不受影响，内容相同的图片只占一份磁盘空间；
+- 引用计数取自 blob 文件的硬链接数，群组缓存淘汰或整个目录被删除后，无引用的 blob 由 reconcile 清理；
+- 不支持硬链接（跨文件系统、FAT 等）时退化为普通文件，不做去重。
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .db_path_manager import get_db_path_manager
+from .sqlite_connection import connect_sqlite
+
+BLOB_DIR_NAME = "_image_blobs"
+BLOB_INDEX_NAME = "blobs.db"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """计算文件内容的 sha256"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ImageBlobStore:
+    """
+    图片 blob 存储（线程安全）
+    目录：DatabasePathManager.base_dir / _image_blobs
+    表：image_blobs
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or os.path.join(get_db_path_manager().base_dir, BLOB_DIR_NAME))
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = connect_sqlite(str(self.root / BLOB_INDEX_NAME))
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS image_blobs (
+                content_hash TEXT PRIMARY KEY,
+                ext TEXT,
+                size INTEGER DEFAULT 0,
+                refs INTEGER DEFAULT 0,
+                created_at REAL
+            )
+            """
+        )
+        self.conn.commit()
+        # content_hash -> {"ext", "size", "refs"}，统计只读内存
+        self._blobs: Dict[str, Dict[str, Any]] = {
+            row[0]: {"ext": row[1], "size": int(row[2] or 0), "refs": int(row[3] or 0)}
+            for row in self.conn.execute("SELECT content_hash, ext, size, refs FROM image_blobs")
+        }
+
+    def blob_path(self, content_hash: str, ext: str) -> Path:
+        return self.root / content_hash[:2] / f"{content_hash}{ext}"
+
+    def _set_refs(self, content_hash: str, refs: int):
+        self._blobs[content_hash]["refs"] = refs
+        self.conn.execute("UPDATE image_blobs SET refs = ? WHERE content_hash = ?", (refs, content_hash))
+
+    def _refresh(self, content_hash: str) -> int:
+        """按 blob 的硬链接数更新引用计数，无引用时删除 blob，返回引用数"""
+        blob = self._blobs.get(content_hash)
+        if blob is None:
+            return 0
+        path = self.blob_path(content_hash, blob["ext"])
+        try:
+            refs = max(0, os.stat(path).st_nlink - 1)
+        except FileNotFoundError:
+            refs = 0
+        if refs == 0:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self._blobs.pop(content_hash, None)
+            self.conn.execute("DELETE FROM image_blobs WHERE content_hash = ?", (content_hash,))
+        elif refs != blob["refs"]:
+            self._set_refs(content_hash, refs)
+        return refs
+
+    def _link_existing(self, content_hash: str, target_path: Path) -> bool:
+        """把 target_path 替换为已有 blob 的硬链接，失败时返回 False"""
+        blob = self._blobs.get(content_hash)
+        if blob is None:
+            return False
+        link_path = target_path.with_name(f"{target_path.name}.{uuid.uuid4().hex}.link")
+        try:
+            os.link(self.blob_path(content_hash, blob["ext"]), link_path)
+        except OSError:
+            # blob 已丢失或不支持硬链接
+            self._refresh(content_hash)
+            return False
+        os.replace(link_path, target_path)
+        self._refresh(content_hash)
+        self.conn.commit()
+        return True
+
+    def _register_new(self, source_path: Path, content_hash: str) -> bool:
+        """把 source_path 链接为新的 blob，不支持硬链接时返回 False"""
+        blob_path = self.blob_path(content_hash, source_path.suffix)
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            try:
+                os.link(source_path, blob_path)
+            except FileExistsError:
+                # 目录中有未登记的同名 blob（例如索引丢失），以本次内容为准
+                os.remove(blob_path)
+                os.link(source_path, blob_path)
+        except OSError:
+            return False
+        size = os.path.getsize(blob_path)
+        self._blobs[content_hash] = {"ext": source_path.suffix, "size": size, "refs": 1}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO image_blobs (content_hash, ext, size, refs, created_at) VALUES (?, ?, ?, ?, ?)",
+            (content_hash, source_path.suffix, size, 1, time.time()),
+        )
+        self._refresh(content_hash)
+        self.conn.commit()
+        return True
+
+    def store(self, temp_path: Path, content_hash: str, target_path: Path) -> Tuple[bool, bool]:
+        """
+        把已写完的临时文件放到 target_path：内容已存在时链接到已有 blob，否则登记为新 blob
+        临时文件须与 target_path 位于同一目录；调用后临时文件不再存在（被改名或删除）。
+
+        Returns:
+            (是否由 blob 存储管理, 是否复用了已有内容)
+        """
+        with self._lock:
+            if self._link_existing(content_hash, target_path):
+                os.remove(temp_path)
+                return True, True
+            os.replace(temp_path, target_path)
+            return self._register_new(target_path, content_hash), False
+
+    def adopt(self, file_path: Path) -> Tuple[Optional[str], bool]:
+        """
+        把已有的缓存文件纳入 blob 存储（用于对历史缓存去重）
+
+        Returns:
+            (内容哈希，不支持硬链接时为 None, 是否复用了已有内容)
+        """
+        content_hash = hash_file(file_path)
+        with self._lock:
+            blob = self._blobs.get(content_hash)
+            if blob is not None:
+                try:
+                    if os.path.samefile(self.blob_path(content_hash, blob["ext"]), file_path):
+                        return content_hash, False
+                except OSError:
+                    pass
+                if self._link_existing(content_hash, file_path):
+                    return content_hash, True
+            return (content_hash if self._register_new(file_path, content_hash) else None), False
+
+    def release(self, content_hash: Optional[str]):
+        """群组缓存删除了一个引用后调用"""
+        if not content_hash:
+            return
+        with self._lock:
+            self._refresh(content_hash)
+            self.conn.commit()
+
+    def reconcile(self) -> int:
+        """按硬链接数校正所有 blob 的引用，清理无引用的 blob，返回清理数量"""
+        with self._lock:
+            hashes = list(self._blobs)
+        removed = 0
+        for content_hash in hashes:
+            with self._lock:
+                if self._refresh(content_hash) == 0:
+                    removed += 1
+        with self._lock:
+            self.conn.commit()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """去重统计：logical 为各群组缓存引用的总字节数，physical 为 blob 实际占用"""
+        with self._lock:
+            physical = sum(blob["size"] for blob in self._blobs.values())
+            logical = sum(blob["size"] * blob["refs"] for blob in self._blobs.values())
+            references = sum(blob["refs"] for blob in self._blobs.values())
+            blobs = len(self._blobs)
+        return {
+            "blobs": blobs,
+            "references": references,
+            "logical_bytes": logical,
+            "physical_bytes": physical,
+            "bytes_saved": logical - physical,
+            "dedup_ratio": round(logical / physical, 4) if physical else None,
+        }
+
+    def close(self):
+        with self._lock:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+
+
+_store_singleton: Optional[ImageBlobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_image_blob_store() -> ImageBlobStore:
+    global _store_singleton
+    if _store_singleton is None:
+        with _store_lock:
+            if _store_singleton is None:
+                _store_singleton = ImageBlobStore()
+    return _store_singleton
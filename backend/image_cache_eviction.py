@@ -0,0 +1,231 @@
+"""
+图片缓存容量控制
+各群组的 images/ 缓存原先只增不减，唯一的控制手段是 clear_cache 整体清空。这里按 config.toml 中
+[cache.images] 的预算在后台按 LRU 淘汰：
+- group_max_mb 为单个群组缓存的上限，total_max_mb 为所有缓存合计的上限，0 表示不限制；
+- 写入新图片后检查预算，超出时启动后台淘汰（同一时间只有一轮），淘汰到预算的 90% 以免频繁触发；
+- 置顶话题引用的图片与被导出话题引用（pinned）的图片不参与淘汰。
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .db_path_manager import get_db_path_manager
+from .logger_config import log_info, log_warning
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+_CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'config.toml'))
+
+# 淘汰到预算的该比例为止
+LOW_WATER_RATIO = 0.9
+
+
+def load_image_cache_budget() -> Dict[str, int]:
+    """读取 config.toml 中的 [cache.images]，返回字节数（0 表示不限制）"""
+    budget = {"group_max_bytes": 0, "total_max_bytes": 0}
+    if tomllib is None or not os.path.exists(_CONFIG_PATH):
+        return budget
+    try:
+        with open(_CONFIG_PATH, 'rb') as f:
+            config = tomllib.load(f)
+    except Exception as e:
+        print(f"⚠️ 读取图片缓存容量配置失败，不限制容量: {e}")
+        return budget
+
+    raw = config.get('cache', {}).get('images', {})
+    if not isinstance(raw, dict):
+        return budget
+    for key, target in (('group_max_mb', 'group_max_bytes'), ('total_max_mb', 'total_max_bytes')):
+        if key not in raw:
+            continue
+        try:
+            budget[target] = max(0, int(float(raw[key]) * 1024 * 1024))
+        except (TypeError, ValueError):
+            print(f"⚠️ config.toml [cache.images] {key} = {raw[key]!r} 无效，不限制容量")
+    return budget
+
+
+def get_protected_cache_keys(group_id: Optional[str]) -> Set[str]:
+    """置顶话题（含其评论）引用的图片缓存键"""
+    if not group_id:
+        return set()
+    db_path = os.path.join(get_db_path_manager().base_dir, str(group_id), f"zsxq_topics_{group_id}.db")
+    if not os.path.exists(db_path):
+        return set()
+    keys: Set[str] = set()
+    try:
+        conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True, timeout=5)
+        try:
+            rows = conn.execute(
+                """
+                SELECT i.thumbnail_url, i.large_url, i.original_url
+                FROM images i JOIN topics t ON t.topic_id = i.topic_id
+                WHERE t.sticky = 1
+                """
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log_warning(f"读取群组 {group_id} 的置顶话题图片失败: {e}")
+        return set()
+    for row in rows:
+        for url in row:
+            if url:
+                keys.add(hashlib.md5(url.encode('utf-8')).hexdigest())
+    return keys
+
+
+class ImageCacheEvictor:
+    """图片缓存的后台淘汰器（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pending = False
+        self.budget = load_image_cache_budget()
+        self.last_run: Dict[str, Any] = {}
+
+    def reload_budget(self) -> Dict[str, int]:
+        self.budget = load_image_cache_budget()
+        return dict(self.budget)
+
+    def is_enabled(self) -> bool:
+        return bool(self.budget["group_max_bytes"] or self.budget["total_max_bytes"])
+
+    def check(self, manager) -> bool:
+        """写入新图片后调用：超出预算时启动后台淘汰，本身只读内存中的统计"""
+        group_max = self.budget["group_max_bytes"]
+        total_max = self.budget["total_max_bytes"]
+        if not group_max and not total_max:
+            return False
+        over = bool(group_max) and manager.index.stats()[1] > group_max
+        if not over and total_max:
+            from .image_cache_manager import loaded_cache_managers
+            over = sum(m.index.stats()[1] for m in loaded_cache_managers()) > total_max
+        if over:
+            self.request_sweep()
+        return over
+
+    def request_sweep(self) -> bool:
+        """启动一轮后台淘汰，返回是否新启动了线程；进行中时在本轮结束后再执行一次"""
+        if not self.is_enabled():
+            return False
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._pending = True
+                return False
+            self._thread = threading.Thread(target=self._run, daemon=True, name="image-cache-eviction")
+            self._thread.start()
+            return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                log_warning(f"图片缓存淘汰失败: {e}")
+            with self._lock:
+                if not self._pending:
+                    return
+                self._pending = False
+
+    @staticmethod
+    def _evict_until(candidates: List[Tuple[float, Any, str, int]], current: int, target: int) -> Tuple[int, int]:
+        """按最近访问时间从旧到新淘汰，直到不超过 target，返回 (淘汰数, 释放字节数)"""
+        count = freed = 0
+        for _, manager, cache_key, _size in candidates:
+            if current - freed <= target:
+                break
+            released = manager.evict(cache_key)
+            if released:
+                count += 1
+                freed += released
+        return count, freed
+
+    def sweep(self) -> Dict[str, Any]:
+        """执行一轮淘汰：先按单群组预算，再按合计预算"""
+        started = time.time()
+        group_max = self.budget["group_max_bytes"]
+        total_max = self.budget["total_max_bytes"]
+        from .image_cache_manager import all_cache_managers
+        managers = [(manager.group_id, manager) for manager in all_cache_managers()]
+        protected = {gid: get_protected_cache_keys(gid) for gid, _ in managers}
+
+        evicted = freed = 0
+        if group_max:
+            for gid, manager in managers:
+                size = manager.index.stats()[1]
+                if size <= group_max:
+                    continue
+                candidates = [(ts, manager, key, sz) for ts, key, sz in manager.eviction_candidates(protected[gid])]
+                count, released = self._evict_until(candidates, size, int(group_max * LOW_WATER_RATIO))
+                evicted += count
+                freed += released
+
+        if total_max:
+            total = sum(manager.index.stats()[1] for _, manager in managers)
+            if total > total_max:
+                candidates = [
+                    (ts, manager, key, sz)
+                    for gid, manager in managers
+                    for ts, key, sz in manager.eviction_candidates(protected[gid])
+                ]
+                candidates.sort(key=lambda item: item[0])
+                count, released = self._evict_until(candidates, total, int(total_max * LOW_WATER_RATIO))
+                evicted += count
+                freed += released
+
+        duration = round(time.time() - started, 2)
+        self.last_run = {
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "duration_seconds": duration,
+            "evicted": evicted,
+            "freed_bytes": freed,
+        }
+        if evicted:
+            log_info(f"图片缓存淘汰完成: 删除 {evicted} 张, 释放 {freed / 1024 / 1024:.1f} MB, 耗时 {duration}s")
+        return dict(self.last_run)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            running = self._thread is not None and self._thread.is_alive()
+        return {
+            "group_max_bytes": self.budget["group_max_bytes"],
+            "total_max_bytes": self.budget["total_max_bytes"],
+            "sweeping": running,
+            "last_run": dict(self.last_run),
+        }
+
+
+_evictor_singleton: Optional[ImageCacheEvictor] = None
+_evictor_lock = threading.Lock()
+
+
+def get_image_cache_evictor() -> ImageCacheEvictor:
+    global _evictor_singleton
+    if _evictor_singleton is None:
+        with _evictor_lock:
+            if _evictor_singleton is None:
+                _evictor_singleton = ImageCacheEvictor()
+    return _evictor_singleton
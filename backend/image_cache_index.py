@@ -0,0 +1,298 @@
+"""
+图片缓存索引
+原先判断图片是否已缓存要对每种扩展名逐个 Path.exists()，一次代理命中最多十次 stat；统计缓存信息要遍历整个目录。
+这里为每个图片缓存目录维护一个 SQLite 索引（目录下的 image_index.db），记录缓存键对应的文件名、大小、
+内容类型与最近访问时间：
+- 创建时一次性载入内存，查询不产生任何文件系统调用，缓存统计为 O(1)；
+- 最近访问时间只在内存中更新，定期批量写回，命中路径不会每次写库，供容量超限时按 LRU 淘汰；
+- pinned 标记的图片（被导出话题引用）不参与淘汰；
+- content_hash 为内容寻址存储（image_blob_store）中的 blob，文件删除后据此释放引用；
+- variants 为尺寸变体（image_variants）的文件名，size 包含变体的大小，淘汰时一并删除；
+- 索引文件不存在时（旧版本留下的缓存目录、导入后被重置）扫描一次目录重建。
+"""
+
+import json
+import mimetypes
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .sqlite_connection import connect_sqlite
+
+INDEX_DB_NAME = "image_index.db"
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.gif', '.webp', '.bmp')
+# 最近访问时间写回数据库的最小间隔
+ACCESS_FLUSH_INTERVAL_SECONDS = 30
+
+
+class ImageCacheIndex:
+    """
+    图片缓存索引（线程安全）
+    表：image_cache
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.db_path = self.cache_dir / INDEX_DB_NAME
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._total_bytes = 0
+        self._dirty_access: Dict[str, float] = {}
+        self._last_flush = time.monotonic()
+
+        fresh = not self.db_path.exists()
+        self.conn = connect_sqlite(str(self.db_path))
+        self._ensure_schema()
+        if fresh:
+            self.rebuild()
+        else:
+            self._load()
+
+    def _ensure_schema(self):
+        with self._lock:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS image_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    size INTEGER DEFAULT 0,
+                    content_type TEXT,
+                    created_at REAL,
+                    last_access REAL,
+                    pinned INTEGER DEFAULT 0,
+                    content_hash TEXT,
+                    variants TEXT
+                )
+                """
+            )
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(image_cache)")}
+            if "pinned" not in columns:
+                self.conn.execute("ALTER TABLE image_cache ADD COLUMN pinned INTEGER DEFAULT 0")
+            if "content_hash" not in columns:
+                self.conn.execute("ALTER TABLE image_cache ADD COLUMN content_hash TEXT")
+            if "variants" not in columns:
+                self.conn.execute("ALTER TABLE image_cache ADD COLUMN variants TEXT")
+            self.conn.commit()
+
+    def _load(self):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT cache_key, filename, size, content_type, created_at, last_access, pinned, content_hash, "
+                "variants FROM image_cache"
+            ).fetchall()
+            self._entries = {
+                row[0]: {
+                    "filename": row[1],
+                    "size": int(row[2] or 0),
+                    "content_type": row[3],
+                    "created_at": row[4],
+                    "last_access": row[5],
+                    "pinned": bool(row[6]),
+                    "content_hash": row[7],
+                    "variants": json.loads(row[8]) if row[8] is not None else None,
+                }
+                for row in rows
+            }
+            self._total_bytes = sum(entry["size"] for entry in self._entries.values())
+
+    def rebuild(self) -> int:
+        """扫描缓存目录重建索引，返回索引的图片数"""
+        entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            scanned = list(os.scandir(self.cache_dir))
+        except OSError:
+            scanned = []
+        for entry in scanned:
+            stem, ext = os.path.splitext(entry.name)
+            # 缓存键不含 "."，带点的是尺寸变体（<缓存键>.w<宽度>.<扩展名>）
+            if ext not in IMAGE_EXTENSIONS or "." in stem:
+                continue
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat_result = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            entries[stem] = {
+                "filename": entry.name,
+                "size": stat_result.st_size,
+                "content_type": mimetypes.guess_type(entry.name)[0] or "image/jpeg",
+                "created_at": stat_result.st_mtime,
+                "last_access": stat_result.st_atime,
+                "pinned": False,
+                "content_hash": None,
+                "variants": None,
+            }
+
+        with self._lock:
+            self.conn.execute("DELETE FROM image_cache")
+            self.conn.executemany(
+                "INSERT INTO image_cache (cache_key, filename, size, content_type, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (key, e["filename"], e["size"], e["content_type"], e["created_at"], e["last_access"])
+                    for key, e in entries.items()
+                ],
+            )
+            self.conn.commit()
+            self._entries = entries
+            self._total_bytes = sum(e["size"] for e in entries.values())
+            self._dirty_access.clear()
+        return len(entries)
+
+    def lookup(self, cache_key: str, touch: bool = True) -> Optional[Dict[str, Any]]:
+        """查询缓存条目（只读内存），touch 时记录一次访问"""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if touch:
+                now = time.time()
+                entry["last_access"] = now
+                self._dirty_access[cache_key] = now
+                if time.monotonic() - self._last_flush >= ACCESS_FLUSH_INTERVAL_SECONDS:
+                    self.flush_access()
+            return entry
+
+    def path_for(self, cache_key: str, touch: bool = True) -> Optional[Path]:
+        entry = self.lookup(cache_key, touch=touch)
+        return self.cache_dir / entry["filename"] if entry else None
+
+    def add(self, cache_key: str, filename: str, size: int, content_type: Optional[str] = None,
+            content_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """登记新写入的缓存文件（同一缓存键重复写入时覆盖），返回被覆盖的旧条目"""
+        now = time.time()
+        with self._lock:
+            previous = self._entries.get(cache_key)
+            pinned = bool(previous and previous.get("pinned"))
+            if previous:
+                self._total_bytes -= previous["size"]
+            self._entries[cache_key] = {
+                "filename": filename,
+                "size": int(size),
+                "content_type": content_type,
+                "created_at": now,
+                "last_access": now,
+                "pinned": pinned,
+                "content_hash": content_hash,
+                "variants": None,
+            }
+            self._total_bytes += int(size)
+            self._dirty_access.pop(cache_key, None)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO image_cache "
+                "(cache_key, filename, size, content_type, created_at, last_access, pinned, content_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, filename, int(size), content_type, now, now, int(pinned), content_hash),
+            )
+            self.conn.commit()
+            return previous
+
+    def remove(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """移除条目（不删除文件），返回被移除的条目"""
+        with self._lock:
+            entry = self._entries.pop(cache_key, None)
+            if entry is None:
+                return None
+            self._total_bytes -= entry["size"]
+            self._dirty_access.pop(cache_key, None)
+            self.conn.execute("DELETE FROM image_cache WHERE cache_key = ?", (cache_key,))
+            self.conn.commit()
+            return entry
+
+    def pin(self, cache_key: str) -> bool:
+        """标记图片不参与淘汰，返回条目是否存在"""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return False
+            if not entry.get("pinned"):
+                entry["pinned"] = True
+                self.conn.execute("UPDATE image_cache SET pinned = 1 WHERE cache_key = ?", (cache_key,))
+                self.conn.commit()
+            return True
+
+    def set_variants(self, cache_key: str, variants: Dict[str, str], variants_bytes: int):
+        """登记生成的尺寸变体，变体大小计入条目大小"""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return
+            entry["variants"] = variants
+            entry["size"] += int(variants_bytes)
+            self._total_bytes += int(variants_bytes)
+            self.conn.execute(
+                "UPDATE image_cache SET variants = ?, size = size + ? WHERE cache_key = ?",
+                (json.dumps(variants), int(variants_bytes), cache_key),
+            )
+            self.conn.commit()
+
+    def set_content_hash(self, cache_key: str, content_hash: Optional[str]):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return
+            entry["content_hash"] = content_hash
+            self.conn.execute("UPDATE image_cache SET content_hash = ? WHERE cache_key = ?", (content_hash, cache_key))
+            self.conn.commit()
+
+    def entries(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """所有条目的快照 (缓存键, 条目)"""
+        with self._lock:
+            return [(key, dict(entry)) for key, entry in self._entries.items()]
+
+    def eviction_candidates(self, protected: Iterable[str] = ()) -> List[Tuple[float, str, int]]:
+        """可淘汰的条目 (最近访问时间, 缓存键, 大小)，按最近访问时间从旧到新排列"""
+        protected = set(protected)
+        with self._lock:
+            candidates = [
+                (entry.get("last_access") or 0.0, key, entry["size"])
+                for key, entry in self._entries.items()
+                if not entry.get("pinned") and key not in protected
+            ]
+        candidates.sort()
+        return candidates
+
+    def pinned_count(self) -> int:
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if entry.get("pinned"))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self._dirty_access.clear()
+            self.conn.execute("DELETE FROM image_cache")
+            self.conn.commit()
+
+    def stats(self) -> Tuple[int, int]:
+        """(图片数, 总字节数)"""
+        with self._lock:
+            return len(self._entries), self._total_bytes
+
+    def flush_access(self):
+        """把内存中更新的最近访问时间写回数据库"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._dirty_access:
+                return
+            updates = [(ts, key) for key, ts in self._dirty_access.items()]
+            self._dirty_access.clear()
+            try:
+                self.conn.executemany("UPDATE image_cache SET last_access = ? WHERE cache_key = ?", updates)
+                self.conn.commit()
+            except Exception as e:
+                print(f"⚠️ 写回图片缓存访问时间失败: {e}")
+
+    def close(self):
+        with self._lock:
+            try:
+                self.flush_access()
+            except Exception:
+                pass
+            try:
+                self.conn.close()
+            except Exception:
+                pass
@@ -4,27 +4,45 @@
 """
 
 import os
+import asyncio
 import hashlib
+import threading
+import uuid
 import requests
 import mimetypes
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urlparse
 import time
 
+from .group_stats_cache import record_file_added, record_file_removed
+from .image_blob_store import get_image_blob_store
+from .image_cache_index import INDEX_DB_NAME, ImageCacheIndex
+from .image_variants import get_image_variant_worker, pick_variant, variants_supported
+from .pooled_http import get_image_http_client
+
 
 class ImageCacheManager:
     """图片缓存管理器"""
 
-    def __init__(self, cache_dir: str = "cache/images"):
+    def __init__(self, cache_dir: str = "cache/images", group_id: str = None):
         """
         初始化图片缓存管理器
 
         Args:
             cache_dir: 缓存目录路径
+            group_id: 所属群组ID（用于更新群组占用空间缓存）
         """
         self.cache_dir = Path(cache_dir)
+        self.group_id = group_id
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # 缓存键 -> 文件的索引，查询不再逐个扩展名探测文件
+        self.index = ImageCacheIndex(self.cache_dir)
+        # 正在下载的图片（缓存键 -> Future），同一图片的并发请求共用一次下载
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 进程内的命中/未命中/淘汰计数
+        self._counters_lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "evicted_bytes": 0}
         
         # 支持的图片格式
         self.supported_formats = {
@@ -97,10 +115,9 @@ class ImageCacheManager:
         cache_key = self._get_cache_key(url)
         
         # 如果已存在文件，直接返回
-        for ext in ['.jpg', '.png', '.gif', '.webp', '.bmp']:
-            existing_file = self.cache_dir / f"{cache_key}{ext}"
-            if existing_file.exists():
-                return existing_file
+        existing_file = self.index.path_for(cache_key, touch=False)
+        if existing_file:
+            return existing_file
         
         # 生成新文件路径
         extension = self._get_file_extension(content_type or '', url)
@@ -118,16 +135,8 @@ class ImageCacheManager:
         """
         if not url:
             return False
-            
-        cache_key = self._get_cache_key(url)
-        
-        # 检查是否存在任何格式的缓存文件
-        for ext in ['.jpg', '.png', '.gif', '.webp', '.bmp']:
-            cache_file = self.cache_dir / f"{cache_key}{ext}"
-            if cache_file.exists():
-                return True
         
-        return False
+        return self.index.lookup(self._get_cache_key(url), touch=False) is not None
     
     def get_cached_path(self, url: str) -> Optional[Path]:
         """
@@ -139,26 +148,123 @@ class ImageCacheManager:
         Returns:
             缓存文件路径，如果不存在则返回None
         """
-        if not self.is_cached(url):
+        if not url:
             return None
         
-        cache_key = self._get_cache_key(url)
-        
-        # 查找存在的缓存文件
-        for ext in ['.jpg', '.png', '.gif', '.webp', '.bmp']:
-            cache_file = self.cache_dir / f"{cache_key}{ext}"
-            if cache_file.exists():
-                return cache_file
-        
-        return None
+        cached_path = self.index.path_for(self._get_cache_key(url))
+        if cached_path:
+            self._count("hits")
+        return cached_path
     
-    def download_and_cache(self, url: str, timeout: int = 30) -> Tuple[bool, Optional[Path], Optional[str]]:
+    def _count(self, name: str, amount: int = 1):
+        with self._counters_lock:
+            self.counters[name] += amount
+    
+    def pin(self, url: str) -> bool:
+        """标记图片被导出的话题引用，容量超限时不淘汰"""
+        return self.index.pin(self._get_cache_key(url)) if url else False
+    
+    def get_variant(self, cache_key: str, width: int) -> Optional[Tuple[int, Path]]:
+        """
+        按宽度选择尺寸变体 (变体宽度, 文件路径)，只读内存中的索引
+        变体尚未生成时安排后台生成，本次返回 None（使用原图）。
+        """
+        entry = self.index.lookup(cache_key, touch=False)
+        if entry is None or not width:
+            return None
+        variants = entry.get("variants")
+        if variants is None:
+            if variants_supported():
+                get_image_variant_worker().submit(self, cache_key)
+            return None
+        picked = pick_variant(variants, width)
+        return (picked[0], self.cache_dir / picked[1]) if picked else None
+    
+    def set_variants(self, cache_key: str, variants: Dict[str, str], variants_bytes: int):
+        """后台生成变体后登记到索引"""
+        self.index.set_variants(cache_key, variants, variants_bytes)
+        if self.group_id:
+            for filename in variants.values():
+                record_file_added(self.group_id, str(self.cache_dir / filename))
+    
+    def _remove_variant_files(self, entry: Optional[dict]):
+        for filename in ((entry or {}).get("variants") or {}).values():
+            try:
+                (self.cache_dir / filename).unlink()
+            except OSError:
+                pass
+    
+    def _release_blob(self, content_hash: Optional[str]):
+        if not content_hash:
+            return
+        try:
+            get_image_blob_store().release(content_hash)
+        except Exception as e:
+            print(f"⚠️ 释放图片 blob 引用失败: {e}")
+    
+    def dedupe_existing(self) -> Tuple[int, int]:
+        """把尚未纳入内容寻址存储的缓存文件纳入存储，返回 (处理数, 复用已有内容数)"""
+        store = get_image_blob_store()
+        adopted = reused = 0
+        for cache_key, entry in self.index.entries():
+            if entry.get("content_hash"):
+                continue
+            file_path = self.cache_dir / entry["filename"]
+            try:
+                content_hash, was_reused = store.adopt(file_path)
+            except FileNotFoundError:
+                self.index.remove(cache_key)
+                continue
+            if content_hash:
+                self.index.set_content_hash(cache_key, content_hash)
+                adopted += 1
+                reused += int(was_reused)
+        return adopted, reused
+    
+    def evict(self, cache_key: str) -> int:
+        """淘汰一张缓存图片，返回释放的字节数"""
+        entry = self.index.remove(cache_key)
+        if not entry:
+            return 0
+        file_path = self.cache_dir / entry["filename"]
+        try:
+            file_path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ 删除缓存图片失败: {file_path}: {e}")
+        self._remove_variant_files(entry)
+        self._release_blob(entry.get("content_hash"))
+        self._count("evictions")
+        self._count("evicted_bytes", entry["size"])
+        if self.group_id:
+            record_file_removed(self.group_id, str(file_path), entry["size"])
+        return entry["size"]
+    
+    def eviction_candidates(self, protected: Iterable[str] = ()):
+        """可淘汰的图片 (最近访问时间, 缓存键, 大小)，最久未访问的在前"""
+        return self.index.eviction_candidates(protected)
+    
+    def discard(self, url: str):
+        """移除索引中已失效的条目（例如文件被外部删除），并清理可能残留的文件"""
+        entry = self.index.remove(self._get_cache_key(url))
+        if entry:
+            try:
+                (self.cache_dir / entry["filename"]).unlink()
+            except OSError:
+                pass
+            self._remove_variant_files(entry)
+            self._release_blob(entry.get("content_hash"))
+    
+    def download_and_cache(self, url: str, timeout: int = 30,
+                           session: Optional[requests.Session] = None) -> Tuple[bool, Optional[Path], Optional[str]]:
         """
         下载并缓存图片
         
         Args:
             url: 图片URL
             timeout: 请求超时时间
+            session: 复用连接的会话，默认每次新建连接
             
         Returns:
             (是否成功, 缓存文件路径, 错误信息)
@@ -166,30 +272,70 @@ class ImageCacheManager:
         if not url:
             return False, None, "URL为空"
         
+        # 检查是否已缓存
+        cached_path = self.get_cached_path(url)
+        if cached_path:
+            return True, cached_path, None
+        
+        self._count("misses")
+        return self._download(url, timeout, session)
+    
+    def _download(self, url: str, timeout: int,
+                  session: Optional[requests.Session]) -> Tuple[bool, Optional[Path], Optional[str]]:
+        """下载图片写入缓存并登记索引"""
         try:
-            # 检查是否已缓存
-            if self.is_cached(url):
-                cached_path = self.get_cached_path(url)
-                return True, cached_path, None
-            
             # 下载图片
-            response = requests.get(url, headers=self.headers, timeout=timeout, stream=True)
-            response.raise_for_status()
-            
-            # 检查内容类型
-            content_type = response.headers.get('content-type', '').lower()
-            if not any(fmt in content_type for fmt in self.supported_formats.keys()):
-                return False, None, f"不支持的图片格式: {content_type}"
-            
-            # 获取缓存路径
-            cache_path = self._get_cache_path(url, content_type)
-            
-            # 保存文件
-            with open(cache_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            with (session or requests).get(url, headers=self.headers, timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                
+                # 检查内容类型
+                content_type = response.headers.get('content-type', '').lower()
+                if not any(fmt in content_type for fmt in self.supported_formats.keys()):
+                    return False, None, f"不支持的图片格式: {content_type}"
+                
+                # 获取缓存路径
+                cache_path = self._get_cache_path(url, content_type)
+                
+                # 先写临时文件再改名，其它请求不会读到写了一半的图片
+                temp_path = cache_path.with_name(f"{cache_path.name}.{uuid.uuid4().hex}.part")
+                written = 0
+                hasher = hashlib.sha256()
+                content_hash = None
+                try:
+                    with open(temp_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=65536):
+                            if chunk:
+                                f.write(chunk)
+                                hasher.update(chunk)
+                                written += len(chunk)
+                    # 内容相同的图片（不同签名 URL、不同群组）共用同一个 blob
+                    try:
+                        stored, _reused = get_image_blob_store().store(temp_path, hasher.hexdigest(), cache_path)
+                        content_hash = hasher.hexdigest() if stored else None
+                    except Exception as e:
+                        print(f"⚠️ 图片去重存储失败，按普通文件缓存: {e}")
+                    if temp_path.exists():
+                        os.replace(temp_path, cache_path)
+                finally:
+                    if temp_path.exists():
+                        temp_path.unlink()
             
+            cache_key = self._get_cache_key(url)
+            previous = self.index.add(cache_key, cache_path.name, written,
+                                      mimetypes.guess_type(cache_path.name)[0] or 'image/jpeg', content_hash)
+            if previous:
+                self._remove_variant_files(previous)
+                if previous.get("content_hash") != content_hash:
+                    self._release_blob(previous.get("content_hash"))
+            # 后台生成缩略图等尺寸变体
+            if variants_supported():
+                get_image_variant_worker().submit(self, cache_key)
+
+            if self.group_id:
+                record_file_added(self.group_id, str(cache_path))
+            # 超出容量预算时安排后台淘汰
+            from .image_cache_eviction import get_image_cache_evictor
+            get_image_cache_evictor().check(self)
             return True, cache_path, None
             
         except requests.exceptions.RequestException as e:
@@ -197,6 +343,34 @@ class ImageCacheManager:
         except Exception as e:
             return False, None, f"缓存失败: {str(e)}"
     
+    async def fetch(self, url: str, timeout: int = 20) -> Tuple[bool, Optional[Path], Optional[str]]:
+        """
+        在事件循环中获取图片：命中缓存直接返回，未命中时在连接池线程中下载
+        同一图片的并发请求只下载一次，其余请求等待同一结果。
+        
+        Returns:
+            (是否成功, 缓存文件路径, 错误信息)
+        """
+        if not url:
+            return False, None, "URL为空"
+        
+        cached_path = self.get_cached_path(url)
+        if cached_path:
+            return True, cached_path, None
+        
+        self._count("misses")
+        cache_key = self._get_cache_key(url)
+        future = self._inflight.get(cache_key)
+        if future is None:
+            client = get_image_http_client()
+            future = asyncio.ensure_future(
+                client.run_blocking(self._download, url, timeout, client.session)
+            )
+            self._inflight[cache_key] = future
+            future.add_done_callback(lambda _f: self._inflight.pop(cache_key, None))
+        # shield：单个请求被取消（客户端断开）不影响其它等待者与下载本身
+        return await asyncio.shield(future)
+    
     def get_cache_info(self) -> dict:
         """
         获取缓存统计信息
@@ -204,26 +378,19 @@ class ImageCacheManager:
         Returns:
             缓存统计信息
         """
-        if not self.cache_dir.exists():
-            return {
-                "total_files": 0,
-                "total_size": 0,
-                "cache_dir": str(self.cache_dir)
-            }
-        
-        total_files = 0
-        total_size = 0
-        
-        for file_path in self.cache_dir.iterdir():
-            if file_path.is_file():
-                total_files += 1
-                total_size += file_path.stat().st_size
+        total_files, total_size = self.index.stats()
+        with self._counters_lock:
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["misses"]
         
         return {
             "total_files": total_files,
             "total_size": total_size,
             "total_size_mb": round(total_size / (1024 * 1024), 2),
-            "cache_dir": str(self.cache_dir)
+            "cache_dir": str(self.cache_dir),
+            "pinned_files": self.index.pinned_count(),
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None,
         }
     
     def clear_cache(self) -> Tuple[bool, str]:
@@ -237,20 +404,31 @@ class ImageCacheManager:
             if not self.cache_dir.exists():
                 return True, "缓存目录不存在"
             
+            content_hashes = {entry.get("content_hash") for _, entry in self.index.entries()}
             deleted_count = 0
             for file_path in self.cache_dir.iterdir():
-                if file_path.is_file():
+                # 索引数据库连接仍打开，只清空其内容
+                if file_path.is_file() and not file_path.name.startswith(INDEX_DB_NAME):
                     file_path.unlink()
                     deleted_count += 1
+            self.index.clear()
+            for content_hash in content_hashes:
+                self._release_blob(content_hash)
             
             return True, f"已删除 {deleted_count} 个缓存文件"
             
         except Exception as e:
             return False, f"清空缓存失败: {str(e)}"
+    
+    def close(self):
+        """关闭索引数据库连接"""
+        self.index.close()
 
 
 # 全局缓存管理器实例字典，按群组ID存储
 _cache_managers = {}
+# 后台淘汰线程也会创建管理器，避免同一目录打开两份索引
+_managers_lock = threading.RLock()
 
 
 def get_image_cache_manager(group_id: str = None) -> ImageCacheManager:
@@ -265,25 +443,76 @@ def get_image_cache_manager(group_id: str = None) -> ImageCacheManager:
     """
     global _cache_managers
 
-    if group_id:
-        # 使用群组专用缓存目录
-        if group_id not in _cache_managers:
-            from .db_path_manager import get_db_path_manager
-            path_manager = get_db_path_manager()
-            # 在群组数据库目录下创建images子目录
-            db_dir = path_manager.get_group_data_dir(group_id)
-            cache_dir = db_dir / "images"
-            _cache_managers[group_id] = ImageCacheManager(str(cache_dir))
-        return _cache_managers[group_id]
-    else:
-        # 使用默认全局缓存目录
-        if 'default' not in _cache_managers:
-            _cache_managers['default'] = ImageCacheManager()
-        return _cache_managers['default']
+    with _managers_lock:
+        if group_id:
+            # 使用群组专用缓存目录
+            if group_id not in _cache_managers:
+                from .db_path_manager import get_db_path_manager
+                path_manager = get_db_path_manager()
+                # 在群组数据库目录下创建images子目录
+                db_dir = path_manager.get_group_data_dir(group_id)
+                cache_dir = db_dir / "images"
+                _cache_managers[group_id] = ImageCacheManager(str(cache_dir), group_id=group_id)
+            return _cache_managers[group_id]
+        else:
+            # 使用默认全局缓存目录
+            if 'default' not in _cache_managers:
+                _cache_managers['default'] = ImageCacheManager()
+            return _cache_managers['default']
+
+
+def loaded_cache_managers() -> List[ImageCacheManager]:
+    """当前已加载的缓存管理器"""
+    with _managers_lock:
+        return list(_cache_managers.values())
+
+
+def all_cache_managers() -> List[ImageCacheManager]:
+    """所有图片缓存的管理器（含尚未加载的本地群组）"""
+    from .db_path_manager import get_db_path_manager
+    base_dir = get_db_path_manager().base_dir
+    try:
+        group_ids = [
+            entry.name for entry in os.scandir(base_dir)
+            if entry.is_dir() and entry.name.isdigit() and os.path.isdir(os.path.join(entry.path, "images"))
+        ]
+    except OSError:
+        group_ids = []
+    for group_id in group_ids:
+        get_image_cache_manager(group_id)
+    return loaded_cache_managers()
+
 
+def clear_group_cache_manager(group_id: str, reset_index: bool = False):
+    """
+    清除指定群组的缓存管理器实例
 
-def clear_group_cache_manager(group_id: str):
-    """清除指定群组的缓存管理器实例"""
+    Args:
+        group_id: 群组ID
+        reset_index: 同时删除索引文件（图片目录被整体替换后使用，下次访问时扫描目录重建）
+    """
     global _cache_managers
-    if group_id in _cache_managers:
-        del _cache_managers[group_id]
+    with _managers_lock:
+        manager = _cache_managers.pop(group_id, None)
+    if manager:
+        manager.close()
+    if reset_index:
+        from .db_path_manager import get_db_path_manager
+        images_dir = get_db_path_manager().get_group_data_dir(group_id) / "images"
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(images_dir / f"{INDEX_DB_NAME}{suffix}")
+            except OSError:
+                pass
+
+
+def close_cache_managers():
+    """关闭所有缓存管理器（释放索引数据库连接）"""
+    with _managers_lock:
+        managers = list(_cache_managers.values())
+        _cache_managers.clear()
+    for manager in managers:
+        try:
+            manager.close()
+        except Exception as e:
+            print(f"⚠️ 关闭图片缓存索引失败: {e}")
@@ -0,0 +1,161 @@
+"""
+图片尺寸变体
+话题列表的缩略图、20px 头像原先都通过代理加载原图。图片写入缓存后，这里在后台线程池中生成若干宽度的缩小版本
+（64/256/1024 px），每个宽度在 WebP 与原格式之间取体积更小的一份，与原图放在同一缓存目录（<缓存键>.w<宽度>.<扩展名>），
+并登记在缓存索引中；图片接口按 w= 参数返回不小于该宽度的最小变体。
+- 生成依赖 Pillow（可选依赖），未安装时不生成变体，w= 参数返回原图；
+- 动图与宽度不超过某一档的图片不生成对应变体；
+- 升级前已缓存的图片在首次按 w= 请求时补生成。
+"""
+
+import io
+import mimetypes
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .logger_config import log_warning
+
+mimetypes.add_type("image/webp", ".webp")
+
+VARIANT_WIDTHS = (64, 256, 1024)
+VARIANT_WORKERS = 2
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+_NATIVE_FORMATS = {".jpg": "JPEG", ".png": "PNG", ".gif": "GIF", ".bmp": "BMP", ".webp": "WEBP"}
+
+
+def variants_supported() -> bool:
+    return Image is not None
+
+
+def variant_filename(cache_key: str, width: int, ext: str) -> str:
+    return f"{cache_key}.w{width}{ext}"
+
+
+def pick_variant(variants: Optional[Dict[str, str]], requested_width: int) -> Optional[Tuple[int, str]]:
+    """选择不小于请求宽度的最小变体 (宽度, 文件名)；没有合适的变体时返回 None（使用原图）"""
+    if not variants or not requested_width:
+        return None
+    for width in sorted(int(w) for w in variants):
+        if width >= requested_width:
+            return width, variants[str(width)]
+    return None
+
+
+def _encode(image, fmt: str) -> Optional[bytes]:
+    buffer = io.BytesIO()
+    try:
+        if fmt == "JPEG":
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        elif fmt == "WEBP":
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() or image.mode == "P" else "RGB")
+            image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+        else:
+            image.save(buffer, fmt)
+    except Exception:
+        return None
+    return buffer.getvalue()
+
+
+def generate_variants(source_path: Path, cache_key: str) -> Tuple[Dict[str, str], int]:
+    """
+    为缓存图片生成尺寸变体
+
+    Returns:
+        ({宽度: 文件名}, 变体总字节数)
+    """
+    variants: Dict[str, str] = {}
+    total_bytes = 0
+    with Image.open(source_path) as image:
+        if getattr(image, "is_animated", False):
+            return variants, 0
+        image.load()
+        native_format = _NATIVE_FORMATS.get(source_path.suffix.lower())
+        for width in VARIANT_WIDTHS:
+            if width >= image.width:
+                break
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            candidates = [(".webp", _encode(resized, "WEBP"))]
+            if native_format and native_format != "WEBP":
+                candidates.append((source_path.suffix.lower(), _encode(resized, native_format)))
+            candidates = [(ext, data) for ext, data in candidates if data]
+            if not candidates:
+                continue
+            ext, data = min(candidates, key=lambda item: len(item[1]))
+            filename = variant_filename(cache_key, width, ext)
+            target = source_path.with_name(filename)
+            temp_path = target.with_name(f"{filename}.{uuid.uuid4().hex}.part")
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, target)
+            variants[str(width)] = filename
+            total_bytes += len(data)
+    return variants, total_bytes
+
+
+class ImageVariantWorker:
+    """在后台线程池中为缓存图片生成变体，同一图片同一时间只排队一次"""
+
+    def __init__(self, max_workers: int = VARIANT_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-variants")
+        self._lock = threading.Lock()
+        self._pending: Set[Tuple[str, str]] = set()
+
+    def submit(self, manager, cache_key: str) -> bool:
+        if not variants_supported():
+            return False
+        job = (str(manager.cache_dir), cache_key)
+        with self._lock:
+            if job in self._pending:
+                return False
+            self._pending.add(job)
+        self._executor.submit(self._run, manager, cache_key, job)
+        return True
+
+    def _run(self, manager, cache_key: str, job: Tuple[str, str]):
+        try:
+            entry = manager.index.lookup(cache_key, touch=False)
+            if entry is None or entry.get("variants") is not None:
+                return
+            variants, total_bytes = generate_variants(manager.cache_dir / entry["filename"], cache_key)
+            manager.set_variants(cache_key, variants, total_bytes)
+        except Exception as e:
+            log_warning(f"生成图片尺寸变体失败: {cache_key}: {e}")
+            try:
+                # 记录为空，避免无法解码的图片被反复提交
+                manager.set_variants(cache_key, {}, 0)
+            except Exception:
+                pass
+        finally:
+            with self._lock:
+                self._pending.discard(job)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_worker_singleton: Optional[ImageVariantWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_image_variant_worker() -> ImageVariantWorker:
+    global _worker_singleton
+    if _worker_singleton is None:
+        with _worker_lock:
+            if _worker_singleton is None:
+                _worker_singleton = ImageVariantWorker()
+    return _worker_singleton
@@ -332,6 +332,43 @@ def log_task_event(
         file_obj.write(line)
 
 
+# 单任务日志文件行格式：时间 | 级别 | task=.. group=.. type=.. | 消息（消息中的换行会延续到后续行）
+_TASK_LOG_LINE_RE = re.compile(
+    r"^\d{4}-\d{2}-\d{2} (\d{2}:\d{2}:\d{2})\.\d{3} \| \S+\s* \| task=\S* group=\S* type=\S* \| (.*)$"
+)
+
+
+def find_task_log_files(task_id: str) -> list[Path]:
+    """查找任务日志文件；任务跨天运行时分布在多个日期目录，按日期排序返回。"""
+    safe_task_id = re.sub(r"[^A-Za-z0-9_.-]+", "_", task_id)
+    return sorted(LOG_ROOT.glob(f"*/*/*/tasks/{safe_task_id}.log"))
+
+
+def read_task_log_entries(task_id: str, offset: int = 0, limit: Optional[int] = None) -> tuple[list[str], int]:
+    """按条分页读取任务日志文件。
+
+    返回 (日志列表, 总条数)，日志格式与内存中的任务日志一致：``[HH:MM:SS] 消息``。
+    逐行流式读取，只保留请求范围内的条目，避免大日志整体载入内存。
+    """
+    entries: list[str] = []
+    total = 0
+    end = None if limit is None else offset + limit
+
+    for path in find_task_log_files(task_id):
+        with path.open("r", encoding="utf-8", errors="replace") as file_obj:
+            for raw_line in file_obj:
+                line = raw_line.rstrip("\n")
+                match = _TASK_LOG_LINE_RE.match(line)
+                if match:
+                    total += 1
+                    if total > offset and (end is None or total <= end):
+                        entries.append(f"[{match.group(1)}] {match.group(2)}")
+                elif total > offset and (end is None or total <= end) and entries:
+                    entries[-1] += "\n" + line
+
+    return entries, total
+
+
 def log_debug(message: str, **kwargs: Any) -> None:
     """记录 DEBUG 级别日志。"""
     ensure_configured()
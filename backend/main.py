@@ -9,18 +9,22 @@ import asyncio
 import base64
 import gc
 import shutil
-import io
 import posixpath
 import sqlite3
 import tempfile
+import threading
+import uuid
 import zipfile
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterator, Optional, List, Tuple
 from datetime import datetime
 from contextlib import asynccontextmanager
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
 import json
 import requests
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, Response, FileResponse
 from pydantic import BaseModel, Field
@@ -38,17 +42,38 @@ if project_root not in sys.path:
 
 # 导入现有的业务逻辑模块
 from .zsxq_interactive_crawler import ZSXQInteractiveCrawler, load_config
-from .zsxq_database import ZSXQDatabase
+from .zsxq_database import ZSXQDatabase, invalidate_topic_count_cache, ms_to_topic_time, topic_time_to_ms
 from .zsxq_file_database import ZSXQFileDatabase
 from .db_path_manager import get_db_path_manager
 from . import accounts_sql_manager as accounts_sql_module
 from . import account_info_db as account_info_module
 from . import image_cache_manager as image_cache_module
 from .image_cache_manager import get_image_cache_manager
+from .image_cache_index import INDEX_DB_NAME as IMAGE_INDEX_DB_NAME
+from .image_cache_eviction import get_image_cache_evictor
+from . import image_blob_store as image_blob_module
+from . import image_variants as image_variants_module
+from .image_blob_store import BLOB_DIR_NAME as IMAGE_BLOB_DIR_NAME, get_image_blob_store
+from .task_log_bus import get_task_log_bus
+from .pooled_http import get_columns_http_client, get_image_http_client
+from .crawl_scheduler import CrawlScheduler
+from .account_group_refresher import AccountGroupRefresher
+from . import group_stats_cache as group_stats_module
+from .group_stats_cache import compute_dir_signature, get_group_stats_cache, record_topics_added
+from .zip_export import iter_zip_stream, write_entries as write_zip_entries
+from . import backup_delta as backup_delta_module
+from .backup_delta import (
+    BACKUP_INDEX_NAME,
+    DB_DELTA_SUFFIX,
+    apply_sqlite_delta,
+    get_backup_index_store,
+    iter_backup_stream,
+)
 # 使用SQL账号管理器
 from .accounts_sql_manager import get_accounts_sql_manager
 from .account_info_db import get_account_info_db
 from .zsxq_columns_database import ZSXQColumnsDatabase
+from .sqlite_connection import get_sqlite_profile, read_persistent_pragmas
 from .logger_config import (
     bind_context,
     ensure_configured,
@@ -58,6 +83,7 @@ from .logger_config import (
     log_info,
     log_task_event,
     log_warning,
+    read_task_log_entries,
 )
 from .zsxq_retry import (
     GLOBAL_API_MAX_RETRIES,
@@ -80,7 +106,7 @@ ensure_configured()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """应用生命周期管理：启动时扫描本地群"""
+    """应用生命周期管理：启动时扫描本地群并刷新账号群组检测"""
     # 启动时执行
     try:
         log_info("应用启动: 开始扫描本地群")
@@ -88,6 +114,10 @@ async def lifespan(app: FastAPI):
         log_info("应用启动: 本地群扫描完成")
     except Exception as e:
         log_error(f"应用启动: 本地群扫描失败: {e}", exception=e)
+    # 后台刷新过期的账号群组检测结果，不阻塞启动
+    account_group_refresher.refresh_if_stale()
+    # 配置了图片缓存容量时，在后台淘汰超出预算的图片
+    get_image_cache_evictor().request_sweep()
     yield
     log_info("应用关闭: lifespan 退出")
 
@@ -157,11 +187,24 @@ async def log_http_requests(request: Request, call_next):
 crawler_instance: Optional[ZSXQInteractiveCrawler] = None
 current_tasks: Dict[str, Dict[str, Any]] = {}
 task_counter = 0
-task_logs: Dict[str, List[str]] = {}  # 存储任务日志
-sse_connections: Dict[str, List] = {}  # 存储SSE连接
 task_stop_flags: Dict[str, bool] = {}  # 任务停止标志
 file_downloader_instances: Dict[str, Any] = {}  # 存储文件下载器实例
 
+# 已结束任务的回收：按结束时间记录，访问时移到末尾（LRU），超过 TTL 或数量上限时从内存移除，
+# 任务日志仍可从 output/logs/.../tasks/{task_id}.log 分页读取
+TASK_FINAL_STATUSES = {"completed", "failed", "cancelled"}
+try:
+    FINISHED_TASK_TTL_SECONDS = int(os.environ.get("ZSXQ_TASK_TTL_SECONDS", "3600"))
+except Exception:
+    FINISHED_TASK_TTL_SECONDS = 3600
+try:
+    MAX_FINISHED_TASKS = int(os.environ.get("ZSXQ_MAX_FINISHED_TASKS", "100"))
+except Exception:
+    MAX_FINISHED_TASKS = 100
+finished_tasks: "OrderedDict[str, float]" = OrderedDict()  # task_id -> 结束时间
+# 后台任务在工作线程中更新状态，current_tasks / finished_tasks / task_stop_flags 的读写统一持有该锁
+task_registry_lock = threading.RLock()
+
 # =========================
 # 本地群扫描（output 目录）
 # =========================
@@ -301,6 +344,7 @@ class FileDownloadRequest(BaseModel):
     download_interval_max: Optional[float] = Field(default=None, ge=1.0, le=300.0, description="随机下载间隔最大值（秒）")
     long_sleep_interval_min: Optional[float] = Field(default=None, ge=10.0, le=3600.0, description="随机长休眠间隔最小值（秒）")
     long_sleep_interval_max: Optional[float] = Field(default=None, ge=10.0, le=3600.0, description="随机长休眠间隔最大值（秒）")
+    max_concurrent_downloads: Optional[int] = Field(default=None, ge=1, le=8, description="并发下载数（默认读取 ZSXQ_DOWNLOAD_WORKERS）")
 
 class ColumnsSettingsRequest(BaseModel):
     """专栏采集设置请求"""
@@ -362,6 +406,19 @@ def get_crawler(log_callback=None) -> ZSXQInteractiveCrawler:
 
     return crawler_instance
 
+def _release_crawler_instance(db_path: str) -> None:
+    """数据库被外部替换或合并后，关闭并丢弃使用该数据库的全局爬虫实例"""
+    global crawler_instance
+    crawler = crawler_instance
+    db = getattr(crawler, "db", None)
+    if not db or os.path.abspath(getattr(db, "db_path", "")) != os.path.abspath(db_path):
+        return
+    try:
+        db.close()
+    except Exception as e:
+        print(f"⚠️ 关闭全局话题数据库连接失败: {e}")
+    crawler_instance = None
+
 def get_crawler_for_group(group_id: str, log_callback=None) -> ZSXQInteractiveCrawler:
     """为指定群组获取爬虫实例"""
     config = load_config()
@@ -426,34 +483,31 @@ def is_configured() -> bool:
 def create_task(task_type: str, description: str) -> str:
     """创建新任务"""
     global task_counter
-    task_counter += 1
-    task_id = f"task_{task_counter}_{int(datetime.now().timestamp())}"
-    
-    current_tasks[task_id] = {
-        "task_id": task_id,
-        "type": task_type,
-        "status": "pending",
-        "message": description,
-        "result": None,
-        "created_at": datetime.now(),
-        "updated_at": datetime.now()
-    }
+    with task_registry_lock:
+        task_counter += 1
+        task_id = f"task_{task_counter}_{int(datetime.now().timestamp())}"
+
+        current_tasks[task_id] = {
+            "task_id": task_id,
+            "type": task_type,
+            "status": "pending",
+            "message": description,
+            "result": None,
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
+        }
 
-    # 初始化任务日志和停止标志
-    task_logs[task_id] = []
-    task_stop_flags[task_id] = False
+        # 初始化停止标志（日志缓冲区由日志总线按需创建）
+        task_stop_flags[task_id] = False
     add_task_log(task_id, f"任务创建: {description}")
+    evict_finished_tasks()
 
     return task_id
 
 def add_task_log(task_id: str, log_message: str):
-    """添加任务日志"""
-    if task_id not in task_logs:
-        task_logs[task_id] = []
-
+    """添加任务日志（内存中只保留日志总线的环形缓冲区，完整日志落盘到任务日志文件）"""
     timestamp = datetime.now().strftime("%H:%M:%S")
     formatted_log = f"[{timestamp}] {log_message}"
-    task_logs[task_id].append(formatted_log)
 
     task_info = current_tasks.get(task_id, {})
     log_level = _infer_task_log_level(log_message)
@@ -483,9 +537,8 @@ def _infer_task_log_level(log_message: str) -> str:
     return "INFO"
 
 def broadcast_log(task_id: str, log_message: str):
-    """广播日志到SSE连接"""
-    # 这个函数现在主要用于存储日志，实际的SSE广播在stream端点中实现
-    pass
+    """广播日志到SSE连接（可在工作线程中调用，由日志总线跨线程唤醒订阅者）"""
+    get_task_log_bus().publish(task_id, log_message)
 
 def build_stealth_headers(cookie: str) -> Dict[str, str]:
     """构造更接近官网的请求头，提升成功率"""
@@ -524,16 +577,62 @@ def build_stealth_headers(cookie: str) -> Dict[str, str]:
 
 def update_task(task_id: str, status: str, message: str, result: Optional[Dict[str, Any]] = None):
     """更新任务状态"""
-    if task_id in current_tasks:
-        current_tasks[task_id].update({
+    with task_registry_lock:
+        task = current_tasks.get(task_id)
+        if task is None:
+            return
+        task.update({
             "status": status,
             "message": message,
             "result": result,
             "updated_at": datetime.now()
         })
 
-        # 添加状态变更日志
-        add_task_log(task_id, f"状态更新: {message}")
+        if status in TASK_FINAL_STATUSES:
+            finished_tasks[task_id] = time.time()
+            finished_tasks.move_to_end(task_id)
+
+    # 添加状态变更日志
+    add_task_log(task_id, f"状态更新: {message}")
+
+
+def touch_task(task_id: str) -> None:
+    """已结束任务被访问时刷新 LRU 顺序"""
+    with task_registry_lock:
+        if task_id in finished_tasks:
+            finished_tasks.move_to_end(task_id)
+
+
+def evict_finished_tasks() -> int:
+    """回收超过 TTL 或超出数量上限的已结束任务，返回回收数量"""
+    now = time.time()
+    with task_registry_lock:
+        expired = [
+            task_id for task_id, finished_at in finished_tasks.items()
+            if now - finished_at > FINISHED_TASK_TTL_SECONDS
+        ]
+        overflow = len(finished_tasks) - len(expired) - MAX_FINISHED_TASKS
+        if overflow > 0:
+            expired_set = set(expired)
+            remaining = [task_id for task_id in finished_tasks if task_id not in expired_set]
+            expired.extend(remaining[:overflow])
+
+        for task_id in expired:
+            finished_tasks.pop(task_id, None)
+            current_tasks.pop(task_id, None)
+            task_stop_flags.pop(task_id, None)
+        known_tasks = set(current_tasks)
+
+    bus = get_task_log_bus()
+    for task_id in expired:
+        bus.drop(task_id)
+
+    # 任务已不在注册表中、但仍有迟到日志写入的缓冲区
+    for task_id in bus.task_ids():
+        if task_id not in known_tasks and bus.subscriber_count(task_id) == 0:
+            bus.drop(task_id)
+
+    return len(expired)
 
 def stop_task(task_id: str) -> bool:
     """停止任务"""
@@ -546,7 +645,8 @@ def stop_task(task_id: str) -> bool:
         return False
 
     # 设置停止标志
-    task_stop_flags[task_id] = True
+    with task_registry_lock:
+        task_stop_flags[task_id] = True
     add_task_log(task_id, "🛑 收到停止请求，正在停止任务...")
 
     # 如果有爬虫实例，也设置爬虫的停止标志
@@ -569,13 +669,15 @@ def is_task_stopped(task_id: str) -> bool:
     return stopped
 
 def get_active_task_ids() -> List[str]:
-    return [
-        task_id
-        for task_id, task in current_tasks.items()
-        if task.get("status") in {"pending", "running"}
-    ]
+    with task_registry_lock:
+        return [
+            task_id
+            for task_id, task in current_tasks.items()
+            if task.get("status") in {"pending", "running"}
+        ]
 
 def remove_sqlite_file(db_path: str) -> bool:
+    invalidate_topic_count_cache(db_path)
     removed = False
     for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
         if os.path.exists(path):
@@ -625,10 +727,44 @@ def close_runtime_handles() -> None:
         print(f"⚠️ 关闭账号信息数据库连接失败: {e}")
 
     try:
-        image_cache_module._cache_managers.clear()
+        stats_singleton = getattr(group_stats_module, "_cache_singleton", None)
+        if stats_singleton:
+            stats_singleton.close()
+        group_stats_module._cache_singleton = None
+    except Exception as e:
+        print(f"⚠️ 关闭群组统计缓存连接失败: {e}")
+
+    try:
+        backup_store = getattr(backup_delta_module, "_store_singleton", None)
+        if backup_store:
+            backup_store.close()
+        backup_delta_module._store_singleton = None
+    except Exception as e:
+        print(f"⚠️ 关闭备份索引连接失败: {e}")
+
+    try:
+        image_cache_module.close_cache_managers()
     except Exception as e:
         print(f"⚠️ 清理图片缓存管理器失败: {e}")
 
+    try:
+        blob_store = getattr(image_blob_module, "_store_singleton", None)
+        if blob_store:
+            blob_store.close()
+        image_blob_module._store_singleton = None
+    except Exception as e:
+        print(f"⚠️ 关闭图片去重存储失败: {e}")
+
+    try:
+        variant_worker = getattr(image_variants_module, "_worker_singleton", None)
+        if variant_worker:
+            variant_worker.close()
+        image_variants_module._worker_singleton = None
+    except Exception as e:
+        print(f"⚠️ 关闭图片变体生成线程池失败: {e}")
+
+    invalidate_topic_count_cache()
+
 
 def _get_output_dir() -> str:
     return LOCAL_OUTPUT_DIR if os.path.isabs(LOCAL_OUTPUT_DIR) else os.path.join(project_root, LOCAL_OUTPUT_DIR)
@@ -680,6 +816,12 @@ def _is_ignored_export_import_path(path: str) -> bool:
         return True
     if filename in {"zsxq_config.db", "zsxq_config.db-wal", "zsxq_config.db-shm"}:
         return True
+    # 图片缓存索引可由目录重建，不随导出导入
+    if filename == IMAGE_INDEX_DB_NAME:
+        return True
+    # 去重 blob 与各群组图片缓存是同一份内容（硬链接），导出时只保留群组目录中的文件
+    if IMAGE_BLOB_DIR_NAME in normalized.split("/"):
+        return True
     return False
 
 
@@ -723,8 +865,118 @@ def _get_existing_group_dirs(group_id: str) -> List[str]:
 
 
 def _get_group_storage_size(group_id: str) -> int:
-    """统计单个社群本地占用大小，包含数据库、下载文件、图片缓存与专栏资源。"""
-    return sum(_get_directory_size(path) for path in _get_existing_group_dirs(group_id))
+    """统计单个社群本地占用大小，包含数据库、下载文件、图片缓存与专栏资源（读取统计缓存）。"""
+    entry = _get_cached_group_stats(group_id)
+    return int(entry.get("size_bytes") or 0) if entry else 0
+
+
+def _scan_group_content_size(group_dirs: List[str]) -> int:
+    """完整统计群组目录下各子目录的大小（一级文件由统计缓存读取时实时统计）"""
+    total = 0
+    for group_dir in group_dirs:
+        for name in _safe_listdir(group_dir):
+            path = os.path.join(group_dir, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                total += _get_directory_size(path)
+    return total
+
+
+def _load_group_topic_time_range(group_id: str, group_dir: str) -> Tuple[Optional[str], Optional[str]]:
+    topics_db = os.path.join(group_dir, f"zsxq_topics_{group_id}.db")
+    if not os.path.exists(topics_db):
+        return None, None
+    conn = None
+    try:
+        conn = sqlite3.connect(topics_db)
+        row = conn.execute(
+            """
+            SELECT MIN(create_time), MAX(create_time) FROM topics
+            WHERE group_id = ? AND create_time IS NOT NULL AND create_time != ''
+            """,
+            (int(group_id),),
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+    except Exception:
+        return None, None
+    finally:
+        if conn:
+            conn.close()
+
+
+def _rescan_group_stats(group_id: str, include_size: bool = True) -> None:
+    """完整统计单个群组的占用大小与话题统计并写入缓存"""
+    cache = get_group_stats_cache()
+    content_bytes = signature = None
+    if include_size:
+        group_dirs = _get_existing_group_dirs(group_id)
+        # 先取签名再统计：统计期间发生的写入会在下次读取时再次触发重扫
+        signature = compute_dir_signature(group_dirs)
+        content_bytes = _scan_group_content_size(group_dirs)
+
+    group_dir = os.path.join(get_db_path_manager().base_dir, str(group_id))
+    db_meta = _load_group_meta_from_db(str(group_id), group_dir)
+    statistics = _normalize_group_statistics(db_meta.get("statistics") or {})
+    first_topic_time, last_topic_time = _load_group_topic_time_range(str(group_id), group_dir)
+    cache.store_scan(int(group_id), content_bytes, signature, {
+        "name": db_meta.get("name"),
+        "type": db_meta.get("type"),
+        "background_url": db_meta.get("background_url"),
+        "topics_count": statistics["topics"]["topics_count"],
+        "answers_count": statistics["topics"]["answers_count"],
+        "digests_count": statistics["topics"]["digests_count"],
+        "users_count": statistics["members"]["count"],
+        "files_count": statistics["files"]["count"],
+        "first_topic_time": first_topic_time,
+        "last_topic_time": last_topic_time,
+    })
+
+
+_group_stats_rescan_lock = threading.Lock()
+_group_stats_rescan_pending: Dict[str, bool] = {}  # group_id -> 是否需要重新统计占用大小
+_group_stats_rescan_thread: Optional[threading.Thread] = None
+
+
+def _drain_group_stats_rescans() -> None:
+    global _group_stats_rescan_thread
+    while True:
+        with _group_stats_rescan_lock:
+            if not _group_stats_rescan_pending:
+                _group_stats_rescan_thread = None
+                return
+            group_id, include_size = _group_stats_rescan_pending.popitem()
+        try:
+            _rescan_group_stats(group_id, include_size=include_size)
+        except Exception as e:
+            log_warning(f"后台重扫群组统计失败: group_id={group_id}, error={e}")
+
+
+def _schedule_group_stats_rescan(group_id: str, include_size: bool = True) -> None:
+    """把缓存已过期的群组交给后台线程重扫（同一群组排队期间只扫一次）"""
+    global _group_stats_rescan_thread
+    with _group_stats_rescan_lock:
+        _group_stats_rescan_pending[str(group_id)] = _group_stats_rescan_pending.get(str(group_id), False) or include_size
+        if _group_stats_rescan_thread is None:
+            _group_stats_rescan_thread = threading.Thread(
+                target=_drain_group_stats_rescans, daemon=True, name="group-stats-rescan"
+            )
+            _group_stats_rescan_thread.start()
+
+
+def _get_cached_group_stats(group_id: str) -> Optional[Dict[str, Any]]:
+    """读取群组统计缓存：从未统计过时同步统计一次，过期时返回旧值并安排后台重扫"""
+    try:
+        cache = get_group_stats_cache()
+        group_dirs = _get_existing_group_dirs(group_id)
+        entry = cache.lookup(int(group_id), group_dirs)
+        if entry is None:
+            _rescan_group_stats(group_id)
+            entry = cache.lookup(int(group_id), group_dirs)
+        elif entry["size_stale"] or entry["stats_stale"]:
+            _schedule_group_stats_rescan(group_id, include_size=entry["size_stale"])
+        return entry
+    except Exception as e:
+        log_warning(f"读取群组统计缓存失败: group_id={group_id}, error={e}")
+        return None
 
 
 def _load_group_meta_from_file(group_dir: str) -> Dict[str, Any]:
@@ -876,12 +1128,14 @@ def _load_group_meta_from_db(group_id: str, group_dir: str) -> Dict[str, Any]:
     answers_count = 0
     digests_count = 0
     conn = None
+    # group_id 列为整数，直接按整数比较才能使用索引
+    group_key = int(group_id) if str(group_id).isdigit() else group_id
     if os.path.exists(topics_db):
         try:
             conn = sqlite3.connect(topics_db)
             cursor = conn.cursor()
             try:
-                cursor.execute("SELECT name, type, background_url FROM groups WHERE CAST(group_id AS TEXT) = ? LIMIT 1", (str(group_id),))
+                cursor.execute("SELECT name, type, background_url FROM groups WHERE group_id = ? LIMIT 1", (group_key,))
                 row = cursor.fetchone()
                 if row:
                     meta.update({
@@ -894,8 +1148,8 @@ def _load_group_meta_from_db(group_id: str, group_dir: str) -> Dict[str, Any]:
 
             topics_count = _sqlite_count(
                 cursor,
-                "SELECT COUNT(*) FROM topics WHERE CAST(group_id AS TEXT) = ?",
-                (str(group_id),),
+                "SELECT COUNT(*) FROM topics WHERE group_id = ?",
+                (group_key,),
             )
             if topics_count == 0:
                 topics_count = _sqlite_count(cursor, "SELECT COUNT(*) FROM topics")
@@ -906,22 +1160,22 @@ def _load_group_meta_from_db(group_id: str, group_dir: str) -> Dict[str, Any]:
                 SELECT COUNT(DISTINCT t.owner_user_id)
                 FROM talks t
                 JOIN topics tp ON t.topic_id = tp.topic_id
-                WHERE CAST(tp.group_id AS TEXT) = ?
+                WHERE tp.group_id = ?
                 """,
-                (str(group_id),),
+                (group_key,),
             )
             if users_count == 0:
                 users_count = _sqlite_count(cursor, "SELECT COUNT(DISTINCT owner_user_id) FROM talks")
 
             answers_count = _sqlite_count(
                 cursor,
-                "SELECT COUNT(*) FROM topics WHERE CAST(group_id AS TEXT) = ? AND answered = 1",
-                (str(group_id),),
+                "SELECT COUNT(*) FROM topics WHERE group_id = ? AND answered = 1",
+                (group_key,),
             )
             digests_count = _sqlite_count(
                 cursor,
-                "SELECT COUNT(*) FROM topics WHERE CAST(group_id AS TEXT) = ? AND digested = 1",
-                (str(group_id),),
+                "SELECT COUNT(*) FROM topics WHERE group_id = ? AND digested = 1",
+                (group_key,),
             )
             topic_files_count = _sqlite_count(cursor, "SELECT COUNT(*) FROM topic_files")
         except Exception:
@@ -1032,7 +1286,10 @@ def _get_group_cover_image_data_url(group_dir: str, cover_url: str) -> str:
         return ""
     try:
         cache_manager = image_cache_module.ImageCacheManager(os.path.join(group_dir, "images"))
-        success, path, _ = cache_manager.download_and_cache(cover_url, timeout=8)
+        try:
+            success, path, _ = cache_manager.download_and_cache(cover_url, timeout=8)
+        finally:
+            cache_manager.close()
         if success and path:
             return _build_image_data_url(str(path))
     except Exception:
@@ -1127,30 +1384,50 @@ def _build_export_manifest(export_type: str, source_path: str, archive_root: str
     }
 
 
+def _iter_export_entries(source_path: str, archive_root: str) -> Iterator[Tuple[str, Optional[str]]]:
+    """按目录顺序遍历待导出的条目：(包内路径, 本地文件路径)，空目录的本地路径为 None"""
+    source_abs = os.path.abspath(source_path)
+    for root, dirs, files in os.walk(source_abs):
+        dirs.sort()
+        files.sort()
+        rel_dir = os.path.relpath(root, source_abs)
+        zip_dir = archive_root if rel_dir == "." else posixpath.join(archive_root, rel_dir.replace("\\", "/"))
+        if not files and not dirs:
+            yield zip_dir, None
+        for filename in files:
+            file_path = os.path.join(root, filename)
+            rel_file = os.path.relpath(file_path, source_abs).replace("\\", "/")
+            zip_name = posixpath.join(archive_root, rel_file)
+            if _is_ignored_export_import_path(zip_name):
+                continue
+            yield zip_name, file_path
+
+
 def _zip_directory_with_manifest(source_path: str, archive_root: str, manifest: Dict[str, Any]) -> str:
     temp = tempfile.NamedTemporaryFile(delete=False, suffix=".zip")
     temp_path = temp.name
     temp.close()
-    source_abs = os.path.abspath(source_path)
+    # 数据库通过备份 API 生成快照写入（包含 -wal 中已提交的数据），媒体文件按原样存储
     with zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
         zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
-        for root, dirs, files in os.walk(source_abs):
-            dirs.sort()
-            files.sort()
-            rel_dir = os.path.relpath(root, source_abs)
-            zip_dir = archive_root if rel_dir == "." else posixpath.join(archive_root, rel_dir.replace("\\", "/"))
-            if not files and not dirs:
-                zf.writestr(zip_dir.rstrip("/") + "/", "")
-            for filename in files:
-                file_path = os.path.join(root, filename)
-                rel_file = os.path.relpath(file_path, source_abs).replace("\\", "/")
-                zip_name = posixpath.join(archive_root, rel_file)
-                if _is_ignored_export_import_path(zip_name):
-                    continue
-                zf.write(file_path, zip_name)
+        write_zip_entries(zf, _iter_export_entries(source_path, archive_root))
     return temp_path
 
 
+def _export_zip_response(source_path: str, archive_root: str, manifest: Dict[str, Any],
+                         filename: str) -> StreamingResponse:
+    """流式导出：边遍历边发送 zip 字节，不在磁盘上生成临时压缩包"""
+    stream = iter_zip_stream(
+        json.dumps(manifest, ensure_ascii=False, indent=2),
+        _iter_export_entries(source_path, archive_root),
+    )
+    return StreamingResponse(
+        stream,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 def _find_group_db_entry(zip_entries: List[str], group_id: str, db_kind: str) -> Optional[str]:
     """在导入包中查找指定社群的 topics/files 数据库。"""
     expected_name = f"zsxq_{db_kind}_{group_id}.db"
@@ -1203,7 +1480,8 @@ def _sync_group_count_fields(group: Dict[str, Any], statistics: Dict[str, Any])
     return group
 
 
-def _enrich_import_manifest_with_archive_counts(archive_bytes: bytes, manifest: Dict[str, Any]) -> Dict[str, Any]:
+def _enrich_import_manifest_with_archive_counts(zf: zipfile.ZipFile, zip_entries: List[str],
+                                                manifest: Dict[str, Any]) -> Dict[str, Any]:
     groups = manifest.get("groups")
     if not isinstance(groups, list):
         return manifest
@@ -1211,18 +1489,16 @@ def _enrich_import_manifest_with_archive_counts(archive_bytes: bytes, manifest:
     enriched_manifest = dict(manifest)
     enriched_groups: List[Dict[str, Any]] = []
     try:
-        with zipfile.ZipFile(io.BytesIO(archive_bytes)) as zf:
-            zip_entries = zf.namelist()
-            for group in groups:
-                if not isinstance(group, dict):
-                    enriched_groups.append(group)
-                    continue
-                enriched_group = dict(group)
-                group_id = str(enriched_group.get("group_id") or "")
-                local_statistics = _load_group_statistics_from_zip(zf, zip_entries, group_id)
-                statistics = _merge_group_statistics(enriched_group.get("statistics") or {}, local_statistics)
-                statistics = _apply_local_package_counts(statistics, local_statistics)
-                enriched_groups.append(_sync_group_count_fields(enriched_group, statistics))
+        for group in groups:
+            if not isinstance(group, dict):
+                enriched_groups.append(group)
+                continue
+            enriched_group = dict(group)
+            group_id = str(enriched_group.get("group_id") or "")
+            local_statistics = _load_group_statistics_from_zip(zf, zip_entries, group_id)
+            statistics = _merge_group_statistics(enriched_group.get("statistics") or {}, local_statistics)
+            statistics = _apply_local_package_counts(statistics, local_statistics)
+            enriched_groups.append(_sync_group_count_fields(enriched_group, statistics))
     except Exception:
         return manifest
 
@@ -1230,22 +1506,17 @@ def _enrich_import_manifest_with_archive_counts(archive_bytes: bytes, manifest:
     return enriched_manifest
 
 
-def _parse_import_archive(archive_bytes: bytes) -> Dict[str, Any]:
+def _parse_import_archive(zf: zipfile.ZipFile) -> Dict[str, Any]:
+    names = zf.namelist()
+    if "manifest.json" not in names:
+        raise HTTPException(status_code=400, detail="压缩包缺少根目录 manifest.json")
+    for name in names:
+        if not _is_safe_zip_path(name.rstrip("/")):
+            raise HTTPException(status_code=400, detail=f"压缩包包含非法路径: {name}")
     try:
-        zip_buffer = io.BytesIO(archive_bytes)
-        with zipfile.ZipFile(zip_buffer) as zf:
-            names = zf.namelist()
-            if "manifest.json" not in names:
-                raise HTTPException(status_code=400, detail="压缩包缺少根目录 manifest.json")
-            for name in names:
-                if not _is_safe_zip_path(name.rstrip("/")):
-                    raise HTTPException(status_code=400, detail=f"压缩包包含非法路径: {name}")
-            try:
-                manifest = json.loads(zf.read("manifest.json").decode("utf-8"))
-            except Exception:
-                raise HTTPException(status_code=400, detail="manifest.json 不是有效的 JSON")
-    except zipfile.BadZipFile:
-        raise HTTPException(status_code=400, detail="上传文件不是有效的 zip 压缩包")
+        manifest = json.loads(zf.read("manifest.json").decode("utf-8"))
+    except Exception:
+        raise HTTPException(status_code=400, detail="manifest.json 不是有效的 JSON")
 
     if not isinstance(manifest, dict):
         raise HTTPException(status_code=400, detail="manifest.json 格式不正确")
@@ -1264,7 +1535,15 @@ def _parse_import_archive(archive_bytes: bytes) -> Dict[str, Any]:
             raise HTTPException(status_code=400, detail=f"manifest.json 包含非法社群 ID: {gid}")
         group_ids.append(gid)
 
-    data_entries = [name.rstrip("/") for name in names if name and name != "manifest.json"]
+    backup = manifest.get("backup") or {}
+    is_differential = backup.get("mode") == "differential"
+    if is_differential:
+        if manifest.get("export_type") != "single_group" or not backup.get("base_backup_id"):
+            raise HTTPException(status_code=400, detail="差异备份包 manifest.json 缺少基准备份信息")
+        if BACKUP_INDEX_NAME not in names:
+            raise HTTPException(status_code=400, detail=f"差异备份包缺少 {BACKUP_INDEX_NAME}")
+
+    data_entries = [name.rstrip("/") for name in names if name and name not in ("manifest.json", BACKUP_INDEX_NAME)]
     root_entries = {name.split("/", 1)[0] for name in data_entries if name}
     if manifest.get("export_type") == "all_output":
         if "output" not in root_entries:
@@ -1275,7 +1554,9 @@ def _parse_import_archive(archive_bytes: bytes) -> Dict[str, Any]:
         expected_root = str(manifest.get("source_root") or "").strip().replace("\\", "/").strip("/")
         if not expected_root or not _is_safe_zip_path(expected_root):
             raise HTTPException(status_code=400, detail="单社群导出包 manifest.json 缺少有效目录信息")
-        if not any(entry == expected_root or entry.startswith(expected_root + "/") for entry in data_entries):
+        # 没有任何变化的差异包可以不含数据条目
+        if not is_differential and \
+                not any(entry == expected_root or entry.startswith(expected_root + "/") for entry in data_entries):
             raise HTTPException(status_code=400, detail="单社群导出包内容与 manifest.json 目录信息不一致")
     else:
         raise HTTPException(status_code=400, detail="manifest.json 包含未知导出类型")
@@ -1287,7 +1568,24 @@ def _parse_import_archive(archive_bytes: bytes) -> Dict[str, Any]:
     }
 
 
-def _get_import_conflicts(group_ids: List[str]) -> List[Dict[str, Any]]:
+def _get_import_conflicts(group_ids: List[str], backup: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    完整导入要求社群本地数据不存在；差异备份要求本机最近应用的备份正是其基准备份。
+    """
+    if backup and backup.get("mode") == "differential":
+        store = get_backup_index_store()
+        base_backup_id = backup.get("base_backup_id")
+        conflicts = []
+        for group_id in group_ids:
+            applied = store.get_applied(group_id)
+            if applied != base_backup_id:
+                conflicts.append({
+                    "group_id": group_id,
+                    "paths": [],
+                    "reason": f"需要先导入基准备份 {base_backup_id}（本机当前为 {applied or '无'}）",
+                })
+        return conflicts
+
     output_dir = _get_output_dir()
     path_manager = get_db_path_manager()
     conflicts: List[Dict[str, Any]] = []
@@ -1307,10 +1605,15 @@ def _get_import_conflicts(group_ids: List[str]) -> List[Dict[str, Any]]:
     return conflicts
 
 
-def _build_import_preview(archive_bytes: bytes) -> Dict[str, Any]:
-    parsed = _parse_import_archive(archive_bytes)
-    manifest = _enrich_import_manifest_with_archive_counts(archive_bytes, parsed["manifest"])
-    conflicts = _get_import_conflicts(parsed["group_ids"])
+def _build_import_preview(archive_path: str) -> Dict[str, Any]:
+    """读取磁盘上的导入包：只打开一次，校验 manifest 并从包内数据库补全统计"""
+    try:
+        with zipfile.ZipFile(archive_path) as zf:
+            parsed = _parse_import_archive(zf)
+            manifest = _enrich_import_manifest_with_archive_counts(zf, parsed["zip_entries"], parsed["manifest"])
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="上传文件不是有效的 zip 压缩包")
+    conflicts = _get_import_conflicts(parsed["group_ids"], manifest.get("backup"))
     return {
         "success": True,
         "manifest": manifest,
@@ -1320,52 +1623,185 @@ def _build_import_preview(archive_bytes: bytes) -> Dict[str, Any]:
     }
 
 
-def _extract_import_archive(archive_bytes: bytes) -> Dict[str, Any]:
-    preview = _build_import_preview(archive_bytes)
-    if preview["conflicts"]:
-        raise HTTPException(
-            status_code=409,
-            detail={
-                "message": "导入的社群本地数据已存在，请先删除已有本地数据后再导入",
-                "conflicts": preview["conflicts"],
-            },
-        )
+# 预览后暂存的导入包（upload_id -> 上传记录），确认导入时直接使用，无需再次上传
+IMPORT_UPLOAD_TTL_SECONDS = 3600
+_import_uploads: Dict[str, Dict[str, Any]] = {}
+_import_uploads_lock = threading.Lock()
 
-    with zipfile.ZipFile(io.BytesIO(archive_bytes)) as zf:
-        for member in zf.infolist():
-            name = member.filename
-            if name == "manifest.json":
-                continue
-            if _is_ignored_export_import_path(name):
-                continue
-            target = _safe_zip_join(project_root, name)
-            if member.is_dir():
-                os.makedirs(target, exist_ok=True)
-                continue
+
+def _remove_import_upload_file(upload: Dict[str, Any]):
+    try:
+        if upload.get("path") and os.path.exists(upload["path"]):
+            os.remove(upload["path"])
+    except OSError as e:
+        print(f"⚠️ 删除导入暂存文件失败: {e}")
+
+
+def _cleanup_import_uploads():
+    """清理超过有效期仍未确认的导入包"""
+    now = time.time()
+    with _import_uploads_lock:
+        expired = [
+            upload_id for upload_id, upload in _import_uploads.items()
+            if now - upload["created_at"] > IMPORT_UPLOAD_TTL_SECONDS
+        ]
+        uploads = [_import_uploads.pop(upload_id) for upload_id in expired]
+    for upload in uploads:
+        _remove_import_upload_file(upload)
+
+
+async def _spool_import_upload(request: Request) -> Dict[str, Any]:
+    """把上传的 zip 按块写入临时目录，不在内存中保留整个压缩包"""
+    _cleanup_import_uploads()
+    upload_dir = os.path.join(tempfile.gettempdir(), "zsxq_import_uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".zip", prefix="import_", dir=upload_dir)
+    upload = {"upload_id": uuid.uuid4().hex, "path": path, "size": 0, "created_at": time.time()}
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                if chunk:
+                    f.write(chunk)
+                    upload["size"] += len(chunk)
+    except BaseException:
+        _remove_import_upload_file(upload)
+        raise
+    if upload["size"] == 0:
+        _remove_import_upload_file(upload)
+        raise HTTPException(status_code=400, detail="请上传 zip 文件")
+    return upload
+
+
+def _move_staged_import(staging_dir: str, target_root: str) -> int:
+    """把解压到暂存目录的文件移动到项目目录（同一文件系统内仅为重命名），返回文件数"""
+    moved = 0
+    for root, dirs, files in os.walk(staging_dir):
+        rel_dir = os.path.relpath(root, staging_dir)
+        target_dir = target_root if rel_dir == "." else os.path.join(target_root, rel_dir)
+        os.makedirs(target_dir, exist_ok=True)
+        for filename in files:
+            target = os.path.join(target_dir, filename)
             if os.path.isdir(target):
-                raise HTTPException(status_code=400, detail=f"导入路径冲突，目标是目录: {name}")
-            os.makedirs(os.path.dirname(target), exist_ok=True)
-            with zf.open(member) as src, open(target, "wb") as dst:
-                shutil.copyfileobj(src, dst)
+                raise Exception(f"导入路径冲突，目标是目录: {os.path.relpath(target, target_root)}")
+            os.replace(os.path.join(root, filename), target)
+            moved += 1
+    return moved
 
-    for group in preview["groups"]:
-        try:
-            group_id = int(str(group.get("group_id")))
-            meta = dict(group)
-            meta.pop("cover_image_data_url", None)
-            if meta.get("cover_url") and not meta.get("background_url"):
-                meta["background_url"] = meta.get("cover_url")
-            _persist_group_meta_local(group_id, meta)
-        except Exception:
-            continue
 
-    scan_local_groups()
-    return {
-        "success": True,
-        "message": f"导入成功，共导入 {len(preview['groups'])} 个社群",
-        "manifest": preview["manifest"],
-        "groups": preview["groups"],
-    }
+def run_import_archive_task(task_id: str, archive_path: str, preview: Dict[str, Any]):
+    """
+    后台解压导入包：先解压到项目目录下的暂存目录，全部成功后再移动到位，
+    任务停止或失败时删除暂存目录，不会留下只导入了一半的社群。
+    """
+    staging_dir = os.path.join(project_root, f".zsxq_import_{task_id}")
+    try:
+        update_task(task_id, "running", "正在解压导入包")
+        with zipfile.ZipFile(archive_path) as zf:
+            backup_index = None
+            if BACKUP_INDEX_NAME in zf.namelist():
+                backup_index = json.loads(zf.read(BACKUP_INDEX_NAME).decode("utf-8"))
+            members = [
+                member for member in zf.infolist()
+                if member.filename not in ("manifest.json", BACKUP_INDEX_NAME)
+                and not _is_ignored_export_import_path(member.filename)
+            ]
+            total_bytes = sum(member.file_size for member in members if not member.is_dir())
+            add_task_log(task_id, f"📦 导入包共 {len(members)} 个条目，解压后约 {total_bytes / 1024 / 1024:.1f} MB")
+
+            done_bytes = 0
+            next_report = 5
+            for index, member in enumerate(members, 1):
+                if is_task_stopped(task_id):
+                    add_task_log(task_id, "🛑 任务已停止，已丢弃解压的数据")
+                    return
+                target = _safe_zip_join(staging_dir, member.filename)
+                if member.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with zf.open(member) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+
+                done_bytes += member.file_size
+                percent = int(done_bytes * 100 / total_bytes) if total_bytes else 100
+                if percent >= next_report or index == len(members):
+                    add_task_log(task_id, f"📥 已解压 {percent}% ({index}/{len(members)})")
+                    update_task(task_id, "running", f"正在解压导入包 {percent}%")
+                    next_report = percent - percent % 5 + 5
+
+        is_differential = bool(backup_index) and backup_index.get("mode") == "differential"
+        if is_differential:
+            # 差异备份：数据库只包含变化的行区间，合并到本地基准数据库
+            for zip_name in backup_index.get("db_deltas", []):
+                staged_delta = _safe_zip_join(staging_dir, zip_name + DB_DELTA_SUFFIX)
+                target_db = _safe_zip_join(project_root, zip_name)
+                if not os.path.exists(target_db):
+                    raise Exception(f"本地缺少基准数据库: {zip_name}")
+                delta_stats = apply_sqlite_delta(target_db, staged_delta)
+                os.remove(staged_delta)
+                add_task_log(task_id, f"🗃️ 已合并 {posixpath.basename(zip_name)}: "
+                                      f"{delta_stats['ranges']} 个区间, {delta_stats['rows']} 行")
+                if posixpath.basename(zip_name).startswith("zsxq_topics_"):
+                    # 全文索引不在差异之内，按合并后的数据重建
+                    topics_db = ZSXQDatabase(target_db)
+                    try:
+                        if topics_db.fts_enabled:
+                            search_stats = topics_db.rebuild_search_index()
+                            add_task_log(task_id, f"🔎 已重建全文检索索引: {search_stats['topics']} 个话题, "
+                                                  f"{search_stats['comments']} 条评论")
+                    finally:
+                        topics_db.close()
+                    # 话题库已在原地被修改：丢弃缓存的话题总数、统计与持有旧连接的爬虫实例
+                    invalidate_topic_count_cache(target_db)
+                    _release_crawler_instance(target_db)
+                    if backup_index.get("group_id"):
+                        get_group_stats_cache().mark_stats_stale(int(backup_index["group_id"]))
+
+        moved = _move_staged_import(staging_dir, project_root)
+        add_task_log(task_id, f"📂 已写入 {moved} 个文件")
+
+        if is_differential:
+            removed = 0
+            for zip_name in backup_index.get("deleted", []):
+                target = _safe_zip_join(project_root, zip_name)
+                if os.path.isfile(target):
+                    os.remove(target)
+                    removed += 1
+            if removed:
+                add_task_log(task_id, f"🧹 已删除基准备份之后移除的 {removed} 个文件")
+        if backup_index:
+            for group in preview["groups"]:
+                get_backup_index_store().set_applied(str(group.get("group_id")), backup_index["backup_id"])
+
+        for group in preview["groups"]:
+            try:
+                group_id = int(str(group.get("group_id")))
+                meta = dict(group)
+                meta.pop("cover_image_data_url", None)
+                if meta.get("cover_url") and not meta.get("background_url"):
+                    meta["background_url"] = meta.get("cover_url")
+                _persist_group_meta_local(group_id, meta)
+                # 导入包覆盖了数据库和目录，统计缓存整体失效，图片索引重新扫描目录
+                get_group_stats_cache().invalidate(group_id)
+                image_cache_module.clear_group_cache_manager(str(group_id), reset_index=True)
+            except Exception:
+                continue
+
+        scan_local_groups()
+        message = f"导入成功，共导入 {len(preview['groups'])} 个社群"
+        add_task_log(task_id, f"✅ {message}")
+        update_task(task_id, "completed", message, {
+            "groups": preview["groups"],
+            "files": moved,
+            "bytes": total_bytes,
+        })
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        add_task_log(task_id, f"❌ 导入失败: {detail}")
+        update_task(task_id, "failed", f"导入失败: {detail}")
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        _remove_import_upload_file({"path": archive_path})
 
 
 # API路由定义
@@ -1380,46 +1816,143 @@ async def health_check():
     return {"status": "healthy", "timestamp": datetime.now()}
 
 
+def _resolve_group_export_dir(group_id: str) -> Tuple[str, str]:
+    """定位社群本地目录及其在压缩包内的根路径"""
+    path_manager = get_db_path_manager()
+    candidate_dirs = [
+        os.path.join(path_manager.base_dir, group_id),
+        os.path.join(_get_output_dir(), group_id),
+    ]
+    group_dir = next((path for path in candidate_dirs if os.path.isdir(path)), None)
+    if not group_dir:
+        raise HTTPException(status_code=404, detail=f"社群 {group_id} 本地文件夹不存在")
+
+    archive_root = os.path.relpath(group_dir, project_root).replace("\\", "/")
+    if not _is_safe_zip_path(archive_root):
+        archive_root = posixpath.join("output", "databases", group_id)
+    return group_dir, archive_root
+
+
+def _write_stream_to_temp_zip(chunks: Iterator[bytes]) -> str:
+    temp = tempfile.NamedTemporaryFile(delete=False, suffix=".zip")
+    with temp:
+        for chunk in chunks:
+            temp.write(chunk)
+    return temp.name
+
+
+async def _group_backup_response(group_id: str, baseline_index: Optional[Dict[str, Any]], stream: bool):
+    """
+    导出社群备份：baseline_index 为空时为完整备份，否则为相对该基准的差异备份。
+    备份索引写入包内 backup_index.json，并在打包完成后保存到配置库，作为后续差异备份的基准。
+    """
+    group_dir, archive_root = _resolve_group_export_dir(group_id)
+    manifest = _build_export_manifest(
+        "single_group",
+        group_dir,
+        archive_root,
+        [{"group_id": group_id, "path": group_dir}],
+    )
+    now = datetime.now()
+    manifest["backup"] = {
+        "mode": "differential" if baseline_index else "full",
+        "backup_id": f"{group_id}_{now.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}",
+        "base_backup_id": baseline_index.get("backup_id") if baseline_index else None,
+        "group_id": group_id,
+    }
+    kind = "diff_" if baseline_index else ""
+    filename = f"zsxq_group_{group_id}_{kind}{now.strftime('%Y%m%d_%H%M%S')}.zip"
+    chunks = iter_backup_stream(
+        manifest,
+        _iter_export_entries(group_dir, archive_root),
+        baseline=baseline_index,
+        on_complete=get_backup_index_store().save,
+    )
+    if stream:
+        return StreamingResponse(
+            chunks,
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+    zip_path = await asyncio.to_thread(_write_stream_to_temp_zip, chunks)
+    return FileResponse(
+        zip_path,
+        media_type="application/zip",
+        filename=filename,
+        background=BackgroundTask(lambda: os.path.exists(zip_path) and os.remove(zip_path)),
+    )
+
+
 @app.get("/api/groups/{group_id}/export")
-async def export_group_folder(group_id: str):
+async def export_group_folder(
+    group_id: str,
+    stream: bool = Query(default=True, description="流式打包：边打包边下载，不生成临时压缩包"),
+    mode: str = Query(default="full", description="full 完整备份 / differential 差异备份"),
+    baseline: Optional[str] = Query(default=None, description="差异备份的基准备份ID，缺省为该社群最近一次导出的备份"),
+):
     try:
         if not group_id.isdigit():
             raise HTTPException(status_code=400, detail="社群 ID 格式不正确")
-
-        path_manager = get_db_path_manager()
-        candidate_dirs = [
-            os.path.join(path_manager.base_dir, group_id),
-            os.path.join(_get_output_dir(), group_id),
-        ]
-        group_dir = next((path for path in candidate_dirs if os.path.isdir(path)), None)
-        if not group_dir:
-            raise HTTPException(status_code=404, detail=f"社群 {group_id} 本地文件夹不存在")
-
-        archive_root = os.path.relpath(group_dir, project_root).replace("\\", "/")
-        if not _is_safe_zip_path(archive_root):
-            archive_root = posixpath.join("output", "databases", group_id)
-        manifest = _build_export_manifest(
-            "single_group",
-            group_dir,
-            archive_root,
-            [{"group_id": group_id, "path": group_dir}],
-        )
-        zip_path = await asyncio.to_thread(_zip_directory_with_manifest, group_dir, archive_root, manifest)
-        filename = f"zsxq_group_{group_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-        return FileResponse(
-            zip_path,
-            media_type="application/zip",
-            filename=filename,
-            background=BackgroundTask(lambda: os.path.exists(zip_path) and os.remove(zip_path)),
-        )
+        if mode not in ("full", "differential"):
+            raise HTTPException(status_code=400, detail="mode 仅支持 full 或 differential")
+
+        baseline_index = None
+        if mode == "differential":
+            store = get_backup_index_store()
+            baseline_index = store.get(baseline) if baseline else store.latest(group_id)
+            if not baseline_index:
+                raise HTTPException(status_code=404, detail="没有可用的基准备份，请先完整导出一次该社群")
+            if str(baseline_index.get("group_id")) != group_id:
+                raise HTTPException(status_code=400, detail="基准备份不属于该社群")
+        return await _group_backup_response(group_id, baseline_index, stream)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"导出社群文件夹失败: {str(e)}")
 
 
+@app.post("/api/groups/{group_id}/export/differential")
+async def export_group_differential(
+    group_id: str,
+    request: Request,
+    stream: bool = Query(default=True, description="流式打包：边打包边下载，不生成临时压缩包"),
+):
+    """以请求体中的基准备份索引（任一备份包根目录下的 backup_index.json）生成差异备份"""
+    try:
+        if not group_id.isdigit():
+            raise HTTPException(status_code=400, detail="社群 ID 格式不正确")
+        try:
+            baseline_index = json.loads((await request.body()).decode("utf-8"))
+        except Exception:
+            raise HTTPException(status_code=400, detail="请求体不是有效的 backup_index.json")
+        if not isinstance(baseline_index, dict) or not baseline_index.get("backup_id"):
+            raise HTTPException(status_code=400, detail="backup_index.json 缺少备份ID")
+        if str(baseline_index.get("group_id")) != group_id:
+            raise HTTPException(status_code=400, detail="基准备份不属于该社群")
+        return await _group_backup_response(group_id, baseline_index, stream)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"导出差异备份失败: {str(e)}")
+
+
+@app.get("/api/groups/{group_id}/backups")
+async def list_group_backups(group_id: str):
+    """本机导出过的社群备份（可作为差异备份的基准）及本机最近应用的备份"""
+    try:
+        store = get_backup_index_store()
+        return {
+            "backups": store.list(group_id),
+            "applied_backup_id": store.get_applied(group_id),
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取备份列表失败: {str(e)}")
+
+
 @app.get("/api/export/all")
-async def export_all_output_folder():
+async def export_all_output_folder(
+    stream: bool = Query(default=True, description="流式打包：边打包边下载，不生成临时压缩包"),
+):
     try:
         output_dir = _get_output_dir()
         if not os.path.isdir(output_dir):
@@ -1430,8 +1963,10 @@ async def export_all_output_folder():
             archive_root = "output"
         groups = _find_group_dirs_under_output(output_dir)
         manifest = _build_export_manifest("all_output", output_dir, archive_root, groups)
-        zip_path = await asyncio.to_thread(_zip_directory_with_manifest, output_dir, archive_root, manifest)
         filename = f"zsxq_output_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        if stream:
+            return _export_zip_response(output_dir, archive_root, manifest, filename)
+        zip_path = await asyncio.to_thread(_zip_directory_with_manifest, output_dir, archive_root, manifest)
         return FileResponse(
             zip_path,
             media_type="application/zip",
@@ -1446,11 +1981,18 @@ async def export_all_output_folder():
 
 @app.post("/api/import/preview")
 async def preview_import_archive(request: Request):
+    """上传导入包并预览：压缩包按块写入磁盘，返回的 upload_id 用于确认导入"""
     try:
-        archive_bytes = await request.body()
-        if not archive_bytes:
-            raise HTTPException(status_code=400, detail="请上传 zip 文件")
-        return await asyncio.to_thread(_build_import_preview, archive_bytes)
+        upload = await _spool_import_upload(request)
+        try:
+            preview = await asyncio.to_thread(_build_import_preview, upload["path"])
+        except BaseException:
+            _remove_import_upload_file(upload)
+            raise
+        upload["preview"] = preview
+        with _import_uploads_lock:
+            _import_uploads[upload["upload_id"]] = upload
+        return dict(preview, upload_id=upload["upload_id"])
     except HTTPException:
         raise
     except Exception as e:
@@ -1458,7 +2000,12 @@ async def preview_import_archive(request: Request):
 
 
 @app.post("/api/import/confirm")
-async def confirm_import_archive(request: Request):
+async def confirm_import_archive(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    upload_id: Optional[str] = Query(default=None, description="预览接口返回的上传ID；为空时从请求体读取压缩包"),
+):
+    """确认导入：校验冲突后创建后台解压任务，进度见任务日志"""
     try:
         active_task_ids = get_active_task_ids()
         if active_task_ids:
@@ -1466,10 +2013,39 @@ async def confirm_import_archive(request: Request):
                 status_code=409,
                 detail=f"存在正在运行的任务，请先停止后再导入: {', '.join(active_task_ids)}"
             )
-        archive_bytes = await request.body()
-        if not archive_bytes:
-            raise HTTPException(status_code=400, detail="请上传 zip 文件")
-        return await asyncio.to_thread(_extract_import_archive, archive_bytes)
+        if upload_id:
+            with _import_uploads_lock:
+                upload = _import_uploads.pop(upload_id, None)
+            if not upload:
+                raise HTTPException(status_code=404, detail="导入包已过期，请重新选择文件")
+        else:
+            upload = await _spool_import_upload(request)
+
+        try:
+            preview = upload.get("preview") or await asyncio.to_thread(_build_import_preview, upload["path"])
+            group_ids = [str(group.get("group_id")) for group in preview["groups"]]
+            conflicts = await asyncio.to_thread(_get_import_conflicts, group_ids, preview["manifest"].get("backup"))
+            if conflicts:
+                raise HTTPException(
+                    status_code=409,
+                    detail={
+                        "message": conflicts[0].get("reason") or "导入的社群本地数据已存在，请先删除已有本地数据后再导入",
+                        "conflicts": conflicts,
+                    },
+                )
+        except BaseException:
+            _remove_import_upload_file(upload)
+            raise
+
+        task_id = create_task("import_archive", f"导入数据包 ({len(preview['groups'])} 个社群)")
+        background_tasks.add_task(run_import_archive_task, task_id, upload["path"], preview)
+        return {
+            "success": True,
+            "task_id": task_id,
+            "message": "导入任务已创建，正在后台解压",
+            "manifest": preview["manifest"],
+            "groups": preview["groups"],
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -1617,15 +2193,13 @@ async def reset_all_local_data():
 
         _local_groups_cache["ids"] = set()
         _local_groups_cache["scanned_at"] = time.time()
-        _account_detect_cache["built_at"] = 0
-        _account_detect_cache["group_to_account"] = {}
-        _account_detect_cache["cookie_by_account"] = {}
 
         global task_counter
-        current_tasks.clear()
-        task_logs.clear()
-        task_stop_flags.clear()
-        sse_connections.clear()
+        with task_registry_lock:
+            current_tasks.clear()
+            finished_tasks.clear()
+            task_stop_flags.clear()
+        get_task_log_bus().clear()
         task_counter = 0
         details["task_state_cleared"] = True
 
@@ -1941,7 +2515,9 @@ async def get_database_stats():
 @app.get("/api/tasks")
 async def get_tasks():
     """获取所有任务状态"""
-    return list(current_tasks.values())
+    evict_finished_tasks()
+    with task_registry_lock:
+        return list(current_tasks.values())
 
 @app.get("/api/tasks/{task_id}")
 async def get_task(task_id: str):
@@ -1949,6 +2525,7 @@ async def get_task(task_id: str):
     if task_id not in current_tasks:
         raise HTTPException(status_code=404, detail="任务不存在")
 
+    touch_task(task_id)
     return current_tasks[task_id]
 
 @app.post("/api/tasks/{task_id}/stop")
@@ -2039,7 +2616,8 @@ def run_file_download_task(task_id: str, group_id: str, max_files: Optional[int]
                           files_per_batch: int = 10, download_interval_min: Optional[float] = None,
                           download_interval_max: Optional[float] = None,
                           long_sleep_interval_min: Optional[float] = None,
-                          long_sleep_interval_max: Optional[float] = None):
+                          long_sleep_interval_max: Optional[float] = None,
+                          max_concurrent_downloads: Optional[int] = None):
     """后台执行文件下载任务"""
     try:
         update_task(task_id, "running", "开始文件下载...")
@@ -2072,7 +2650,8 @@ def run_file_download_task(task_id: str, group_id: str, max_files: Optional[int]
             download_interval_min=download_interval_min,
             download_interval_max=download_interval_max,
             long_sleep_interval_min=long_sleep_interval_min,
-            long_sleep_interval_max=long_sleep_interval_max
+            long_sleep_interval_max=long_sleep_interval_max,
+            max_concurrent_downloads=max_concurrent_downloads
         )
         # 设置日志回调和停止检查函数
         downloader.log_callback = log_callback
@@ -2082,6 +2661,7 @@ def run_file_download_task(task_id: str, group_id: str, max_files: Optional[int]
         add_task_log(task_id, f"   ⏱️ 单次下载间隔: {download_interval}秒")
         add_task_log(task_id, f"   😴 长休眠间隔: {long_sleep_interval}秒")
         add_task_log(task_id, f"   📦 批次大小: {files_per_batch}个文件")
+        add_task_log(task_id, f"   ⚡ 并发下载: {downloader.max_concurrent_downloads}个")
 
         # 将下载器实例存储到全局字典中
         global file_downloader_instances
@@ -2466,7 +3046,7 @@ def run_single_file_download_task_with_info(task_id: str, group_id: str, file_id
             del file_downloader_instances[task_id]
 
 # 群组相关辅助函数
-def fetch_groups_from_api(cookie: str) -> List[dict]:
+def fetch_groups_from_api(cookie: str, timeout: float = 30) -> List[dict]:
     """从知识星球API获取群组列表"""
     import requests
 
@@ -2583,7 +3163,7 @@ def fetch_groups_from_api(cookie: str) -> List[dict]:
     headers = build_stealth_headers(cookie)
 
     try:
-        response = requests.get('https://api.zsxq.com/v2/groups', headers=headers, timeout=30)
+        response = requests.get('https://api.zsxq.com/v2/groups', headers=headers, timeout=timeout)
         response.raise_for_status()
 
         data = response.json()
@@ -2917,7 +3497,8 @@ async def download_files(group_id: str, request: FileDownloadRequest, background
             request.download_interval_min,
             request.download_interval_max,
             request.long_sleep_interval_min,
-            request.long_sleep_interval_max
+            request.long_sleep_interval_max,
+            request.max_concurrent_downloads
         )
 
         return {"task_id": task_id, "message": "任务已创建，正在后台执行"}
@@ -3178,6 +3759,11 @@ async def clear_topic_database(group_id: str):
                 # 方式1：通过爬虫实例关闭
                 crawler = get_crawler_for_group(group_id)
                 if hasattr(crawler, 'db') and crawler.db:
+                    # 采集覆盖区间记录在话题库中，先清除，避免删除失败或残留 WAL 时仍按旧区间跳过采集
+                    try:
+                        crawler.db.clear_crawl_coverage(int(group_id))
+                    except Exception as coverage_error:
+                        print(f"⚠️ 清除采集覆盖记录失败: {coverage_error}")
                     crawler.db.close()
                 if hasattr(crawler, 'file_downloader') and crawler.file_downloader:
                     if hasattr(crawler.file_downloader, 'file_db') and crawler.file_downloader.file_db:
@@ -3192,10 +3778,11 @@ async def clear_topic_database(group_id: str):
             # 方式3：等待一小段时间让连接释放
             time.sleep(0.5)
 
-            # 删除数据库文件
+            # 删除数据库文件（连同 -wal/-shm）
             try:
-                os.remove(db_path)
+                remove_sqlite_file(db_path)
                 print(f"✅ 话题数据库已删除: {db_path}")
+                get_group_stats_cache().mark_stats_stale(int(group_id))
 
                 # 同时删除该群组的图片缓存
                 try:
@@ -3363,6 +3950,44 @@ async def refresh_local_groups():
         # 不报错，返回降级结果
         return {"success": False, "count": len(cached), "groups": sorted(list(cached)), "error": str(e)}
 
+
+def run_group_stats_rescan_task(task_id: str, group_ids: List[str]):
+    """后台完整重扫群组占用大小与统计（遍历下载、图片等目录并重新统计本地数据库）"""
+    try:
+        update_task(task_id, "running", f"开始重扫 {len(group_ids)} 个群组的统计...")
+        total_bytes = 0
+        for index, gid in enumerate(group_ids, 1):
+            if is_task_stopped(task_id):
+                add_task_log(task_id, "🛑 任务已停止")
+                return
+            started = time.time()
+            _rescan_group_stats(gid)
+            entry = get_group_stats_cache().lookup(int(gid), _get_existing_group_dirs(gid)) or {}
+            size_bytes = int(entry.get("size_bytes") or 0)
+            total_bytes += size_bytes
+            add_task_log(task_id, f"📊 [{index}/{len(group_ids)}] 群组 {gid}: {size_bytes / 1024 / 1024:.1f} MB, "
+                                  f"话题 {entry.get('topics_count', 0)} 个，耗时 {time.time() - started:.1f}s")
+        result = {"groups": len(group_ids), "total_bytes": total_bytes}
+        add_task_log(task_id, f"✅ 重扫完成，共 {len(group_ids)} 个群组，占用 {total_bytes / 1024 / 1024:.1f} MB")
+        update_task(task_id, "completed", "群组统计重扫完成", result)
+    except Exception as e:
+        add_task_log(task_id, f"❌ 群组统计重扫失败: {str(e)}")
+        update_task(task_id, "failed", f"群组统计重扫失败: {str(e)}")
+
+
+@app.post("/api/local-groups/rescan-stats")
+async def rescan_local_group_stats(background_tasks: BackgroundTasks, group_id: Optional[str] = None):
+    """
+    后台完整重扫本地群组的占用大小与统计缓存（平时由下载/爬取增量维护，目录变化时自动重扫单个群组）。
+    不指定 group_id 时重扫全部本地群组。
+    """
+    if group_id is not None and not str(group_id).isdigit():
+        raise HTTPException(status_code=400, detail="group_id 必须为数字")
+    group_ids = [str(group_id)] if group_id else [str(gid) for gid in sorted(await asyncio.to_thread(scan_local_groups))]
+    task_id = create_task("rescan_group_stats", f"重扫群组统计 ({len(group_ids)} 个群组)")
+    background_tasks.add_task(run_group_stats_rescan_task, task_id, group_ids)
+    return {"task_id": task_id, "message": "任务已创建，正在后台执行"}
+
 def _persist_group_meta_local(group_id: int, info: Dict[str, Any]):
     """
     将群组的封面、名称、群主与时间等元信息持久化到本地目录。
@@ -3405,12 +4030,17 @@ async def get_groups():
     try:
         # 自动构建群组→账号映射（多账号支持）
         group_account_map = build_account_group_detection()
-        # 首页需要实时展示本地占用大小，因此每次取群组列表时刷新本地目录索引。
+        # 首页需要展示本地占用大小，因此每次取群组列表时刷新本地目录索引；
+        # 占用大小与本地统计读取持久化缓存（目录变化时后台重扫），不再每次遍历目录和打开数据库。
         local_ids = get_cached_local_group_ids(force_refresh=True)
-        local_storage_sizes = {
-            int(gid): _get_group_storage_size(str(gid))
+        local_stats = {
+            int(gid): _get_cached_group_stats(str(gid)) or {}
             for gid in (local_ids or [])
         }
+        local_storage_sizes = {
+            gid: int(entry.get("size_bytes") or 0)
+            for gid, entry in local_stats.items()
+        }
 
         # 获取“当前账号”的群列表（优先账号默认账号，其次config.toml；若未配置则视为空集合）
         groups_data: List[dict] = []
@@ -3528,68 +4158,33 @@ async def get_groups():
                 except Exception as e:
                     print(f"⚠️ 读取本地群组 {gid_int} 元数据文件失败: {e}")
 
-                # 2. 若元数据文件中仍缺少信息，再从本地数据库补充
-                try:
-                    path_manager = get_db_path_manager()
-                    db_paths = path_manager.list_group_databases(str(gid_int))
-                    topics_db = db_paths.get("topics")
-                    if topics_db and os.path.exists(topics_db):
-                        db = ZSXQDatabase(topics_db)
-                        try:
-                            cur = db.cursor
-                            # 群组基础信息
-                            if not local_bg or local_name.startswith("本地群（"):
-                                cur.execute(
-                                    "SELECT name, type, background_url FROM groups WHERE group_id = ? LIMIT 1",
-                                    (gid_int,),
-                                )
-                                row = cur.fetchone()
-                                if row:
-                                    if row[0]:
-                                        local_name = row[0]
-                                    if row[1]:
-                                        local_type = row[1]
-                                    if row[2]:
-                                        local_bg = row[2]
-
-                            # 本地数据时间范围（以话题时间替代“加入/过期时间”的近似）
-                            if not join_time or not expiry_time:
-                                cur.execute(
-                                    """
-                                    SELECT MIN(create_time), MAX(create_time)
-                                    FROM topics
-                                    WHERE group_id = ? AND create_time IS NOT NULL AND create_time != ''
-                                    """,
-                                    (gid_int,),
-                                )
-                                trow = cur.fetchone()
-                                if trow:
-                                    if not join_time:
-                                        join_time = trow[0]
-                                    if not expiry_time:
-                                        expiry_time = trow[1]
-                                    if not last_active_time:
-                                        last_active_time = trow[1]
-
-                            # 简单统计：话题数量
-                            if not statistics:
-                                cur.execute(
-                                    "SELECT COUNT(*) FROM topics WHERE group_id = ?",
-                                    (gid_int,),
-                                )
-                                topics_count = cur.fetchone()[0] or 0
-                                statistics = {
-                                    "topics": {
-                                        "topics_count": topics_count,
-                                        "answers_count": 0,
-                                        "digests_count": 0,
-                                    }
-                                }
-                        finally:
-                            db.close()
-                except Exception as e:
-                    # 出错时降级为占位信息，不中断整个接口
-                    print(f"⚠️ 读取本地群组 {gid_int} 元数据失败: {e}")
+                # 2. 若元数据文件中仍缺少信息，再从统计缓存（本地数据库的统计结果）补充
+                cached = local_stats.get(gid_int) or {}
+                if not local_bg or local_name.startswith("本地群（"):
+                    if cached.get("name"):
+                        local_name = cached["name"]
+                    if cached.get("type"):
+                        local_type = cached["type"]
+                    if cached.get("background_url"):
+                        local_bg = cached["background_url"]
+
+                # 本地数据时间范围（以话题时间替代“加入/过期时间”的近似）
+                if not join_time:
+                    join_time = cached.get("first_topic_time")
+                if not expiry_time:
+                    expiry_time = cached.get("last_topic_time")
+                if not last_active_time:
+                    last_active_time = cached.get("last_topic_time")
+
+                # 简单统计：话题数量
+                if not statistics:
+                    statistics = {
+                        "topics": {
+                            "topics_count": int(cached.get("topics_count") or 0),
+                            "answers_count": 0,
+                            "digests_count": 0,
+                        }
+                    }
 
                 by_id[gid_int] = {
                     "group_id": gid_int,
@@ -3667,6 +4262,7 @@ def _topic_image_downloader(group_id: str):
     """构建用于 ZIP 归档的图片下载回调。
 
     优先使用 image_cache_manager 的本地缓存（避免重复下载）；缓存未命中时主动下载。
+    导出话题引用的图片会被标记为 pinned，缓存容量超限时不会被淘汰。
     返回的 callable 接收 url，返回本地图片路径或 None。
     """
     cache_manager = get_image_cache_manager(group_id)
@@ -3677,6 +4273,7 @@ def _topic_image_downloader(group_id: str):
         try:
             success, path, _err = cache_manager.download_and_cache(url, timeout=20)
             if success and path:
+                cache_manager.pin(url)
                 return path
         except Exception as e:
             log_warning(f"导出 ZIP 时下载图片失败: url={url}, error={e}")
@@ -3844,17 +4441,23 @@ async def fetch_more_comments(topic_id: int, group_id: str):
                 "comments_fetched": 0
             }
 
-        # 获取更多评论
+        # 获取更多评论（已同步过的话题只获取新评论）
         try:
-            additional_comments = crawler.fetch_all_comments(topic_id, comments_count)
-            if additional_comments:
-                crawler.db.import_additional_comments(topic_id, additional_comments)
-                crawler.db.conn.commit()
-
+            result = crawler.sync_topic_comments(topic_id, comments_count)
+            if result["mode"] == "skipped":
                 return {
                     "success": True,
-                    "message": f"成功获取并导入 {len(additional_comments)} 条评论",
-                    "comments_fetched": len(additional_comments)
+                    "message": "本地评论已是最新，无需重新获取",
+                    "comments_fetched": 0,
+                    "sync_mode": result["mode"]
+                }
+            if result["comments"]:
+                mode_label = "新增" if result["mode"] == "incremental" else ""
+                return {
+                    "success": True,
+                    "message": f"成功获取并导入 {result['comments']} 条{mode_label}评论",
+                    "comments_fetched": result["comments"],
+                    "sync_mode": result["mode"]
                 }
             else:
                 return {
@@ -3901,7 +4504,8 @@ async def delete_single_topic(topic_id: int, group_id: int):
             'articles',
             'talks',
             'topic_files',
-            'topic_tags'
+            'topic_tags',
+            'comment_sync_state'
         ]
 
         for table in tables_to_clean:
@@ -3912,6 +4516,9 @@ async def delete_single_topic(topic_id: int, group_id: int):
 
         deleted = crawler.db.cursor.rowcount
         crawler.db.conn.commit()
+        crawler.db.invalidate_topic_count_cache()
+        if deleted:
+            get_group_stats_cache().mark_stats_stale(int(group_id))
 
         return {"success": True, "deleted_topic_id": topic_id, "deleted": deleted > 0}
     except Exception as e:
@@ -3959,6 +4566,9 @@ async def fetch_single_topic(group_id: str, topic_id: int, fetch_comments: bool
         # 导入话题完整数据
         crawler.db.import_topic_data(topic)
         crawler.db.conn.commit()
+        crawler.db.invalidate_topic_count_cache()
+        if not existed:
+            record_topics_added(group_id, 1, topic.get("create_time"), topic.get("create_time"))
 
         # 可选：获取完整评论
         comments_fetched = 0
@@ -3966,11 +4576,7 @@ async def fetch_single_topic(group_id: str, topic_id: int, fetch_comments: bool
             comments_count = topic.get("comments_count", 0) or 0
             if comments_count > 0:
                 try:
-                    additional_comments = crawler.fetch_all_comments(topic_id, comments_count)
-                    if additional_comments:
-                        crawler.db.import_additional_comments(topic_id, additional_comments)
-                        crawler.db.conn.commit()
-                        comments_fetched = len(additional_comments)
+                    comments_fetched = crawler.sync_topic_comments(topic_id, comments_count)["comments"]
                 except Exception as e:
                     # 不阻塞主流程
                     print(f"⚠️ 单话题评论获取失败: {e}")
@@ -4029,63 +4635,99 @@ async def get_topics_by_tag(group_id: int, tag_id: int, page: int = 1, per_page:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"根据标签获取话题失败: {str(e)}")
 
+def _image_etag(path: Path, stat_result: os.stat_result) -> str:
+    """缓存文件名即 URL 的摘要，结合大小与修改时间作为 ETag"""
+    return f'"{path.stem}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def _is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """按 If-None-Match / If-Modified-Since 判断客户端缓存是否仍然有效"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= int(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _cached_image_response(request: Request, cached_path: Path, cache_status: str) -> Response:
+    """以文件方式返回缓存图片（不整体读入内存），支持 304"""
+    stat_result = cached_path.stat()
+    etag = _image_etag(cached_path, stat_result)
+    headers = {
+        'Cache-Control': 'public, max-age=86400',  # 缓存24小时
+        'Access-Control-Allow-Origin': '*',
+        'X-Cache-Status': cache_status,
+        'ETag': etag,
+        'Last-Modified': formatdate(stat_result.st_mtime, usegmt=True),
+    }
+    if _is_not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    content_type = mimetypes.guess_type(str(cached_path))[0] or 'image/jpeg'
+    return FileResponse(cached_path, media_type=content_type, headers=headers, stat_result=stat_result)
+
+
+def _serve_cached_image(request: Request, cache_manager, cached_path: Path, cache_status: str,
+                        width: Optional[int] = None) -> Response:
+    """按 w= 返回不小于该宽度的最小尺寸变体，没有合适的变体（或尚未生成）时返回原图"""
+    if width:
+        picked = cache_manager.get_variant(cached_path.stem, width)
+        if picked:
+            try:
+                response = _cached_image_response(request, picked[1], cache_status)
+                response.headers['X-Image-Variant'] = str(picked[0])
+                return response
+            except FileNotFoundError:
+                pass
+    return _cached_image_response(request, cached_path, cache_status)
+
+
 @app.get("/api/proxy-image")
-async def proxy_image(url: str, group_id: str = None):
-    """代理图片请求，支持本地缓存"""
+async def proxy_image(request: Request, url: str, group_id: str = None,
+                      w: Optional[int] = Query(default=None, ge=1, le=4096)):
+    """代理图片请求，支持本地缓存；w 为显示宽度（像素），返回最接近的尺寸变体"""
     try:
         cache_manager = get_image_cache_manager(group_id)
 
         # 检查是否已缓存
-        if cache_manager.is_cached(url):
-            cached_path = cache_manager.get_cached_path(url)
-            if cached_path and cached_path.exists():
-                # 返回缓存的图片
-                content_type = mimetypes.guess_type(str(cached_path))[0] or 'image/jpeg'
-
-                with open(cached_path, 'rb') as f:
-                    content = f.read()
-
-                return Response(
-                    content=content,
-                    media_type=content_type,
-                    headers={
-                        'Cache-Control': 'public, max-age=86400',  # 缓存24小时
-                        'Access-Control-Allow-Origin': '*',
-                        'X-Cache-Status': 'HIT'
-                    }
-                )
+        cached_path = cache_manager.get_cached_path(url)
+        if cached_path:
+            try:
+                return _serve_cached_image(request, cache_manager, cached_path, 'HIT', w)
+            except FileNotFoundError:
+                # 文件已被外部删除：移除失效的索引条目后重新下载
+                cache_manager.discard(url)
 
-        # 下载并缓存图片
-        success, cached_path, error = cache_manager.download_and_cache(url)
+        # 在连接池线程中下载并缓存图片，同一图片的并发请求只下载一次
+        success, cached_path, error = await cache_manager.fetch(url)
 
         if success and cached_path and cached_path.exists():
-            content_type = mimetypes.guess_type(str(cached_path))[0] or 'image/jpeg'
-
-            with open(cached_path, 'rb') as f:
-                content = f.read()
-
-            return Response(
-                content=content,
-                media_type=content_type,
-                headers={
-                    'Cache-Control': 'public, max-age=86400',
-                    'Access-Control-Allow-Origin': '*',
-                    'X-Cache-Status': 'MISS'
-                }
-            )
+            return _serve_cached_image(request, cache_manager, cached_path, 'MISS', w)
         else:
             raise HTTPException(status_code=404, detail=f"图片加载失败: {error}")
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"代理图片失败: {str(e)}")
 
 
 @app.get("/api/cache/images/info/{group_id}")
 async def get_image_cache_info(group_id: str):
-    """获取指定群组的图片缓存统计信息"""
+    """获取指定群组的图片缓存统计信息（含命中/未命中/淘汰计数与容量预算）"""
     try:
         cache_manager = get_image_cache_manager(group_id)
-        return cache_manager.get_cache_info()
+        info = cache_manager.get_cache_info()
+        info["eviction"] = get_image_cache_evictor().snapshot()
+        # 去重统计覆盖所有群组共用的内容寻址存储
+        info["dedup"] = get_image_blob_store().stats()
+        return info
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取缓存信息失败: {str(e)}")
 
@@ -4105,9 +4747,47 @@ async def clear_image_cache(group_id: str):
         raise HTTPException(status_code=500, detail=f"清空缓存失败: {str(e)}")
 
 
+def run_image_dedup_task(task_id: str):
+    """后台把历史图片缓存纳入内容寻址存储：内容相同的图片改为同一 blob 的硬链接"""
+    try:
+        update_task(task_id, "running", "正在对图片缓存去重...")
+        store = get_image_blob_store()
+        removed = store.reconcile()
+        if removed:
+            add_task_log(task_id, f"🧹 已清理 {removed} 个无引用的 blob")
+        managers = image_cache_module.all_cache_managers()
+        total_adopted = total_reused = 0
+        for index, manager in enumerate(managers, 1):
+            if is_task_stopped(task_id):
+                add_task_log(task_id, "🛑 任务已停止")
+                return
+            adopted, reused = manager.dedupe_existing()
+            total_adopted += adopted
+            total_reused += reused
+            add_task_log(task_id, f"🖼️ [{index}/{len(managers)}] {manager.group_id or '默认缓存'}: "
+                                  f"纳入 {adopted} 张，其中 {reused} 张与已有内容相同")
+        stats = store.stats()
+        result = dict(stats, adopted=total_adopted, reused=total_reused)
+        add_task_log(task_id, f"✅ 去重完成，节省 {stats['bytes_saved'] / 1024 / 1024:.1f} MB，"
+                              f"去重比 {stats['dedup_ratio'] or 1}")
+        update_task(task_id, "completed", "图片缓存去重完成", result)
+    except Exception as e:
+        add_task_log(task_id, f"❌ 图片缓存去重失败: {str(e)}")
+        update_task(task_id, "failed", f"图片缓存去重失败: {str(e)}")
+
+
+@app.post("/api/cache/images/dedup")
+async def dedup_image_caches(background_tasks: BackgroundTasks):
+    """后台对所有群组的历史图片缓存去重（新下载的图片写入时即已去重）"""
+    task_id = create_task("image_dedup", "图片缓存去重")
+    background_tasks.add_task(run_image_dedup_task, task_id)
+    return {"task_id": task_id, "message": "任务已创建，正在后台执行"}
+
+
 @app.get("/api/groups/{group_id}/images/{image_path:path}")
-async def get_local_image(group_id: str, image_path: str):
-    """获取群组本地缓存的图片"""
+async def get_local_image(request: Request, group_id: str, image_path: str,
+                          w: Optional[int] = Query(default=None, ge=1, le=4096)):
+    """获取群组本地缓存的图片；w 为显示宽度（像素），返回最接近的尺寸变体"""
     from pathlib import Path
     
     try:
@@ -4120,17 +4800,16 @@ async def get_local_image(group_id: str, image_path: str):
         if not str(image_file).startswith(str(images_dir.resolve())):
             raise HTTPException(status_code=403, detail="禁止访问该路径")
         
-        if not image_file.exists():
+        if not image_file.is_file():
             raise HTTPException(status_code=404, detail="图片不存在")
         
-        # 获取 MIME 类型
-        content_type = mimetypes.guess_type(str(image_file))[0] or 'application/octet-stream'
+        # 缓存目录中由索引管理的图片可按 w= 返回尺寸变体
+        if w and image_file.parent == images_dir.resolve():
+            cache_manager = get_image_cache_manager(group_id)
+            if cache_manager.index.lookup(image_file.stem, touch=False):
+                return _serve_cached_image(request, cache_manager, image_file, 'HIT', w)
         
-        # 读取并返回图片
-        with open(image_file, 'rb') as f:
-            content = f.read()
-        
-        return Response(content=content, media_type=content_type)
+        return _cached_image_response(request, image_file, 'HIT')
     except HTTPException:
         raise
     except Exception as e:
@@ -4346,9 +5025,33 @@ async def get_group_info(group_id: str):
         # 任何异常都回退为本地信息，避免 500
         return build_fallback(note="exception_fallback")
 
+def _encode_topic_cursor(create_time: Optional[str], topic_id: int) -> str:
+    """把列表最后一条话题的 (create_time, topic_id) 编码为不透明游标"""
+    payload = json.dumps([create_time, str(topic_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_topic_cursor(cursor: str):
+    """解析话题列表游标，返回 (create_time, topic_id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        create_time, topic_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        if create_time is not None and not isinstance(create_time, str):
+            raise ValueError("create_time")
+        return create_time, int(topic_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
 @app.get("/api/groups/{group_id}/topics")
-async def get_group_topics(group_id: int, page: int = 1, per_page: int = 20, search: Optional[str] = None):
-    """获取指定群组的话题列表"""
+async def get_group_topics(group_id: int, page: int = 1, per_page: int = 20, search: Optional[str] = None,
+                           page_cursor: Optional[str] = Query(None, alias="cursor")):
+    """获取指定群组的话题列表
+
+    - 传 page/per_page：按页码分页（兼容旧接口）
+    - 传 cursor：按 (create_time, topic_id) 游标分页，首屏传空字符串，后续传上次返回的 next_cursor；
+      深翻页不再随 OFFSET 线性变慢
+    """
     db = None
     try:
         db = _open_local_topics_db(str(group_id))
@@ -4363,48 +5066,78 @@ async def get_group_topics(group_id: int, page: int = 1, per_page: int = 20, sea
 
         offset = (page - 1) * per_page
 
+        topic_columns_sql = """
+            SELECT
+                t.topic_id, t.title, t.create_time, t.likes_count, t.comments_count,
+                t.reading_count, t.type, t.digested, t.sticky,
+                q.text as question_text,
+                a.text as answer_text,
+                tk.text as talk_text,
+                u.user_id, u.name, u.avatar_url, t.imported_at
+            FROM topics t
+            LEFT JOIN questions q ON t.topic_id = q.topic_id
+            LEFT JOIN answers a ON t.topic_id = a.topic_id
+            LEFT JOIN talks tk ON t.topic_id = tk.topic_id
+            LEFT JOIN users u ON tk.owner_user_id = u.user_id
+        """
+
         # 构建查询SQL - 包含所有内容类型
+        search_hits = {}
+        query = None
+        topics = []
         if search:
-            query = """
-                SELECT
-                    t.topic_id, t.title, t.create_time, t.likes_count, t.comments_count,
-                    t.reading_count, t.type, t.digested, t.sticky,
-                    q.text as question_text,
-                    a.text as answer_text,
-                    tk.text as talk_text,
-                    u.user_id, u.name, u.avatar_url, t.imported_at
-                FROM topics t
-                LEFT JOIN questions q ON t.topic_id = q.topic_id
-                LEFT JOIN answers a ON t.topic_id = a.topic_id
-                LEFT JOIN talks tk ON t.topic_id = tk.topic_id
-                LEFT JOIN users u ON tk.owner_user_id = u.user_id
-                WHERE t.group_id = ? AND (t.title LIKE ? OR q.text LIKE ? OR tk.text LIKE ?)
-                ORDER BY t.create_time DESC
-                LIMIT ? OFFSET ?
-            """
-            params = (group_id, f"%{search}%", f"%{search}%", f"%{search}%", per_page, offset)
+            # 全文检索（FTS5）按相关度排序，再按命中的 topic_id 取列表字段
+            search_result = db.search_topics(search, group_id=group_id, limit=per_page, offset=offset)
+            search_hits = {hit['topic_id']: hit for hit in search_result['hits']}
+            total = search_result['total']
+            if search_hits:
+                placeholders = ','.join('?' for _ in search_hits)
+                query = topic_columns_sql + f" WHERE t.topic_id IN ({placeholders})"
+                params = tuple(search_hits)
+        elif page_cursor:
+            # 游标分页：排序与 idx_topics_group_create_time 一致（create_time 降序、topic_id 升序），
+            # 条件写成 create_time <= ? 的范围才能直接在索引上定位；没有时间的话题排在最后，单独补齐
+            cursor_time, cursor_topic_id = _decode_topic_cursor(page_cursor)
+            segments = []
+            if cursor_time is not None:
+                segments.append((
+                    "t.create_time <= ? AND (t.create_time < ? OR t.topic_id > ?)",
+                    (cursor_time, cursor_time, cursor_topic_id),
+                ))
+            segments.append((
+                "t.create_time IS NULL AND t.topic_id > ?",
+                (cursor_topic_id if cursor_time is None else -1,),
+            ))
+            for keyset_sql, keyset_params in segments:
+                remaining = per_page + 1 - len(topics)
+                if remaining <= 0:
+                    break
+                cursor.execute(topic_columns_sql + f"""
+                    WHERE t.group_id = ? AND {keyset_sql}
+                    ORDER BY t.create_time DESC, t.topic_id ASC
+                    LIMIT ?
+                """, (group_id, *keyset_params, remaining))
+                topics.extend(cursor.fetchall())
         else:
-            query = """
-                SELECT
-                    t.topic_id, t.title, t.create_time, t.likes_count, t.comments_count,
-                    t.reading_count, t.type, t.digested, t.sticky,
-                    q.text as question_text,
-                    a.text as answer_text,
-                    tk.text as talk_text,
-                    u.user_id, u.name, u.avatar_url, t.imported_at
-                FROM topics t
-                LEFT JOIN questions q ON t.topic_id = q.topic_id
-                LEFT JOIN answers a ON t.topic_id = a.topic_id
-                LEFT JOIN talks tk ON t.topic_id = tk.topic_id
-                LEFT JOIN users u ON tk.owner_user_id = u.user_id
+            query = topic_columns_sql + """
                 WHERE t.group_id = ?
-                ORDER BY t.create_time DESC
+                ORDER BY t.create_time DESC, t.topic_id ASC
                 LIMIT ? OFFSET ?
             """
-            params = (group_id, per_page, offset)
+            params = (group_id, per_page + 1 if page_cursor is not None else per_page, offset)
 
-        cursor.execute(query, params)
-        topics = cursor.fetchall()
+        if query:
+            cursor.execute(query, params)
+            topics = cursor.fetchall()
+
+        # 游标模式多取一条用于判断是否还有下一页
+        has_more = None
+        if page_cursor is not None and not search:
+            has_more = len(topics) > per_page
+            topics = topics[:per_page]
+        if search_hits:
+            rank = {topic_id: index for index, topic_id in enumerate(search_hits)}
+            topics.sort(key=lambda row: rank.get(row[0], len(rank)))
 
         # 🧪 调试：打印前若干条话题的 topic_id 和标题
         try:
@@ -4420,12 +5153,11 @@ async def get_group_topics(group_id: int, page: int = 1, per_page: int = 20, sea
         except Exception as e:
             print(f"[DEBUG get_group_topics] failed to debug topics: {e}")
 
-        # 获取总数
-        if search:
-            cursor.execute("SELECT COUNT(*) FROM topics WHERE group_id = ? AND title LIKE ?", (group_id, f"%{search}%"))
-        else:
-            cursor.execute("SELECT COUNT(*) FROM topics WHERE group_id = ?", (group_id,))
-        total = cursor.fetchone()[0]
+        # 获取总数（搜索模式下由全文检索返回；列表模式按群组缓存，采集写入后失效）
+        if not search:
+            total = db.count_group_topics(group_id)
+            if has_more is None:
+                has_more = offset + len(topics) < total
 
         # 处理话题数据
         topics_list = []
@@ -4461,15 +5193,26 @@ async def get_group_topics(group_id: int, page: int = 1, per_page: int = 20, sea
                         'avatar_url': topic[14]
                     }
 
+            # 搜索命中的高亮摘要
+            hit = search_hits.get(topic[0])
+            if hit:
+                topic_data['search_snippet'] = hit['snippet']
+                topic_data['search_source'] = hit['source']
+
             topics_list.append(topic_data)
 
+        next_cursor = None
+        if not search and has_more and topics:
+            next_cursor = _encode_topic_cursor(topics[-1][2], topics[-1][0])
+
         return {
             "topics": topics_list,
             "pagination": {
                 "page": page,
                 "per_page": per_page,
                 "total": total,
-                "pages": (total + per_page - 1) // per_page
+                "pages": (total + per_page - 1) // per_page,
+                "next_cursor": next_cursor
             }
         }
     except HTTPException:
@@ -4545,9 +5288,27 @@ async def get_group_database_info(group_id: int):
         path_manager = get_db_path_manager()
         db_info = path_manager.get_database_info(str(group_id))
 
+        # 各数据库文件实际保存的日志模式（WAL 在部分文件系统上可能切换失败）；
+        # 其余参数是连接级设置，每个连接按 configured 设置，不单独读取
+        active_pragmas = {}
+        for db_type, item in db_info.get("databases", {}).items():
+            conn = None
+            try:
+                conn = sqlite3.connect(Path(item['path']).resolve().as_uri() + "?mode=ro", uri=True)
+                active_pragmas[db_type] = read_persistent_pragmas(conn)
+            except Exception as e:
+                active_pragmas[db_type] = {"error": str(e)}
+            finally:
+                if conn:
+                    conn.close()
+
         return {
             "group_id": group_id,
-            "database_info": db_info
+            "database_info": db_info,
+            "sqlite_profile": {
+                "configured": get_sqlite_profile(),
+                "active": active_pragmas,
+            }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取数据库信息失败: {str(e)}")
@@ -4582,6 +5343,7 @@ async def delete_group_topics(group_id: int):
             ('talks', 'topic_id'),
             ('topic_files', 'topic_id'),  # 添加话题文件表
             ('topic_tags', 'topic_id'),   # 添加话题标签关联表
+            ('comment_sync_state', 'topic_id'),  # 评论同步水位，重新采集后需要重新同步评论
             ('topics', 'group_id')
         ]
 
@@ -4604,6 +5366,10 @@ async def delete_group_topics(group_id: int):
 
         # 提交事务
         crawler.db.conn.commit()
+        crawler.db.invalidate_topic_count_cache()
+        get_group_stats_cache().mark_stats_stale(group_id)
+        # 话题已清空，采集覆盖区间随之失效，否则按时间区间/增量采集会跳过这些区间
+        crawler.db.clear_crawl_coverage(group_id)
 
         return {
             "message": f"成功删除群组 {group_id} 的所有话题数据",
@@ -4617,64 +5383,107 @@ async def delete_group_topics(group_id: int):
         raise HTTPException(status_code=500, detail=f"删除话题数据失败: {str(e)}")
 
 @app.get("/api/tasks/{task_id}/logs")
-async def get_task_logs(task_id: str):
-    """获取任务日志"""
-    if task_id not in task_logs:
+async def get_task_logs(task_id: str, offset: Optional[int] = None, limit: Optional[int] = None):
+    """获取任务日志
+
+    - 不带参数：返回内存缓冲区中的最近日志
+    - offset/limit：按条分页（offset 从 0 开始）；缓冲区已不包含的范围从任务日志文件读取，
+      已被回收的任务同样可以读取
+    """
+    bus = get_task_log_bus()
+    touch_task(task_id)
+    first_seq, last_seq = bus.buffered_range(task_id)
+    in_memory = task_id in current_tasks or bus.has_task(task_id)
+
+    if offset is None and limit is None and in_memory:
+        lines, _ = bus.read_since(task_id, 0)
+        return {
+            "task_id": task_id,
+            "logs": [line for _, line in lines],
+            "offset": first_seq - 1,
+            "total": last_seq,
+            "source": "memory"
+        }
+
+    offset = max(offset or 0, 0)
+    limit = max(min(limit or 500, 5000), 1)
+
+    # 请求范围完全落在缓冲区内（序号 = 条目下标 + 1）时直接返回内存数据
+    if in_memory and offset + 1 >= first_seq:
+        lines, _ = bus.read_since(task_id, offset)
+        return {
+            "task_id": task_id,
+            "logs": [line for _, line in lines[:limit]],
+            "offset": offset,
+            "total": last_seq,
+            "source": "memory"
+        }
+
+    logs, total = await asyncio.to_thread(read_task_log_entries, task_id, offset, limit)
+    if not in_memory and total == 0:
         raise HTTPException(status_code=404, detail="任务不存在")
 
     return {
         "task_id": task_id,
-        "logs": task_logs[task_id]
+        "logs": logs,
+        "offset": offset,
+        "total": max(total, last_seq),
+        "source": "file"
     }
 
 @app.get("/api/tasks/{task_id}/stream")
-async def stream_task_logs(task_id: str):
-    """SSE流式传输任务日志"""
-    async def event_stream():
-        # 初始化连接
-        if task_id not in sse_connections:
-            sse_connections[task_id] = []
-
-        # 发送历史日志
-        if task_id in task_logs:
-            for log in task_logs[task_id]:
-                yield f"data: {json.dumps({'type': 'log', 'message': log})}\n\n"
+async def stream_task_logs(task_id: str, request: Request, last_event_id: Optional[int] = None):
+    """SSE流式传输任务日志
 
-        # 发送任务状态
-        if task_id in current_tasks:
-            task = current_tasks[task_id]
-            yield f"data: {json.dumps({'type': 'status', 'status': task['status'], 'message': task['message']})}\n\n"
+    日志由 add_task_log 推送到日志总线，连接只在有新日志时被唤醒；每条日志带 id（递增序号），
+    EventSource 断线重连时会自动携带 Last-Event-ID，只补发之后的日志。
+    """
+    bus = get_task_log_bus()
+    header_event_id = request.headers.get("last-event-id")
+    try:
+        after_seq = int(header_event_id) if header_event_id else (last_event_id or 0)
+    except ValueError:
+        after_seq = 0
 
-        # 记录当前日志数量，用于检测新日志
-        last_log_count = len(task_logs.get(task_id, []))
+    def status_event(task: Dict[str, Any], seq: int) -> str:
+        payload = {'type': 'status', 'status': task['status'], 'message': task['message']}
+        return f"id: {seq}\ndata: {json.dumps(payload)}\n\n"
 
-        # 保持连接活跃
+    async def event_stream():
+        nonlocal after_seq
+        subscription = bus.subscribe(task_id)
+        last_status = None
         try:
             while True:
-                # 检查是否有新日志
-                current_log_count = len(task_logs.get(task_id, []))
-                if current_log_count > last_log_count:
-                    # 发送新日志
-                    new_logs = task_logs[task_id][last_log_count:]
-                    for log in new_logs:
-                        yield f"data: {json.dumps({'type': 'log', 'message': log})}\n\n"
-                    last_log_count = current_log_count
-
-                # 检查任务状态变化
-                if task_id in current_tasks:
-                    task = current_tasks[task_id]
-                    yield f"data: {json.dumps({'type': 'status', 'status': task['status'], 'message': task['message']})}\n\n"
-
+                # 补发缓冲区中尚未发送的日志
+                lines, missed = bus.read_since(task_id, after_seq)
+                if missed:
+                    notice = f"…… 已省略 {missed} 条较早的日志 ……"
+                    yield f"data: {json.dumps({'type': 'log', 'message': notice})}\n\n"
+                for seq, line in lines:
+                    yield f"id: {seq}\ndata: {json.dumps({'type': 'log', 'message': line})}\n\n"
+                    after_seq = seq
+
+                # 任务状态仅在变化时发送
+                task = current_tasks.get(task_id)
+                if task:
+                    status = (task['status'], task['message'])
+                    if status != last_status:
+                        last_status = status
+                        yield status_event(task, after_seq)
                     if task['status'] in ['completed', 'failed', 'cancelled']:
                         break
 
-                # 发送心跳
-                yield f"data: {json.dumps({'type': 'heartbeat'})}\n\n"
-                await asyncio.sleep(0.5)  # 更频繁的检查
-
+                # 等待新日志；长时间无消息时发送 SSE 注释保持连接
+                if not await subscription.wait(15):
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
         except asyncio.CancelledError:
             # 客户端断开连接
             pass
+        finally:
+            bus.unsubscribe(subscription)
 
     return StreamingResponse(
         event_stream(),
@@ -4691,9 +5500,6 @@ async def stream_task_logs(task_id: str):
 @app.get("/api/proxy/image")
 async def proxy_image(url: str):
     """图片代理，解决盗链问题"""
-    import requests
-    from fastapi.responses import Response
-
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -4701,7 +5507,8 @@ async def proxy_image(url: str):
             'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
         }
 
-        response = requests.get(url, headers=headers, timeout=10)
+        # 在连接池线程中请求，避免阻塞事件循环
+        response = await get_image_http_client().get(url, headers=headers, timeout=10)
         response.raise_for_status()
 
         return Response(
@@ -4849,85 +5656,58 @@ async def update_downloader_settings(request: DownloaderSettingsRequest):
         raise HTTPException(status_code=500, detail=f"更新下载器设置失败: {str(e)}")
 
 # =========================
-# 自动账号匹配缓存与辅助函数
+# 自动账号匹配（持久化检测结果 + 后台刷新）
 # =========================
 ACCOUNT_DETECT_TTL_SECONDS = 300
-_account_detect_cache: Dict[str, Any] = {
-    "built_at": 0,
-    "group_to_account": {},
-    "cookie_by_account": {}
-}
+ACCOUNT_DETECT_TIMEOUT_SECONDS = 15
+# 账号尚未完成首次群组检测时，选择 Cookie 前最多等待后台刷新的时间
+ACCOUNT_DETECT_FIRST_WAIT_SECONDS = 3
+
+account_group_refresher = AccountGroupRefresher(
+    lambda cookie, timeout: fetch_groups_from_api(cookie, timeout=timeout),
+    refresh_interval=ACCOUNT_DETECT_TTL_SECONDS,
+    account_timeout=ACCOUNT_DETECT_TIMEOUT_SECONDS,
+)
 
 def clear_account_detect_cache():
-    """清除账号群组检测缓存，使新账号/删除账号后群组立即刷新"""
-    _account_detect_cache["built_at"] = 0
+    """账号新增/删除后立即在后台刷新群组检测（删除的账号其检测结果随账号级联删除）"""
+    account_group_refresher.refresh(force=True)
 
-def _get_all_account_sources() -> List[Dict[str, Any]]:
-    """获取所有账号来源"""
-    sources: List[Dict[str, Any]] = []
+def _load_detected_group_accounts() -> Dict[str, Dict[str, Any]]:
+    """读取持久化的群组→账号检测结果（包含未掩码 cookie），过期时触发后台刷新"""
+    account_group_refresher.refresh_if_stale()
     try:
-        sql_mgr = get_accounts_sql_manager()
-        accounts = sql_mgr.get_accounts(mask_cookie=False)
-        if accounts:
-            sources.extend(accounts)
-    except Exception:
-        pass
-    return sources
+        return get_accounts_sql_manager().get_detected_group_accounts()
+    except Exception as e:
+        print(f"⚠️ 读取账号群组检测结果失败: {e}")
+        return {}
 
 def build_account_group_detection(force_refresh: bool = False) -> Dict[str, Dict[str, Any]]:
     """
     构建自动匹配映射：group_id -> 账号摘要
-    遍历所有账号来源，调用官方 /v2/groups 获取其可访问群组进行比对。
-    使用内存缓存减少频繁请求。
+    只读取账号库中持久化的检测结果，不在请求路径上调用 /v2/groups；
+    结果过期或 force_refresh 时在后台刷新，本次仍返回现有结果。
     """
-    now = time.time()
-    cache = _account_detect_cache
-    if (not force_refresh
-        and cache.get("group_to_account")
-        and now - cache.get("built_at", 0) < ACCOUNT_DETECT_TTL_SECONDS):
-        return cache["group_to_account"]
-
-    group_to_account: Dict[str, Dict[str, Any]] = {}
-    cookie_by_account: Dict[str, str] = {}
-
-    sources = _get_all_account_sources()
-    for src in sources:
-        cookie = src.get("cookie", "")
-        acc_id = src.get("id")
-        if not cookie or cookie == "your_cookie_here" or not acc_id:
-            continue
-
-        # 记录账号对应cookie
-        cookie_by_account[acc_id] = cookie
-
-        try:
-            groups = fetch_groups_from_api(cookie)
-            for g in groups or []:
-                gid = str(g.get("group_id"))
-                if gid and gid not in group_to_account:
-                    group_to_account[gid] = {
-                        "id": acc_id,
-                        "name": src.get("name") or acc_id,
-                        "created_at": src.get("created_at"),
-                        "cookie": "***"
-                    }
-        except Exception:
-            # 忽略单个账号失败
-            continue
-
-    cache["group_to_account"] = group_to_account
-    cache["cookie_by_account"] = cookie_by_account
-    cache["built_at"] = now
-    return group_to_account
+    if force_refresh:
+        account_group_refresher.refresh(force=True)
+    return {
+        gid: {
+            "id": acc["id"],
+            "name": acc["name"],
+            "created_at": acc["created_at"],
+            "cookie": "***"
+        }
+        for gid, acc in _load_detected_group_accounts().items()
+    }
 
 def get_cookie_for_group(group_id: str) -> str:
     """根据自动匹配结果选择用于该群组的Cookie，失败则回退到config.toml"""
-    mapping = build_account_group_detection(force_refresh=False)
-    summary = mapping.get(str(group_id))
-    cookie = None
-    if summary:
-        cookie = _account_detect_cache.get("cookie_by_account", {}).get(summary["id"])
+    detected = _load_detected_group_accounts().get(str(group_id))
+    if not detected and account_group_refresher.wait_for_unrefreshed(ACCOUNT_DETECT_FIRST_WAIT_SECONDS):
+        detected = _load_detected_group_accounts().get(str(group_id))
+    cookie = detected.get("cookie") if detected else None
     if not cookie:
+        log_warning(f"群组 {group_id} 未匹配到账号，使用 config.toml 中的 Cookie")
         cfg = load_config()
         auth = cfg.get('auth', {}) if cfg else {}
         cookie = auth.get('cookie', '')
@@ -4956,6 +5736,23 @@ def get_account_summary_for_group_auto(group_id: str) -> Optional[Dict[str, Any]
 
     return None
 
+@app.get("/api/accounts/group-detection")
+async def get_account_group_detection_status():
+    """账号群组检测结果的年龄与刷新状态（max_age_seconds 超过刷新间隔即表示映射已过期）"""
+    try:
+        return await asyncio.to_thread(account_group_refresher.snapshot)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取账号群组检测状态失败: {str(e)}")
+
+@app.post("/api/accounts/group-detection/refresh")
+async def refresh_account_group_detection():
+    """在后台立即刷新所有账号的群组检测结果"""
+    started = account_group_refresher.refresh(force=True)
+    return {
+        "success": True,
+        "message": "已开始刷新账号群组检测" if started else "刷新进行中，完成后将再刷新一次",
+    }
+
 # =========================
 # 新增：按时间区间爬取
 # =========================
@@ -4971,6 +5768,7 @@ class CrawlTimeRangeRequest(BaseModel):
     longSleepIntervalMin: Optional[float] = Field(default=None, ge=60.0, le=3600.0, description="长休眠间隔最小值(秒)")
     longSleepIntervalMax: Optional[float] = Field(default=None, ge=60.0, le=3600.0, description="长休眠间隔最大值(秒)")
     pagesPerBatch: Optional[int] = Field(default=None, ge=5, le=50, description="每批次页面数")
+    skipCovered: Optional[bool] = Field(default=True, description="跳过采集覆盖表中已完整同步的时间段；关闭后整段重新爬取（用于刷新点赞/评论数）")
 
 
 def run_crawl_time_range_task(task_id: str, group_id: str, request: "CrawlTimeRangeRequest"):
@@ -5061,102 +5859,157 @@ def run_crawl_time_range_task(task_id: str, group_id: str, request: "CrawlTimeRa
 
         per_page = request.perPage or 20
         total_stats = {'new_topics': 0, 'updated_topics': 0, 'errors': 0, 'pages': 0}
-        end_time_param = None  # 从最新开始
         max_retries_per_page = 10
 
-        while True:
-            if is_task_stopped(task_id):
-                add_task_log(task_id, "🛑 任务已停止")
-                break
+        # 根据采集覆盖表只爬取区间内尚未完整同步的时间段（按时间从新到旧）
+        start_str = ms_to_topic_time(int(start_dt.timestamp() * 1000))
+        end_str = ms_to_topic_time(int(end_dt.timestamp() * 1000))
+        start_ms = topic_time_to_ms(start_str)
+        end_ms = topic_time_to_ms(end_str)
+        if request.skipCovered:
+            uncovered = crawler.db.find_uncovered_ranges(int(group_id), start_str, end_str)
+            if not uncovered:
+                add_task_log(task_id, "✅ 该时间区间已完整同步，无需请求")
+                update_task(task_id, "completed", "时间区间爬取完成", total_stats)
+                return
+            if uncovered != [(start_str, end_str)]:
+                add_task_log(task_id, f"🧭 区间内已有完整同步的数据，仅爬取 {len(uncovered)} 个缺口:")
+                for gap_start, gap_end in uncovered:
+                    add_task_log(task_id, f"   • {gap_start} ~ {gap_end}")
+        else:
+            uncovered = [(start_str, end_str)]
 
-            retry = 0
-            page_processed = False
-            last_time_dt_in_page = None
+        def parse_topic_time(ts: Optional[str]) -> Optional[datetime]:
+            try:
+                if ts:
+                    ts_fixed = ts.replace('+0800', '+08:00') if ts.endswith('+0800') else ts
+                    return datetime.fromisoformat(ts_fixed)
+            except Exception:
+                pass
+            return None
+
+        stopped = False
+        exhausted = False  # 已没有更老的数据，后续缺口无需再请求
+        for gap_index, (gap_start, gap_end) in enumerate(uncovered):
+            gap_start_dt = parse_topic_time(gap_start) or start_dt
+            # 区间终点为“现在”时从最新开始（与官网首页请求一致），否则直接从缺口上界开始
+            if gap_index == 0 and request.endTime is None and not request.lastDays and gap_end == end_str:
+                end_time_param = None
+            else:
+                end_time_param = gap_end
 
-            while retry < max_retries_per_page:
+            while True:
                 if is_task_stopped(task_id):
+                    add_task_log(task_id, "🛑 任务已停止")
+                    stopped = True
                     break
 
-                data = crawler.fetch_topics_safe(
-                    scope="all",
-                    count=per_page,
-                    end_time=end_time_param,
-                    is_historical=True if end_time_param else False
-                )
+                retry = 0
+                page_processed = False
+                reached_gap_start = False
+                last_time_dt_in_page = None
 
-                # 会员过期
-                if data and isinstance(data, dict) and data.get('expired'):
-                    add_task_log(task_id, f"❌ 会员已过期: {data.get('message')}")
-                    update_task(task_id, "failed", "会员已过期", data)
-                    return
+                while retry < max_retries_per_page:
+                    if is_task_stopped(task_id):
+                        break
 
-                if not data:
-                    retry += 1
-                    total_stats['errors'] += 1
-                    add_task_log(task_id, f"❌ 页面获取失败 (重试{retry}/{max_retries_per_page})")
-                    continue
+                    data = crawler.fetch_topics_safe(
+                        scope="all",
+                        count=per_page,
+                        end_time=end_time_param,
+                        is_historical=True if end_time_param else False
+                    )
+
+                    # 会员过期
+                    if data and isinstance(data, dict) and data.get('expired'):
+                        add_task_log(task_id, f"❌ 会员已过期: {data.get('message')}")
+                        update_task(task_id, "failed", "会员已过期", data)
+                        return
 
-                topics = (data.get('resp_data', {}) or {}).get('topics', []) or []
-                if not topics:
-                    add_task_log(task_id, "📭 无更多数据，任务结束")
+                    if not data:
+                        retry += 1
+                        total_stats['errors'] += 1
+                        add_task_log(task_id, f"❌ 页面获取失败 (重试{retry}/{max_retries_per_page})")
+                        continue
+
+                    topics = (data.get('resp_data', {}) or {}).get('topics', []) or []
+                    if not topics:
+                        add_task_log(task_id, "📭 无更多数据")
+                        # end_time 之前已没有任何话题：[区间起点, end_time] 视为已完整同步
+                        if end_time_param and start_ms <= topic_time_to_ms(end_time_param) <= end_ms:
+                            crawler.db.record_crawl_coverage(int(group_id), start_str, end_time_param)
+                            crawler.db.conn.commit()
+                        page_processed = True
+                        exhausted = True
+                        break
+
+                    # 过滤时间范围
+                    filtered = []
+                    for t in topics:
+                        dt = parse_topic_time(t.get('create_time'))
+                        if dt:
+                            last_time_dt_in_page = dt  # 该页数据按时间降序；循环结束后持有最后（最老）时间
+                            if start_dt <= dt <= end_dt:
+                                filtered.append(t)
+
+                    # 仅导入时间范围内的数据；覆盖区间的上界不超过区间终点
+                    requested_end = end_time_param
+                    page_complete = True
+                    if filtered:
+                        covered_until = end_time_param if end_time_param and topic_time_to_ms(end_time_param) <= end_ms else None
+                        filtered_data = {'succeeded': True, 'resp_data': {'topics': filtered}}
+                        page_stats = crawler.store_batch_data(filtered_data, covered_until=covered_until)
+                        total_stats['new_topics'] += page_stats.get('new_topics', 0)
+                        total_stats['updated_topics'] += page_stats.get('updated_topics', 0)
+                        total_stats['errors'] += page_stats.get('errors', 0)
+                        page_complete = page_stats.get('errors', 0) == 0 and \
+                            page_stats.get('new_topics', 0) + page_stats.get('updated_topics', 0) == len(filtered)
+
+                    total_stats['pages'] += 1
                     page_processed = True
-                    break
 
-                # 过滤时间范围
-                from datetime import datetime
-                filtered = []
-                for t in topics:
-                    ts = t.get('create_time')
-                    dt = None
+                    # 计算下一页的 end_time（使用该页最老话题时间 - 偏移毫秒）
+                    oldest_in_page = topics[-1].get('create_time')
                     try:
-                        if ts:
-                            ts_fixed = ts.replace('+0800', '+08:00') if ts.endswith('+0800') else ts
-                            dt = datetime.fromisoformat(ts_fixed)
+                        dt_oldest = datetime.fromisoformat(oldest_in_page.replace('+0800', '+08:00'))
+                        dt_oldest = dt_oldest - timedelta(milliseconds=crawler.timestamp_offset_ms)
+                        end_time_param = dt_oldest.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
                     except Exception:
-                        dt = None
-
-                    if dt:
-                        last_time_dt_in_page = dt  # 该页数据按时间降序；循环结束后持有最后（最老）时间
-                        if start_dt <= dt <= end_dt:
-                            filtered.append(t)
-
-                # 仅导入时间范围内的数据
-                if filtered:
-                    filtered_data = {'succeeded': True, 'resp_data': {'topics': filtered}}
-                    page_stats = crawler.store_batch_data(filtered_data)
-                    total_stats['new_topics'] += page_stats.get('new_topics', 0)
-                    total_stats['updated_topics'] += page_stats.get('updated_topics', 0)
-                    total_stats['errors'] += page_stats.get('errors', 0)
-
-                total_stats['pages'] += 1
-                page_processed = True
-
-                # 计算下一页的 end_time（使用该页最老话题时间 - 偏移毫秒）
-                oldest_in_page = topics[-1].get('create_time')
-                try:
-                    dt_oldest = datetime.fromisoformat(oldest_in_page.replace('+0800', '+08:00'))
-                    dt_oldest = dt_oldest - timedelta(milliseconds=crawler.timestamp_offset_ms)
-                    end_time_param = dt_oldest.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-                except Exception:
-                    end_time_param = oldest_in_page
+                        end_time_param = oldest_in_page
+
+                    # 该页最老时间已早于缺口起点：缺口已补齐（更老的数据已同步或不在范围内）
+                    if last_time_dt_in_page and last_time_dt_in_page < gap_start_dt:
+                        reached_gap_start = True
+                        if gap_start_dt <= start_dt:
+                            add_task_log(task_id, "✅ 已到达起始时间之前")
+                            # [区间起点, 本页区间内最老话题] 之间没有其它话题，一并记为已同步
+                            lower_edge = filtered[-1].get('create_time') if filtered else requested_end
+                            lower_edge_ms = topic_time_to_ms(lower_edge)
+                            if page_complete and lower_edge_ms is not None and start_ms <= lower_edge_ms <= end_ms:
+                                crawler.db.record_crawl_coverage(int(group_id), start_str, lower_edge)
+                                crawler.db.conn.commit()
+                        else:
+                            add_task_log(task_id, "✅ 已衔接到完整同步的数据")
+                        break
 
-                # 若该页最老时间已早于 start_dt，则后续更老数据均不在范围内，结束
-                if last_time_dt_in_page and last_time_dt_in_page < start_dt:
-                    add_task_log(task_id, "✅ 已到达起始时间之前，任务结束")
-                    break
+                    # 成功处理后进行长休眠检查
+                    crawler.check_page_long_delay()
+                    break  # 成功后跳出重试循环
 
-                # 成功处理后进行长休眠检查
-                crawler.check_page_long_delay()
-                break  # 成功后跳出重试循环
+                if not page_processed:
+                    if not is_task_stopped(task_id):
+                        add_task_log(task_id, "🚫 当前页面达到最大重试次数，终止任务")
+                    stopped = True
+                    break
 
-            if not page_processed:
-                add_task_log(task_id, "🚫 当前页面达到最大重试次数，终止任务")
-                break
+                # 结束条件：没有更多数据、没有下一页时间或已越过缺口起点
+                if exhausted or not end_time_param or reached_gap_start:
+                    break
 
-            # 结束条件：没有下一页时间或已越过起始边界
-            if not end_time_param or (last_time_dt_in_page and last_time_dt_in_page < start_dt):
+            if stopped or exhausted:
                 break
 
+        crawler.wait_comment_backfill()
         update_task(task_id, "completed", "时间区间爬取完成", total_stats)
     except Exception as e:
         if not is_task_stopped(task_id):
@@ -5173,6 +6026,276 @@ async def crawl_by_time_range(group_id: str, request: CrawlTimeRangeRequest, bac
         return {"task_id": task_id, "message": "任务已创建，正在后台执行"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"创建时间区间爬取任务失败: {str(e)}")
+
+
+# =========================
+# 新增：时间线缺口检测与补齐
+# =========================
+
+class GapBackfillRequest(BaseModel):
+    perPage: Optional[int] = Field(default=20, ge=1, le=100, description="每页数量")
+    maxGaps: Optional[int] = Field(default=None, ge=1, description="最多补齐的缺口数（按时间从新到旧），缺省补齐全部")
+    minGapHours: Optional[float] = Field(default=6.0, ge=0.5, le=24 * 365, description="稀疏缺口的最小时长(小时)")
+    densityFactor: Optional[float] = Field(default=8.0, ge=2.0, le=1000.0, description="间隔超过附近中位数的倍数才视为缺口")
+    crawlIntervalMin: Optional[float] = Field(default=None, ge=1.0, le=60.0, description="爬取间隔最小值(秒)")
+    crawlIntervalMax: Optional[float] = Field(default=None, ge=1.0, le=60.0, description="爬取间隔最大值(秒)")
+    longSleepIntervalMin: Optional[float] = Field(default=None, ge=60.0, le=3600.0, description="长休眠间隔最小值(秒)")
+    longSleepIntervalMax: Optional[float] = Field(default=None, ge=60.0, le=3600.0, description="长休眠间隔最大值(秒)")
+    pagesPerBatch: Optional[int] = Field(default=None, ge=5, le=50, description="每批次页面数")
+
+
+@app.get("/api/groups/{group_id}/topic-gaps")
+async def get_topic_gaps(group_id: int, per_page: int = Query(20, ge=1, le=100),
+                         min_gap_hours: float = Query(6.0, ge=0.5), density_factor: float = Query(8.0, ge=2.0)):
+    """列出话题时间线中的缺口（采集覆盖记录 + 发帖密度分析）及预计补齐所需的请求页数"""
+    db = None
+    try:
+        db = _open_local_topics_db(str(group_id))
+        gaps = db.find_topic_gaps(group_id, per_page=per_page, min_gap_hours=min_gap_hours,
+                                  density_factor=density_factor)
+        coverage = db.get_crawl_coverage(group_id)
+        return {
+            "group_id": group_id,
+            "gaps": gaps,
+            "total_gaps": len(gaps),
+            "total_estimated_pages": sum(gap["estimated_pages"] for gap in gaps),
+            "coverage": [
+                {k: item[k] for k in ("oldest_time", "newest_time", "updated_at")} for item in coverage
+            ],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"分析话题缺口失败: {str(e)}")
+    finally:
+        if db:
+            db.close()
+
+
+def run_backfill_gaps_task(task_id: str, group_id: str, request: GapBackfillRequest):
+    """后台执行缺口补齐任务：只爬取检测到的缺口时间段"""
+    try:
+        update_task(task_id, "running", "开始分析话题缺口...")
+
+        def log_callback(message: str):
+            add_task_log(task_id, message)
+
+        def stop_check():
+            return is_task_stopped(task_id)
+
+        cookie = get_cookie_for_group(group_id)
+        path_manager = get_db_path_manager()
+        db_path = path_manager.get_topics_db_path(group_id)
+
+        crawler = ZSXQInteractiveCrawler(cookie, group_id, db_path, log_callback)
+        crawler.stop_check_func = stop_check
+
+        if any([
+            request.crawlIntervalMin, request.crawlIntervalMax,
+            request.longSleepIntervalMin, request.longSleepIntervalMax,
+            request.pagesPerBatch
+        ]):
+            crawler.set_custom_intervals(
+                crawl_interval_min=request.crawlIntervalMin,
+                crawl_interval_max=request.crawlIntervalMax,
+                long_sleep_interval_min=request.longSleepIntervalMin,
+                long_sleep_interval_max=request.longSleepIntervalMax,
+                pages_per_batch=request.pagesPerBatch
+            )
+
+        per_page = request.perPage or 20
+        gaps = crawler.db.find_topic_gaps(int(group_id), per_page=per_page,
+                                          min_gap_hours=request.minGapHours or 6.0,
+                                          density_factor=request.densityFactor or 8.0)
+        if request.maxGaps:
+            gaps = gaps[:request.maxGaps]
+
+        if not gaps:
+            add_task_log(task_id, "✅ 未发现时间线缺口，无需补齐")
+            update_task(task_id, "completed", "未发现缺口", {'gaps_filled': 0, 'pages': 0})
+            return
+
+        add_task_log(task_id, f"🔍 发现 {len(gaps)} 个缺口，预计请求 {sum(g['estimated_pages'] for g in gaps)} 页")
+
+        if is_task_stopped(task_id):
+            add_task_log(task_id, "🛑 任务在初始化过程中被停止")
+            return
+
+        result = crawler.crawl_gaps(gaps, per_page)
+
+        if result and result.get('expired'):
+            add_task_log(task_id, f"❌ 会员已过期: {result.get('message')}")
+            update_task(task_id, "failed", "会员已过期", {"expired": True, "code": result.get('code'), "message": result.get('message')})
+            return
+
+        if is_task_stopped(task_id):
+            return
+
+        add_task_log(task_id, f"✅ 缺口补齐完成！补齐 {result.get('gaps_filled', 0)}/{len(gaps)} 个, 新增话题: {result.get('new_topics', 0)}")
+        update_task(task_id, "completed", "缺口补齐完成", result)
+    except Exception as e:
+        if not is_task_stopped(task_id):
+            add_task_log(task_id, f"❌ 缺口补齐失败: {str(e)}")
+            update_task(task_id, "failed", f"缺口补齐失败: {str(e)}")
+
+
+@app.post("/api/crawl/backfill-gaps/{group_id}")
+async def crawl_backfill_gaps(group_id: str, request: GapBackfillRequest, background_tasks: BackgroundTasks):
+    """定向补齐话题时间线中的缺口（只请求缺失的时间段）"""
+    try:
+        task_id = create_task("crawl_backfill_gaps", f"补齐话题缺口 (群组: {group_id})")
+        background_tasks.add_task(run_backfill_gaps_task, task_id, group_id, request)
+        return {"task_id": task_id, "message": "任务已创建，正在后台执行"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"创建缺口补齐任务失败: {str(e)}")
+
+
+class CrawlSchedulerRequest(BaseModel):
+    groupIds: List[str] = Field(..., min_length=1, description="要爬取的群组ID列表")
+    mode: str = Field(default="latest", description="爬取模式: latest(获取最新记录) / incremental(增量爬取历史) / all(全量爬取)")
+    pages: Optional[int] = Field(default=10, ge=1, le=1000, description="增量爬取页数（仅 incremental 模式）")
+    perPage: Optional[int] = Field(default=20, ge=1, le=100, description="每页数量")
+    maxGroupsPerAccount: Optional[int] = Field(default=None, ge=1, le=10, description="同一账号同时爬取的群组数，缺省为2")
+    crawlIntervalMin: Optional[float] = Field(default=None, ge=1.0, le=60.0, description="同一账号的请求间隔最小值(秒)")
+    crawlIntervalMax: Optional[float] = Field(default=None, ge=1.0, le=60.0, description="同一账号的请求间隔最大值(秒)")
+    longSleepIntervalMin: Optional[float] = Field(default=None, ge=60.0, le=3600.0, description="长休眠间隔最小值(秒)")
+    longSleepIntervalMax: Optional[float] = Field(default=None, ge=60.0, le=3600.0, description="长休眠间隔最大值(秒)")
+    pagesPerBatch: Optional[int] = Field(default=None, ge=5, le=50, description="同一账号每请求多少页进行一次长休眠")
+
+
+CRAWL_SCHEDULER_MODES = {
+    "latest": "获取最新记录",
+    "incremental": "增量爬取历史",
+    "all": "全量爬取",
+}
+
+
+def run_scheduled_crawl_job(job: Dict[str, Any], governor) -> None:
+    """调度器工作线程执行单个群组的爬取，请求节奏由所属账号的限速器统一控制"""
+    task_id = job["task_id"]
+    group_id = job["group_id"]
+    mode_label = CRAWL_SCHEDULER_MODES[job["mode"]]
+    if is_task_stopped(task_id):
+        return
+
+    try:
+        update_task(task_id, "running", f"开始{mode_label}...")
+        add_task_log(task_id, f"🚦 轮到本群组执行 (账号: {job['account_name']})，请求频率与该账号其它群组共享")
+
+        def log_callback(message: str):
+            add_task_log(task_id, message)
+
+        cookie = get_cookie_for_group(group_id)
+        path_manager = get_db_path_manager()
+        db_path = path_manager.get_topics_db_path(group_id)
+
+        crawler = ZSXQInteractiveCrawler(cookie, group_id, db_path, log_callback)
+        crawler.stop_check_func = lambda: is_task_stopped(task_id)
+        crawler.rate_governor = governor
+
+        try:
+            if job["mode"] == "incremental":
+                result = crawler.crawl_incremental(job["pages"], job["per_page"])
+            elif job["mode"] == "all":
+                result = crawler.crawl_all_historical(per_page=job["per_page"], auto_confirm=True)
+            else:
+                result = crawler.crawl_latest_until_complete(per_page=job["per_page"])
+        finally:
+            crawler.db.close()
+
+        if is_task_stopped(task_id):
+            return
+
+        if result and result.get('expired'):
+            add_task_log(task_id, f"❌ 会员已过期: {result.get('message', '成员体验已到期')}")
+            update_task(task_id, "failed", "会员已过期", {"expired": True, "code": result.get('code'), "message": result.get('message')})
+            return
+
+        add_task_log(task_id, f"✅ {mode_label}完成！新增话题: {result.get('new_topics', 0)}, 更新话题: {result.get('updated_topics', 0)}")
+        update_task(task_id, "completed", f"{mode_label}完成", result)
+    except Exception as e:
+        if not is_task_stopped(task_id):
+            add_task_log(task_id, f"❌ {mode_label}失败: {str(e)}")
+            update_task(task_id, "failed", f"{mode_label}失败: {str(e)}")
+
+
+crawl_scheduler = CrawlScheduler(run_scheduled_crawl_job)
+
+
+def _resolve_group_account(group_id: str) -> Dict[str, str]:
+    """确定群组所属账号（调度器按账号分队列）；未匹配到账号的群组使用 config.toml 中的 Cookie"""
+    summary = build_account_group_detection(force_refresh=False).get(str(group_id))
+    if summary:
+        return {"id": str(summary["id"]), "name": summary.get("name") or str(summary["id"])}
+    return {"id": "config", "name": "config.toml"}
+
+
+@app.post("/api/crawl/scheduler")
+async def schedule_group_crawls(request: CrawlSchedulerRequest):
+    """
+    批量调度多个群组的爬取：不同账号的群组并发执行，同一账号的群组共享请求频率限制。
+    每个群组对应一个任务，可通过任务接口查看日志或停止。
+    """
+    if request.mode not in CRAWL_SCHEDULER_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的爬取模式: {request.mode}")
+
+    try:
+        group_ids = list(dict.fromkeys(str(gid).strip() for gid in request.groupIds if str(gid).strip()))
+        accounts = await asyncio.to_thread(lambda: {gid: _resolve_group_account(gid) for gid in group_ids})
+
+        interval_range = None
+        if request.crawlIntervalMin and request.crawlIntervalMax:
+            interval_range = (request.crawlIntervalMin, request.crawlIntervalMax)
+        long_sleep_range = None
+        if request.longSleepIntervalMin and request.longSleepIntervalMax:
+            long_sleep_range = (request.longSleepIntervalMin, request.longSleepIntervalMax)
+
+        mode_label = CRAWL_SCHEDULER_MODES[request.mode]
+        scheduled = []
+        skipped = []
+        for gid in group_ids:
+            if crawl_scheduler.is_scheduled(gid):
+                skipped.append({"group_id": gid, "reason": "该群组已在调度队列中"})
+                continue
+
+            account = accounts[gid]
+            task_id = create_task("crawl_scheduled", f"调度{mode_label} (群组: {gid}, 账号: {account['name']})")
+            ahead = crawl_scheduler.submit(
+                account["id"],
+                {
+                    "task_id": task_id,
+                    "group_id": gid,
+                    "mode": request.mode,
+                    "pages": request.pages or 10,
+                    "per_page": request.perPage or 20,
+                    "account_name": account["name"],
+                },
+                interval_range=interval_range,
+                long_sleep_range=long_sleep_range,
+                pages_per_batch=request.pagesPerBatch,
+                max_groups=request.maxGroupsPerAccount,
+            )
+            if ahead:
+                add_task_log(task_id, f"⏳ 已加入账号队列，前面还有 {ahead} 个群组")
+            scheduled.append({"group_id": gid, "task_id": task_id, "account_id": account["id"], "queued_ahead": ahead})
+
+        return {
+            "scheduled": scheduled,
+            "skipped": skipped,
+            "message": f"已调度 {len(scheduled)} 个群组，跳过 {len(skipped)} 个",
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"调度群组爬取失败: {str(e)}")
+
+
+@app.get("/api/crawl/scheduler")
+async def get_crawl_scheduler_status():
+    """查看调度器状态：各账号正在爬取和排队中的群组、已发放的请求数及限速设置"""
+    return {"accounts": crawl_scheduler.snapshot()}
+
+
 @app.delete("/api/groups/{group_id}")
 async def delete_group_local(group_id: str):
     """
@@ -5264,6 +6387,8 @@ async def delete_group_local(group_id: str):
             if ok:
                 details["images_cache_removed"] = True
                 print(f"🗑️ 图片缓存清空: {msg}")
+            # 先关闭索引数据库连接，再删除目录
+            clear_group_cache_manager(group_id)
             images_dir = os.path.join(group_dir, "images")
             if os.path.exists(images_dir):
                 try:
@@ -5271,7 +6396,6 @@ async def delete_group_local(group_id: str):
                     print(f"🗑️ 已删除图片缓存目录: {images_dir}")
                 except Exception as e:
                     print(f"⚠️ 删除图片缓存目录失败: {e}")
-            clear_group_cache_manager(group_id)
         except Exception as e:
             print(f"⚠️ 清理图片缓存失败: {e}")
 
@@ -5290,6 +6414,9 @@ async def delete_group_local(group_id: str):
             if gid_int in _local_groups_cache.get("ids", set()):
                 _local_groups_cache["ids"].discard(gid_int)
                 _local_groups_cache["scanned_at"] = time.time()
+            get_group_stats_cache().remove(gid_int)
+            # 本地数据已删除，之后只能从完整备份重新开始备份链
+            get_backup_index_store().clear_applied(group_id)
         except Exception as e:
             print(f"⚠️ 更新本地群缓存失败: {e}")
 
@@ -5471,22 +6598,23 @@ async def fetch_group_columns(group_id: str, request: ColumnsSettingsRequest, ba
     global task_counter
     
     try:
-        task_counter += 1
-        task_id = f"columns_{group_id}_{task_counter}"
-        
-        # 创建任务记录
-        current_tasks[task_id] = {
-            "task_id": task_id,
-            "type": "columns_fetch",
-            "group_id": group_id,
-            "status": "running",
-            "message": "正在采集专栏内容...",
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat(),
-            "result": None
-        }
-        task_logs[task_id] = []
-        task_stop_flags[task_id] = False
+        with task_registry_lock:
+            task_counter += 1
+            task_id = f"columns_{group_id}_{task_counter}"
+
+            # 创建任务记录
+            current_tasks[task_id] = {
+                "task_id": task_id,
+                "type": "columns_fetch",
+                "group_id": group_id,
+                "status": "running",
+                "message": "正在采集专栏内容...",
+                "created_at": datetime.now().isoformat(),
+                "updated_at": datetime.now().isoformat(),
+                "result": None
+            }
+            task_stop_flags[task_id] = False
+        evict_finished_tasks()
         
         # 添加到后台任务
         background_tasks.add_task(
@@ -5539,6 +6667,7 @@ async def _fetch_columns_task(task_id: str, group_id: str, settings: ColumnsSett
             raise Exception("未找到可用Cookie，请先配置账号")
         
         headers = build_stealth_headers(cookie)
+        http_client = get_columns_http_client()
         db = get_columns_db(group_id)
         log_id = db.start_crawl_log(int(group_id), 'full_fetch')
         
@@ -5564,12 +6693,12 @@ async def _fetch_columns_task(task_id: str, group_id: str, settings: ColumnsSett
                 break
             
             try:
-                resp = requests.get(columns_url, headers=headers, timeout=30)
+                resp = await http_client.get(columns_url, headers=headers)
                 request_count += 1
             except Exception as req_err:
                 log_exception(f"获取专栏目录请求异常: group_id={group_id}, url={columns_url}")
                 if retry < max_retries - 1:
-                    wait_time = 2 if retry < 3 else (5 if retry < 6 else 10)
+                    wait_time = retry_wait_seconds(retry)
                     add_task_log(task_id, f"   ⚠️ 请求异常，等待{wait_time}秒后重试 ({retry+1}/{max_retries})")
                     await asyncio.sleep(wait_time)
                     continue
@@ -5578,7 +6707,7 @@ async def _fetch_columns_task(task_id: str, group_id: str, settings: ColumnsSett
             if resp.status_code != 200:
                 log_error(f"获取专栏目录失败: group_id={group_id}, HTTP {resp.status_code}, response={resp.text[:500] if resp.text else 'empty'}")
                 if retry < max_retries - 1:
-                    wait_time = 2 if retry < 3 else (5 if retry < 6 else 10)
+                    wait_time = retry_wait_seconds(retry)
                     add_task_log(task_id, f"   ⚠️ HTTP {resp.status_code}，等待{wait_time}秒后重试 ({retry+1}/{max_retries})")
                     await asyncio.sleep(wait_time)
                     continue
@@ -5666,12 +6795,12 @@ async def _fetch_columns_task(task_id: str, group_id: str, settings: ColumnsSett
                     add_task_log(task_id, f"   🔄 重试获取文章列表 ({retry+1}/{max_topic_list_retries})")
 
                 try:
-                    topics_resp = requests.get(topics_url, headers=headers, timeout=30)
+                    topics_resp = await http_client.get(topics_url, headers=headers)
                     request_count += 1
                 except Exception as req_err:
                     log_exception(f"获取专栏文章列表请求异常: column_id={column_id}, url={topics_url}")
                     if retry < max_topic_list_retries - 1:
-                        wait_time = 2 if retry < 3 else (5 if retry < 6 else 10)
+                        wait_time = retry_wait_seconds(retry)
                         add_task_log(task_id, f"   ⚠️ 请求异常，等待{wait_time}秒后重试 ({retry+1}/{max_topic_list_retries})")
                         await asyncio.sleep(wait_time)
                         continue
@@ -5681,7 +6810,7 @@ async def _fetch_columns_task(task_id: str, group_id: str, settings: ColumnsSett
                 if topics_resp.status_code != 200:
                     log_error(f"获取专栏文章列表失败: column_id={column_id}, HTTP {topics_resp.status_code}, response={topics_resp.text[:500] if topics_resp.text else 'empty'}")
                     if retry < max_topic_list_retries - 1:
-                        wait_time = 2 if retry < 3 else (5 if retry < 6 else 10)
+                        wait_time = retry_wait_seconds(retry)
                         add_task_log(task_id, f"   ⚠️ HTTP {topics_resp.status_code}，等待{wait_time}秒后重试 ({retry+1}/{max_topic_list_retries})")
                         await asyncio.sleep(wait_time)
                         continue
@@ -5693,7 +6822,7 @@ async def _fetch_columns_task(task_id: str, group_id: str, settings: ColumnsSett
                 except Exception as json_err:
                     log_exception(f"解析专栏文章列表JSON失败: column_id={column_id}, response={topics_resp.text[:500] if topics_resp.text else 'empty'}")
                     if retry < max_topic_list_retries - 1:
-                        wait_time = 2 if retry < 3 else (5 if retry < 6 else 10)
+                        wait_time = retry_wait_seconds(retry)
                         add_task_log(task_id, f"   ⚠️ 解析文章列表失败，等待{wait_time}秒后重试 ({retry+1}/{max_topic_list_retries})")
                         await asyncio.sleep(wait_time)
                         continue
@@ -5767,7 +6896,7 @@ async def _fetch_columns_task(task_id: str, group_id: str, settings: ColumnsSett
                     # 获取文章详情
                     detail_url = f"https://api.zsxq.com/v2/topics/{topic_id}/info"
                     try:
-                        detail_resp = requests.get(detail_url, headers=headers, timeout=30)
+                        detail_resp = await http_client.get(detail_url, headers=headers)
                         request_count += 1
                     except Exception as req_err:
                         log_exception(f"获取文章详情请求异常: topic_id={topic_id}, url={detail_url}")
@@ -5878,7 +7007,7 @@ async def _fetch_columns_task(task_id: str, group_id: str, settings: ColumnsSett
                         if original_url and image_id:
                             try:
                                 cache_manager = get_image_cache_manager(group_id)
-                                success, local_path, error_msg = cache_manager.download_and_cache(original_url)
+                                success, local_path, error_msg = await cache_manager.fetch(original_url)
                                 if success and local_path:
                                     db.update_image_local_path(image_id, str(local_path))
                                     images_count += 1
@@ -5905,7 +7034,7 @@ async def _fetch_columns_task(task_id: str, group_id: str, settings: ColumnsSett
                     if cache_images and cover_url:
                         try:
                             cache_manager = get_image_cache_manager(group_id)
-                            success, cover_local, error_msg = cache_manager.download_and_cache(cover_url)
+                            success, cover_local, error_msg = await cache_manager.fetch(cover_url)
                             if success and cover_local:
                                 db.update_video_cover_path(video_id, str(cover_local))
                                 add_task_log(task_id, f"      ✅ 视频封面缓存成功")
@@ -6013,10 +7142,10 @@ async def _download_column_file(group_id: str, file_id: int, file_name: str, fil
     
     for retry in range(max_retries):
         try:
-            resp = requests.get(download_url, headers=headers, timeout=30)
+            resp = await get_columns_http_client().get(download_url, headers=headers)
         except Exception as req_err:
             if retry < max_retries - 1:
-                wait_time = 2 if retry < 3 else (5 if retry < 6 else 10)
+                wait_time = retry_wait_seconds(retry)
                 await asyncio.sleep(wait_time)
                 continue
             log_exception(f"获取下载链接请求异常: file_id={file_id}")
@@ -6024,7 +7153,7 @@ async def _download_column_file(group_id: str, file_id: int, file_name: str, fil
         
         if resp.status_code != 200:
             if retry < max_retries - 1:
-                wait_time = 2 if retry < 3 else (5 if retry < 6 else 10)
+                wait_time = retry_wait_seconds(retry)
                 await asyncio.sleep(wait_time)
                 continue
             error_msg = f"获取下载链接失败: HTTP {resp.status_code}, URL={download_url}, Response={resp.text[:500] if resp.text else 'empty'}"
@@ -6064,17 +7193,14 @@ async def _download_column_file(group_id: str, file_id: int, file_name: str, fil
     
     for download_attempt in range(download_retries):
         try:
-            file_resp = requests.get(real_url, headers=headers, stream=True, timeout=300)
-            if file_resp.status_code == 200:
-                with open(local_path, 'wb') as f:
-                    for chunk in file_resp.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                
+            status_code, _ = await get_columns_http_client().download_to_file(
+                real_url, local_path, headers=headers, timeout=(10, 300)
+            )
+            if status_code == 200:
                 db.update_file_download_status(file_id, 'completed', local_path)
                 return "downloaded"
             else:
-                last_error = f"HTTP {file_resp.status_code}"
+                last_error = f"HTTP {status_code}"
                 if download_attempt < download_retries - 1:
                     log_warning(f"文件下载失败 (尝试 {download_attempt + 1}/{download_retries}): {last_error}, file_id={file_id}")
                     await asyncio.sleep(2 * (download_attempt + 1))  # 递增等待
@@ -6130,10 +7256,10 @@ async def _download_column_video(group_id: str, video_id: int, video_size: int,
     
     for retry in range(max_retries):
         try:
-            resp = requests.get(video_url_api, headers=headers, timeout=30)
+            resp = await get_columns_http_client().get(video_url_api, headers=headers)
         except Exception as req_err:
             if retry < max_retries - 1:
-                wait_time = 2 if retry < 3 else (5 if retry < 6 else 10)
+                wait_time = retry_wait_seconds(retry)
                 await asyncio.sleep(wait_time)
                 continue
             log_exception(f"获取视频链接请求异常: video_id={video_id}")
@@ -6141,7 +7267,7 @@ async def _download_column_video(group_id: str, video_id: int, video_size: int,
         
         if resp.status_code != 200:
             if retry < max_retries - 1:
-                wait_time = 2 if retry < 3 else (5 if retry < 6 else 10)
+                wait_time = retry_wait_seconds(retry)
                 await asyncio.sleep(wait_time)
                 continue
             error_msg = f"获取视频链接失败: HTTP {resp.status_code}, URL={video_url_api}, Response={resp.text[:500] if resp.text else 'empty'}"
@@ -6260,7 +7386,7 @@ async def _download_column_video(group_id: str, video_id: int, video_size: int,
             while process.poll() is None:
                 # 非阻塞方式获取进度
                 try:
-                    line = stdout_queue.get(timeout=1)
+                    line = await asyncio.to_thread(stdout_queue.get, True, 1)
                     
                     # 解析 ffmpeg 进度信息
                     # 格式: out_time_ms=123456789
@@ -6294,8 +7420,8 @@ async def _download_column_video(group_id: str, video_id: int, video_size: int,
                     continue
             
             # 等待线程结束
-            stdout_thread.join(timeout=5)
-            stderr_thread.join(timeout=5)
+            await asyncio.to_thread(stdout_thread.join, 5)
+            await asyncio.to_thread(stderr_thread.join, 5)
                 
         except Exception as e:
             process.kill()
@@ -6387,7 +7513,7 @@ async def get_column_topic_full_comments(group_id: str, topic_id: int):
         # 获取完整评论（参数与官网一致）
         comments_url = f"https://api.zsxq.com/v2/topics/{topic_id}/comments?sort=asc&count=30&with_sticky=true"
         log_info(f"Fetching comments from: {comments_url}")
-        resp = requests.get(comments_url, headers=headers, timeout=30)
+        resp = await get_columns_http_client().get(comments_url, headers=headers)
 
         if resp.status_code != 200:
             log_error(f"Failed to fetch comments: HTTP {resp.status_code}, response={resp.text[:500] if resp.text else 'empty'}")
@@ -0,0 +1,128 @@
+"""
+协程内使用的连接池 HTTP 客户端
+专栏采集等后台任务运行在 FastAPI 事件循环中，直接调用 requests 会阻塞整个事件循环（其它接口与 SSE 推送随之卡住）。
+这里复用一个 requests.Session（keep-alive 连接池，按主机限制连接数），把阻塞的网络 IO 放到专用线程池执行。
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# 每个主机的最大连接数（超出时排队等待空闲连接，避免对同一主机并发过高）
+DEFAULT_PER_HOST_CONNECTIONS = 6
+# 连接池缓存的主机数量
+DEFAULT_POOL_HOSTS = 16
+# (连接超时, 读取超时) 秒
+DEFAULT_TIMEOUT: Tuple[float, float] = (10, 30)
+# 下载文件时每次写入的块大小
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class PooledHttpClient:
+    """基于 requests.Session 连接池的异步 HTTP 客户端"""
+
+    def __init__(self, per_host_connections: int = DEFAULT_PER_HOST_CONNECTIONS,
+                 pool_hosts: int = DEFAULT_POOL_HOSTS, max_workers: Optional[int] = None,
+                 timeout: Timeout = DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        # 各账号的 Cookie 通过请求头显式传入，禁止会话自动保存响应中的 Set-Cookie，避免账号之间串用
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_hosts,
+            pool_maxsize=per_host_connections,
+            pool_block=True,
+            max_retries=0,  # 重试由调用方按 zsxq_retry 策略处理
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # 线程数略大于单主机连接数，保证 API 与 CDN 两类主机可以同时有请求在途
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or per_host_connections * 2,
+            thread_name_prefix='zsxq-http',
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """在客户端线程池中执行使用 self.session 的阻塞函数"""
+        return await self._run(func, *args, **kwargs)
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+                  timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        """GET 请求（响应体已读取完毕，连接归还连接池）"""
+        return await self._run(
+            self.session.get, url, headers=headers, timeout=timeout or self.timeout, **kwargs
+        )
+
+    async def download_to_file(self, url: str, local_path: str, headers: Optional[Dict[str, str]] = None,
+                               timeout: Optional[Timeout] = None,
+                               chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Tuple[int, int]:
+        """流式下载到本地文件，整个传输过程在线程池中完成
+
+        Returns:
+            (HTTP 状态码, 写入字节数)；状态码非 200 时不会创建文件
+        """
+        return await self._run(
+            self._download_to_file_sync, url, local_path, headers, timeout or self.timeout, chunk_size
+        )
+
+    def _download_to_file_sync(self, url: str, local_path: str, headers: Optional[Dict[str, str]],
+                               timeout: Timeout, chunk_size: int) -> Tuple[int, int]:
+        with self.session.get(url, headers=headers, stream=True, timeout=timeout) as resp:
+            if resp.status_code != 200:
+                return resp.status_code, 0
+
+            written = 0
+            with open(local_path, 'wb') as f:
+                for chunk in resp.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        written += len(chunk)
+            return resp.status_code, written
+
+    def close(self):
+        """关闭连接池与线程池"""
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_client_lock = threading.Lock()
+_columns_client: Optional[PooledHttpClient] = None
+_image_client: Optional[PooledHttpClient] = None
+
+
+def get_columns_http_client() -> PooledHttpClient:
+    """获取专栏采集共用的 HTTP 客户端（连接数可通过 ZSXQ_HTTP_PER_HOST 调整）"""
+    global _columns_client
+    with _client_lock:
+        if _columns_client is None:
+            try:
+                per_host = max(1, int(os.environ.get('ZSXQ_HTTP_PER_HOST', DEFAULT_PER_HOST_CONNECTIONS)))
+            except ValueError:
+                per_host = DEFAULT_PER_HOST_CONNECTIONS
+            _columns_client = PooledHttpClient(per_host_connections=per_host)
+        return _columns_client
+
+
+def get_image_http_client() -> PooledHttpClient:
+    """获取图片代理共用的 HTTP 客户端（与专栏采集分开，避免页面加载图片时占满采集任务的连接）"""
+    global _image_client
+    with _client_lock:
+        if _image_client is None:
+            _image_client = PooledHttpClient(timeout=(10, 20))
+        return _image_client
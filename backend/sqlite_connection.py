@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 连接工厂
+为各群组数据库（话题 / 文件 / 专栏）统一打开连接并应用 config.toml 中的 [database.sqlite] 性能参数
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, Optional
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+# 默认性能参数：WAL 允许采集线程写入的同时 Web 端读取，NORMAL 在 WAL 下仍保证数据库一致性
+DEFAULT_SQLITE_PROFILE: Dict[str, Any] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,   # 256 MiB
+    'cache_size': -65536,     # 负数单位为 KiB，即 64 MiB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,     # 毫秒
+}
+
+_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+_SYNCHRONOUS_MODES = {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3}
+_TEMP_STORE_MODES = {'DEFAULT': 0, 'FILE': 1, 'MEMORY': 2}
+_INT_KEYS = ('mmap_size', 'cache_size', 'busy_timeout')
+
+_CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'config.toml'))
+
+_profile_lock = threading.Lock()
+_profile_cache: Optional[Dict[str, Any]] = None
+
+
+def _normalize_profile(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """校验配置项，非法值回退为默认值"""
+    profile = dict(DEFAULT_SQLITE_PROFILE)
+
+    for key, allowed in (('journal_mode', _JOURNAL_MODES),
+                         ('synchronous', _SYNCHRONOUS_MODES),
+                         ('temp_store', _TEMP_STORE_MODES)):
+        if key not in raw:
+            continue
+        value = str(raw[key]).strip().upper()
+        if value in allowed:
+            profile[key] = value
+        else:
+            print(f"⚠️ config.toml [database.sqlite] {key} = {raw[key]!r} 无效，使用默认值 {profile[key]}")
+
+    for key in _INT_KEYS:
+        if key not in raw:
+            continue
+        try:
+            profile[key] = int(raw[key])
+        except (TypeError, ValueError):
+            print(f"⚠️ config.toml [database.sqlite] {key} = {raw[key]!r} 无效，使用默认值 {profile[key]}")
+
+    return profile
+
+
+def _load_profile_from_config() -> Dict[str, Any]:
+    """读取 config.toml 中的 [database.sqlite]，缺失时使用默认值"""
+    if tomllib is None or not os.path.exists(_CONFIG_PATH):
+        return dict(DEFAULT_SQLITE_PROFILE)
+
+    try:
+        with open(_CONFIG_PATH, 'rb') as f:
+            config = tomllib.load(f)
+    except Exception as e:
+        print(f"⚠️ 读取 SQLite 性能配置失败，使用默认值: {e}")
+        return dict(DEFAULT_SQLITE_PROFILE)
+
+    raw = config.get('database', {}).get('sqlite', {})
+    if not isinstance(raw, dict):
+        return dict(DEFAULT_SQLITE_PROFILE)
+    return _normalize_profile(raw)
+
+
+def get_sqlite_profile(reload: bool = False) -> Dict[str, Any]:
+    """获取当前生效的 SQLite 性能参数（进程内缓存，reload=True 时重新读取配置）"""
+    global _profile_cache
+    with _profile_lock:
+        if _profile_cache is None or reload:
+            _profile_cache = _load_profile_from_config()
+        return dict(_profile_cache)
+
+
+def apply_sqlite_profile(conn: sqlite3.Connection, profile: Optional[Dict[str, Any]] = None) -> None:
+    """在已打开的连接上应用性能参数"""
+    profile = profile or get_sqlite_profile()
+
+    # busy_timeout 需最先设置，切换 WAL 时若有其他连接持锁可以等待而不是直接报错
+    conn.execute(f"PRAGMA busy_timeout={int(profile['busy_timeout'])}")
+    try:
+        conn.execute(f"PRAGMA journal_mode={profile['journal_mode']}")
+    except sqlite3.OperationalError as e:
+        # 只读介质或网络文件系统可能不支持 WAL，保持原日志模式继续运行
+        print(f"⚠️ 设置 journal_mode={profile['journal_mode']} 失败: {e}")
+    conn.execute(f"PRAGMA synchronous={profile['synchronous']}")
+    conn.execute(f"PRAGMA mmap_size={int(profile['mmap_size'])}")
+    conn.execute(f"PRAGMA cache_size={int(profile['cache_size'])}")
+    conn.execute(f"PRAGMA temp_store={profile['temp_store']}")
+
+
+def connect_sqlite(db_path: str, check_same_thread: bool = False) -> sqlite3.Connection:
+    """打开 SQLite 连接并应用性能参数"""
+    profile = get_sqlite_profile()
+    conn = sqlite3.connect(
+        db_path,
+        check_same_thread=check_same_thread,
+        timeout=max(int(profile['busy_timeout']), 0) / 1000,
+    )
+    apply_sqlite_profile(conn, profile)
+    return conn
+
+
+def read_persistent_pragmas(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """
+    读取保存在数据库文件中的参数（用于诊断接口展示）
+    synchronous / cache_size 等是连接级参数，每个连接按配置重新设置，只有 journal_mode 会随文件保留。
+    """
+    row = conn.execute("PRAGMA journal_mode").fetchone()
+    return {'journal_mode': str(row[0] if row else '').upper()}
+
+
+def backup_sqlite(db_path: str, dest_path: str) -> bool:
+    """
+    通过 SQLite 在线备份 API 把数据库复制为一致的快照（包含 WAL 中已提交的数据）。
+    复制期间其它连接仍可读写，快照不会出现写了一半的页面；失败返回 False。
+    """
+    src = dst = None
+    try:
+        src = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        dst = sqlite3.connect(dest_path)
+        src.backup(dst)
+        return True
+    except Exception as e:
+        print(f"⚠️ 数据库快照失败 {db_path}: {e}")
+        return False
+    finally:
+        if dst:
+            dst.close()
+        if src:
+            src.close()
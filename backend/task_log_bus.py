@@ -0,0 +1,175 @@
+"""
+任务日志广播器
+后台任务在工作线程中写日志，SSE 连接在事件循环中等待推送：
+每个任务保留一个有界环形缓冲区，日志按递增序号编号，订阅者通过 asyncio.Event 被唤醒后按序号补读，
+断线重连时凭 Last-Event-ID 只补发缺失的部分。
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+
+class TaskLogSubscription:
+    """单个 SSE 连接的订阅句柄"""
+
+    def __init__(self, task_id: str, loop: asyncio.AbstractEventLoop):
+        self.task_id = task_id
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def notify(self):
+        """由任意线程调用，唤醒事件循环中的等待者"""
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # 事件循环已关闭（服务退出中）
+            pass
+
+    async def wait(self, timeout: float) -> bool:
+        """等待新消息，超时返回 False"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.event.clear()
+        return True
+
+
+class _TaskChannel:
+    """单个任务的日志缓冲区与订阅者集合"""
+
+    def __init__(self, buffer_size: int):
+        self.lines: Deque[Tuple[int, str]] = deque(maxlen=buffer_size)
+        self.last_seq = 0
+        self.subscribers: Set[TaskLogSubscription] = set()
+
+
+class TaskLogBus:
+    """进程内任务日志发布/订阅总线（线程安全）"""
+
+    def __init__(self, buffer_size: int = 2000):
+        self.buffer_size = buffer_size
+        self._channels: Dict[str, _TaskChannel] = {}
+        self._lock = threading.Lock()
+
+    def _channel(self, task_id: str) -> _TaskChannel:
+        channel = self._channels.get(task_id)
+        if channel is None:
+            channel = _TaskChannel(self.buffer_size)
+            self._channels[task_id] = channel
+        return channel
+
+    def publish(self, task_id: str, line: str) -> int:
+        """追加一行日志并唤醒订阅者，返回该行序号"""
+        with self._lock:
+            channel = self._channel(task_id)
+            channel.last_seq += 1
+            seq = channel.last_seq
+            channel.lines.append((seq, line))
+            subscribers = list(channel.subscribers)
+
+        for subscription in subscribers:
+            subscription.notify()
+        return seq
+
+    def notify(self, task_id: str):
+        """不追加日志，仅唤醒订阅者（例如任务状态变化）"""
+        with self._lock:
+            channel = self._channels.get(task_id)
+            subscribers = list(channel.subscribers) if channel else []
+        for subscription in subscribers:
+            subscription.notify()
+
+    def read_since(self, task_id: str, after_seq: int) -> Tuple[List[Tuple[int, str]], int]:
+        """读取序号大于 after_seq 的日志
+
+        Returns:
+            (日志列表 [(序号, 内容)], 因缓冲区已覆盖而丢失的行数)
+        """
+        with self._lock:
+            channel = self._channels.get(task_id)
+            if channel is None:
+                return [], 0
+            lines = [item for item in channel.lines if item[0] > after_seq]
+
+        missed = max(0, lines[0][0] - after_seq - 1) if lines else 0
+        return lines, missed
+
+    def buffered_range(self, task_id: str) -> Tuple[int, int]:
+        """缓冲区中最早与最新日志的序号，缓冲为空时返回 (last_seq + 1, last_seq)"""
+        with self._lock:
+            channel = self._channels.get(task_id)
+            if channel is None:
+                return 1, 0
+            first_seq = channel.lines[0][0] if channel.lines else channel.last_seq + 1
+            return first_seq, channel.last_seq
+
+    def has_task(self, task_id: str) -> bool:
+        """是否存在该任务的缓冲区"""
+        with self._lock:
+            return task_id in self._channels
+
+    def task_ids(self) -> List[str]:
+        """当前持有缓冲区的任务ID"""
+        with self._lock:
+            return list(self._channels)
+
+    def last_seq(self, task_id: str) -> int:
+        """获取任务最新日志序号"""
+        with self._lock:
+            channel = self._channels.get(task_id)
+            return channel.last_seq if channel else 0
+
+    def subscribe(self, task_id: str) -> TaskLogSubscription:
+        """在当前事件循环中订阅任务日志"""
+        subscription = TaskLogSubscription(task_id, asyncio.get_running_loop())
+        with self._lock:
+            self._channel(task_id).subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: TaskLogSubscription):
+        """取消订阅"""
+        with self._lock:
+            channel = self._channels.get(subscription.task_id)
+            if channel:
+                channel.subscribers.discard(subscription)
+
+    def subscriber_count(self, task_id: Optional[str] = None) -> int:
+        """当前订阅数（用于诊断）"""
+        with self._lock:
+            if task_id is not None:
+                channel = self._channels.get(task_id)
+                return len(channel.subscribers) if channel else 0
+            return sum(len(channel.subscribers) for channel in self._channels.values())
+
+    def drop(self, task_id: str):
+        """丢弃任务的缓冲区（订阅者会在下次唤醒时读到空结果）"""
+        with self._lock:
+            channel = self._channels.pop(task_id, None)
+            subscribers = list(channel.subscribers) if channel else []
+        for subscription in subscribers:
+            subscription.notify()
+
+    def clear(self):
+        """清空全部任务"""
+        with self._lock:
+            task_ids = list(self._channels)
+        for task_id in task_ids:
+            self.drop(task_id)
+
+
+# 全局实例；每个任务在内存中保留的日志条数可通过 ZSXQ_TASK_LOG_BUFFER 调整，更早的日志从任务日志文件读取
+try:
+    _buffer_size = max(100, int(os.environ.get("ZSXQ_TASK_LOG_BUFFER", "2000")))
+except ValueError:
+    _buffer_size = 2000
+_task_log_bus = TaskLogBus(_buffer_size)
+
+
+def get_task_log_bus() -> TaskLogBus:
+    """获取任务日志总线实例"""
+    return _task_log_bus
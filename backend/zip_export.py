@@ -0,0 +1,149 @@
+"""
+导出压缩包写入
+原先导出时先把整个目录以 ZIP_DEFLATED 写成临时 .zip，再通过 FileResponse 发送：导出几十 GB 的 output
+需要同等大小的额外磁盘空间，且打包完成前浏览器收不到任何数据。这里提供按条目写入的工具：
+- iter_zip_stream 边遍历边生成 zip 字节流（不可 seek 的输出，条目使用数据描述符），无需临时文件；
+- PDF、音视频、图片、压缩包等本身已压缩的文件以 ZIP_STORED 直接存储，不再浪费 CPU 重复压缩；
+- SQLite 数据库先通过在线备份 API 生成快照再写入，正在运行的采集任务不会让包内数据库处于写了一半的状态。
+"""
+
+import os
+import tempfile
+import zipfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .sqlite_connection import backup_sqlite
+
+# (包内路径, 本地文件路径)；本地路径为 None 时表示空目录条目
+ExportEntry = Tuple[str, Optional[str]]
+
+CHUNK_SIZE = 1024 * 1024
+
+# 本身已压缩的格式，再次 deflate 几乎没有收益
+STORED_EXTENSIONS = frozenset({
+    ".pdf", ".epub",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".mp4", ".m4v", ".mov", ".mkv", ".avi", ".flv", ".webm",
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac", ".amr",
+    ".zip", ".rar", ".7z", ".gz", ".tgz", ".bz2", ".xz", ".zst",
+    ".docx", ".xlsx", ".pptx", ".apk", ".dmg",
+})
+
+_SQLITE_HEADER = b"SQLite format 3\x00"
+
+
+def compression_for(filename: str) -> int:
+    """按扩展名选择压缩方式"""
+    ext = os.path.splitext(filename)[1].lower()
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+def is_sqlite_file(path: str) -> bool:
+    if not path.endswith(".db"):
+        return False
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(_SQLITE_HEADER)) == _SQLITE_HEADER
+    except OSError:
+        return False
+
+
+def snapshot_sqlite(path: str) -> Optional[str]:
+    """为数据库生成一致快照，返回快照路径；失败时返回 None（按原文件写入）"""
+    fd, snapshot_path = tempfile.mkstemp(suffix=".db", prefix="zsxq_export_")
+    os.close(fd)
+    if backup_sqlite(path, snapshot_path):
+        return snapshot_path
+    remove_quietly(snapshot_path)
+    return None
+
+
+def remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def iter_write_file(zf: zipfile.ZipFile, zip_name: str, source_path: str,
+                    stat_path: Optional[str] = None, hasher=None) -> Iterator[None]:
+    """
+    把 source_path 的内容写入 zip，每写入一块数据 yield 一次（流式输出借此及时发送已生成的字节）
+    stat_path 为条目时间戳的来源（写入快照时使用原文件）；hasher 为 hashlib 对象时同时计算内容摘要。
+    """
+    zinfo = zipfile.ZipInfo.from_file(stat_path or source_path, zip_name)
+    zinfo.file_size = os.path.getsize(source_path)
+    zinfo.compress_type = compression_for(zip_name)
+    with open(source_path, "rb") as src, zf.open(zinfo, "w") as dest:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            dest.write(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+            yield
+
+
+def iter_write_entry(zf: zipfile.ZipFile, zip_name: str, file_path: Optional[str]) -> Iterator[None]:
+    """写入一个导出条目：空目录、数据库快照或普通文件"""
+    if file_path is None:
+        zf.writestr(zip_name.rstrip("/") + "/", "")
+        return
+
+    snapshot_path = snapshot_sqlite(file_path) if is_sqlite_file(file_path) else None
+    try:
+        yield from iter_write_file(zf, zip_name, snapshot_path or file_path, stat_path=file_path)
+    finally:
+        if snapshot_path:
+            remove_quietly(snapshot_path)
+
+
+def write_entries(zf: zipfile.ZipFile, entries: Iterable[ExportEntry]):
+    """把所有条目写入已打开的 zip 文件"""
+    for zip_name, file_path in entries:
+        for _ in iter_write_entry(zf, zip_name, file_path):
+            pass
+
+
+class StreamSink:
+    """zip 输出目标：只支持追加写入和 tell，ZipFile 会因此改用数据描述符而不回写本地文件头"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip_stream(manifest_text: str, entries: Iterable[ExportEntry]) -> Iterator[bytes]:
+    """边遍历边生成 zip 字节流，manifest.json 为第一个条目；客户端断开时生成器被关闭，快照随之清理"""
+    sink = StreamSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("manifest.json", manifest_text)
+        for zip_name, file_path in entries:
+            for _ in iter_write_entry(zf, zip_name, file_path):
+                data = sink.drain()
+                if data:
+                    yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
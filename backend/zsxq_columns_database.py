@@ -5,12 +5,13 @@
 用于存储专栏目录、文章和相关信息
 """
 
-import sqlite3
 import re
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from urllib.parse import unquote
 
+from .sqlite_connection import connect_sqlite
+
 
 _ZSXQ_TAG_TITLE_RE = re.compile(r'<e\b[^>]*\btitle="([^"]*)"[^>]*\/?>')
 _HTML_TAG_RE = re.compile(r'<[^>]+>')
@@ -94,7 +95,7 @@ class ZSXQColumnsDatabase:
     def __init__(self, db_path: str = "zsxq_columns.db"):
         """初始化数据库连接"""
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn = connect_sqlite(db_path)
         self.cursor = self.conn.cursor()
         self._init_database()
     
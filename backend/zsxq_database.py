@@ -1,8 +1,253 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import bisect
+import html
+import math
+import os
+import re
 import sqlite3
-from typing import Dict, Any, Optional, List
+import statistics
+import threading
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional, List, Set, Tuple
+from urllib.parse import unquote
+
+from .sqlite_connection import connect_sqlite
+
+
+def _beijing_now() -> str:
+    """获取东八区当前时间字符串（与库中 created_at / imported_at 格式一致）"""
+    beijing_tz = timezone(timedelta(hours=8))
+    return datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
+
+
+_BEIJING_TZ = timezone(timedelta(hours=8))
+_TOPIC_TIME_OFFSET_RE = re.compile(r'([+-]\d{2})(\d{2})$')
+
+
+def topic_time_to_ms(time_str: Optional[str]) -> Optional[int]:
+    """把话题时间（如 2025-07-03T12:54:05.849+0800）转换为毫秒时间戳，无法解析时返回 None"""
+    if not time_str:
+        return None
+    try:
+        dt = datetime.fromisoformat(_TOPIC_TIME_OFFSET_RE.sub(r'\1:\2', time_str.strip()))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_BEIJING_TZ)
+    return int(round(dt.timestamp() * 1000))
+
+
+def ms_to_topic_time(ms: int) -> str:
+    """毫秒时间戳转换为接口使用的东八区时间格式（可直接作为 end_time 参数）"""
+    dt = datetime.fromtimestamp(ms / 1000, tz=_BEIJING_TZ)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
+
+
+# 话题导入使用的写入语句（单条导入与批量导入共用）
+_SQL_UPSERT_GROUP = '''
+    INSERT OR REPLACE INTO groups
+    (group_id, name, type, background_url, created_at)
+    VALUES (?, ?, ?, ?, ?)
+'''
+_SQL_UPSERT_USER = '''
+    INSERT OR REPLACE INTO users
+    (user_id, name, alias, avatar_url, location, description, ai_comment_url, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_UPSERT_TOPIC = '''
+    INSERT OR REPLACE INTO topics
+    (topic_id, group_id, type, title, create_time, digested, sticky,
+     likes_count, tourist_likes_count, rewards_count, comments_count,
+     reading_count, readers_count, answered, silenced, annotation,
+     user_liked, user_subscribed, imported_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_UPSERT_TALK = '''
+    INSERT OR REPLACE INTO talks
+    (topic_id, owner_user_id, text, created_at)
+    VALUES (?, ?, ?, ?)
+'''
+_SQL_UPSERT_IMAGE = '''
+    INSERT OR REPLACE INTO images
+    (image_id, topic_id, comment_id, type, thumbnail_url, thumbnail_width, thumbnail_height,
+     large_url, large_width, large_height, original_url, original_width, original_height,
+     original_size, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_INSERT_LIKE = '''
+    INSERT OR IGNORE INTO likes
+    (topic_id, user_id, create_time, imported_at)
+    VALUES (?, ?, ?, ?)
+'''
+_SQL_UPSERT_LIKE_EMOJI = '''
+    INSERT OR REPLACE INTO like_emojis
+    (topic_id, emoji_key, likes_count, created_at)
+    VALUES (?, ?, ?, ?)
+'''
+_SQL_INSERT_USER_LIKED_EMOJI = '''
+    INSERT OR IGNORE INTO user_liked_emojis
+    (topic_id, emoji_key)
+    VALUES (?, ?)
+'''
+_SQL_UPSERT_COMMENT = '''
+    INSERT OR REPLACE INTO comments
+    (comment_id, topic_id, owner_user_id, parent_comment_id, repliee_user_id,
+     text, create_time, likes_count, rewards_count, replies_count, sticky, imported_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_UPSERT_QUESTION = '''
+    INSERT OR REPLACE INTO questions
+    (topic_id, owner_user_id, questionee_user_id, text, expired, anonymous,
+     owner_questions_count, owner_join_time, owner_status, owner_location, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_UPSERT_ANSWER = '''
+    INSERT OR REPLACE INTO answers
+    (topic_id, owner_user_id, text, created_at)
+    VALUES (?, ?, ?, ?)
+'''
+_SQL_UPSERT_ARTICLE = '''
+    INSERT OR REPLACE INTO articles
+    (topic_id, title, article_id, article_url, inline_article_url, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+_SQL_UPSERT_TOPIC_FILE = '''
+    INSERT OR REPLACE INTO topic_files
+    (topic_id, file_id, name, hash, size, duration, download_count, create_time, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_INDEX_TOPIC_SEARCH = '''
+    INSERT INTO topics_fts (rowid, title, talk, question, answer, article)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+_SQL_INDEX_COMMENT_SEARCH = 'INSERT INTO comments_fts (rowid, topic_id, text) VALUES (?, ?, ?)'
+
+# 标签格式：<e type="hashtag" hid="..." title="..." />
+_HASHTAG_RE = re.compile(r'<e\s+type="hashtag"\s+hid="([^"]+)"\s+title="([^"]+)"\s*/>')
+
+
+# 群组话题总数缓存：{(数据库路径, group_id): 话题数}，写入提交或删除数据后失效
+_topic_count_cache: Dict[Tuple[str, int], int] = {}
+_topic_count_lock = threading.Lock()
+
+
+def invalidate_topic_count_cache(db_path: Optional[str] = None):
+    """清除话题总数缓存（db_path 为空时清除全部）"""
+    with _topic_count_lock:
+        if db_path is None:
+            _topic_count_cache.clear()
+            return
+        key_path = os.path.abspath(db_path)
+        for key in [key for key in _topic_count_cache if key[0] == key_path]:
+            del _topic_count_cache[key]
+
+
+# 结构迁移：按版本号顺序执行，已执行的版本记录在 db_meta.schema_version
+# 每个版本为 (版本号, 说明, 语句列表)，语句需可重复执行（IF NOT EXISTS）
+_SCHEMA_MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, '热点查询二级索引', [
+        # 群组话题列表：WHERE group_id = ? ORDER BY create_time DESC
+        'CREATE INDEX IF NOT EXISTS idx_topics_group_create_time ON topics (group_id, create_time DESC)',
+        # 最早 / 最新话题时间（增量采集与时间范围统计）
+        'CREATE INDEX IF NOT EXISTS idx_topics_create_time ON topics (create_time)',
+        # 话题详情与列表 LEFT JOIN 的子表
+        'CREATE INDEX IF NOT EXISTS idx_talks_topic_id ON talks (topic_id)',
+        'CREATE INDEX IF NOT EXISTS idx_articles_topic_id ON articles (topic_id)',
+        'CREATE INDEX IF NOT EXISTS idx_questions_topic_id ON questions (topic_id)',
+        'CREATE INDEX IF NOT EXISTS idx_answers_topic_id ON answers (topic_id)',
+        'CREATE INDEX IF NOT EXISTS idx_images_topic_comment ON images (topic_id, comment_id)',
+        'CREATE INDEX IF NOT EXISTS idx_images_comment_id ON images (comment_id)',
+        'CREATE INDEX IF NOT EXISTS idx_likes_topic_create_time ON likes (topic_id, create_time)',
+        'CREATE INDEX IF NOT EXISTS idx_like_emojis_topic_id ON like_emojis (topic_id)',
+        'CREATE INDEX IF NOT EXISTS idx_user_liked_emojis_topic_id ON user_liked_emojis (topic_id)',
+        'CREATE INDEX IF NOT EXISTS idx_comments_topic_create_time ON comments (topic_id, create_time)',
+        'CREATE INDEX IF NOT EXISTS idx_topic_files_topic_file ON topic_files (topic_id, file_id)',
+        # 按标签查话题（topic_tags 的 UNIQUE(topic_id, tag_id) 只能覆盖 topic_id 方向）
+        'CREATE INDEX IF NOT EXISTS idx_topic_tags_tag_id ON topic_tags (tag_id)',
+    ]),
+    (2, '采集覆盖区间表', [
+        # 已确认完整采集的时间区间 [oldest_ms, newest_ms]（毫秒时间戳，闭区间），由采集写入时合并维护
+        '''CREATE TABLE IF NOT EXISTS crawl_coverage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id INTEGER NOT NULL,
+            oldest_ms INTEGER NOT NULL,
+            newest_ms INTEGER NOT NULL,
+            updated_at TEXT
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_crawl_coverage_group_newest ON crawl_coverage (group_id, newest_ms)',
+    ]),
+    (3, '评论同步水位表', [
+        # 通过评论接口同步到的最新一条一级评论时间及同步时接口给出的评论数，用于增量获取评论
+        '''CREATE TABLE IF NOT EXISTS comment_sync_state (
+            topic_id INTEGER PRIMARY KEY,
+            synced_until TEXT,
+            synced_count INTEGER DEFAULT 0,
+            updated_at TEXT
+        )''',
+    ]),
+]
+SCHEMA_VERSION = _SCHEMA_MIGRATIONS[-1][0]
+
+
+# 全文检索相关：ZSXQ 文本中的 <e type="..." title="..." /> 标签需要还原为可读文本再入索引
+_SEARCH_E_TAG_RE = re.compile(r'<e\s+([^/>]+?)/?\s*>', flags=re.IGNORECASE | re.DOTALL)
+_SEARCH_TITLE_ATTR_RE = re.compile(r'title\s*=\s*"([^"]*)"', flags=re.IGNORECASE)
+_SEARCH_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+# 高亮标记与摘要长度（snippet 以 token 计，trigram 下约等于字符数）
+SEARCH_HIGHLIGHT_OPEN = '<mark>'
+SEARCH_HIGHLIGHT_CLOSE = '</mark>'
+SEARCH_SNIPPET_TOKENS = 32
+
+
+def _plain_search_text(text: Optional[str]) -> str:
+    """把话题/评论原始文本转换为适合全文检索的纯文本"""
+    if not text:
+        return ''
+
+    def _replace(match: re.Match) -> str:
+        title = _SEARCH_TITLE_ATTR_RE.search(match.group(1) or '')
+        if not title:
+            return ''
+        try:
+            return unquote(title.group(1))
+        except Exception:
+            return title.group(1)
+
+    result = _SEARCH_E_TAG_RE.sub(_replace, str(text))
+    result = _SEARCH_HTML_TAG_RE.sub(' ', result)
+    result = html.unescape(result)
+    return re.sub(r'\s+', ' ', result).strip()
+
+
+def _split_search_terms(keyword: Optional[str]) -> List[str]:
+    """按空白拆分搜索词（多个词之间为 AND 关系）"""
+    return [term for term in re.split(r'\s+', (keyword or '').strip()) if term]
+
+
+def _build_like_snippet(text: str, terms: List[str], radius: int = SEARCH_SNIPPET_TOKENS // 2) -> str:
+    """LIKE 回退模式下在 Python 侧生成带高亮的摘要"""
+    if not text:
+        return ''
+    lowered = text.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    positions = [pos for pos in positions if pos >= 0]
+    center = min(positions) if positions else 0
+    start = max(0, center - radius)
+    end = min(len(text), center + radius * 2)
+    snippet = text[start:end]
+
+    pattern = '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    if pattern:
+        snippet = re.sub(
+            f'({pattern})',
+            lambda m: f"{SEARCH_HIGHLIGHT_OPEN}{m.group(1)}{SEARCH_HIGHLIGHT_CLOSE}",
+            snippet,
+            flags=re.IGNORECASE,
+        )
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(text) else '')
 
 
 class ZSXQDatabase:
@@ -10,7 +255,7 @@ class ZSXQDatabase:
     
     def __init__(self, db_path: str = "zsxq_interactive.db"):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn = connect_sqlite(db_path)
         self.cursor = self.conn.cursor()
         self._init_database()
     
@@ -253,8 +498,96 @@ class ZSXQDatabase:
             )
         ''')
 
+        # 数据库元信息表（键值对，记录索引/结构版本等状态）
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS db_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+
+        self._init_search_index()
+        self._apply_schema_migrations()
+
         self.conn.commit()
-    
+
+    def _apply_schema_migrations(self):
+        """执行尚未应用的结构迁移（索引等），并记录当前结构版本"""
+        current = int(self._get_meta('schema_version') or 0)
+        if current >= SCHEMA_VERSION:
+            return
+
+        for version, description, statements in _SCHEMA_MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"🔧 数据库结构升级到 v{version}: {description}")
+            for statement in statements:
+                self.cursor.execute(statement)
+            self._set_meta('schema_version', str(version))
+
+    def _init_search_index(self):
+        """初始化全文检索索引（FTS5 + trigram 分词，中文按任意子串检索）
+
+        - topics_fts: rowid = topic_id，覆盖标题、正文、提问、回答、文章标题
+        - comments_fts: rowid = comment_id，覆盖评论正文
+        写入由 import_topic_data / _upsert_comment 同步维护，删除由触发器同步。
+        """
+        self.fts_enabled = False
+        self.search_index_ready = False
+
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'topics_fts'")
+        existed = self.cursor.fetchone() is not None
+
+        try:
+            self.cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS topics_fts USING fts5(
+                    title, talk, question, answer, article,
+                    tokenize = 'trigram'
+                )
+            ''')
+            self.cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+                    topic_id UNINDEXED, text,
+                    tokenize = 'trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ 当前SQLite不支持FTS5 trigram分词，话题搜索将回退为LIKE匹配: {e}")
+            return
+
+        # 删除话题/评论时同步清理索引（INSERT OR REPLACE 不会触发，由 Python 侧重建对应行）
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS topics_fts_after_delete AFTER DELETE ON topics BEGIN
+                DELETE FROM topics_fts WHERE rowid = old.topic_id;
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS comments_fts_after_delete AFTER DELETE ON comments BEGIN
+                DELETE FROM comments_fts WHERE rowid = old.comment_id;
+            END
+        ''')
+        self.fts_enabled = True
+
+        if not existed:
+            # 新库直接可用；已有数据的旧库需要执行一次重建（scripts/rebuild_search_index.py）
+            self.cursor.execute('SELECT 1 FROM topics LIMIT 1')
+            if self.cursor.fetchone() is None:
+                self._set_meta('search_index_ready', '1')
+            else:
+                print("ℹ️ 已为旧数据库创建全文检索索引，请运行 scripts/rebuild_search_index.py 导入历史数据")
+
+        self.search_index_ready = self._get_meta('search_index_ready') == '1'
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        """读取数据库元信息"""
+        self.cursor.execute('SELECT value FROM db_meta WHERE key = ?', (key,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        """写入数据库元信息（不提交事务）"""
+        self.cursor.execute('INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)', (key, value))
+
     def import_topic_data(self, topic_data: Dict[str, Any]) -> bool:
         """导入话题数据到数据库"""
         try:
@@ -314,6 +647,9 @@ class ZSXQDatabase:
             if 'talk' in topic_data and topic_data['talk'] and 'files' in topic_data['talk']:
                 self._import_files(topic_id, topic_data['talk']['files'])
 
+            # 同步全文检索索引
+            self._index_topic_search(topic_id, topic_data)
+
             return True
             
         except Exception as e:
@@ -324,43 +660,35 @@ class ZSXQDatabase:
     
     def _upsert_group(self, group_data: Dict[str, Any]):
         """插入或更新群组信息"""
+        row = self._group_row(group_data, _beijing_now())
+        if row:
+            self.cursor.execute(_SQL_UPSERT_GROUP, row)
+
+    @staticmethod
+    def _group_row(group_data: Dict[str, Any], current_time: str) -> Optional[Tuple]:
         group_id = group_data.get('group_id')
         if not group_id:
-            return
-        
-        # 获取当前时间作为created_at（使用东八区时间格式）
-        from datetime import datetime, timezone, timedelta
-        beijing_tz = timezone(timedelta(hours=8))
-        current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-        
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO groups 
-            (group_id, name, type, background_url, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
+            return None
+        return (
             group_id,
             group_data.get('name', ''),
             group_data.get('type', ''),
             group_data.get('background_url', ''),
             current_time
-        ))
-    
+        )
+
     def _upsert_user(self, user_data: Dict[str, Any]):
         """插入或更新用户信息"""
+        row = self._user_row(user_data, _beijing_now())
+        if row:
+            self.cursor.execute(_SQL_UPSERT_USER, row)
+
+    @staticmethod
+    def _user_row(user_data: Dict[str, Any], current_time: str) -> Optional[Tuple]:
         user_id = user_data.get('user_id')
         if not user_id:
-            return
-        
-        # 获取当前时间作为created_at（使用东八区时间格式）
-        from datetime import datetime, timezone, timedelta
-        beijing_tz = timezone(timedelta(hours=8))
-        current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-        
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO users 
-            (user_id, name, alias, avatar_url, location, description, ai_comment_url, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+            return None
+        return (
             user_id,
             user_data.get('name', ''),
             user_data.get('alias', ''),
@@ -369,27 +697,20 @@ class ZSXQDatabase:
             user_data.get('description', ''),
             user_data.get('ai_comment_url', ''),
             current_time
-        ))
-    
+        )
+
     def _upsert_topic(self, topic_data: Dict[str, Any]):
         """插入或更新话题信息"""
+        row = self._topic_row(topic_data, _beijing_now())
+        if row:
+            self.cursor.execute(_SQL_UPSERT_TOPIC, row)
+
+    @staticmethod
+    def _topic_row(topic_data: Dict[str, Any], current_time: str) -> Optional[Tuple]:
         topic_id = topic_data.get('topic_id')
         if not topic_id:
-            return
-        
-        # 获取当前时间作为imported_at（使用东八区时间格式）
-        from datetime import datetime, timezone, timedelta
-        beijing_tz = timezone(timedelta(hours=8))
-        current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-        
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO topics 
-            (topic_id, group_id, type, title, create_time, digested, sticky, 
-             likes_count, tourist_likes_count, rewards_count, comments_count, 
-             reading_count, readers_count, answered, silenced, annotation, 
-             user_liked, user_subscribed, imported_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+            return None
+        return (
             topic_id,
             topic_data.get('group', {}).get('group_id', ''),
             topic_data.get('type', ''),
@@ -409,7 +730,7 @@ class ZSXQDatabase:
             topic_data.get('user_liked', False),
             topic_data.get('user_subscribed', False),
             current_time
-        ))
+        )
     
     def update_topic_stats(self, topic_data: Dict[str, Any]) -> bool:
         """仅更新话题的统计信息，不导入其他相关数据"""
@@ -477,6 +798,24 @@ class ZSXQDatabase:
 
         return stats
     
+    def count_group_topics(self, group_id: int) -> int:
+        """获取群组话题总数（带缓存，避免列表翻页时重复 COUNT）"""
+        key = (os.path.abspath(self.db_path), int(group_id))
+        with _topic_count_lock:
+            cached = _topic_count_cache.get(key)
+        if cached is not None:
+            return cached
+
+        self.cursor.execute('SELECT COUNT(*) FROM topics WHERE group_id = ?', (group_id,))
+        total = self.cursor.fetchone()[0]
+        with _topic_count_lock:
+            _topic_count_cache[key] = total
+        return total
+
+    def invalidate_topic_count_cache(self):
+        """话题写入提交后清除本库的话题总数缓存"""
+        invalidate_topic_count_cache(self.db_path)
+
     def get_timestamp_range_info(self) -> Dict[str, Any]:
         """获取话题时间戳范围信息"""
         try:
@@ -553,67 +892,282 @@ class ZSXQDatabase:
             print(f"获取最新话题时间戳失败: {e}")
             return None
     
+    def record_crawl_coverage(self, group_id: int, oldest_time: str, newest_time: str) -> bool:
+        """记录一段已完整采集的时间区间，并与相邻/重叠的已有区间合并
+
+        Args:
+            oldest_time / newest_time: 区间两端的话题时间（闭区间）；相差 1 毫秒以内视为相邻
+        """
+        oldest_ms = topic_time_to_ms(oldest_time)
+        newest_ms = topic_time_to_ms(newest_time)
+        if oldest_ms is None or newest_ms is None:
+            return False
+        if oldest_ms > newest_ms:
+            oldest_ms, newest_ms = newest_ms, oldest_ms
+
+        self.cursor.execute('''
+            SELECT id, oldest_ms, newest_ms FROM crawl_coverage
+            WHERE group_id = ? AND newest_ms >= ? AND oldest_ms <= ?
+        ''', (group_id, oldest_ms - 1, newest_ms + 1))
+        overlapping = self.cursor.fetchall()
+        if overlapping:
+            oldest_ms = min([oldest_ms] + [row[1] for row in overlapping])
+            newest_ms = max([newest_ms] + [row[2] for row in overlapping])
+            self.cursor.executemany('DELETE FROM crawl_coverage WHERE id = ?', [(row[0],) for row in overlapping])
+
+        self.cursor.execute('''
+            INSERT INTO crawl_coverage (group_id, oldest_ms, newest_ms, updated_at)
+            VALUES (?, ?, ?, ?)
+        ''', (group_id, oldest_ms, newest_ms, _beijing_now()))
+        return True
+
+    def get_crawl_coverage(self, group_id: int) -> List[Dict[str, Any]]:
+        """获取群组已完整采集的时间区间（按时间从新到旧）"""
+        self.cursor.execute('''
+            SELECT oldest_ms, newest_ms, updated_at FROM crawl_coverage
+            WHERE group_id = ? ORDER BY newest_ms DESC
+        ''', (group_id,))
+        return [
+            {
+                'oldest_time': ms_to_topic_time(oldest_ms),
+                'newest_time': ms_to_topic_time(newest_ms),
+                'oldest_ms': oldest_ms,
+                'newest_ms': newest_ms,
+                'updated_at': updated_at,
+            }
+            for oldest_ms, newest_ms, updated_at in self.cursor.fetchall()
+        ]
+
+    def find_covering_interval(self, group_id: int, time_str: str) -> Optional[Dict[str, Any]]:
+        """查找包含指定时间点的已覆盖区间"""
+        time_ms = topic_time_to_ms(time_str)
+        if time_ms is None:
+            return None
+        self.cursor.execute('''
+            SELECT oldest_ms, newest_ms FROM crawl_coverage
+            WHERE group_id = ? AND newest_ms >= ? AND oldest_ms <= ?
+            ORDER BY newest_ms ASC LIMIT 1
+        ''', (group_id, time_ms, time_ms))
+        row = self.cursor.fetchone()
+        if not row:
+            return None
+        return {
+            'oldest_time': ms_to_topic_time(row[0]),
+            'newest_time': ms_to_topic_time(row[1]),
+            'oldest_ms': row[0],
+            'newest_ms': row[1],
+        }
+
+    def find_uncovered_ranges(self, group_id: int, start_time: str, end_time: str) -> List[Tuple[str, str]]:
+        """计算 [start_time, end_time] 内尚未被覆盖区间包含的时间段（按时间从新到旧）
+
+        Returns:
+            [(段内最老时间, 段内最新时间)]，最新时间可直接作为采集的 end_time 参数
+        """
+        start_ms = topic_time_to_ms(start_time)
+        end_ms = topic_time_to_ms(end_time)
+        if start_ms is None or end_ms is None:
+            return [(start_time, end_time)]
+
+        self.cursor.execute('''
+            SELECT oldest_ms, newest_ms FROM crawl_coverage
+            WHERE group_id = ? AND newest_ms >= ? AND oldest_ms <= ?
+            ORDER BY newest_ms DESC
+        ''', (group_id, start_ms, end_ms))
+
+        ranges = []
+        cursor_ms = end_ms
+        for oldest_ms, newest_ms in self.cursor.fetchall():
+            if newest_ms < cursor_ms:
+                ranges.append((max(newest_ms + 1, start_ms), cursor_ms))
+            cursor_ms = min(cursor_ms, oldest_ms - 1)
+            if cursor_ms < start_ms:
+                break
+        if cursor_ms >= start_ms:
+            ranges.append((start_ms, cursor_ms))
+
+        return [(ms_to_topic_time(oldest_ms), ms_to_topic_time(newest_ms)) for oldest_ms, newest_ms in ranges]
+
+    def find_topic_gaps(self, group_id: int, per_page: int = 20, min_gap_hours: float = 6.0,
+                        density_factor: float = 8.0, window: int = 50) -> List[Dict[str, Any]]:
+        """分析话题时间线中的缺口（按时间从新到旧）
+
+        两类来源：
+        - uncovered: 相邻两段采集覆盖区间之间未被确认、且本地话题明显少于附近密度的时间段
+        - sparse: 覆盖区间以外，相邻话题间隔远大于附近的发帖间隔（超过 density_factor 倍中位数且不少于 min_gap_hours）
+        只分析本地最老与最新话题之间的区间；已被覆盖区间确认的部分会被剔除。
+
+        Returns:
+            [{start_time, end_time, start_ms, end_ms, duration_hours, reasons, expected_topics, estimated_pages}]
+        """
+        self.cursor.execute('''
+            SELECT create_time FROM topics
+            WHERE group_id = ? AND create_time IS NOT NULL AND create_time != ''
+            ORDER BY create_time ASC
+        ''', (group_id,))
+        times = sorted(ms for ms in (topic_time_to_ms(row[0]) for row in self.cursor.fetchall()) if ms is not None)
+        if len(times) < 2:
+            return []
+
+        diffs = [later - earlier for earlier, later in zip(times, times[1:])]
+        min_gap_ms = int(min_gap_hours * 3600 * 1000)
+        half_window = max(1, window // 2)
+
+        def local_median(index: int) -> float:
+            """第 index 个间隔附近（不含自身）的间隔中位数"""
+            lo, hi = max(0, index - half_window), min(len(diffs), index + half_window + 1)
+            neighbours = diffs[lo:index] + diffs[index + 1:hi]
+            return statistics.median(neighbours) if neighbours else float(diffs[index])
+
+        candidates = []  # [start_ms, end_ms, reason, median_interval_ms]
+
+        # 1) 覆盖区间之间的未确认时间段
+        self.cursor.execute('''
+            SELECT oldest_ms, newest_ms FROM crawl_coverage
+            WHERE group_id = ? ORDER BY oldest_ms ASC
+        ''', (group_id,))
+        coverage = self.cursor.fetchall()
+        for (_, older_newest), (newer_oldest, _) in zip(coverage, coverage[1:]):
+            start_ms, end_ms = max(older_newest + 1, times[0]), min(newer_oldest - 1, times[-1])
+            if end_ms <= start_ms:
+                continue
+            # 本地话题数不足按附近密度推算数量的一半时才视为缺口（早于覆盖记录导入的数据不算缺失）
+            first, last = bisect.bisect_left(times, start_ms), bisect.bisect_right(times, end_ms)
+            median = local_median(min(first, len(diffs) - 1))
+            if median > 0 and (last - first) < (end_ms - start_ms) / median / 2:
+                candidates.append([start_ms, end_ms, 'uncovered', median])
+
+        # 2) 发帖密度异常稀疏的时间段
+        for index, diff in enumerate(diffs):
+            if diff <= min_gap_ms:
+                continue
+            median = local_median(index)
+            if diff > density_factor * median:
+                candidates.append([times[index] + 1, times[index + 1] - 1, 'sparse', median])
+
+        # 剔除已被覆盖区间确认的部分
+        pieces = []
+        for start_ms, end_ms, reason, median in candidates:
+            segments = [(start_ms, end_ms)]
+            for cov_oldest, cov_newest in coverage:
+                next_segments = []
+                for seg_start, seg_end in segments:
+                    if cov_newest < seg_start or cov_oldest > seg_end:
+                        next_segments.append((seg_start, seg_end))
+                        continue
+                    if seg_start < cov_oldest:
+                        next_segments.append((seg_start, cov_oldest - 1))
+                    if cov_newest < seg_end:
+                        next_segments.append((cov_newest + 1, seg_end))
+                segments = next_segments
+            pieces.extend([seg_start, seg_end, reason, median] for seg_start, seg_end in segments if seg_end > seg_start)
+
+        # 合并重叠的缺口
+        merged = []
+        for piece in sorted(pieces):
+            if merged and piece[0] <= merged[-1][1] + 1:
+                last = merged[-1]
+                last[1] = max(last[1], piece[1])
+                last[2].add(piece[2])
+                last[3] = min(last[3], piece[3])
+            else:
+                merged.append([piece[0], piece[1], {piece[2]}, piece[3]])
+
+        gaps = []
+        for start_ms, end_ms, reasons, median in reversed(merged):
+            expected = int((end_ms - start_ms) / median) if median > 0 else 0
+            gaps.append({
+                'start_time': ms_to_topic_time(start_ms),
+                'end_time': ms_to_topic_time(end_ms),
+                'start_ms': start_ms,
+                'end_ms': end_ms,
+                'duration_hours': round((end_ms - start_ms) / 3600000, 1),
+                'reasons': sorted(reasons),
+                'expected_topics': expected,
+                # 每页 per_page 条，最后一页会越过缺口下界与已有数据衔接
+                'estimated_pages': max(1, math.ceil((expected + 1) / max(1, per_page))),
+            })
+        return gaps
+
+    def clear_crawl_coverage(self, group_id: Optional[int] = None):
+        """清除采集覆盖记录（本地话题被清空后调用）"""
+        if group_id is None:
+            self.cursor.execute('DELETE FROM crawl_coverage')
+        else:
+            self.cursor.execute('DELETE FROM crawl_coverage WHERE group_id = ?', (group_id,))
+        self.conn.commit()
+
     def _import_all_users(self, topic_data: Dict[str, Any]):
         """导入话题相关的所有用户信息"""
-        # 导入talk中的用户
+        for user_data in self._collect_topic_users(topic_data):
+            self._upsert_user(user_data)
+
+    @staticmethod
+    def _collect_topic_users(topic_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """收集话题中出现的所有用户（作者、提问/被提问者、回答者、点赞者、评论者）"""
+        users = []
+
+        # talk中的用户
         if 'talk' in topic_data and topic_data['talk'] and 'owner' in topic_data['talk']:
-            self._upsert_user(topic_data['talk']['owner'])
+            users.append(topic_data['talk']['owner'])
 
-        # 导入question中的用户
+        # question中的用户
         if 'question' in topic_data and topic_data['question']:
             # 对于非匿名用户，导入提问者信息
             if 'owner' in topic_data['question'] and not topic_data['question'].get('anonymous', False):
-                self._upsert_user(topic_data['question']['owner'])
+                users.append(topic_data['question']['owner'])
             # 导入被提问者信息（无论是否匿名都有）
             if 'questionee' in topic_data['question']:
-                self._upsert_user(topic_data['question']['questionee'])
+                users.append(topic_data['question']['questionee'])
 
-        # 导入answer中的用户
+        # answer中的用户
         if 'answer' in topic_data and topic_data['answer'] and 'owner' in topic_data['answer']:
-            self._upsert_user(topic_data['answer']['owner'])
-        
-        # 导入latest_likes中的用户
+            users.append(topic_data['answer']['owner'])
+
+        # latest_likes中的用户
         if 'latest_likes' in topic_data:
             for like in topic_data['latest_likes']:
                 if 'owner' in like:
-                    self._upsert_user(like['owner'])
-        
-        # 导入comments中的用户
+                    users.append(like['owner'])
+
+        # comments中的用户
         if 'show_comments' in topic_data:
             for comment in topic_data['show_comments']:
                 if 'owner' in comment:
-                    self._upsert_user(comment['owner'])
+                    users.append(comment['owner'])
                 if 'repliee' in comment:
-                    self._upsert_user(comment['repliee'])
+                    users.append(comment['repliee'])
+
+        return users
     
     def _upsert_talk(self, topic_id: int, talk_data: Dict[str, Any]):
         """插入或更新话题内容"""
+        row = self._talk_row(topic_id, talk_data, _beijing_now())
+        if row:
+            self.cursor.execute(_SQL_UPSERT_TALK, row)
+
+    @staticmethod
+    def _talk_row(topic_id: int, talk_data: Dict[str, Any], current_time: str) -> Optional[Tuple]:
         if not talk_data:
-            return
-        
+            return None
+
         owner_user_id = talk_data.get('owner', {}).get('user_id')
         if not owner_user_id:
-            return
-        
-        # 获取当前时间作为created_at（使用东八区时间格式）
-        from datetime import datetime, timezone, timedelta
-        beijing_tz = timezone(timedelta(hours=8))
-        current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-        
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO talks 
-            (topic_id, owner_user_id, text, created_at)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            topic_id,
-            owner_user_id,
-            talk_data.get('text', ''),
-            current_time
-        ))
+            return None
+
+        return (topic_id, owner_user_id, talk_data.get('text', ''), current_time)
 
-    
     def _import_images(self, topic_id: int, topic_data: Dict[str, Any]):
         """导入图片信息"""
+        current_time = _beijing_now()
+        for image_data, comment_id in self._collect_topic_images(topic_data):
+            row = self._image_row(topic_id, image_data, comment_id, current_time)
+            if row:
+                self.cursor.execute(_SQL_UPSERT_IMAGE, row)
+
+    @staticmethod
+    def _collect_topic_images(topic_data: Dict[str, Any]) -> List[Tuple[Dict[str, Any], Optional[int]]]:
+        """收集话题正文和评论中的图片，返回 (image_data, comment_id) 列表"""
         images_to_import = []
         
         # 从talk中获取图片
@@ -628,32 +1182,27 @@ class ZSXQDatabase:
                     comment_id = comment.get('comment_id')
                     for img in comment['images']:
                         images_to_import.append((img, comment_id))
-        
-        # 导入所有图片
-        for img_data, comment_id in images_to_import:
-            self._upsert_image(topic_id, img_data, comment_id)
+
+        return images_to_import
     
     def _upsert_image(self, topic_id: int, image_data: Dict[str, Any], comment_id: Optional[int] = None):
         """插入或更新图片信息"""
+        row = self._image_row(topic_id, image_data, comment_id, _beijing_now())
+        if row:
+            self.cursor.execute(_SQL_UPSERT_IMAGE, row)
+
+    @staticmethod
+    def _image_row(topic_id: int, image_data: Dict[str, Any], comment_id: Optional[int],
+                   current_time: str) -> Optional[Tuple]:
         image_id = image_data.get('image_id')
         if not image_id:
-            return
+            return None
         
         thumbnail = image_data.get('thumbnail', {})
         large = image_data.get('large', {})
         original = image_data.get('original', {})
-        
-        # 获取当前时间作为created_at（使用东八区时间格式）
-        from datetime import datetime, timezone, timedelta
-        beijing_tz = timezone(timedelta(hours=8))
-        current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-        
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO images 
-            (image_id, topic_id, comment_id, type, thumbnail_url, thumbnail_width, thumbnail_height,
-             large_url, large_width, large_height, original_url, original_width, original_height, original_size, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+
+        return (
             image_id,
             topic_id,
             comment_id,
@@ -669,83 +1218,52 @@ class ZSXQDatabase:
             original.get('height'),
             original.get('size'),
             current_time
-        ))
+        )
 
-    
     def _import_likes(self, topic_id: int, topic_data: Dict[str, Any]):
         """导入点赞信息"""
-        if 'latest_likes' not in topic_data:
-            return
-        
-        for like in topic_data['latest_likes']:
-            owner = like.get('owner', {})
-            user_id = owner.get('user_id')
+        rows = self._like_rows(topic_id, topic_data, _beijing_now())
+        if rows:
+            self.cursor.executemany(_SQL_INSERT_LIKE, rows)
+
+    @staticmethod
+    def _like_rows(topic_id: int, topic_data: Dict[str, Any], current_time: str) -> List[Tuple]:
+        rows = []
+        for like in topic_data.get('latest_likes') or []:
+            user_id = like.get('owner', {}).get('user_id')
             if user_id:
-                # 获取当前时间作为imported_at（使用东八区时间格式）
-                from datetime import datetime, timezone, timedelta
-                beijing_tz = timezone(timedelta(hours=8))
-                current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-                
-                self.cursor.execute('''
-                    INSERT OR IGNORE INTO likes 
-                    (topic_id, user_id, create_time, imported_at)
-                    VALUES (?, ?, ?, ?)
-                ''', (
-                    topic_id,
-                    user_id,
-                    like.get('create_time', ''),
-                    current_time
-                ))
-        
-        if topic_data['latest_likes']:
-            pass  # 数据已导入，无需额外日志
+                rows.append((topic_id, user_id, like.get('create_time', ''), current_time))
+        return rows
 
     def _import_like_emojis(self, topic_id: int, topic_data: Dict[str, Any]):
         """导入表情点赞信息"""
+        rows = self._like_emoji_rows(topic_id, topic_data, _beijing_now())
+        if rows:
+            self.cursor.executemany(_SQL_UPSERT_LIKE_EMOJI, rows)
+
+    @staticmethod
+    def _like_emoji_rows(topic_id: int, topic_data: Dict[str, Any], current_time: str) -> List[Tuple]:
         if 'likes_detail' not in topic_data or 'emojis' not in topic_data['likes_detail']:
-            return
-        
+            return []
+
+        rows = []
         for emoji in topic_data['likes_detail']['emojis']:
             emoji_key = emoji.get('emoji_key')
-            likes_count = emoji.get('likes_count', 0)
             if emoji_key:
-                # 获取当前时间作为created_at（使用东八区时间格式）
-                from datetime import datetime, timezone, timedelta
-                beijing_tz = timezone(timedelta(hours=8))
-                current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-                
-                self.cursor.execute('''
-                    INSERT OR REPLACE INTO like_emojis 
-                    (topic_id, emoji_key, likes_count, created_at)
-                    VALUES (?, ?, ?, ?)
-                ''', (
-                    topic_id,
-                    emoji_key,
-                    likes_count,
-                    current_time
-                ))
-        
-        if topic_data['likes_detail']['emojis']:
-            pass  # 数据已导入，无需额外日志
+                rows.append((topic_id, emoji_key, emoji.get('likes_count', 0), current_time))
+        return rows
 
     def _import_user_liked_emojis(self, topic_id: int, topic_data: Dict[str, Any]):
         """导入用户表情点赞信息"""
+        rows = self._user_liked_emoji_rows(topic_id, topic_data)
+        if rows:
+            self.cursor.executemany(_SQL_INSERT_USER_LIKED_EMOJI, rows)
+
+    @staticmethod
+    def _user_liked_emoji_rows(topic_id: int, topic_data: Dict[str, Any]) -> List[Tuple]:
         if 'user_specific' not in topic_data or 'liked_emojis' not in topic_data['user_specific']:
-            return
-        
-        for emoji_key in topic_data['user_specific']['liked_emojis']:
-            if emoji_key:
-                self.cursor.execute('''
-                    INSERT OR IGNORE INTO user_liked_emojis 
-                    (topic_id, emoji_key)
-                    VALUES (?, ?)
-                ''', (
-                    topic_id,
-                    emoji_key
-                ))
-        
-        if topic_data['user_specific']['liked_emojis']:
-            pass  # 数据已导入，无需额外日志
+            return []
+        return [(topic_id, emoji_key) for emoji_key in topic_data['user_specific']['liked_emojis'] if emoji_key]
 
     def _import_comments(self, topic_id: int, comments: List[Dict[str, Any]]):
         """导入评论信息"""
@@ -755,9 +1273,6 @@ class ZSXQDatabase:
             if 'images' in comment and comment['images']:
                 self._import_comment_images(topic_id, comment['comment_id'], comment['images'])
 
-        if comments:
-            pass  # 数据已导入，无需额外日志
-
     def import_additional_comments(self, topic_id: int, comments: List[Dict[str, Any]]):
         """导入额外获取的评论信息（来自评论API）"""
         if not comments:
@@ -785,24 +1300,23 @@ class ZSXQDatabase:
 
     def _upsert_comment(self, topic_id: int, comment_data: Dict[str, Any]):
         """插入或更新评论信息"""
+        row = self._comment_row(topic_id, comment_data, _beijing_now())
+        if not row:
+            return
+
+        self.cursor.execute(_SQL_UPSERT_COMMENT, row)
+        self._index_comment_search(row[0], topic_id, comment_data.get('text', ''))
+
+    @staticmethod
+    def _comment_row(topic_id: int, comment_data: Dict[str, Any], current_time: str) -> Optional[Tuple]:
         comment_id = comment_data.get('comment_id')
         if not comment_id:
-            return
+            return None
         
         owner_user_id = comment_data.get('owner', {}).get('user_id')
         repliee_user_id = comment_data.get('repliee', {}).get('user_id')
-        
-        # 获取当前时间作为imported_at（使用东八区时间格式）
-        from datetime import datetime, timezone, timedelta
-        beijing_tz = timezone(timedelta(hours=8))
-        current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-        
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO comments
-            (comment_id, topic_id, owner_user_id, parent_comment_id, repliee_user_id,
-             text, create_time, likes_count, rewards_count, replies_count, sticky, imported_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+
+        return (
             comment_id,
             topic_id,
             owner_user_id,
@@ -815,45 +1329,276 @@ class ZSXQDatabase:
             comment_data.get('replies_count', 0),
             comment_data.get('sticky', False),
             current_time
-        ))
+        )
+
+    def _index_topic_search(self, topic_id: int, topic_data: Dict[str, Any]):
+        """将话题的标题/正文/问答/文章标题写入全文检索索引"""
+        if not self.fts_enabled:
+            return
+
+        self.cursor.execute('DELETE FROM topics_fts WHERE rowid = ?', (topic_id,))
+        self.cursor.execute(_SQL_INDEX_TOPIC_SEARCH, self._topic_search_row(topic_id, topic_data))
+
+    @staticmethod
+    def _topic_search_row(topic_id: int, topic_data: Dict[str, Any]) -> Tuple:
+        talk = topic_data.get('talk') or {}
+        question = topic_data.get('question') or {}
+        answer = topic_data.get('answer') or {}
+        article = talk.get('article') or topic_data.get('article') or {}
+        article_title = article.get('title', '')
+        if not article_title and topic_data.get('type') == 'article':
+            article_title = topic_data.get('title', '')
+
+        return (
+            topic_id,
+            _plain_search_text(topic_data.get('title', '')),
+            _plain_search_text(talk.get('text', '')),
+            _plain_search_text(question.get('text', '')),
+            _plain_search_text(answer.get('text', '')),
+            _plain_search_text(article_title)
+        )
+
+    def _index_comment_search(self, comment_id: int, topic_id: int, text: Optional[str]):
+        """将评论正文写入全文检索索引"""
+        if not self.fts_enabled:
+            return
+
+        self.cursor.execute('DELETE FROM comments_fts WHERE rowid = ?', (comment_id,))
+        self.cursor.execute(_SQL_INDEX_COMMENT_SEARCH, (comment_id, topic_id, _plain_search_text(text)))
+
+    def rebuild_search_index(self, batch_size: int = 1000) -> Dict[str, int]:
+        """根据现有数据全量重建全文检索索引（用于旧数据库的一次性迁移）"""
+        if not self.fts_enabled:
+            raise RuntimeError("当前SQLite不支持FTS5 trigram分词，无法构建全文检索索引")
+
+        self.cursor.execute('DELETE FROM topics_fts')
+        self.cursor.execute('DELETE FROM comments_fts')
+
+        # 子表可能存在同一话题的多行记录，按 topic_id 聚合后以最后一条非空内容为准
+        read_cursor = self.conn.cursor()
+        read_cursor.execute('''
+            SELECT t.topic_id, t.type, t.title, tk.text, q.text, a.text, ar.title
+            FROM topics t
+            LEFT JOIN talks tk ON tk.topic_id = t.topic_id
+            LEFT JOIN questions q ON q.topic_id = t.topic_id
+            LEFT JOIN answers a ON a.topic_id = t.topic_id
+            LEFT JOIN articles ar ON ar.topic_id = t.topic_id
+            ORDER BY t.topic_id
+        ''')
+
+        topics_indexed = 0
+        batch = []
+        current = None
+
+        def _flush_current():
+            nonlocal topics_indexed
+            if current is None:
+                return
+            batch.append(tuple(current))
+            topics_indexed += 1
+            if len(batch) >= batch_size:
+                self.cursor.executemany(_SQL_INDEX_TOPIC_SEARCH, batch)
+                batch.clear()
+
+        for topic_id, topic_type, title, talk_text, question_text, answer_text, article_title in read_cursor:
+            if current is None or current[0] != topic_id:
+                _flush_current()
+                if not article_title and topic_type == 'article':
+                    article_title = title
+                current = [topic_id, _plain_search_text(title), '', '', '', _plain_search_text(article_title)]
+            for index, value in ((2, talk_text), (3, question_text), (4, answer_text)):
+                if value:
+                    current[index] = _plain_search_text(value)
+        _flush_current()
+        if batch:
+            self.cursor.executemany(_SQL_INDEX_TOPIC_SEARCH, batch)
+
+        comments_indexed = 0
+        read_cursor.execute('SELECT comment_id, topic_id, text FROM comments')
+        while True:
+            rows = read_cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            self.cursor.executemany(
+                _SQL_INDEX_COMMENT_SEARCH,
+                [(comment_id, topic_id, _plain_search_text(text)) for comment_id, topic_id, text in rows]
+            )
+            comments_indexed += len(rows)
+
+        # 合并 FTS5 内部段，提升后续查询速度
+        self.cursor.execute("INSERT INTO topics_fts (topics_fts) VALUES ('optimize')")
+        self.cursor.execute("INSERT INTO comments_fts (comments_fts) VALUES ('optimize')")
+
+        self._set_meta('search_index_ready', '1')
+        self.conn.commit()
+        self.search_index_ready = True
+
+        return {'topics': topics_indexed, 'comments': comments_indexed}
+
+    def search_topics(self, keyword: str, group_id: Optional[int] = None,
+                      limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """全文检索话题（标题、正文、问答、文章、评论）
+
+        多个关键词以空白分隔，按 AND 匹配。索引可用且每个关键词不少于3个字符时
+        使用 FTS5 MATCH 并按 bm25 相关度排序；否则回退为 LIKE 匹配并按时间倒序。
+
+        Returns:
+            {'hits': [{'topic_id', 'source', 'snippet'}], 'total': int, 'mode': 'fts' | 'like'}
+        """
+        terms = _split_search_terms(keyword)
+        if not terms:
+            return {'hits': [], 'total': 0, 'mode': 'like'}
+
+        if self.fts_enabled and self.search_index_ready and all(len(term) >= 3 for term in terms):
+            return self._search_topics_fts(terms, group_id, limit, offset)
+        return self._search_topics_like(terms, group_id, limit, offset)
+
+    def _search_topics_fts(self, terms: List[str], group_id: Optional[int],
+                           limit: int, offset: int) -> Dict[str, Any]:
+        """FTS5 MATCH 检索：话题命中与评论命中合并，每个话题取最相关的一处作为摘要"""
+        match_query = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        group_filter = 'WHERE t.group_id = ?' if group_id is not None else ''
+        group_params = (group_id,) if group_id is not None else ()
+
+        # bm25 越小越相关；标题与文章标题权重更高，评论命中整体降权
+        hits_sql = f'''
+            SELECT hits.topic_id, MIN(hits.score) AS score, hits.snippet, hits.source
+            FROM (
+                SELECT rowid AS topic_id,
+                       bm25(topics_fts, 10.0, 4.0, 4.0, 4.0, 8.0) AS score,
+                       snippet(topics_fts, -1, ?, ?, '…', ?) AS snippet,
+                       'topic' AS source
+                FROM topics_fts WHERE topics_fts MATCH ?
+                UNION ALL
+                SELECT topic_id,
+                       bm25(comments_fts) * 0.5 AS score,
+                       snippet(comments_fts, 1, ?, ?, '…', ?) AS snippet,
+                       'comment' AS source
+                FROM comments_fts WHERE comments_fts MATCH ?
+            ) hits
+            JOIN topics t ON t.topic_id = hits.topic_id
+            {group_filter}
+            GROUP BY hits.topic_id
+        '''
+        snippet_params = (SEARCH_HIGHLIGHT_OPEN, SEARCH_HIGHLIGHT_CLOSE, SEARCH_SNIPPET_TOKENS)
+        params = snippet_params + (match_query,) + snippet_params + (match_query,) + group_params
+
+        self.cursor.execute(f'''
+            SELECT topic_id, snippet, source FROM ({hits_sql})
+            ORDER BY score, topic_id DESC
+            LIMIT ? OFFSET ?
+        ''', params + (limit, offset))
+        hits = [
+            {'topic_id': row[0], 'snippet': row[1], 'source': row[2]}
+            for row in self.cursor.fetchall()
+        ]
+
+        self.cursor.execute(f'SELECT COUNT(*) FROM ({hits_sql})', params)
+        total = self.cursor.fetchone()[0]
+
+        return {'hits': hits, 'total': total, 'mode': 'fts'}
+
+    def _search_topics_like(self, terms: List[str], group_id: Optional[int],
+                            limit: int, offset: int) -> Dict[str, Any]:
+        """LIKE 回退检索：短关键词（trigram 无法 MATCH）或索引尚未构建时使用"""
+        if self.fts_enabled and self.search_index_ready:
+            # 注意：对 FTS5 列表达式做 LIKE，避免 trigram 对少于3字符的 LIKE 模式走索引时漏匹配
+            sources_sql = '''
+                SELECT rowid AS topic_id, 'topic' AS source,
+                       title || ' ' || talk || ' ' || question || ' ' || answer || ' ' || article AS text
+                FROM topics_fts
+                UNION ALL
+                SELECT topic_id, 'comment' AS source, text || '' AS text FROM comments_fts
+            '''
+        else:
+            sources_sql = '''
+                SELECT t.topic_id AS topic_id, 'topic' AS source,
+                       COALESCE(t.title, '') || ' ' || COALESCE(tk.text, '') || ' ' ||
+                       COALESCE(q.text, '') || ' ' || COALESCE(a.text, '') AS text
+                FROM topics t
+                LEFT JOIN talks tk ON tk.topic_id = t.topic_id
+                LEFT JOIN questions q ON q.topic_id = t.topic_id
+                LEFT JOIN answers a ON a.topic_id = t.topic_id
+                UNION ALL
+                SELECT topic_id, 'comment' AS source, COALESCE(text, '') AS text FROM comments
+                UNION ALL
+                SELECT topic_id, 'article' AS source, COALESCE(title, '') AS text FROM articles
+            '''
+
+        conditions = ['s.text LIKE ?' for _ in terms]
+        params: List[Any] = [f'%{term}%' for term in terms]
+        if group_id is not None:
+            conditions.append('t.group_id = ?')
+            params.append(group_id)
+        where_sql = ' AND '.join(conditions)
+
+        # MAX(source) 优先取话题本身的命中（'topic' > 'comment' > 'article'）作为摘要来源
+        hits_sql = f'''
+            SELECT s.topic_id, MAX(s.source) AS source, s.text, t.create_time
+            FROM ({sources_sql}) s
+            JOIN topics t ON t.topic_id = s.topic_id
+            WHERE {where_sql}
+            GROUP BY s.topic_id
+        '''
+        self.cursor.execute(f'''
+            SELECT topic_id, source, text FROM ({hits_sql})
+            ORDER BY create_time DESC
+            LIMIT ? OFFSET ?
+        ''', params + [limit, offset])
+        hits = [
+            {
+                'topic_id': row[0],
+                'snippet': _build_like_snippet(_plain_search_text(row[2]), terms),
+                'source': row[1]
+            }
+            for row in self.cursor.fetchall()
+        ]
+
+        self.cursor.execute(f'SELECT COUNT(*) FROM ({hits_sql})', params)
+        total = self.cursor.fetchone()[0]
+
+        return {'hits': hits, 'total': total, 'mode': 'like'}
 
     def _import_comment_images(self, topic_id: int, comment_id: int, images: List[Dict[str, Any]]):
         """导入评论的图片信息"""
+        current_time = _beijing_now()
         for image in images:
-            if not image.get('image_id'):
-                continue
-
-            # 获取当前时间作为created_at（使用东八区时间格式）
-            from datetime import datetime, timezone, timedelta
-            beijing_tz = timezone(timedelta(hours=8))
-            current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
+            row = self._comment_image_row(topic_id, comment_id, image, current_time)
+            if row:
+                self.cursor.execute(_SQL_UPSERT_IMAGE, row)
+
+    @staticmethod
+    def _comment_image_row(topic_id: int, comment_id: int, image: Dict[str, Any],
+                           current_time: str) -> Optional[Tuple]:
+        if not image.get('image_id'):
+            return None
 
-            self.cursor.execute('''
-                INSERT OR REPLACE INTO images
-                (image_id, topic_id, comment_id, type, thumbnail_url, thumbnail_width, thumbnail_height,
-                 large_url, large_width, large_height, original_url, original_width, original_height,
-                 original_size, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                image.get('image_id'),
-                topic_id,
-                comment_id,
-                image.get('type', ''),
-                image.get('thumbnail', {}).get('url', ''),
-                image.get('thumbnail', {}).get('width', 0),
-                image.get('thumbnail', {}).get('height', 0),
-                image.get('large', {}).get('url', ''),
-                image.get('large', {}).get('width', 0),
-                image.get('large', {}).get('height', 0),
-                image.get('original', {}).get('url', ''),
-                image.get('original', {}).get('width', 0),
-                image.get('original', {}).get('height', 0),
-                image.get('original', {}).get('size', 0),
-                current_time
-            ))
+        return (
+            image.get('image_id'),
+            topic_id,
+            comment_id,
+            image.get('type', ''),
+            image.get('thumbnail', {}).get('url', ''),
+            image.get('thumbnail', {}).get('width', 0),
+            image.get('thumbnail', {}).get('height', 0),
+            image.get('large', {}).get('url', ''),
+            image.get('large', {}).get('width', 0),
+            image.get('large', {}).get('height', 0),
+            image.get('original', {}).get('url', ''),
+            image.get('original', {}).get('width', 0),
+            image.get('original', {}).get('height', 0),
+            image.get('original', {}).get('size', 0),
+            current_time
+        )
 
     def _upsert_question(self, topic_id: int, question_data: Dict[str, Any]):
         """插入或更新问题信息"""
+        row = self._question_row(topic_id, question_data, _beijing_now())
+        if row:
+            self.cursor.execute(_SQL_UPSERT_QUESTION, row)
+
+    @staticmethod
+    def _question_row(topic_id: int, question_data: Dict[str, Any], current_time: str) -> Optional[Tuple]:
         owner_user_id = question_data.get('owner', {}).get('user_id')
         questionee_user_id = question_data.get('questionee', {}).get('user_id')
         is_anonymous = question_data.get('anonymous', False)
@@ -861,21 +1606,11 @@ class ZSXQDatabase:
         # 对于匿名用户，owner_user_id 可能为 None，但仍需要存储问题信息
         # 只有在既没有 owner_user_id 又没有问题文本时才跳过
         if not owner_user_id and not question_data.get('text'):
-            return
+            return None
 
         owner_detail = question_data.get('owner_detail', {})
 
-        # 获取当前时间作为created_at（使用东八区时间格式）
-        from datetime import datetime, timezone, timedelta
-        beijing_tz = timezone(timedelta(hours=8))
-        current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO questions
-            (topic_id, owner_user_id, questionee_user_id, text, expired, anonymous,
-             owner_questions_count, owner_join_time, owner_status, owner_location, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        return (
             topic_id,
             owner_user_id,  # 对于匿名用户可能为 None
             questionee_user_id,
@@ -887,65 +1622,55 @@ class ZSXQDatabase:
             owner_detail.get('status', ''),
             question_data.get('owner_location', ''),
             current_time
-        ))
+        )
 
-    
     def _upsert_answer(self, topic_id: int, answer_data: Dict[str, Any]):
         """插入或更新回答信息"""
+        row = self._answer_row(topic_id, answer_data, _beijing_now())
+        if row:
+            self.cursor.execute(_SQL_UPSERT_ANSWER, row)
+
+    @staticmethod
+    def _answer_row(topic_id: int, answer_data: Dict[str, Any], current_time: str) -> Optional[Tuple]:
         owner_user_id = answer_data.get('owner', {}).get('user_id')
-        
         if not owner_user_id:
-            return
-        
-        # 获取当前时间作为created_at（使用东八区时间格式）
-        from datetime import datetime, timezone, timedelta
-        beijing_tz = timezone(timedelta(hours=8))
-        current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-        
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO answers 
-            (topic_id, owner_user_id, text, created_at)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            topic_id,
-            owner_user_id,
-            answer_data.get('text', ''),
-            current_time
-        ))
+            return None
+        return (topic_id, owner_user_id, answer_data.get('text', ''), current_time)
 
-    
     def _import_articles(self, topic_id: int, topic_data: Dict[str, Any]):
         """导入文章信息"""
+        article_data = self._resolve_article_data(topic_id, topic_data)
+        if article_data:
+            self._upsert_article(topic_id, article_data)
+
+    @staticmethod
+    def _resolve_article_data(topic_id: int, topic_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """从话题数据中解析文章信息"""
         # 检查talk类型话题中的article字段
         if 'talk' in topic_data and topic_data['talk'] and 'article' in topic_data['talk']:
             article_data = topic_data['talk']['article']
             if article_data:
-                self._upsert_article(topic_id, article_data)
-                return
+                return article_data
         
         # 检查顶层的article字段（如果存在）
         if 'article' in topic_data and topic_data['article']:
-            article_data = topic_data['article']
-            self._upsert_article(topic_id, article_data)
-            return
+            return topic_data['article']
         
         # 如果话题类型是article但没有article字段，从title等信息构建
         topic_type = topic_data.get('type', '')
         if topic_type == 'article' and topic_data.get('title'):
-            article_data = {
+            return {
                 'title': topic_data.get('title', ''),
                 'article_id': str(topic_id),  # 使用topic_id作为article_id
                 'article_url': '',  # 暂时为空
                 'inline_article_url': ''  # 暂时为空
             }
-            self._upsert_article(topic_id, article_data)
+
+        return None
     
     def _upsert_article(self, topic_id: int, article_data: Dict[str, Any]):
         """插入或更新文章信息"""
-        title = article_data.get('title', '')
-        article_id = article_data.get('article_id', '')
-        
-        if not title and not article_id:
+        if not article_data.get('title', '') and not article_data.get('article_id', ''):
             return
         
         # 获取话题的创建时间作为文章创建时间
@@ -954,39 +1679,37 @@ class ZSXQDatabase:
         ''', (topic_id,))
         result = self.cursor.fetchone()
         created_at = result[0] if result else ''
-        
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO articles
-            (topic_id, title, article_id, article_url, inline_article_url, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
+
+        self.cursor.execute(_SQL_UPSERT_ARTICLE, self._article_row(topic_id, article_data, created_at))
+
+    @staticmethod
+    def _article_row(topic_id: int, article_data: Dict[str, Any], created_at: str) -> Optional[Tuple]:
+        title = article_data.get('title', '')
+        article_id = article_data.get('article_id', '')
+        if not title and not article_id:
+            return None
+        return (
             topic_id,
             title,
             article_id,
             article_data.get('article_url', ''),
             article_data.get('inline_article_url', ''),
             created_at
-        ))
+        )
 
     def _import_files(self, topic_id: int, files_data: List[Dict[str, Any]]):
         """导入话题文件信息"""
-        if not files_data:
-            return
-
-        for file_data in files_data:
+        rows = self._file_rows(topic_id, files_data, _beijing_now())
+        if rows:
+            self.cursor.executemany(_SQL_UPSERT_TOPIC_FILE, rows)
+
+    @staticmethod
+    def _file_rows(topic_id: int, files_data: List[Dict[str, Any]], current_time: str) -> List[Tuple]:
+        rows = []
+        for file_data in files_data or []:
             if not file_data.get('file_id'):
                 continue
-
-            # 获取当前时间作为created_at（使用东八区时间格式）
-            from datetime import datetime, timezone, timedelta
-            beijing_tz = timezone(timedelta(hours=8))
-            current_time = datetime.now(beijing_tz).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
-
-            self.cursor.execute('''
-                INSERT OR REPLACE INTO topic_files
-                (topic_id, file_id, name, hash, size, duration, download_count, create_time, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            rows.append((
                 topic_id,
                 file_data.get('file_id'),
                 file_data.get('name', ''),
@@ -997,7 +1720,222 @@ class ZSXQDatabase:
                 file_data.get('create_time', ''),
                 current_time
             ))
+        return rows
+
+    def get_existing_topic_ids(self, topic_ids: List[int]) -> Set[int]:
+        """用 IN 查询一次性判断哪些话题已存在（按 SQLite 参数上限分块）"""
+        existing = set()
+        ids = [topic_id for topic_id in topic_ids if topic_id]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' for _ in chunk)
+            self.cursor.execute(f'SELECT topic_id FROM topics WHERE topic_id IN ({placeholders})', chunk)
+            existing.update(row[0] for row in self.cursor.fetchall())
+        return existing
+
+    def get_stored_comment_counts(self, topic_ids: List[int]) -> Dict[int, int]:
+        """统计各话题本地已存的评论数（含回复），用于判断评论是否需要补全"""
+        counts: Dict[int, int] = {}
+        ids = [topic_id for topic_id in topic_ids if topic_id]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' for _ in chunk)
+            self.cursor.execute(
+                f'SELECT topic_id, COUNT(*) FROM comments WHERE topic_id IN ({placeholders}) GROUP BY topic_id',
+                chunk
+            )
+            counts.update((row[0], row[1]) for row in self.cursor.fetchall())
+        return counts
+
+    def get_comment_sync_states(self, topic_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """读取各话题的评论同步水位 {topic_id: {'synced_until', 'synced_count'}}"""
+        states: Dict[int, Dict[str, Any]] = {}
+        ids = [topic_id for topic_id in topic_ids if topic_id]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' for _ in chunk)
+            self.cursor.execute(
+                f'SELECT topic_id, synced_until, synced_count FROM comment_sync_state WHERE topic_id IN ({placeholders})',
+                chunk
+            )
+            for topic_id, synced_until, synced_count in self.cursor.fetchall():
+                states[topic_id] = {'synced_until': synced_until, 'synced_count': synced_count or 0}
+        return states
+
+    def filter_topics_needing_comment_sync(self, comment_counts: Dict[int, int]) -> Dict[int, int]:
+        """从 {topic_id: 接口评论数} 中筛出需要同步评论的话题
+
+        本地已存评论数不少于接口评论数，或上次同步时接口评论数与当前相同（如评论被删除导致永远对不齐）时跳过。
+        """
+        if not comment_counts:
+            return {}
+        stored = self.get_stored_comment_counts(list(comment_counts))
+        states = self.get_comment_sync_states(list(comment_counts))
+        needed = {}
+        for topic_id, comments_count in comment_counts.items():
+            if stored.get(topic_id, 0) >= comments_count:
+                continue
+            state = states.get(topic_id)
+            if state and state['synced_count'] == comments_count:
+                continue
+            needed[topic_id] = comments_count
+        return needed
 
+    def record_comment_sync(self, topic_id: int, synced_until: Optional[str], synced_count: int):
+        """记录话题评论的同步水位（不提交事务）"""
+        self.cursor.execute('''
+            INSERT INTO comment_sync_state (topic_id, synced_until, synced_count, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(topic_id) DO UPDATE SET
+                synced_until = excluded.synced_until,
+                synced_count = excluded.synced_count,
+                updated_at = excluded.updated_at
+        ''', (topic_id, synced_until, synced_count, _beijing_now()))
+
+    def import_topics_batch(self, topics: List[Dict[str, Any]]) -> Dict[str, int]:
+        """批量导入一整页话题（resp_data.topics）
+
+        先把群组/用户/话题/评论/图片/点赞/标签等按表规整为行数组，再在单个事务内
+        用 executemany 写入，新增/更新由一次 IN 查询判定。写入语义与逐条调用
+        import_topic_data 一致。该方法自行提交事务；失败时回滚并抛出异常，
+        由调用方决定是否退回逐条导入。
+
+        Returns:
+            {'new_topics', 'updated_topics', 'errors', 'rows'}，rows 为写入的总行数
+        """
+        current_time = _beijing_now()
+
+        # 同一页内重复出现的话题以最后一次为准
+        unique_topics: Dict[int, Dict[str, Any]] = {}
+        invalid = 0
+        for topic_data in topics or []:
+            topic_id = topic_data.get('topic_id')
+            if topic_id:
+                unique_topics[topic_id] = topic_data
+            else:
+                invalid += 1
+
+        stats = {'new_topics': 0, 'updated_topics': 0, 'errors': invalid, 'rows': 0}
+        if not unique_topics:
+            return stats
+
+        existing_ids = self.get_existing_topic_ids(list(unique_topics))
+
+        groups: Dict[int, Tuple] = {}
+        users: Dict[int, Tuple] = {}
+        images: Dict[int, Tuple] = {}
+        comments: Dict[int, Tuple] = {}
+        comment_search: Dict[int, Tuple] = {}
+        topic_rows, talk_rows, article_rows = [], [], []
+        like_rows, like_emoji_rows, user_liked_emoji_rows = [], [], []
+        question_rows, answer_rows, file_rows, search_rows = [], [], [], []
+        tag_links: List[Tuple[int, int, str, str]] = []
+
+        for topic_id, topic_data in unique_topics.items():
+            group_row = self._group_row(topic_data.get('group') or {}, current_time)
+            if group_row:
+                groups[group_row[0]] = group_row
+
+            for user_data in self._collect_topic_users(topic_data):
+                user_row = self._user_row(user_data, current_time)
+                if user_row:
+                    users[user_row[0]] = user_row
+
+            topic_rows.append(self._topic_row(topic_data, current_time))
+
+            talk = topic_data.get('talk')
+            if talk:
+                talk_row = self._talk_row(topic_id, talk, current_time)
+                if talk_row:
+                    talk_rows.append(talk_row)
+
+            article_data = self._resolve_article_data(topic_id, topic_data)
+            if article_data:
+                article_row = self._article_row(topic_id, article_data, topic_data.get('create_time', ''))
+                if article_row:
+                    article_rows.append(article_row)
+
+            for image_data, comment_id in self._collect_topic_images(topic_data):
+                image_row = self._image_row(topic_id, image_data, comment_id, current_time)
+                if image_row:
+                    images[image_row[0]] = image_row
+
+            like_rows.extend(self._like_rows(topic_id, topic_data, current_time))
+            like_emoji_rows.extend(self._like_emoji_rows(topic_id, topic_data, current_time))
+            user_liked_emoji_rows.extend(self._user_liked_emoji_rows(topic_id, topic_data))
+
+            for comment in topic_data.get('show_comments') or []:
+                comment_row = self._comment_row(topic_id, comment, current_time)
+                if comment_row:
+                    comments[comment_row[0]] = comment_row
+                    comment_search[comment_row[0]] = (
+                        comment_row[0], topic_id, _plain_search_text(comment.get('text', ''))
+                    )
+                # 评论图片以评论接口格式为准（与 _import_comments 的覆盖顺序一致）
+                if 'images' in comment and comment['images']:
+                    for image in comment['images']:
+                        image_row = self._comment_image_row(topic_id, comment['comment_id'], image, current_time)
+                        if image_row:
+                            images[image_row[0]] = image_row
+
+            if topic_data.get('question'):
+                question_row = self._question_row(topic_id, topic_data['question'], current_time)
+                if question_row:
+                    question_rows.append(question_row)
+
+            if topic_data.get('answer'):
+                answer_row = self._answer_row(topic_id, topic_data['answer'], current_time)
+                if answer_row:
+                    answer_rows.append(answer_row)
+
+            group_id = topic_data.get('group', {}).get('group_id')
+            if group_id:
+                for tag_name, hid in self._extract_topic_tags(topic_data):
+                    tag_links.append((topic_id, group_id, tag_name, hid))
+
+            if talk and 'files' in talk:
+                file_rows.extend(self._file_rows(topic_id, talk['files'], current_time))
+
+            if self.fts_enabled:
+                search_rows.append(self._topic_search_row(topic_id, topic_data))
+
+        def _write(sql: str, rows: List[Tuple]):
+            if rows:
+                self.cursor.executemany(sql, rows)
+                stats['rows'] += len(rows)
+
+        try:
+            _write(_SQL_UPSERT_GROUP, list(groups.values()))
+            _write(_SQL_UPSERT_USER, list(users.values()))
+            _write(_SQL_UPSERT_TOPIC, topic_rows)
+            _write(_SQL_UPSERT_TALK, talk_rows)
+            _write(_SQL_UPSERT_ARTICLE, article_rows)
+            _write(_SQL_UPSERT_IMAGE, list(images.values()))
+            _write(_SQL_INSERT_LIKE, like_rows)
+            _write(_SQL_UPSERT_LIKE_EMOJI, like_emoji_rows)
+            _write(_SQL_INSERT_USER_LIKED_EMOJI, user_liked_emoji_rows)
+            _write(_SQL_UPSERT_COMMENT, list(comments.values()))
+            _write(_SQL_UPSERT_QUESTION, question_rows)
+            _write(_SQL_UPSERT_ANSWER, answer_rows)
+            stats['rows'] += self._link_topic_tags_batch(tag_links, current_time)
+            _write(_SQL_UPSERT_TOPIC_FILE, file_rows)
+
+            if self.fts_enabled:
+                self.cursor.executemany('DELETE FROM topics_fts WHERE rowid = ?', [(row[0],) for row in search_rows])
+                self.cursor.executemany(_SQL_INDEX_TOPIC_SEARCH, search_rows)
+                if comment_search:
+                    self.cursor.executemany('DELETE FROM comments_fts WHERE rowid = ?',
+                                            [(comment_id,) for comment_id in comment_search])
+                    self.cursor.executemany(_SQL_INDEX_COMMENT_SEARCH, list(comment_search.values()))
+
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        stats['updated_topics'] = len(existing_ids)
+        stats['new_topics'] = len(unique_topics) - len(existing_ids)
+        return stats
 
     def get_topic_detail(self, topic_id: int):
         """获取完整的话题详情"""
@@ -1392,12 +2330,19 @@ class ZSXQDatabase:
     
     def _import_tags(self, topic_id: int, topic_data: Dict[str, Any]):
         """从话题数据中提取并导入标签信息"""
-        import re
-        
         group_id = topic_data.get('group', {}).get('group_id')
         if not group_id:
             return
         
+        # 为每个标签创建或更新数据库记录
+        for tag_name, hid in self._extract_topic_tags(topic_data):
+            tag_id = self._upsert_tag(group_id, tag_name, hid)
+            if tag_id:
+                self._link_topic_tag(topic_id, tag_id)
+
+    @staticmethod
+    def _extract_topic_tags(topic_data: Dict[str, Any]) -> Set[Tuple[str, str]]:
+        """从正文/问答/评论中提取标签，返回 (tag_name, hid) 集合"""
         # 收集所有可能包含标签的文本内容
         text_contents = []
         
@@ -1424,25 +2369,61 @@ class ZSXQDatabase:
         for text in text_contents:
             if text:
                 # 使用正则表达式提取标签 <e type="hashtag" hid="..." title="..." />
-                tag_pattern = r'<e\s+type="hashtag"\s+hid="([^"]+)"\s+title="([^"]+)"\s*/>'
-                matches = re.findall(tag_pattern, text)
-                for hid, encoded_title in matches:
+                for hid, encoded_title in _HASHTAG_RE.findall(text):
                     try:
-                        # 解码标签名称
-                        import urllib.parse
-                        tag_name = urllib.parse.unquote(encoded_title)
-                        # 移除可能的#符号
-                        tag_name = tag_name.strip('#')
+                        # 解码标签名称，并移除可能的#符号
+                        tag_name = unquote(encoded_title).strip('#')
                         if tag_name:
                             all_tags.add((tag_name, hid))
                     except Exception as e:
                         print(f"解码标签失败: {e}")
-        
-        # 为每个标签创建或更新数据库记录
-        for tag_name, hid in all_tags:
-            tag_id = self._upsert_tag(group_id, tag_name, hid)
-            if tag_id:
-                self._link_topic_tag(topic_id, tag_id)
+
+        return all_tags
+
+    def _link_topic_tags_batch(self, tag_links: List[Tuple[int, int, str, str]], current_time: str) -> int:
+        """批量写入标签及话题-标签关联，tag_links 为 (topic_id, group_id, tag_name, hid) 列表"""
+        if not tag_links:
+            return 0
+
+        # 同名标签以最后出现的 hid 为准（与逐条导入时 UPDATE hid 的效果一致）
+        tag_hids: Dict[Tuple[int, str], str] = {}
+        for _, group_id, tag_name, hid in tag_links:
+            tag_hids[(group_id, tag_name)] = hid
+
+        self.cursor.executemany('''
+            INSERT OR IGNORE INTO tags (group_id, tag_name, hid, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', [(group_id, tag_name, hid, current_time) for (group_id, tag_name), hid in tag_hids.items()])
+        self.cursor.executemany('''
+            UPDATE tags SET hid = ? WHERE group_id = ? AND tag_name = ?
+        ''', [(hid, group_id, tag_name) for (group_id, tag_name), hid in tag_hids.items() if hid])
+
+        tag_ids: Dict[Tuple[int, str], int] = {}
+        for group_id, tag_name in tag_hids:
+            self.cursor.execute('SELECT tag_id FROM tags WHERE group_id = ? AND tag_name = ?', (group_id, tag_name))
+            row = self.cursor.fetchone()
+            if row:
+                tag_ids[(group_id, tag_name)] = row[0]
+
+        link_rows = [
+            (topic_id, tag_ids[(group_id, tag_name)], current_time)
+            for topic_id, group_id, tag_name, _ in tag_links
+            if (group_id, tag_name) in tag_ids
+        ]
+        self.cursor.executemany('''
+            INSERT OR IGNORE INTO topic_tags (topic_id, tag_id, created_at)
+            VALUES (?, ?, ?)
+        ''', link_rows)
+
+        # 更新标签的话题计数
+        touched = sorted(set(tag_ids.values()))
+        self.cursor.executemany('''
+            UPDATE tags SET topic_count = (
+                SELECT COUNT(*) FROM topic_tags WHERE tag_id = ?
+            ) WHERE tag_id = ?
+        ''', [(tag_id, tag_id) for tag_id in touched])
+
+        return len(tag_hids) + len(link_rows)
     
     def _upsert_tag(self, group_id: int, tag_name: str, hid: str = None) -> Optional[int]:
         """插入或更新标签信息"""
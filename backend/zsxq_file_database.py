@@ -1,6 +1,8 @@
-import sqlite3
+import threading
 from typing import Dict, List, Any, Optional
 
+from .sqlite_connection import connect_sqlite
+
 
 class ZSXQFileDatabase:
     """知识星球文件列表数据库管理工具 - 完全匹配API响应结构"""
@@ -8,8 +10,10 @@ class ZSXQFileDatabase:
     def __init__(self, db_path: str = "zsxq_files_complete.db"):
         """初始化数据库连接"""
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn = connect_sqlite(db_path)
         self.cursor = self.conn.cursor()
+        # 并发下载时工作线程也会写入进度，写操作经此锁串行化
+        self._write_lock = threading.RLock()
         self.create_tables()
     
     def create_tables(self):
@@ -41,7 +45,9 @@ class ZSXQFileDatabase:
             imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             download_status TEXT DEFAULT 'pending',
             local_path TEXT,
-            download_time TIMESTAMP
+            download_time TIMESTAMP,
+            part_path TEXT,
+            downloaded_bytes INTEGER DEFAULT 0
         )
         ''')
 
@@ -718,6 +724,47 @@ class ZSXQFileDatabase:
         
         return stats
 
+    def get_download_progress(self, file_id: int) -> Dict[str, Any]:
+        """获取文件的断点续传进度"""
+        with self._write_lock:
+            row = self.conn.execute(
+                'SELECT part_path, downloaded_bytes FROM files WHERE file_id = ?', (file_id,)
+            ).fetchone()
+        if not row:
+            return {'part_path': None, 'downloaded_bytes': 0}
+        return {'part_path': row[0], 'downloaded_bytes': row[1] or 0}
+
+    def update_download_progress(self, file_id: int, part_path: Optional[str], downloaded_bytes: int):
+        """记录断点续传进度（.part 文件路径与已写入字节数），下载完成后 part_path 置空"""
+        with self._write_lock:
+            self.conn.execute('''
+            UPDATE files
+            SET part_path = ?,
+                downloaded_bytes = ?
+            WHERE file_id = ?
+            ''', (part_path, downloaded_bytes, file_id))
+            self.conn.commit()
+
+    def mark_download_status(self, file_id: int, status: str, local_path: Optional[str] = None):
+        """更新文件下载状态（completed 时同时记录本地路径）"""
+        with self._write_lock:
+            if local_path is not None:
+                self.conn.execute('''
+                UPDATE files
+                SET download_status = ?,
+                    local_path = ?,
+                    download_time = CURRENT_TIMESTAMP
+                WHERE file_id = ?
+                ''', (status, local_path, file_id))
+            else:
+                self.conn.execute('''
+                UPDATE files
+                SET download_status = ?,
+                    download_time = CURRENT_TIMESTAMP
+                WHERE file_id = ?
+                ''', (status, file_id))
+            self.conn.commit()
+
     def _migrate_database(self):
         """执行数据库迁移，添加新列"""
         migrations = [
@@ -735,6 +782,16 @@ class ZSXQFileDatabase:
                 'table': 'files',
                 'column': 'download_time',
                 'definition': 'TIMESTAMP'
+            },
+            {
+                'table': 'files',
+                'column': 'part_path',
+                'definition': 'TEXT'
+            },
+            {
+                'table': 'files',
+                'column': 'downloaded_bytes',
+                'definition': 'INTEGER DEFAULT 0'
             }
         ]
 
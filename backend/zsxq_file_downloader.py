@@ -11,11 +11,16 @@ import datetime
 import json
 import os
 import random
+import threading
 import time
-from typing import Dict, Optional, Any
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from .download_governor import get_download_governor
+from .group_stats_cache import record_file_added
 from .zsxq_file_database import ZSXQFileDatabase
 from .zsxq_retry import (
     ensure_global_max_retries,
@@ -24,6 +29,18 @@ from .zsxq_retry import (
 )
 
 
+# 下载时每次读取/写入的块大小
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# 每写入多少字节把续传进度记录到数据库
+PROGRESS_PERSIST_BYTES = 8 * 1024 * 1024
+# 每下载多少字节输出一次进度日志
+PROGRESS_LOG_BYTES = 10 * 1024 * 1024
+# 默认并发下载数（可通过 ZSXQ_DOWNLOAD_WORKERS 调整）
+DEFAULT_DOWNLOAD_WORKERS = 3
+# 并发下载时输出汇总吞吐的最小间隔（秒）
+THROUGHPUT_LOG_INTERVAL = 30
+
+
 class ZSXQFileDownloader:
     """知识星球文件下载器"""
 
@@ -31,7 +48,7 @@ class ZSXQFileDownloader:
                  download_interval: float = 1.0, long_sleep_interval: float = 60.0,
                  files_per_batch: int = 10, download_interval_min: float = None,
                  download_interval_max: float = None, long_sleep_interval_min: float = None,
-                 long_sleep_interval_max: float = None):
+                 long_sleep_interval_max: float = None, max_concurrent_downloads: Optional[int] = None):
         """
         初始化文件下载器
 
@@ -47,6 +64,7 @@ class ZSXQFileDownloader:
             download_interval_max: 随机下载间隔最大值（秒）
             long_sleep_interval_min: 随机长休眠间隔最小值（秒）
             long_sleep_interval_max: 随机长休眠间隔最大值（秒）
+            max_concurrent_downloads: 并发下载数（下载链接请求仍按上述间隔串行节流）
         """
         self.cookie = self.clean_cookie(cookie)
         self.group_id = group_id
@@ -101,14 +119,31 @@ class ZSXQFileDownloader:
         self.min_delay = 2.0  # 最小延迟（秒）
         self.max_delay = 5.0  # 最大延迟（秒）
         self.long_delay_interval = 5  # 每N个文件进行长休眠
+        self.transfer_retries = 3  # 单个文件传输中断后按 Range 续传的次数
 
         # 统计
         self.request_count = 0
         self.download_count = 0
         self.debug_mode = False
 
-        # 创建session
+        # 并发下载设置
+        if max_concurrent_downloads is None:
+            try:
+                max_concurrent_downloads = int(os.environ.get('ZSXQ_DOWNLOAD_WORKERS', DEFAULT_DOWNLOAD_WORKERS))
+            except ValueError:
+                max_concurrent_downloads = DEFAULT_DOWNLOAD_WORKERS
+        self.max_concurrent_downloads = max(1, max_concurrent_downloads)
+        self.bytes_transferred = 0
+        self._stats_lock = threading.Lock()
+        # 清理后文件名相同的文件共用同一个正式文件，并发下载时按目标路径逐个进行
+        self._target_locks: Dict[str, threading.Lock] = {}
+        self._target_locks_guard = threading.Lock()
+
+        # 创建session（连接池容量与并发下载数匹配）
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max(10, self.max_concurrent_downloads))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
         # 确保下载目录存在
         os.makedirs(self.download_dir, exist_ok=True)
@@ -358,7 +393,8 @@ class ZSXQFileDownloader:
 
             # 每次重试都获取新的请求头（包含新的User-Agent等）
             self.smart_delay()
-            self.request_count += 1
+            with self._stats_lock:
+                self.request_count += 1
             headers = self.get_stealth_headers()
 
             if attempt > 0:
@@ -450,7 +486,8 @@ class ZSXQFileDownloader:
 
             # 每次重试都获取新的请求头（包含新的User-Agent等）
             self.smart_delay()
-            self.request_count += 1
+            with self._stats_lock:
+                self.request_count += 1
             headers = self.get_stealth_headers()
 
             if attempt > 0:
@@ -529,8 +566,23 @@ class ZSXQFileDownloader:
         print(f"   🚫 已重试{max_retries}次，全部失败")
         return None
 
-    def download_file(self, file_info: Dict[str, Any]) -> bool:
-        """下载单个文件"""
+    def get_rate_governor(self):
+        """获取当前账号共享的下载链接限速器（按当前间隔设置配置）"""
+        if self.use_random_interval:
+            interval_range = (self.download_interval_min, self.download_interval_max)
+            long_sleep_range = (self.long_sleep_interval_min, self.long_sleep_interval_max)
+        else:
+            interval_range = (self.download_interval, self.download_interval)
+            long_sleep_range = (self.long_sleep_interval, self.long_sleep_interval)
+        return get_download_governor(self.cookie, interval_range, long_sleep_range, self.files_per_batch)
+
+    def download_file(self, file_info: Dict[str, Any], governed: bool = False) -> bool:
+        """下载单个文件
+
+        Args:
+            file_info: 文件信息（成功时写入 local_path 字段）
+            governed: 是否由并发下载池调用；为 True 时下载链接请求经限速器节流，不再在传输后休眠
+        """
         file_data = file_info.get('file', {})
         file_id = file_data.get('id')
         file_name = file_data.get('name', 'Unknown')
@@ -553,7 +605,21 @@ class ZSXQFileDownloader:
             safe_filename = f"file_{file_id}"
 
         file_path = os.path.join(self.download_dir, safe_filename)
-
+        with self._target_lock(file_path):
+            return self._download_to(file_info, file_id, file_name, file_size, safe_filename, file_path, governed)
+
+    def _target_lock(self, file_path: str) -> threading.Lock:
+        """同一正式文件路径共用的锁：避免并发任务同时检查、替换同一个文件"""
+        with self._target_locks_guard:
+            lock = self._target_locks.get(file_path)
+            if lock is None:
+                lock = self._target_locks[file_path] = threading.Lock()
+            return lock
+
+    def _download_to(self, file_info: Dict[str, Any], file_id: int, file_name: str, file_size: int,
+                     safe_filename: str, file_path: str, governed: bool) -> bool:
+        """把文件下载到 file_path（调用方持有该路径的锁）"""
+        locked_path = file_path
         # 🚀 优化：先检查本地文件，避免无意义的API请求
         if os.path.exists(file_path):
             existing_size = os.path.getsize(file_path)
@@ -563,94 +629,235 @@ class ZSXQFileDownloader:
             else:
                 self.log(f"   ⚠️ 文件已存在但大小不匹配，重新下载")
 
+        # 数据先写入 .part 文件，校验大小后再原子替换为正式文件；中断时保留 .part 供下次续传
+        # .part 名包含 file_id，同名的不同文件不会续传到彼此的数据上
+        part_path = self._part_path(file_path, file_id)
+        resume_from = self._get_resume_offset(file_id, part_path, file_size)
+        if resume_from > 0:
+            self.log(f"   ⏯️ 发现未完成的下载: 已有 {resume_from:,} bytes")
+
         # 只有在需要下载时才获取下载链接
+        if governed and not self.get_rate_governor().acquire(self.check_stop, self.log):
+            self.log("🛑 等待下载链接时被停止")
+            return False
         download_url = self.get_download_url(file_id)
         if not download_url:
             self.log(f"   ❌ 无法获取下载链接")
             return False
 
-        try:
-            # 下载文件
-            self.log(f"   🚀 开始下载...")
-            response = self.session.get(download_url, timeout=300, stream=True)
-
-            # 如果文件名是默认的，尝试从响应头获取真实文件名
-            if file_name.startswith('file_') and 'content-disposition' in response.headers:
-                content_disposition = response.headers['content-disposition']
-                if 'filename=' in content_disposition:
-                    # 提取文件名
-                    import re
-                    filename_match = re.search(r'filename[*]?=([^;]+)', content_disposition)
-                    if filename_match:
-                        real_filename = filename_match.group(1).strip('"\'')
-                        if real_filename:
-                            file_name = real_filename
-                            safe_filename = "".join(c for c in file_name if c.isalnum() or c in '._-（）()[]{}')
-                            if not safe_filename:
-                                safe_filename = f"file_{file_id}"
-                            file_path = os.path.join(self.download_dir, safe_filename)
-                            self.log(f"   📝 从响应头获取到真实文件名: {file_name}")
-
-            if response.status_code == 200:
-                total_size = int(response.headers.get('content-length', 0))
-                downloaded_size = 0
-
-                with open(file_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded_size += len(chunk)
-
-                            # 显示进度（每10MB显示一次）
-                            if downloaded_size % (10 * 1024 * 1024) == 0 or downloaded_size == total_size:
-                                if total_size > 0:
-                                    progress = (downloaded_size / total_size) * 100
-                                    self.log(f"   📊 进度: {progress:.1f}% ({downloaded_size:,}/{total_size:,} bytes)")
-
-                            # 检查是否需要停止
-                            if self.check_stop():
-                                self.log("🛑 下载过程中被停止")
-                                return False
-
-                            if downloaded_size % (10 * 1024 * 1024) != 0 and downloaded_size != total_size:
-                                if total_size == 0:
-                                    self.log(f"   📊 已下载: {downloaded_size:,} bytes")
-
-                # 验证文件大小
-                final_size = os.path.getsize(file_path)
-                if file_size > 0 and final_size != file_size:
-                    self.log(f"   ⚠️ 文件大小不匹配: 预期{file_size:,}, 实际{final_size:,}")
-
-                self.log(f"   ✅ 下载完成: {safe_filename}")
-                self.log(f"   💾 保存路径: {file_path}")
-
-                self.download_count += 1
-                self.current_batch_count += 1
-
-                # 下载间隔控制
-                self._apply_download_intervals()
-
-                return True
+        total_size = 0
+        # 传输中断时使用同一个下载链接按 Range 续传，无需重新获取链接
+        for attempt in range(1, self.transfer_retries + 1):
+            if attempt == 1:
+                self.log(f"   🚀 开始下载..." if resume_from == 0 else f"   🚀 从 {resume_from:,} bytes 处续传...")
             else:
-                self.log(f"   ❌ 下载失败: HTTP {response.status_code}")
-                return False
+                self.log(f"   🔄 第{attempt}次尝试，从 {resume_from:,} bytes 处续传...")
 
-        except Exception as e:
-            self.log(f"   ❌ 下载异常: {e}")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                self.log(f"   🗑️ 删除不完整文件")
+            headers = {'Range': f'bytes={resume_from}-'} if resume_from > 0 else None
+            try:
+                with self.session.get(download_url, headers=headers, timeout=(15, 300), stream=True) as response:
+                    # 如果文件名是默认的，尝试从响应头获取真实文件名
+                    if file_name.startswith('file_') and 'content-disposition' in response.headers:
+                        content_disposition = response.headers['content-disposition']
+                        if 'filename=' in content_disposition:
+                            # 提取文件名
+                            import re
+                            filename_match = re.search(r'filename[*]?=([^;]+)', content_disposition)
+                            if filename_match:
+                                real_filename = filename_match.group(1).strip('"\'')
+                                if real_filename:
+                                    file_name = real_filename
+                                    safe_filename = "".join(c for c in file_name if c.isalnum() or c in '._-（）()[]{}')
+                                    if not safe_filename:
+                                        safe_filename = f"file_{file_id}"
+                                    file_path = os.path.join(self.download_dir, safe_filename)
+                                    self.log(f"   📝 从响应头获取到真实文件名: {file_name}")
+
+                    if response.status_code == 416 and resume_from > 0:
+                        # 请求范围超出文件末尾：.part 已完整则直接收尾，否则丢弃重下
+                        if file_size > 0 and resume_from == file_size:
+                            total_size = file_size
+                            break
+                        self.log(f"   ⚠️ 续传范围无效，丢弃未完成的数据重新下载")
+                        resume_from = self._discard_part(file_id, part_path)
+                        continue
+
+                    if response.status_code == 206 and resume_from > 0:
+                        range_start, range_total = self._parse_content_range(response.headers.get('content-range'))
+                        if range_start != resume_from:
+                            self.log(f"   ⚠️ 服务器返回的续传起点({range_start})与本地不一致，重新下载")
+                            resume_from = self._discard_part(file_id, part_path)
+                            continue
+                        total_size = range_total or resume_from + int(response.headers.get('content-length', 0))
+                        mode = 'ab'
+                    elif response.status_code == 200:
+                        if resume_from > 0:
+                            self.log(f"   ⚠️ 服务器不支持断点续传，从头下载")
+                            resume_from = 0
+                        total_size = int(response.headers.get('content-length', 0))
+                        mode = 'wb'
+                    else:
+                        self.log(f"   ❌ 下载失败: HTTP {response.status_code}")
+                        return False
+
+                    downloaded_size = self._stream_to_part(response, part_path, mode, file_id, resume_from, total_size)
+                    if downloaded_size is None:
+                        self.log("🛑 下载过程中被停止，已保留未完成的数据")
+                        return False
+                    resume_from = downloaded_size
+                break
+
+            except Exception as e:
+                self.log(f"   ❌ 下载异常: {e}")
+                resume_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                self.file_db.update_download_progress(file_id, part_path, resume_from)
+                if attempt >= self.transfer_retries or self.check_stop():
+                    if resume_from > 0:
+                        self.log(f"   💾 已保留 {resume_from:,} bytes，下次下载时续传")
+                    return False
+                time.sleep(min(2 ** attempt, 30))
+        else:
+            self.log(f"   ❌ 下载失败: 已重试{self.transfer_retries}次")
+            return False
+
+        # 校验大小：不完整时保留 .part 待续传，超出预期说明数据已损坏
+        final_size = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        expected_size = total_size or file_size
+        if expected_size > 0 and final_size < expected_size:
+            self.log(f"   ⚠️ 下载不完整: 预期{expected_size:,}, 实际{final_size:,}，保留未完成的数据待续传")
+            self.file_db.update_download_progress(file_id, part_path, final_size)
+            return False
+        if expected_size > 0 and final_size > expected_size:
+            self.log(f"   ❌ 文件大小超出预期: 预期{expected_size:,}, 实际{final_size:,}，丢弃已下载数据")
+            self._discard_part(file_id, part_path)
             return False
+        if file_size > 0 and final_size != file_size:
+            self.log(f"   ⚠️ 文件大小不匹配: 预期{file_size:,}, 实际{final_size:,}")
+
+        if file_path == locked_path:
+            os.replace(part_path, file_path)
+        else:
+            # 响应头给出了真实文件名：先释放原路径的锁再取新路径的锁，
+            # 任何时刻只持有一把锁，两个任务互相改名到对方路径时不会死锁
+            locked = self._target_lock(locked_path)
+            locked.release()
+            try:
+                with self._target_lock(file_path):
+                    os.replace(part_path, file_path)
+            finally:
+                locked.acquire()
+        self.file_db.update_download_progress(file_id, None, final_size)
+        file_info['local_path'] = file_path
+        record_file_added(self.group_id, file_path, final_size)
+
+        self.log(f"   ✅ 下载完成: {safe_filename}")
+        self.log(f"   💾 保存路径: {file_path}")
+
+        with self._stats_lock:
+            self.download_count += 1
+            self.current_batch_count += 1
+
+        # 下载间隔控制（并发下载时由限速器负责）
+        if not governed:
+            self._apply_download_intervals()
+
+        return True
+
+    @staticmethod
+    def _part_path(file_path: str, file_id: int) -> str:
+        return f"{file_path}.{file_id}.part"
+
+    def _get_resume_offset(self, file_id: int, part_path: str, file_size: int) -> int:
+        """根据本地 .part 文件确定续传起点（数据库记录的进度可能滞后，以磁盘为准）"""
+        progress = self.file_db.get_download_progress(file_id)
+        recorded_path = progress.get('part_path')
+        # 文件名变化（如列表刷新后改名）时沿用数据库中记录的 .part；
+        # 只接受属于该 file_id 的 .part（旧版本按文件名命名的 .part 可能来自同名的其他文件）
+        if recorded_path and recorded_path != part_path and recorded_path.endswith(f".{file_id}.part") \
+                and os.path.exists(recorded_path) and not os.path.exists(part_path):
+            os.replace(recorded_path, part_path)
+
+        if not os.path.exists(part_path):
+            return 0
+
+        part_size = os.path.getsize(part_path)
+        if file_size > 0 and part_size > file_size:
+            self.log(f"   ⚠️ 未完成的数据超过文件大小，丢弃后重新下载")
+            return self._discard_part(file_id, part_path)
+        return part_size
+
+    def _discard_part(self, file_id: int, part_path: str) -> int:
+        """删除 .part 文件并清空续传进度"""
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        self.file_db.update_download_progress(file_id, None, 0)
+        return 0
+
+    @staticmethod
+    def _parse_content_range(content_range: Optional[str]):
+        """解析 Content-Range: bytes start-end/total，返回 (start, total)，无法解析时为 (None, 0)"""
+        if not content_range:
+            return None, 0
+        try:
+            unit_range, _, total = content_range.partition('/')
+            start = int(unit_range.split()[-1].split('-')[0])
+            return start, int(total) if total.isdigit() else 0
+        except (ValueError, IndexError):
+            return None, 0
+
+    def _stream_to_part(self, response, part_path: str, mode: str, file_id: int,
+                        offset: int, total_size: int) -> Optional[int]:
+        """把响应体写入 .part 文件并定期记录进度，返回写入后的文件大小；被停止时返回 None"""
+        downloaded_size = offset
+        next_log = (offset // PROGRESS_LOG_BYTES + 1) * PROGRESS_LOG_BYTES
+        next_persist = offset + PROGRESS_PERSIST_BYTES
+
+        try:
+            with open(part_path, mode, buffering=DOWNLOAD_CHUNK_SIZE) as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    downloaded_size += len(chunk)
+                    with self._stats_lock:
+                        self.bytes_transferred += len(chunk)
+
+                    # 显示进度（每10MB显示一次）
+                    if downloaded_size >= next_log or downloaded_size == total_size:
+                        next_log = (downloaded_size // PROGRESS_LOG_BYTES + 1) * PROGRESS_LOG_BYTES
+                        if total_size > 0:
+                            progress = (downloaded_size / total_size) * 100
+                            self.log(f"   📊 进度: {progress:.1f}% ({downloaded_size:,}/{total_size:,} bytes)")
+                        else:
+                            self.log(f"   📊 已下载: {downloaded_size:,} bytes")
+
+                    if downloaded_size >= next_persist:
+                        f.flush()
+                        self.file_db.update_download_progress(file_id, part_path, downloaded_size)
+                        next_persist = downloaded_size + PROGRESS_PERSIST_BYTES
+
+                    # 检查是否需要停止
+                    if self.check_stop():
+                        return None
+        finally:
+            # 异常或停止时同样记录已落盘的进度
+            if os.path.exists(part_path):
+                self.file_db.update_download_progress(file_id, part_path, os.path.getsize(part_path))
+
+        return downloaded_size
 
     def _apply_download_intervals(self):
         """应用下载间隔控制"""
         import time
 
         # 检查是否需要长休眠
-        if self.current_batch_count >= self.files_per_batch:
-            self.log(f"⏰ 已下载 {self.current_batch_count} 个文件，开始长休眠 {self.long_sleep_interval} 秒...")
+        with self._stats_lock:
+            batch_count = self.current_batch_count
+            if batch_count >= self.files_per_batch:
+                self.current_batch_count = 0  # 重置批次计数
+        if batch_count >= self.files_per_batch:
+            self.log(f"⏰ 已下载 {batch_count} 个文件，开始长休眠 {self.long_sleep_interval} 秒...")
             time.sleep(self.long_sleep_interval)
-            self.current_batch_count = 0  # 重置批次计数
             self.log(f"😴 长休眠结束，继续下载")
         else:
             # 普通下载间隔
@@ -658,6 +865,62 @@ class ZSXQFileDownloader:
                 self.log(f"⏱️ 下载间隔休眠 {self.download_interval} 秒...")
                 time.sleep(self.download_interval)
 
+    def _download_concurrently(self, file_infos: Iterable[Dict[str, Any]],
+                               on_result: Callable[[Dict[str, Any], Any], None],
+                               should_submit: Optional[Callable[[], bool]] = None) -> None:
+        """用有界线程池并发下载文件
+
+        下载链接请求经账号共享的令牌桶串行节流，CDN 传输最多并行 max_concurrent_downloads 个。
+        on_result 在调用线程中按完成顺序执行（数据库状态更新等），should_submit 返回 False 时不再提交新文件。
+        """
+        workers = self.max_concurrent_downloads
+        file_iter = iter(file_infos)
+        pending = {}
+        started = time.time()
+        bytes_at_start = self.bytes_transferred
+        last_report = started
+
+        def report_throughput(final: bool = False):
+            elapsed = max(time.time() - started, 1e-6)
+            transferred = self.bytes_transferred - bytes_at_start
+            prefix = "📶 下载吞吐汇总" if final else "📶 当前下载吞吐"
+            self.log(f"{prefix}: {transferred/1024/1024:.1f} MB / {elapsed:.0f}秒, "
+                     f"平均 {transferred/1024/1024/elapsed:.2f} MB/s (并发 {workers})")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='zsxq-download') as executor:
+            def submit_next() -> bool:
+                if self.check_stop() or (should_submit and not should_submit()):
+                    return False
+                file_info = next(file_iter, None)
+                if file_info is None:
+                    return False
+                pending[executor.submit(self.download_file, file_info, True)] = file_info
+                return True
+
+            while len(pending) < workers and submit_next():
+                pass
+
+            while pending:
+                done, _ = wait(pending, timeout=THROUGHPUT_LOG_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_info = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.log(f"   ❌ 下载线程异常: {e}")
+                        result = False
+                    on_result(file_info, result)
+
+                if time.time() - last_report >= THROUGHPUT_LOG_INTERVAL:
+                    report_throughput()
+                    last_report = time.time()
+
+                while len(pending) < workers and submit_next():
+                    pass
+
+        if self.bytes_transferred > bytes_at_start:
+            report_throughput(final=True)
+
     def download_files_batch(self, max_files: Optional[int] = None, start_index: Optional[str] = None) -> Dict[str, int]:
         """批量下载文件"""
         if max_files is None:
@@ -695,45 +958,37 @@ class ZSXQFileDownloader:
 
             self.log(f"📋 当前批次: {len(files)} 个文件")
 
-            for i, file_info in enumerate(files):
-                # 检查是否需要停止
-                if self.check_stop():
-                    self.log("🛑 文件下载过程中被停止")
-                    break
-
-                if max_files is not None and downloaded_in_batch >= max_files:
-                    break
-
-                file_data = file_info.get('file', {})
-                file_name = file_data.get('name', 'Unknown')
-
-                if max_files is None:
-                    self.log(f"【第{downloaded_in_batch + 1}个文件】{file_name}")
-                else:
-                    self.log(f"【{downloaded_in_batch + 1}/{max_files}】{file_name}")
-
-                # 下载文件
-                result = self.download_file(file_info)
-
+            def build_file_infos():
+                for file_info in files:
+                    file_name = file_info.get('file', {}).get('name', 'Unknown')
+                    if max_files is None:
+                        self.log(f"【第{stats['total_files'] + 1}个文件】{file_name}")
+                    else:
+                        self.log(f"【{stats['total_files'] + 1}/{max_files}】{file_name}")
+                    stats['total_files'] += 1
+                    yield file_info
+
+            def record_result(file_info, result):
+                nonlocal downloaded_in_batch
                 if result == "skipped":
                     stats['skipped'] += 1
                     self.log(f"   ⚠️ 文件已跳过，继续下一个")
                 elif result:
                     stats['downloaded'] += 1
                     downloaded_in_batch += 1
-
-                    # 检查长休眠
-                    self.check_long_delay()
-
-                    # 如果不是最后一个文件，进行下载间隔
-                    has_more_in_batch = (i + 1) < len(files)
-                    not_reached_limit = max_files is None or downloaded_in_batch < max_files
-                    if has_more_in_batch and not_reached_limit:
-                        self.download_delay()
                 else:
                     stats['failed'] += 1
 
-                stats['total_files'] += 1
+            # 在途下载可能都会成功，按在途数计算是否还需提交，避免超出 max_files
+            def should_submit():
+                return max_files is None or downloaded_in_batch + (stats['total_files'] - stats['downloaded']
+                                                                   - stats['skipped'] - stats['failed']) < max_files
+
+            self._download_concurrently(build_file_infos(), record_result, should_submit)
+
+            if self.check_stop():
+                self.log("🛑 文件下载过程中被停止")
+                break
 
             # 准备下一页
             should_continue = max_files is None or downloaded_in_batch < max_files
@@ -1205,83 +1460,53 @@ class ZSXQFileDownloader:
 
         stats = {'total_files': len(files_to_download), 'downloaded': 0, 'skipped': 0, 'failed': 0}
 
-        for i, (file_id, file_name, file_size, download_count, create_time) in enumerate(files_to_download, 1):
-            # 检查是否需要停止
-            if self.check_stop():
-                self.log("🛑 下载任务被停止")
-                break
+        if self.max_concurrent_downloads > 1:
+            self.log(f"   ⚡ 并发下载: {self.max_concurrent_downloads} 个")
 
-            try:
+        def build_file_infos():
+            for i, (file_id, file_name, file_size, download_count, create_time) in enumerate(files_to_download, 1):
                 self.log(f"【{i}/{len(files_to_download)}】{file_name}")
-                self.log(f"   📊 文件ID: {file_id}, 大小: {file_size/1024:.1f}KB, 下载次数: {download_count}")
+                self.log(f"   📊 文件ID: {file_id}, 大小: {(file_size or 0)/1024:.1f}KB, 下载次数: {download_count}")
 
                 # 构造文件信息结构（使用正确的file_id）
-                file_info = {
+                yield {
                     'file': {
                         'id': file_id,  # 使用正确的file_id
                         'name': file_name,
-                        'size': file_size,
+                        'size': file_size or 0,
                         'download_count': download_count
                     }
                 }
 
-                # 下载文件
-                result = self.download_file(file_info)
-
+        def record_result(file_info, result):
+            file_id = file_info['file']['id']
+            file_name = file_info['file']['name']
+            try:
                 if result == "skipped":
                     stats['skipped'] += 1
-                    self.log(f"   ⚠️ 文件已跳过")
+                    self.log(f"   ⚠️ 文件已跳过: {file_name}")
                     # 更新数据库状态为已跳过
-                    self.file_db.cursor.execute('''
-                        UPDATE files
-                        SET download_status = 'skipped',
-                            download_time = CURRENT_TIMESTAMP
-                        WHERE file_id = ?
-                    ''', (file_id,))
-                    self.file_db.conn.commit()
+                    self.file_db.mark_download_status(file_id, 'skipped')
                 elif result:
                     stats['downloaded'] += 1
                     # 更新数据库状态为已完成
-                    safe_filename = "".join(c for c in file_name if c.isalnum() or c in '._-（）()[]{}')
-                    if not safe_filename:
-                        safe_filename = f"file_{file_id}"
-                    file_path = os.path.join(self.download_dir, safe_filename)
-
-                    self.file_db.cursor.execute('''
-                        UPDATE files
-                        SET download_status = 'completed',
-                            local_path = ?,
-                            download_time = CURRENT_TIMESTAMP
-                        WHERE file_id = ?
-                    ''', (file_path, file_id))
-                    self.file_db.conn.commit()
-                    self.log(f"   ✅ 数据库状态已更新为: completed")
-
-                    # 检查长休眠
-                    self.check_long_delay()
-
-                    # 如果不是最后一个文件，进行下载间隔
-                    if i < len(files_to_download):
-                        self.download_delay()
+                    self.file_db.mark_download_status(file_id, 'completed', file_info.get('local_path'))
+                    self.log(f"   ✅ 数据库状态已更新为: completed ({file_name})")
                 else:
                     stats['failed'] += 1
-                    self.log(f"   ❌ 下载失败")
+                    self.log(f"   ❌ 下载失败: {file_name}")
                     # 更新数据库状态为失败
-                    self.file_db.cursor.execute('''
-                        UPDATE files
-                        SET download_status = 'failed',
-                            download_time = CURRENT_TIMESTAMP
-                        WHERE file_id = ?
-                    ''', (file_id,))
-                    self.file_db.conn.commit()
-
-            except KeyboardInterrupt:
-                self.log(f"⏹️ 用户中断下载")
-                break
+                    self.file_db.mark_download_status(file_id, 'failed')
             except Exception as e:
                 self.log(f"   ❌ 处理文件异常: {e}")
-                stats['failed'] += 1
-                continue
+
+        try:
+            self._download_concurrently(build_file_infos(), record_result)
+        except KeyboardInterrupt:
+            self.log(f"⏹️ 用户中断下载")
+
+        if self.check_stop():
+            self.log("🛑 下载任务被停止")
 
         self.log(f"🎉 数据库下载完成:")
         self.log(f"   📊 总文件数: {stats['total_files']}")
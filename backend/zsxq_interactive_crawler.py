@@ -4,13 +4,16 @@
 支持多种爬取模式，增强反检测机制
 """
 
+import functools
 import requests
 import time
 import random
 import json
-from typing import Dict, Any, Optional, List
-from .zsxq_database import ZSXQDatabase
+from typing import Dict, Any, Optional, List, Tuple
+from .zsxq_database import ZSXQDatabase, ms_to_topic_time, topic_time_to_ms
 from .zsxq_file_downloader import ZSXQFileDownloader
+from .comment_backfill import CommentBackfillQueue
+from .group_stats_cache import record_topics_added
 from .db_path_manager import get_db_path_manager
 from .logger_config import log_error, log_info, log_warning
 from .zsxq_retry import (
@@ -31,6 +34,19 @@ except ImportError:
         log_warning("💡 请运行: pip install tomli")
         tomllib = None
 
+COMMENT_REQUEST_INTERVAL = 1.0  # 未使用账号级限速器时评论接口的请求间隔（秒）
+
+
+def _drains_comment_backfill(method):
+    """爬取方法返回前等待评论补全队列处理完毕，任务结束时评论已全部入库"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.wait_comment_backfill()
+    return wrapper
+
 
 class ZSXQInteractiveCrawler:
     """知识星球交互式数据采集器"""
@@ -76,6 +92,12 @@ class ZSXQInteractiveCrawler:
         self.custom_long_delay_max = None
         self.custom_pages_per_batch = None
 
+        # 账号级限速器（由多群组调度器注入）：设置后请求间隔与长休眠由同一账号下的所有群组共享
+        self.rate_governor = None
+
+        # 评论较多的话题交给独立线程补全，不阻塞时间线翻页
+        self.comment_backfill = CommentBackfillQueue(self)
+
         self.log(f"🚀 知识星球交互式采集器初始化完成")
         self.log(f"📊 目标群组: {group_id}")
         self.log(f"💾 数据库: {db_path}")
@@ -267,6 +289,12 @@ class ZSXQInteractiveCrawler:
         """智能延迟机制 - 模拟人类行为（仅基础延迟）"""
         self.request_count += 1
 
+        if self.rate_governor is not None:
+            # 同一账号的其它群组可能同时在爬取，统一从账号令牌桶取令牌
+            self.rate_governor.acquire(stop_check=self.is_stopped, log=self.log)
+            self.last_request_time = time.time()
+            return
+
         # 基础延迟时间
         if self.use_custom_intervals and self.custom_min_delay and self.custom_max_delay:
             # 使用自定义间隔
@@ -294,6 +322,10 @@ class ZSXQInteractiveCrawler:
         """检查页面级长休眠：根据配置进行长休眠"""
         self.page_count += 1
 
+        # 使用账号级限速器时长休眠按账号统一进行
+        if self.rate_governor is not None:
+            return
+
         # 确定长休眠间隔
         if self.use_custom_intervals and self.custom_pages_per_batch:
             interval = self.custom_pages_per_batch
@@ -330,8 +362,16 @@ class ZSXQInteractiveCrawler:
                 actual_duration = (actual_end_time - start_time).total_seconds()
                 self.log(f"   💤 长休眠完成: 预计{long_delay:.1f}秒，实际{actual_duration:.1f}秒 (页面#{self.page_count})")
 
-    def fetch_comments_safe(self, topic_id: int, begin_time: str = None, count: int = 30, max_retries: int = 10) -> Optional[Dict[str, Any]]:
-        """安全获取话题评论，包含重试机制处理反爬"""
+    def comment_request_delay(self):
+        """评论接口的请求间隔：有账号级限速器时与话题请求共用令牌桶，否则固定间隔"""
+        if self.rate_governor is not None:
+            self.rate_governor.acquire(stop_check=self.is_stopped, log=self.log)
+        else:
+            self._interruptible_sleep(COMMENT_REQUEST_INTERVAL)
+
+    def fetch_comments_safe(self, topic_id: int, begin_time: str = None, count: int = 30, max_retries: int = 10,
+                            session: Optional[requests.Session] = None) -> Optional[Dict[str, Any]]:
+        """安全获取话题评论，包含重试机制处理反爬（session 为空时使用采集器自身的会话）"""
         max_retries = ensure_global_max_retries(max_retries)
         for retry in range(max_retries):
             try:
@@ -363,7 +403,7 @@ class ZSXQInteractiveCrawler:
                     self.log(f"      X-Aduid: {headers.get('X-Aduid', 'N/A')}")
 
                 # 发送请求
-                response = self.session.get(url, params=params, headers=headers, timeout=30)
+                response = (session or self.session).get(url, params=params, headers=headers, timeout=30)
 
                 if response.status_code == 200:
                     data = response.json()
@@ -406,16 +446,27 @@ class ZSXQInteractiveCrawler:
 
         return None
 
-    def fetch_all_comments(self, topic_id: int, comments_count: int) -> List[Dict[str, Any]]:
-        """获取话题的所有评论（如果评论数量大于8）"""
+    def fetch_all_comments(self, topic_id: int, comments_count: int,
+                           session: Optional[requests.Session] = None,
+                           begin_time: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取话题的所有评论（如果评论数量大于8）；指定 begin_time 时只获取该时间及之后的评论"""
+        return self.fetch_comment_pages(topic_id, comments_count, session=session, begin_time=begin_time)[0]
+
+    def fetch_comment_pages(self, topic_id: int, comments_count: int,
+                            session: Optional[requests.Session] = None,
+                            begin_time: Optional[str] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """逐页获取评论，返回 (评论列表, 是否完整翻到最后一页)；请求失败或被停止时为不完整"""
         if comments_count <= 8:
-            return []  # 不需要额外获取
+            return [], False  # 不需要额外获取
 
-        self.log(f"📝 话题 {topic_id} 有 {comments_count} 条评论，开始获取完整评论列表...")
+        if begin_time:
+            self.log(f"📝 话题 {topic_id} 有 {comments_count} 条评论，获取 {begin_time} 之后的新评论...")
+        else:
+            self.log(f"📝 话题 {topic_id} 有 {comments_count} 条评论，开始获取完整评论列表...")
 
         all_comments = []
-        begin_time = None
         page = 1
+        complete = False
 
         while True:
             # 检查停止标志
@@ -426,7 +477,7 @@ class ZSXQInteractiveCrawler:
             self.log(f"   📄 获取第 {page} 页评论...")
 
             # 获取当前页评论
-            data = self.fetch_comments_safe(topic_id, begin_time, count=30)
+            data = self.fetch_comments_safe(topic_id, begin_time, count=30, session=session)
             if not data:
                 self.log(f"   ❌ 第 {page} 页获取失败，可能是权限问题，跳过此话题")
                 break
@@ -434,6 +485,7 @@ class ZSXQInteractiveCrawler:
             comments = data.get('resp_data', {}).get('comments', [])
             if not comments:
                 self.log(f"   📭 第 {page} 页无评论，停止获取")
+                complete = True
                 break
 
             self.log(f"   ✅ 第 {page} 页获取到 {len(comments)} 条评论")
@@ -450,6 +502,7 @@ class ZSXQInteractiveCrawler:
             # 如果返回的评论数量少于30，说明已经是最后一页
             if len(comments) < 30:
                 self.log(f"   🏁 已获取完所有评论，共 {len(all_comments)} 条")
+                complete = True
                 break
 
             # 准备下一页的 begin_time（最后一条评论的时间 + 1毫秒）
@@ -465,9 +518,63 @@ class ZSXQInteractiveCrawler:
             page += 1
 
             # 添加延迟避免请求过快
-            time.sleep(1)
+            self.comment_request_delay()
+
+        return all_comments, complete
+
+    def sync_topic_comments(self, topic_id: int, comments_count: int, db: Optional[ZSXQDatabase] = None,
+                            session: Optional[requests.Session] = None) -> Dict[str, Any]:
+        """按本地评论数与同步水位同步话题评论
 
-        return all_comments
+        本地评论已齐全时跳过；有同步水位时只获取水位之后的新评论，增量后仍不齐（如旧评论下的新回复）
+        或从未同步过时获取完整评论列表。返回 {'mode': 'skipped'|'incremental'|'full', 'comments': 导入条数}
+        """
+        db = db or self.db
+        if not db.filter_topics_needing_comment_sync({topic_id: comments_count}):
+            return {'mode': 'skipped', 'comments': 0}
+
+        state = db.get_comment_sync_states([topic_id]).get(topic_id) or {}
+        synced_until = state.get('synced_until')
+        mode = 'full'
+        imported = 0
+        complete = False
+
+        if synced_until:
+            comments = self.fetch_all_comments(topic_id, comments_count, session=session,
+                                               begin_time=self._increment_time(synced_until))
+            if comments:
+                db.import_additional_comments(topic_id, comments)
+                imported += len(comments)
+                synced_until = self._latest_root_comment_time(comments) or synced_until
+            mode = 'incremental'
+            if db.get_stored_comment_counts([topic_id]).get(topic_id, 0) < comments_count and not self.is_stopped():
+                self.log(f"   🔁 增量获取后评论数仍不足 {comments_count} 条，重新获取完整评论列表")
+                mode = 'full'
+
+        if mode == 'full':
+            comments, complete = self.fetch_comment_pages(topic_id, comments_count, session=session)
+            if comments:
+                db.import_additional_comments(topic_id, comments)
+                imported += len(comments)
+                synced_until = self._latest_root_comment_time(comments) or synced_until
+            elif not synced_until:
+                # 完整获取失败（如权限限制）时不记录水位，下次仍会重试
+                return {'mode': mode, 'comments': 0}
+
+        if not self.is_stopped():
+            # 只有本地评论已齐全，或完整翻页成功（差额来自已删除的评论）时才记录接口评论数，
+            # 否则记录本地实际评论数，获取失败或不完整的话题下次仍会同步
+            stored = db.get_stored_comment_counts([topic_id]).get(topic_id, 0)
+            synced_count = comments_count if complete or stored >= comments_count else stored
+            db.record_comment_sync(topic_id, synced_until, synced_count)
+        db.conn.commit()
+        return {'mode': mode, 'comments': imported}
+
+    @staticmethod
+    def _latest_root_comment_time(comments: List[Dict[str, Any]]) -> Optional[str]:
+        """一级评论中最新的创建时间（评论接口按一级评论时间翻页，回复不参与水位）"""
+        times = [c.get('create_time') for c in comments if c.get('create_time') and not c.get('parent_comment_id')]
+        return max(times, key=lambda t: topic_time_to_ms(t) or 0) if times else None
 
     def _increment_time(self, time_str: str) -> str:
         """将时间字符串增加1毫秒"""
@@ -645,8 +752,14 @@ class ZSXQInteractiveCrawler:
 
         return None
     
-    def store_batch_data(self, data: Dict[str, Any]) -> Dict[str, int]:
-        """批量存储数据到数据库"""
+    def store_batch_data(self, data: Dict[str, Any], covered_until: Optional[str] = None) -> Dict[str, int]:
+        """批量存储数据到数据库
+
+        Args:
+            data: 话题列表接口的响应
+            covered_until: 本页请求使用的 end_time；整页导入成功后记录 [本页最老话题, covered_until] 为已覆盖区间
+                           （首页请求没有 end_time，以本页最新话题为上界）
+        """
         # 在数据存储前检查停止标志
         if self.is_stopped():
             self.log("🛑 数据存储前检测到停止信号")
@@ -659,52 +772,108 @@ class ZSXQInteractiveCrawler:
         if not topics:
             return {'new_topics': 0, 'updated_topics': 0, 'errors': 0}
 
-        stats = {'new_topics': 0, 'updated_topics': 0, 'errors': 0}
+        # 整页单事务批量写入；失败时退回逐条导入，定位并跳过有问题的话题
+        try:
+            batch_stats = self.db.import_topics_batch(topics)
+            stats = {
+                'new_topics': batch_stats['new_topics'],
+                'updated_topics': batch_stats['updated_topics'],
+                'errors': batch_stats['errors']
+            }
+        except Exception as e:
+            self.log(f"   ⚠️ 批量导入失败，改为逐条导入: {e}")
+            stats = self._store_topics_one_by_one(topics)
 
-        for topic_data in topics:
-            # 在处理每个话题前检查停止标志
-            if self.is_stopped():
-                self.log("🛑 话题处理过程中检测到停止信号")
-                break
+        # 整页话题都已入库时才记录覆盖区间（逐条导入中途停止或失败时不记录）
+        if stats['errors'] == 0 and stats['new_topics'] + stats['updated_topics'] == len(topics):
+            self._record_page_coverage(topics, covered_until)
+
+        # 提交事务
+        self.db.conn.commit()
+        self.db.invalidate_topic_count_cache()
+        self._record_topics_added(topics, stats['new_topics'])
 
+        # 评论较多的话题加入补全队列（本地评论数已齐全的跳过），不影响话题本身的导入
+        if not self.is_stopped():
             try:
-                topic_id = topic_data.get('topic_id')
+                queued = self.comment_backfill.enqueue_topics(topics, self.db)
+                if queued:
+                    self.log(f"📝 {queued} 个话题评论较多，已加入评论补全队列 (待处理 {self.comment_backfill.pending_count()} 个)")
+            except Exception as e:
+                self.log(f"⚠️ 加入评论补全队列失败: {e}")
+        return stats
 
-                # 检查是否已存在
-                self.db.cursor.execute('SELECT topic_id FROM topics WHERE topic_id = ?', (topic_id,))
-                exists = self.db.cursor.fetchone()
+    def wait_comment_backfill(self):
+        """等待评论补全队列处理完毕并输出统计"""
+        if not self.comment_backfill.pending_count():
+            return
+        self.log(f"⏳ 等待评论补全完成 (剩余 {self.comment_backfill.pending_count()} 个话题)...")
+        dropped = self.comment_backfill.wait()
+        stats = self.comment_backfill.stats
+        self.log(f"💬 评论补全: 完成 {stats['completed']} 个话题, 导入 {stats['imported_comments']} 条评论, "
+                 f"失败 {stats['failed']} 个, 已齐全跳过 {stats['skipped']} 个")
+        if dropped:
+            self.log(f"🛑 任务已停止，{dropped} 个话题的评论留待下次爬取时补全")
+
+    def _record_topics_added(self, topics: List[Dict[str, Any]], new_topics: int):
+        """新增话题后累加群组统计缓存中的话题数与时间范围"""
+        if not new_topics:
+            return
+        times = sorted(t.get('create_time') for t in topics if t.get('create_time'))
+        record_topics_added(self.group_id, new_topics, times[0] if times else None, times[-1] if times else None)
+
+    def _record_page_coverage(self, topics: List[Dict[str, Any]], covered_until: Optional[str] = None):
+        """把一页话题覆盖的时间区间写入采集覆盖表（随本页数据一起提交）"""
+        times = [(topic_time_to_ms(t.get('create_time')), t.get('create_time')) for t in topics]
+        times = [item for item in times if item[0] is not None]
+        if not times:
+            return
+
+        oldest_time = min(times)[1]
+        newest_time = max(times)[1]
+        until_ms = topic_time_to_ms(covered_until)
+        if until_ms is not None and until_ms > max(times)[0]:
+            newest_time = covered_until
 
-                # 导入数据
-                self.db.import_topic_data(topic_data)
+        try:
+            self.db.record_crawl_coverage(int(self.group_id), oldest_time, newest_time)
+        except Exception as e:
+            self.log(f"   ⚠️ 记录采集覆盖区间失败: {e}")
 
-                # 检查是否需要获取更多评论
-                comments_count = topic_data.get('comments_count', 0)
-                if comments_count > 8:
-                    self.log(f"📝 话题 {topic_id} 有 {comments_count} 条评论，尝试获取完整评论列表...")
-                    try:
-                        additional_comments = self.fetch_all_comments(topic_id, comments_count)
-                        if additional_comments:
-                            self.db.import_additional_comments(topic_id, additional_comments)
-                            self.log(f"✅ 成功获取并导入 {len(additional_comments)} 条额外评论")
-                        else:
-                            self.log(f"ℹ️ 话题 {topic_id} 无法获取更多评论，可能是权限限制")
-                    except Exception as e:
-                        self.log(f"⚠️ 话题 {topic_id} 获取评论时出错: {e}")
-                        # 不影响话题本身的导入
+    def _skip_covered_end_time(self, end_time: Optional[str]) -> Optional[str]:
+        """若 end_time 落在已完整采集的区间内，直接跳到该区间最老话题之前"""
+        while end_time:
+            interval = self.db.find_covering_interval(int(self.group_id), end_time)
+            if not interval:
+                break
+            next_end_time = ms_to_topic_time(interval['oldest_ms'] - self.timestamp_offset_ms)
+            self.log(f"   ⏩ 跳过已完整采集的区间: {interval['oldest_time']} ~ {interval['newest_time']}")
+            end_time = next_end_time
+        return end_time
+
+    def _store_topics_one_by_one(self, topics: List[Dict[str, Any]]) -> Dict[str, int]:
+        """逐条导入话题（批量导入失败时的回退路径）"""
+        stats = {'new_topics': 0, 'updated_topics': 0, 'errors': 0}
+        existing_ids = self.db.get_existing_topic_ids([topic.get('topic_id') for topic in topics])
 
-                if exists:
+        for topic_data in topics:
+            if self.is_stopped():
+                self.log("🛑 话题处理过程中检测到停止信号")
+                break
+
+            if self.db.import_topic_data(topic_data):
+                if topic_data.get('topic_id') in existing_ids:
                     stats['updated_topics'] += 1
                 else:
                     stats['new_topics'] += 1
-
-            except Exception as e:
+            else:
                 stats['errors'] += 1
-                self.log(f"   ⚠️ 话题导入失败: {e}")
-        
-        # 提交事务
+                self.log(f"   ⚠️ 话题导入失败: {topic_data.get('topic_id')}")
+
         self.db.conn.commit()
         return stats
     
+    @_drains_comment_backfill
     def crawl_latest(self, count: int = 20) -> Dict[str, int]:
         """爬取最新话题"""
         self.log(f"\n🆕 爬取最新 {count} 个话题...")
@@ -718,6 +887,7 @@ class ZSXQInteractiveCrawler:
             self.log("❌ 获取失败")
             return {'new_topics': 0, 'updated_topics': 0, 'errors': 1}
     
+    @_drains_comment_backfill
     def crawl_historical(self, pages: int = 10, per_page: int = 20) -> Dict[str, int]:
         """爬取历史数据"""
         self.log(f"\n📚 爬取历史数据: {pages}页 x {per_page}条/页")
@@ -761,7 +931,7 @@ class ZSXQInteractiveCrawler:
                         return total_stats
                     
                     # 存储数据
-                    page_stats = self.store_batch_data(data)
+                    page_stats = self.store_batch_data(data, covered_until=end_time)
                     self.log(f"   💾 页面存储: 新增{page_stats['new_topics']}, 更新{page_stats['updated_topics']}")
                     
                     # 累计统计
@@ -845,6 +1015,7 @@ class ZSXQInteractiveCrawler:
         
         return total_stats
     
+    @_drains_comment_backfill
     def crawl_all_historical(self, per_page: int = 20, auto_confirm: bool = False) -> Dict[str, int]:
         """获取所有历史数据：无限爬取直到没有数据（使用增量爬取逻辑）"""
         self.log(f"\n🌊 获取所有历史数据模式 (每页{per_page}条)")
@@ -961,15 +1132,11 @@ class ZSXQInteractiveCrawler:
                         consecutive_empty_pages = 0  # 重置连续空页面计数
                     
                     # 检查是否有新数据（避免重复爬取已有数据）
-                    new_topics_count = 0
-                    for topic in topics:
-                        topic_id = topic.get('topic_id')
-                        self.db.cursor.execute('SELECT topic_id FROM topics WHERE topic_id = ?', (topic_id,))
-                        if not self.db.cursor.fetchone():
-                            new_topics_count += 1
+                    existing_ids = self.db.get_existing_topic_ids([topic.get('topic_id') for topic in topics])
+                    new_topics_count = sum(1 for topic in topics if topic.get('topic_id') not in existing_ids)
                     
                     # 存储数据
-                    page_stats = self.store_batch_data(data)
+                    page_stats = self.store_batch_data(data, covered_until=end_time)
                     self.log(f"   💾 页面存储: 新增{page_stats['new_topics']}, 更新{page_stats['updated_topics']}")
                     
                     # 累计统计
@@ -1063,6 +1230,7 @@ class ZSXQInteractiveCrawler:
         # 这里理论上不会到达，因为在循环内会return
         return total_stats
     
+    @_drains_comment_backfill
     def crawl_incremental(self, pages: int = 10, per_page: int = 20) -> Dict[str, int]:
         """增量爬取：基于数据库最老时间戳继续向历史爬取"""
         self.log(f"\n📈 增量爬取模式: {pages}页 x {per_page}条/页")
@@ -1093,6 +1261,7 @@ class ZSXQInteractiveCrawler:
         except Exception as e:
             self.log(f"⚠️ 时间戳处理失败，使用原时间戳: {e}")
             start_end_time = oldest_timestamp
+        start_end_time = self._skip_covered_end_time(start_end_time)
         
         # 执行增量爬取
         total_stats = {'new_topics': 0, 'updated_topics': 0, 'errors': 0, 'pages': 0}
@@ -1127,12 +1296,8 @@ class ZSXQInteractiveCrawler:
                         return total_stats
                     
                     # 检查是否有新数据（避免重复爬取已有数据）
-                    new_topics_count = 0
-                    for topic in topics:
-                        topic_id = topic.get('topic_id')
-                        self.db.cursor.execute('SELECT topic_id FROM topics WHERE topic_id = ?', (topic_id,))
-                        if not self.db.cursor.fetchone():
-                            new_topics_count += 1
+                    existing_ids = self.db.get_existing_topic_ids([topic.get('topic_id') for topic in topics])
+                    new_topics_count = sum(1 for topic in topics if topic.get('topic_id') not in existing_ids)
                     
                     self.log(f"   📊 获取到 {len(topics)} 个话题，其中 {new_topics_count} 个为新话题")
                     
@@ -1142,7 +1307,7 @@ class ZSXQInteractiveCrawler:
                         return total_stats
                     
                     # 存储数据
-                    page_stats = self.store_batch_data(data)
+                    page_stats = self.store_batch_data(data, covered_until=end_time)
                     self.log(f"   💾 页面存储: 新增{page_stats['new_topics']}, 更新{page_stats['updated_topics']}")
                     
                     # 累计统计
@@ -1172,6 +1337,7 @@ class ZSXQInteractiveCrawler:
                         except Exception as e:
                             end_time = original_time
                             self.log(f"   ⚠️ 时间戳调整失败: {e}")
+                        end_time = self._skip_covered_end_time(end_time)
                     
                     # 成功，跳出重试循环
                     self.check_page_long_delay()  # 页面成功处理后进行长休眠检查
@@ -1230,6 +1396,7 @@ class ZSXQInteractiveCrawler:
         
         return total_stats
     
+    @_drains_comment_backfill
     def crawl_latest_until_complete(self, per_page: int = 20) -> Dict[str, int]:
         """获取最新记录：智能增量更新，爬取到与数据库完全衔接为止"""
         self.log(f"\n🔄 获取最新记录模式 (每页{per_page}条)")
@@ -1286,16 +1453,9 @@ class ZSXQInteractiveCrawler:
                         break
                     
                     # 检查这一页的话题是否在数据库中全部存在
-                    existing_count = 0
-                    new_topics_list = []
-                    
-                    for topic in topics:
-                        topic_id = topic.get('topic_id')
-                        self.db.cursor.execute('SELECT topic_id FROM topics WHERE topic_id = ?', (topic_id,))
-                        if self.db.cursor.fetchone():
-                            existing_count += 1
-                        else:
-                            new_topics_list.append(topic)
+                    existing_ids = self.db.get_existing_topic_ids([topic.get('topic_id') for topic in topics])
+                    new_topics_list = [topic for topic in topics if topic.get('topic_id') not in existing_ids]
+                    existing_count = len(topics) - len(new_topics_list)
                     
                     self.log(f"   📊 页面分析: {len(topics)}个话题，{existing_count}个已存在，{len(new_topics_list)}个新话题")
                     
@@ -1321,35 +1481,26 @@ class ZSXQInteractiveCrawler:
                     
                     elif existing_count == 0:
                         # 整页话题都是新的，全部存储
-                        page_stats = self.store_batch_data(data)
+                        page_stats = self.store_batch_data(data, covered_until=end_time)
                         self.log(f"   💾 整页存储: 新增{page_stats['new_topics']}, 更新{page_stats['updated_topics']}")
                     
                     else:
                         # 部分话题是新的，只存储新话题
                         self.log(f"   💾 部分存储: 只处理{len(new_topics_list)}个新话题")
-                        new_topics_count = 0
-                        updated_topics_count = 0
-                        
-                        for new_topic in new_topics_list:
-                            try:
-                                topic_id = new_topic.get('topic_id')
-                                # 检查是否已存在（双重检查）
-                                self.db.cursor.execute('SELECT topic_id FROM topics WHERE topic_id = ?', (topic_id,))
-                                exists = self.db.cursor.fetchone()
-                                
-                                # 导入数据
-                                self.db.import_topic_data(new_topic)
-                                
-                                if exists:
-                                    updated_topics_count += 1
-                                else:
-                                    new_topics_count += 1
-                                    
-                            except Exception as e:
-                                self.log(f"   ⚠️ 话题导入失败: {e}")
-                        
-                        # 提交事务
-                        self.db.conn.commit()
+                        try:
+                            batch_stats = self.db.import_topics_batch(new_topics_list)
+                        except Exception as e:
+                            self.log(f"   ⚠️ 批量导入失败，改为逐条导入: {e}")
+                            batch_stats = self._store_topics_one_by_one(new_topics_list)
+                        # 已存在的话题 + 本次导入的新话题 = 整页完整入库
+                        if batch_stats['errors'] == 0 and \
+                                batch_stats['new_topics'] + batch_stats['updated_topics'] == len(new_topics_list):
+                            self._record_page_coverage(topics, end_time)
+                            self.db.conn.commit()
+                        self.db.invalidate_topic_count_cache()
+                        self._record_topics_added(new_topics_list, batch_stats['new_topics'])
+                        new_topics_count = batch_stats['new_topics']
+                        updated_topics_count = batch_stats['updated_topics']
                         self.log(f"   💾 新话题存储: 新增{new_topics_count}, 更新{updated_topics_count}")
                         
                         # 更新统计
@@ -1384,6 +1535,12 @@ class ZSXQInteractiveCrawler:
                         except Exception as e:
                             end_time = original_time
                             self.log(f"   ⚠️ 时间戳调整失败: {e}")
+
+                        # 下一页落在已完整采集的区间内，说明新数据已与本地数据衔接
+                        covered = self.db.find_covering_interval(int(self.group_id), end_time)
+                        if covered:
+                            self.log(f"   ✅ 已衔接到完整采集区间 {covered['oldest_time']} ~ {covered['newest_time']}，增量更新完成")
+                            return total_stats
                     
                     # 成功，跳出重试循环
                     page_success = True
@@ -1422,6 +1579,88 @@ class ZSXQInteractiveCrawler:
         
         return total_stats
     
+    @_drains_comment_backfill
+    def crawl_gaps(self, gaps: List[Dict[str, Any]], per_page: int = 20) -> Dict[str, int]:
+        """定向补齐时间线缺口：每个缺口从其上界开始向历史翻页，越过缺口下界即转入下一个缺口
+
+        Args:
+            gaps: ZSXQDatabase.find_topic_gaps 的结果（按时间从新到旧）
+        """
+        self.log(f"\n🕳️ 缺口补齐模式: {len(gaps)} 个缺口, 每页{per_page}条")
+        total_stats = {'new_topics': 0, 'updated_topics': 0, 'errors': 0, 'pages': 0, 'gaps_filled': 0}
+        max_retries_per_page = 10
+
+        for gap_index, gap in enumerate(gaps, 1):
+            if self.is_stopped():
+                self.log("🛑 任务已停止")
+                break
+
+            self.log(f"\n🕳️ 缺口 {gap_index}/{len(gaps)}: {gap['start_time']} ~ {gap['end_time']} "
+                     f"(预计 {gap.get('expected_topics', 0)} 个话题, {gap.get('estimated_pages', 1)} 页)")
+            end_time = gap['end_time']
+            gap_filled = False
+
+            while not gap_filled:
+                if self.is_stopped():
+                    return total_stats
+
+                data = None
+                for retry_count in range(max_retries_per_page):
+                    if self.is_stopped():
+                        return total_stats
+                    if retry_count > 0:
+                        self.log(f"   🔄 第{retry_count}次重试")
+                    data = self.fetch_topics_safe(scope="all", count=per_page, end_time=end_time, is_historical=True)
+                    if data:
+                        break
+                    total_stats['errors'] += 1
+
+                # 检查是否是会员过期错误
+                if data and data.get('expired'):
+                    self.log("   ❌ 会员已过期，停止补齐")
+                    return data
+
+                if not data:
+                    self.log("   🚫 缺口页面达到最大重试次数，跳过此缺口")
+                    break
+
+                topics = data.get('resp_data', {}).get('topics', [])
+                if not topics:
+                    # end_time 之前已没有任何话题，缺口区间内同样没有
+                    self.db.record_crawl_coverage(int(self.group_id), gap['start_time'], end_time)
+                    self.db.conn.commit()
+                    gap_filled = True
+                    break
+
+                page_stats = self.store_batch_data(data, covered_until=end_time)
+                total_stats['new_topics'] += page_stats['new_topics']
+                total_stats['updated_topics'] += page_stats['updated_topics']
+                total_stats['errors'] += page_stats['errors']
+                total_stats['pages'] += 1
+                self.log(f"   💾 页面存储: 新增{page_stats['new_topics']}, 更新{page_stats['updated_topics']}")
+
+                oldest_time = topics[-1].get('create_time')
+                oldest_ms = topic_time_to_ms(oldest_time)
+                if oldest_ms is None or oldest_ms < gap['start_ms'] or len(topics) < per_page:
+                    gap_filled = True
+                else:
+                    end_time = ms_to_topic_time(oldest_ms - self.timestamp_offset_ms)
+
+                self.check_page_long_delay()
+
+            if gap_filled:
+                total_stats['gaps_filled'] += 1
+                self.log("   ✅ 缺口已补齐")
+
+        self.log("\n🏁 缺口补齐完成:")
+        self.log(f"   🕳️ 补齐缺口: {total_stats['gaps_filled']}/{len(gaps)}")
+        self.log(f"   📄 请求页数: {total_stats['pages']}")
+        self.log(f"   ✅ 新增话题: {total_stats['new_topics']}")
+        self.log(f"   🔄 更新话题: {total_stats['updated_topics']}")
+        if total_stats['errors'] > 0:
+            self.log(f"   ❌ 总错误数: {total_stats['errors']}")
+        return total_stats
+
     def show_menu(self):
         """显示交互菜单"""
         self.log(f"\n{'='*60}")
@@ -6,7 +6,6 @@
 import html
 import os
 import re
-import shutil
 import tempfile
 import zipfile
 from datetime import datetime
@@ -14,6 +13,9 @@ from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import unquote
 
+from .image_blob_store import hash_file
+from .zip_export import compression_for
+
 
 def safe_filename(name: str, max_length: int = 80) -> str:
     """Return a filename that is safe across common operating systems."""
@@ -587,12 +589,13 @@ def build_topic_archive(
     返回最终 zip 文件的路径。
     """
     render_kwargs = dict(render_kwargs or {})
-    staging_dir = Path(tempfile.mkdtemp(prefix="zsxq_zip_"))
-    assets_dir = staging_dir / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
 
     # url -> 相对路径 缓存，避免重复下载和命名冲突
     url_to_relpath: Dict[str, str] = {}
+    # 内容哈希 -> 相对路径：不同 URL 指向同一张图片时包内只保存一份
+    content_to_relpath: Dict[str, str] = {}
+    # 包内路径 -> 本地文件，打包时直接从缓存读取，不再复制到临时目录
+    assets: Dict[str, Path] = {}
 
     def resolver(url: str, kind: str) -> str:  # kind: avatar / image / file
         if not url:
@@ -613,18 +616,19 @@ def build_topic_archive(
             url_to_relpath[url] = url
             return url
 
-        # 复制到 assets/，使用 md5 命名避免冲突；同源同 URL 仅复制一次
-        target_name = _safe_asset_name(url, Path(local_path))
-        target_path = assets_dir / target_name
-        if not target_path.exists():
-            try:
-                shutil.copyfile(str(local_path), str(target_path))
-            except Exception:
-                # 复制失败时退化为远程 URL
-                url_to_relpath[url] = url
-                return url
-
-        rel = f"./assets/{target_name}"
+        # 按内容哈希命名（与图片缓存的内容寻址存储一致），内容相同的图片只写入一次
+        local_path = Path(local_path)
+        try:
+            content_hash = hash_file(local_path)
+        except OSError:
+            url_to_relpath[url] = url
+            return url
+        rel = content_to_relpath.get(content_hash)
+        if rel is None:
+            target_name = f"{content_hash[:16]}{Path(_safe_asset_name(url, local_path)).suffix}"
+            rel = f"./assets/{target_name}"
+            content_to_relpath[content_hash] = rel
+            assets[f"assets/{target_name}"] = local_path
         url_to_relpath[url] = rel
         return rel
 
@@ -632,24 +636,17 @@ def build_topic_archive(
     render_kwargs["asset_resolver"] = resolver
     markdown = render(detail, **render_kwargs)
 
-    # 写 Markdown 文件
-    md_path = staging_dir / md_filename
-    md_path.write_text(markdown, encoding="utf-8")
-
     # 打包 zip
     zip_path = Path(output_zip_path)
     zip_path.parent.mkdir(parents=True, exist_ok=True)
     with zipfile.ZipFile(str(zip_path), "w", zipfile.ZIP_DEFLATED) as zf:
-        zf.write(str(md_path), arcname=md_filename)
-        for asset_file in sorted(assets_dir.iterdir()):
-            if asset_file.is_file():
-                zf.write(str(asset_file), arcname=f"assets/{asset_file.name}")
-
-    # 清理 staging
-    try:
-        shutil.rmtree(str(staging_dir), ignore_errors=True)
-    except Exception:
-        pass
+        zf.writestr(md_filename, markdown)
+        for arcname in sorted(assets):
+            try:
+                zf.write(str(assets[arcname]), arcname=arcname, compress_type=compression_for(arcname))
+            except OSError:
+                # 打包期间缓存文件被淘汰：跳过该资源，Markdown 中的相对链接失效但不影响整体导出
+                continue
 
     return str(zip_path.resolve())
 
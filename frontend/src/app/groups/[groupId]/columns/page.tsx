@@ -566,7 +566,7 @@ export default function ColumnsPage() {
             {selectedTopic.owner && (
               <div className="flex items-center gap-2">
                 <img
-                  src={apiClient.getProxyImageUrl(selectedTopic.owner.avatar_url || '', groupId)}
+                  src={apiClient.getProxyImageUrl(selectedTopic.owner.avatar_url || '', groupId, 64)}
                   alt={selectedTopic.owner.name}
                   className="w-8 h-8 rounded-full object-cover"
                   onError={(e) => {
@@ -678,7 +678,7 @@ export default function ColumnsPage() {
                     className="block aspect-video rounded-lg overflow-hidden bg-gray-100 hover:opacity-80 transition-opacity"
                   >
                     <img
-                      src={apiClient.getProxyImageUrl(image.large?.url || image.thumbnail?.url || '', groupId)}
+                      src={apiClient.getProxyImageUrl(image.large?.url || image.thumbnail?.url || '', groupId, 400)}
                       alt=""
                       className="w-full h-full object-cover"
                       loading="lazy"
@@ -862,7 +862,7 @@ export default function ColumnsPage() {
                     <div className="flex items-center gap-2 mb-1">
                       {comment.owner && (
                         <img
-                          src={apiClient.getProxyImageUrl(comment.owner.avatar_url || '', groupId)}
+                          src={apiClient.getProxyImageUrl(comment.owner.avatar_url || '', groupId, 64)}
                           alt={comment.owner.name}
                           loading="lazy"
                           decoding="async"
@@ -913,7 +913,7 @@ export default function ColumnsPage() {
                             <div className="flex items-center gap-2 mb-1">
                               {reply.owner && (
                                 <img
-                                  src={apiClient.getProxyImageUrl(reply.owner.avatar_url || '', groupId)}
+                                  src={apiClient.getProxyImageUrl(reply.owner.avatar_url || '', groupId, 64)}
                                   alt={reply.owner.name}
                                   loading="lazy"
                                   decoding="async"
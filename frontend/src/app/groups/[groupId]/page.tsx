@@ -1358,7 +1358,7 @@ const [latestDialogOpen, setLatestDialogOpen] = useState<boolean>(false);
                   topicDetail?.answer?.owner && (
                     <>
                       <img
-                        src={apiClient.getProxyImageUrl(topicDetail.answer.owner.avatar_url, groupId.toString())}
+                        src={apiClient.getProxyImageUrl(topicDetail.answer.owner.avatar_url, groupId.toString(), 64)}
                         alt={topicDetail.answer.owner.name}
                         loading="lazy"
                         decoding="async"
@@ -1390,7 +1390,7 @@ const [latestDialogOpen, setLatestDialogOpen] = useState<boolean>(false);
                   topic.author && (
                     <>
                       <img
-                        src={apiClient.getProxyImageUrl(topic.author.avatar_url, groupId.toString())}
+                        src={apiClient.getProxyImageUrl(topic.author.avatar_url, groupId.toString(), 64)}
                         alt={topic.author.name}
                         loading="lazy"
                         decoding="async"
@@ -1812,7 +1812,7 @@ const [latestDialogOpen, setLatestDialogOpen] = useState<boolean>(false);
                     <div key={comment.comment_id} className="bg-gray-50 rounded-lg p-2">
                       <div className="flex items-center gap-2 mb-1">
                         <img
-                          src={apiClient.getProxyImageUrl(comment.owner.avatar_url, groupId.toString())}
+                          src={apiClient.getProxyImageUrl(comment.owner.avatar_url, groupId.toString(), 64)}
                           alt={comment.owner.name}
                           loading="lazy"
                           decoding="async"
@@ -1862,7 +1862,7 @@ const [latestDialogOpen, setLatestDialogOpen] = useState<boolean>(false);
                               <div className="flex items-center gap-2 mb-1">
                                 {reply.owner && (
                                   <img
-                                    src={apiClient.getProxyImageUrl(reply.owner.avatar_url || '', groupId.toString())}
+                                    src={apiClient.getProxyImageUrl(reply.owner.avatar_url || '', groupId.toString(), 64)}
                                     alt={reply.owner.name}
                                     loading="lazy"
                                     decoding="async"
@@ -2207,7 +2207,7 @@ const [latestDialogOpen, setLatestDialogOpen] = useState<boolean>(false);
                     <div className="flex items-center gap-2">
                       {accountSelf?.avatar_url ? (
                         <img
-                          src={apiClient.getProxyImageUrl(accountSelf.avatar_url, groupId.toString())}
+                          src={apiClient.getProxyImageUrl(accountSelf.avatar_url, groupId.toString(), 64)}
                           alt={accountSelf?.name || ''}
                           className="w-5 h-5 rounded-full"
                           onError={(e) => { (e.currentTarget as HTMLImageElement).style.display = 'none'; }}
@@ -154,7 +154,7 @@ export default function AccountPanel() {
                           <div className="flex items-center gap-2">
                             {acc.selfInfo.avatar_url && (
                               <img
-                                src={apiClient.getProxyImageUrl(acc.selfInfo.avatar_url)}
+                                src={apiClient.getProxyImageUrl(acc.selfInfo.avatar_url, undefined, 64)}
                                 alt={acc.selfInfo.name || ''}
                                 className="w-6 h-6 rounded-full"
                                 onError={(e) => { (e.currentTarget as HTMLImageElement).style.display = 'none'; }}
@@ -344,7 +344,7 @@ export default function GroupSelector({ onGroupSelected }: GroupSelectorProps) {
     if (!importFile || importing || !importPreview?.can_import) return;
     setImporting(true);
     try {
-      const result = await apiClient.confirmImportArchive(importFile);
+      const result = await apiClient.confirmImportArchive(importFile, importPreview.upload_id);
       toast.success(result.message || '导入成功');
       setImportDialogOpen(false);
       setImportFile(null);
@@ -799,7 +799,8 @@ export default function GroupSelector({ onGroupSelected }: GroupSelectorProps) {
                 <div className="rounded-lg border border-destructive/30 bg-destructive/5 p-3">
                   <div className="text-sm font-medium text-destructive mb-1">存在冲突，无法导入</div>
                   <div className="text-xs text-muted-foreground">
-                    以下社群的本地文件夹已存在，请先删除已有本地数据后再导入。
+                    {importPreview.conflicts.find((conflict) => conflict.reason)?.reason
+                      || '以下社群的本地文件夹已存在，请先删除已有本地数据后再导入。'}
                   </div>
                   <div className="mt-2 flex flex-wrap gap-1.5">
                     {importPreview.conflicts.map((conflict) => (
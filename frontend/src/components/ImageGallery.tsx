@@ -52,7 +52,8 @@ const ImageGallery: React.FC<ImageGalleryProps> = ({ images, className = '', siz
   const getThumbnailUrl = (image: ImageData) => {
     return apiClient.getProxyImageUrl(
       image.thumbnail?.url || image.large?.url || image.original?.url || '',
-      groupId
+      groupId,
+      256
     );
   };
 
@@ -221,6 +221,7 @@ export interface ExportManifest {
 export interface ImportConflict {
   group_id: string;
   paths: string[];
+  reason?: string;
 }
 
 export interface ImportPreview {
@@ -229,11 +230,13 @@ export interface ImportPreview {
   groups: ExportManifestGroup[];
   conflicts: ImportConflict[];
   can_import: boolean;
+  upload_id?: string;
 }
 
 export interface ImportConfirmResult {
   success: boolean;
   message: string;
+  task_id?: string;
   manifest: ExportManifest;
   groups: ExportManifestGroup[];
 }
@@ -430,20 +433,24 @@ class ApiClient {
     return this.request(url, { method: 'POST' });
   }
 
-  // 获取代理图片URL，解决防盗链问题
-  getProxyImageUrl(originalUrl: string, groupId?: string): string {
+  // 获取代理图片URL，解决防盗链问题；width 为显示宽度，后端返回最接近的缩小版本
+  getProxyImageUrl(originalUrl: string, groupId?: string, width?: number): string {
     if (!originalUrl) return '';
     const params = new URLSearchParams({ url: originalUrl });
     if (groupId) {
       params.append('group_id', groupId);
     }
+    if (width) {
+      params.append('w', String(width));
+    }
     return `${API_BASE_URL}/api/proxy-image?${params.toString()}`;
   }
 
   // 获取本地缓存图片URL
-  getLocalImageUrl(groupId: string, localPath: string): string {
+  getLocalImageUrl(groupId: string, localPath: string, width?: number): string {
     if (!localPath) return '';
-    return `${API_BASE_URL}/api/groups/${groupId}/images/${encodeURIComponent(localPath)}`;
+    const query = width ? `?w=${width}` : '';
+    return `${API_BASE_URL}/api/groups/${groupId}/images/${encodeURIComponent(localPath)}${query}`;
   }
 
   // 获取本地缓存视频URL
@@ -655,17 +662,40 @@ class ApiClient {
     return this.uploadZip<ImportPreview>('/api/import/preview', file);
   }
 
-  async confirmImportArchive(file: File): Promise<ImportConfirmResult> {
-    return this.uploadZip<ImportConfirmResult>('/api/import/confirm', file);
+  // 导入在后台任务中解压，这里等待任务结束后再返回结果
+  async confirmImportArchive(file: File, uploadId?: string): Promise<ImportConfirmResult> {
+    const started = uploadId
+      ? await this.uploadZip<ImportConfirmResult>(`/api/import/confirm?upload_id=${encodeURIComponent(uploadId)}`, null)
+      : await this.uploadZip<ImportConfirmResult>('/api/import/confirm', file);
+    if (!started.task_id) {
+      return started;
+    }
+    const task = await this.waitForTask(started.task_id);
+    if (task.status !== 'completed') {
+      throw new Error(task.message || '导入失败');
+    }
+    return { ...started, message: task.message };
   }
 
-  private async uploadZip<T>(endpoint: string, file: File): Promise<T> {
+  async waitForTask(taskId: string, intervalMs: number = 1000): Promise<Task> {
+    for (;;) {
+      const task = await this.getTask(taskId);
+      if (task.status !== 'pending' && task.status !== 'running') {
+        return task;
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  }
+
+  private async uploadZip<T>(endpoint: string, file: File | null): Promise<T> {
     const response = await fetch(`${this.baseUrl}${endpoint}`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/zip',
-        'X-Filename': encodeURIComponent(file.name),
-      },
+      headers: file
+        ? {
+            'Content-Type': 'application/zip',
+            'X-Filename': encodeURIComponent(file.name),
+          }
+        : undefined,
       body: file,
     });
 
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+话题入库性能基准
+对比逐条导入（import_topic_data）与整页批量导入（import_topics_batch）的写入速度
+
+用法:
+    python scripts/benchmark_topic_ingest.py page1.json page2.json ...   # 回放录制的话题接口响应
+    python scripts/benchmark_topic_ingest.py --synthetic 50               # 无录制数据时生成 50 页模拟数据
+
+录制文件可以是完整的接口响应（{"resp_data": {"topics": [...]}}），也可以直接是话题数组。
+每轮都会把所有页面导入一遍：第1轮为新增，之后各轮为更新。
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend.zsxq_database import ZSXQDatabase
+from loguru import logger
+
+
+def load_recorded_pages(paths):
+    """读取录制的话题页面"""
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        topics = data if isinstance(data, list) else data.get('resp_data', {}).get('topics', [])
+        if topics:
+            pages.append(topics)
+    return pages
+
+
+def build_synthetic_pages(page_count, per_page=20, seed=42):
+    """生成结构接近真实接口的模拟话题页面"""
+    rnd = random.Random(seed)
+    users = [{'user_id': uid, 'name': f'user{uid}', 'avatar_url': f'https://images.zsxq.com/{uid}.jpg'}
+             for uid in range(1, 200)]
+    hashtag = '<e type="hashtag" hid="{hid}" title="%23%E6%8A%95%E8%B5%84{hid}%23" />'
+    topic_id, comment_id, image_id = 10 ** 14, 10 ** 15, 10 ** 13
+    pages = []
+
+    for _ in range(page_count):
+        topics = []
+        for _ in range(per_page):
+            topic_id += 1
+            comments = []
+            for _ in range(rnd.randint(0, 8)):
+                comment_id += 1
+                comments.append({
+                    'comment_id': comment_id,
+                    'owner': rnd.choice(users),
+                    'text': f'评论内容 {comment_id} ' * rnd.randint(1, 5),
+                    'create_time': '2024-03-01T12:00:00.000+0800',
+                    'likes_count': rnd.randint(0, 10),
+                })
+            images = []
+            for _ in range(rnd.randint(0, 4)):
+                image_id += 1
+                images.append({
+                    'image_id': image_id,
+                    'type': 'jpg',
+                    'thumbnail': {'url': f'https://images.zsxq.com/t/{image_id}', 'width': 200, 'height': 200},
+                    'large': {'url': f'https://images.zsxq.com/l/{image_id}', 'width': 800, 'height': 800},
+                    'original': {'url': f'https://images.zsxq.com/o/{image_id}', 'size': 123456},
+                })
+            topics.append({
+                'topic_id': topic_id,
+                'group': {'group_id': 88888888, 'name': '基准测试星球', 'type': 'pay'},
+                'type': 'talk',
+                'title': f'话题标题 {topic_id}',
+                'create_time': '2024-03-01T10:00:00.000+0800',
+                'likes_count': rnd.randint(0, 100),
+                'comments_count': len(comments),
+                'reading_count': rnd.randint(0, 5000),
+                'talk': {
+                    'owner': rnd.choice(users),
+                    'text': f'正文内容 {topic_id} {hashtag.format(hid=rnd.randint(1, 20))} ' * rnd.randint(1, 20),
+                    'images': images,
+                },
+                'latest_likes': [{'owner': rnd.choice(users), 'create_time': '2024-03-01T11:00:00.000+0800'}
+                                 for _ in range(rnd.randint(0, 5))],
+                'likes_detail': {'emojis': [{'emoji_key': '[赞]', 'likes_count': rnd.randint(1, 30)}]},
+                'user_specific': {'liked_emojis': []},
+                'show_comments': comments,
+            })
+        pages.append(topics)
+    return pages
+
+
+def run_one_by_one(db, pages):
+    """逐条导入（旧路径）：每个话题一次存在性查询 + import_topic_data"""
+    for topics in pages:
+        for topic_data in topics:
+            db.cursor.execute('SELECT topic_id FROM topics WHERE topic_id = ?', (topic_data.get('topic_id'),))
+            db.cursor.fetchone()
+            db.import_topic_data(topic_data)
+        db.conn.commit()
+
+
+def run_batch(db, pages):
+    """整页批量导入（新路径），返回写入的总行数"""
+    rows = 0
+    for topics in pages:
+        rows += db.import_topics_batch(topics)['rows']
+    return rows
+
+
+def benchmark(pages, rounds):
+    """分别在全新的临时数据库中运行两种导入方式"""
+    topic_total = sum(len(topics) for topics in pages)
+    logger.info(f"共 {len(pages)} 页、{topic_total} 个话题，每种方式导入 {rounds} 轮")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in ('one_by_one', 'batch'):
+            db = ZSXQDatabase(os.path.join(tmp_dir, f'{mode}.db'))
+            timings, rows_per_round = [], []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                if mode == 'batch':
+                    rows_per_round.append(run_batch(db, pages))
+                else:
+                    run_one_by_one(db, pages)
+                timings.append(time.perf_counter() - started)
+            db.close()
+            results[mode] = {'timings': timings, 'rows': rows_per_round}
+
+    # 两种方式写入的逻辑行数相同，以批量路径统计的行数为准
+    rows_per_round = results['batch']['rows']
+    for mode, label in (('one_by_one', '逐条导入'), ('batch', '批量导入')):
+        for index, elapsed in enumerate(results[mode]['timings']):
+            phase = '新增' if index == 0 else '更新'
+            logger.info(
+                f"{label} 第{index + 1}轮({phase}): {elapsed:.3f}s, "
+                f"{rows_per_round[index] / elapsed:,.0f} rows/s, {topic_total / elapsed:,.0f} topics/s"
+            )
+
+    before = sum(results['one_by_one']['timings'])
+    after = sum(results['batch']['timings'])
+    logger.success(f"总耗时: 逐条 {before:.3f}s -> 批量 {after:.3f}s，提速 {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='话题入库性能基准（逐条 vs 批量）')
+    parser.add_argument('pages', nargs='*', help='录制的话题接口响应 JSON 文件')
+    parser.add_argument('--synthetic', type=int, default=0, help='未提供录制文件时生成的模拟页数')
+    parser.add_argument('--rounds', type=int, default=2, help='每种方式导入的轮数（第1轮新增，其余为更新）')
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = load_recorded_pages(args.pages)
+    else:
+        pages = build_synthetic_pages(args.synthetic or 50)
+
+    if not pages:
+        logger.error("没有可用的话题页面")
+        sys.exit(1)
+
+    benchmark(pages, max(1, args.rounds))
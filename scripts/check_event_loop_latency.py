@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+事件循环延迟检查脚本
+在本地启动一个慢速桩服务器模拟知识星球接口，分别用「协程内直接调用 requests」和「连接池客户端」
+执行一段模拟的专栏采集，同时在同一事件循环中周期性调用 /api/health 的处理函数，
+对比两种方式下健康检查的响应延迟。连接池客户端下延迟应保持平稳（毫秒级）。
+
+用法:
+    python scripts/check_event_loop_latency.py
+    python scripts/check_event_loop_latency.py --requests 30 --delay 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend.main import health_check
+from backend.pooled_http import PooledHttpClient
+from loguru import logger
+
+
+def start_stub_server(delay: float) -> ThreadingHTTPServer:
+    """启动返回固定 JSON 的慢速桩服务器"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(delay)
+            body = json.dumps({'succeeded': True, 'resp_data': {'columns': []}}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def probe_health(stop: asyncio.Event, interval: float = 0.05):
+    """周期性调用健康检查，记录从计划时间到返回的延迟（毫秒）"""
+    latencies = []
+    while not stop.is_set():
+        scheduled = time.perf_counter()
+        await asyncio.sleep(interval)
+        await health_check()
+        latencies.append((time.perf_counter() - scheduled - interval) * 1000)
+    return latencies
+
+
+async def run_crawl(mode: str, url: str, count: int):
+    """模拟专栏采集：顺序请求 count 次"""
+    client = PooledHttpClient() if mode == 'pooled' else None
+    try:
+        for _ in range(count):
+            if client:
+                resp = await client.get(url)
+            else:
+                resp = requests.get(url, timeout=30)
+            resp.json()
+            await asyncio.sleep(0)
+    finally:
+        if client:
+            client.close()
+
+
+async def measure(mode: str, url: str, count: int):
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_health(stop))
+    started = time.perf_counter()
+    await run_crawl(mode, url, count)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    latencies = sorted(await probe)
+    if not latencies:
+        latencies = [elapsed * 1000]
+    p50 = latencies[len(latencies) // 2]
+    worst = latencies[-1]
+    return elapsed, len(latencies), p50, worst
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='对比专栏采集期间 /api/health 的事件循环延迟')
+    parser.add_argument('--requests', type=int, default=20, help='模拟采集的请求数')
+    parser.add_argument('--delay', type=float, default=0.2, help='桩服务器每次响应的延迟（秒）')
+    parser.add_argument('--max-latency-ms', type=float, default=50, help='连接池模式允许的最大延迟（毫秒）')
+    args = parser.parse_args()
+
+    server = start_stub_server(args.delay)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v2/groups/1/columns"
+
+    results = {}
+    for mode, label in (('blocking', '协程内直接调用 requests'), ('pooled', '连接池客户端')):
+        elapsed, samples, p50, worst = asyncio.run(measure(mode, url, args.requests))
+        results[mode] = worst
+        logger.info(f"{label}: 采集耗时 {elapsed:.2f}s, 健康检查 {samples} 次, "
+                    f"延迟 p50={p50:.1f}ms, 最大={worst:.1f}ms")
+
+    server.shutdown()
+
+    if results['pooled'] > args.max_latency_ms:
+        logger.error(f"连接池模式下健康检查最大延迟 {results['pooled']:.1f}ms 超过 {args.max_latency_ms}ms")
+        sys.exit(1)
+    logger.success("采集期间健康检查延迟保持平稳")
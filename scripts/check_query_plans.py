@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+话题数据库查询计划检查脚本
+对热点查询执行 EXPLAIN QUERY PLAN，若出现全表扫描（或列表查询需要临时排序）则以非零状态退出，
+用于确认 ZSXQDatabase 的结构迁移索引仍然生效。
+
+用法:
+    python scripts/check_query_plans.py              # 在临时新库上检查
+    python scripts/check_query_plans.py 123 456      # 检查指定群组的本地话题数据库
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend.zsxq_database import ZSXQDatabase
+from loguru import logger
+
+
+_TOPIC_LIST_SELECT = '''
+    SELECT
+        t.topic_id, t.title, t.create_time, t.likes_count, t.comments_count,
+        t.reading_count, t.type, t.digested, t.sticky,
+        q.text, a.text, tk.text, u.user_id, u.name, u.avatar_url, t.imported_at
+    FROM topics t
+    LEFT JOIN questions q ON t.topic_id = q.topic_id
+    LEFT JOIN answers a ON t.topic_id = a.topic_id
+    LEFT JOIN talks tk ON t.topic_id = tk.topic_id
+    LEFT JOIN users u ON tk.owner_user_id = u.user_id
+'''
+
+# (名称, SQL, 参数, 是否禁止临时排序)
+HOT_QUERIES = [
+    ('群组话题列表', _TOPIC_LIST_SELECT + ' WHERE t.group_id = ? ORDER BY t.create_time DESC LIMIT ? OFFSET ?',
+     (1, 20, 0), True),
+    ('群组话题计数', 'SELECT COUNT(*) FROM topics WHERE group_id = ?', (1,), False),
+    ('最早话题时间', "SELECT create_time FROM topics WHERE create_time IS NOT NULL AND create_time != '' "
+                     "ORDER BY create_time ASC LIMIT 1", (), True),
+    ('最新话题时间', "SELECT create_time FROM topics WHERE create_time IS NOT NULL AND create_time != '' "
+                     "ORDER BY create_time DESC LIMIT 1", (), True),
+    ('详情-正文', 'SELECT t.text FROM talks t LEFT JOIN users u ON t.owner_user_id = u.user_id '
+                  'WHERE t.topic_id = ?', (1,), False),
+    ('详情-图片', 'SELECT image_id FROM images WHERE topic_id = ? AND comment_id IS NULL ORDER BY image_id',
+     (1,), False),
+    ('详情-评论图片', 'SELECT image_id FROM images WHERE comment_id = ? ORDER BY image_id', (1,), False),
+    ('详情-附件', 'SELECT file_id FROM topic_files WHERE topic_id = ? ORDER BY file_id', (1,), True),
+    ('详情-文章', 'SELECT title FROM articles WHERE topic_id = ?', (1,), False),
+    ('详情-点赞', 'SELECT l.create_time FROM likes l LEFT JOIN users u ON l.user_id = u.user_id '
+                  'WHERE l.topic_id = ? ORDER BY l.create_time DESC', (1,), True),
+    ('详情-评论', 'SELECT c.comment_id FROM comments c LEFT JOIN users u ON c.owner_user_id = u.user_id '
+                  'LEFT JOIN users r ON c.repliee_user_id = r.user_id WHERE c.topic_id = ? '
+                  'ORDER BY c.create_time ASC', (1,), True),
+    ('详情-表情', 'SELECT emoji_key FROM like_emojis WHERE topic_id = ?', (1,), False),
+    ('详情-提问', 'SELECT q.text FROM questions q WHERE q.topic_id = ?', (1,), False),
+    ('详情-回答', 'SELECT a.text FROM answers a WHERE a.topic_id = ?', (1,), False),
+    ('话题标签', 'SELECT tag_id FROM topic_tags WHERE topic_id = ?', (1,), False),
+    ('标签话题列表', 'SELECT t.topic_id FROM topics t INNER JOIN topic_tags tt ON t.topic_id = tt.topic_id '
+                     'WHERE tt.tag_id = ? ORDER BY t.create_time DESC LIMIT ? OFFSET ?', (1, 20, 0), False),
+]
+
+
+def plan_problems(cursor, sql, params, forbid_sort):
+    """返回查询计划中的问题列表（全表扫描 / 临时排序）"""
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    details = [row[3] for row in cursor.fetchall()]
+    problems = []
+    for detail in details:
+        # "SCAN t" 为全表扫描；"SCAN t USING [COVERING] INDEX ..." 为按索引顺序遍历，可接受
+        if detail.startswith('SCAN ') and ' USING ' not in detail:
+            problems.append(detail)
+        if forbid_sort and 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+    return details, problems
+
+
+def check_database(db_path):
+    """检查单个话题数据库，返回失败的查询数"""
+    db = ZSXQDatabase(db_path)
+    failures = 0
+    try:
+        for name, sql, params, forbid_sort in HOT_QUERIES:
+            details, problems = plan_problems(db.cursor, sql, params, forbid_sort)
+            if problems:
+                failures += 1
+                logger.error(f"❌ {name}: {' | '.join(problems)}")
+            else:
+                logger.info(f"✅ {name}: {' | '.join(details)}")
+    finally:
+        db.close()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='检查话题数据库热点查询是否走索引')
+    parser.add_argument('group_ids', nargs='*', help='群组ID（留空则在临时新库上检查）')
+    args = parser.parse_args()
+
+    total_failures = 0
+    if args.group_ids:
+        from backend.db_path_manager import get_db_path_manager
+        path_manager = get_db_path_manager()
+        for group_id in args.group_ids:
+            db_path = path_manager.get_topics_db_path(str(group_id))
+            if not os.path.exists(db_path):
+                logger.warning(f"群组 {group_id} 话题数据库不存在，跳过")
+                continue
+            logger.info(f"检查群组 {group_id}: {db_path}")
+            total_failures += check_database(db_path)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            total_failures += check_database(os.path.join(tmp_dir, 'query_plan_check.db'))
+
+    if total_failures:
+        logger.error(f"{total_failures} 个热点查询未使用索引")
+        sys.exit(1)
+    logger.success("所有热点查询均使用索引")
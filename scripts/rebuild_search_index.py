@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+全文检索索引重建脚本
+为已有的话题数据库（zsxq_topics_{group_id}.db）一次性构建 FTS5 索引
+
+用法:
+    python scripts/rebuild_search_index.py              # 重建所有本地群组
+    python scripts/rebuild_search_index.py 123 456      # 仅重建指定群组
+"""
+
+import os
+import sys
+import time
+import argparse
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backend.db_path_manager import get_db_path_manager
+from backend.zsxq_database import ZSXQDatabase
+from loguru import logger
+
+
+def rebuild_search_index(group_ids=None):
+    """重建指定群组（默认全部群组）的全文检索索引"""
+    path_manager = get_db_path_manager()
+
+    if group_ids:
+        targets = [str(gid) for gid in group_ids]
+    else:
+        targets = [group['group_id'] for group in path_manager.list_all_groups()]
+
+    if not targets:
+        logger.warning("未找到任何本地群组数据库")
+        return
+
+    logger.info(f"开始重建 {len(targets)} 个群组的全文检索索引...")
+
+    for group_id in targets:
+        db_path = path_manager.get_topics_db_path(group_id)
+        if not os.path.exists(db_path):
+            logger.warning(f"群组 {group_id} 话题数据库不存在，跳过")
+            continue
+
+        db = ZSXQDatabase(db_path)
+        try:
+            started = time.time()
+            result = db.rebuild_search_index()
+            logger.success(
+                f"群组 {group_id}: 索引话题 {result['topics']} 个，评论 {result['comments']} 条，"
+                f"耗时 {time.time() - started:.1f}s"
+            )
+        except Exception as e:
+            logger.error(f"群组 {group_id} 重建失败: {e}")
+        finally:
+            db.close()
+
+    logger.success("全文检索索引重建完成！")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='重建话题数据库的全文检索索引')
+    parser.add_argument('group_ids', nargs='*', help='群组ID（留空则处理全部本地群组）')
+    args = parser.parse_args()
+    rebuild_search_index(args.group_ids)
@@ -0,0 +1,119 @@
+"""社群差异备份：对带全文检索索引的话题库完整导出、差异导出并按备份链应用"""
+
+import io
+import sqlite3
+import zipfile
+
+from backend.backup_delta import (
+    BACKUP_INDEX_NAME,
+    DB_DELTA_SUFFIX,
+    apply_sqlite_delta,
+    iter_backup_stream,
+    summarize_sqlite,
+)
+from backend.zsxq_database import ZSXQDatabase
+
+DB_NAME = "zsxq_topics_9.db"
+
+
+def _topic(topic_id: int, text: str) -> dict:
+    owner = {"user_id": 5, "name": "u"}
+    return {
+        "topic_id": topic_id,
+        "group": {"group_id": 9, "name": "g"},
+        "type": "talk",
+        "title": f"topic {topic_id}",
+        "create_time": "2024-01-01T00:00:00.000+0800",
+        "talk": {"owner": owner, "text": text},
+        "show_comments": [{
+            "comment_id": topic_id * 10,
+            "create_time": "2024-01-01T00:00:00.000+0800",
+            "owner": owner,
+            "text": f"comment on {text}",
+        }],
+    }
+
+
+def _export(db_path: str, backup_id: str, baseline=None):
+    manifest = {"backup": {
+        "backup_id": backup_id,
+        "base_backup_id": baseline["backup_id"] if baseline else None,
+        "group_id": "9",
+        "mode": "differential" if baseline else "full",
+    }}
+    indexes = []
+    data = b"".join(iter_backup_stream(manifest, [(DB_NAME, db_path)], baseline=baseline,
+                                       on_complete=indexes.append))
+    assert len(indexes) == 1
+    return zipfile.ZipFile(io.BytesIO(data)), indexes[0]
+
+
+def _rows(db_path: str, table: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT * FROM {table} ORDER BY rowid").fetchall()
+    finally:
+        conn.close()
+
+
+def _search(db_path: str, keyword: str):
+    db = ZSXQDatabase(db_path)
+    try:
+        return sorted(hit["topic_id"] for hit in db.search_topics(keyword)["hits"])
+    finally:
+        db.close()
+
+
+def test_full_and_differential_export_of_topics_db(tmp_path):
+    source = str(tmp_path / DB_NAME)
+    db = ZSXQDatabase(source)
+    for topic_id in (1, 2, 3):
+        db.import_topic_data(_topic(topic_id, f"original text {topic_id}"))
+    db.conn.commit()
+    db.close()
+
+    # 虚拟表与其影子表（部分为 WITHOUT ROWID）不参与行摘要
+    tables = summarize_sqlite(source)["tables"]
+    assert "topics" in tables
+    assert not any(name.startswith(("topics_fts", "comments_fts")) for name in tables)
+
+    full_zip, full_index = _export(source, "full-1")
+    assert full_zip.testzip() is None
+    assert {DB_NAME, BACKUP_INDEX_NAME} <= set(full_zip.namelist())
+    restored = str(tmp_path / "restored.db")
+    with open(restored, "wb") as f:
+        f.write(full_zip.read(DB_NAME))
+
+    db = ZSXQDatabase(source)
+    db.import_topic_data(_topic(4, "brand new topic"))
+    db.import_topic_data(_topic(2, "edited text"))
+    db.cursor.execute("DELETE FROM topics WHERE topic_id = 3")
+    db.conn.commit()
+    db.close()
+
+    diff_zip, diff_index = _export(source, "diff-1", baseline=full_index)
+    assert diff_zip.testzip() is None
+    assert diff_index["db_deltas"] == [DB_NAME]
+    delta_path = str(tmp_path / "restored.db.delta")
+    with open(delta_path, "wb") as f:
+        f.write(diff_zip.read(DB_NAME + DB_DELTA_SUFFIX))
+
+    fts_before = _rows(restored, "topics_fts")
+    stats = apply_sqlite_delta(restored, delta_path)
+    assert stats["ranges"] > 0
+    for table in ("topics", "talks", "comments"):
+        assert _rows(restored, table) == _rows(source, table)
+
+    # 应用期间不触发删除触发器，触发器原样保留
+    conn = sqlite3.connect(restored)
+    triggers = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    conn.close()
+    assert {"topics_fts_after_delete", "comments_fts_after_delete"} <= triggers
+    assert _rows(restored, "topics_fts") == fts_before
+
+    db = ZSXQDatabase(restored)
+    db.rebuild_search_index()
+    db.close()
+    assert _search(restored, "brand new") == [4]
+    assert _search(restored, "edited") == [2]
+    assert _search(restored, "original") == [1]
@@ -0,0 +1,104 @@
+"""专栏采集使用的连接池 HTTP 客户端：请求在线程池中执行，采集期间事件循环保持响应"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from backend.pooled_http import PooledHttpClient
+
+STUB_DELAY = 0.2
+PROBE_INTERVAL = 0.02
+
+
+@pytest.fixture
+def stub_url():
+    """返回固定 JSON 的慢速桩服务器，/file 返回文件内容，/missing 返回 404"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(STUB_DELAY)
+            if self.path == "/missing":
+                status, body = 404, b"{}"
+            elif self.path == "/file":
+                status, body = 200, b"x" * 3000
+            else:
+                status, body = 200, json.dumps({"succeeded": True, "resp_data": {"columns": []}}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+async def _worst_loop_lag_during(crawl) -> float:
+    """采集进行期间周期性让出事件循环（等同于 /api/health 的处理），返回最大调度延迟（秒）"""
+    stop = asyncio.Event()
+
+    async def probe():
+        worst = 0.0
+        while not stop.is_set():
+            scheduled = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            worst = max(worst, time.perf_counter() - scheduled - PROBE_INTERVAL)
+        return worst
+
+    task = asyncio.create_task(probe())
+    await asyncio.sleep(0)
+    try:
+        await crawl()
+    finally:
+        stop.set()
+    return await task
+
+
+def test_event_loop_stays_responsive_during_crawl(stub_url):
+    url = f"{stub_url}/v2/groups/1/columns"
+
+    async def blocking_crawl():
+        for _ in range(3):
+            requests.get(url, timeout=10).json()
+            await asyncio.sleep(0)
+
+    client = PooledHttpClient()
+
+    async def pooled_crawl():
+        for _ in range(3):
+            assert (await client.get(url)).json()["succeeded"]
+
+    try:
+        blocking_lag = asyncio.run(_worst_loop_lag_during(blocking_crawl))
+        pooled_lag = asyncio.run(_worst_loop_lag_during(pooled_crawl))
+    finally:
+        client.close()
+
+    # 协程内直接调用 requests 会让事件循环停顿整个请求往返
+    assert blocking_lag >= STUB_DELAY * 0.8
+    assert pooled_lag < STUB_DELAY / 2
+
+
+def test_download_to_file(stub_url, tmp_path):
+    client = PooledHttpClient()
+    target = tmp_path / "column.bin"
+    missing = tmp_path / "missing.bin"
+    try:
+        assert asyncio.run(client.download_to_file(f"{stub_url}/file", str(target))) == (200, 3000)
+        assert asyncio.run(client.download_to_file(f"{stub_url}/missing", str(missing))) == (404, 0)
+    finally:
+        client.close()
+    assert target.read_bytes() == b"x" * 3000
+    assert not missing.exists()
@@ -0,0 +1,38 @@
+"""话题数据库热点查询的 EXPLAIN QUERY PLAN 回归：不得退化为全表扫描或多余的临时排序"""
+
+import sqlite3
+
+import pytest
+
+from backend.zsxq_database import SCHEMA_VERSION, ZSXQDatabase
+from scripts.check_query_plans import HOT_QUERIES, plan_problems
+
+
+@pytest.fixture
+def topics_db(tmp_path):
+    db = ZSXQDatabase(str(tmp_path / "zsxq_topics_1.db"))
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize("name, sql, params, forbid_sort", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_query_uses_index(topics_db, name, sql, params, forbid_sort):
+    details, problems = plan_problems(topics_db.cursor, sql, params, forbid_sort)
+    assert details
+    assert not problems, f"{name}: {' | '.join(details)}"
+
+
+def test_migrations_record_schema_version_once(tmp_path):
+    db_path = str(tmp_path / "zsxq_topics_1.db")
+    ZSXQDatabase(db_path).close()
+    # 重新打开已是最新版本的库不会重复执行迁移
+    ZSXQDatabase(db_path).close()
+
+    conn = sqlite3.connect(db_path)
+    try:
+        version = conn.execute("SELECT value FROM db_meta WHERE key = 'schema_version'").fetchone()
+        indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+    assert int(version[0]) == SCHEMA_VERSION
+    assert "idx_articles_topic_id" in indexes
@@ -0,0 +1,124 @@
+"""话题整页批量导入：与逐条导入写入相同的数据，新增/更新判定一致"""
+
+import sqlite3
+
+from backend.zsxq_database import ZSXQDatabase
+
+# 每次导入都会刷新的时间戳与自增主键不参与比较
+_VOLATILE_COLUMNS = {"id", "created_at", "imported_at", "updated_at"}
+_TABLES = (
+    "groups", "users", "topics", "talks", "articles", "images", "likes", "like_emojis",
+    "user_liked_emojis", "comments", "questions", "answers", "tags", "topic_tags", "topic_files",
+)
+
+
+def _user(user_id: int) -> dict:
+    return {"user_id": user_id, "name": f"user{user_id}", "avatar_url": f"https://images.zsxq.com/{user_id}.jpg"}
+
+
+def _image(image_id: int) -> dict:
+    return {
+        "image_id": image_id,
+        "type": "jpg",
+        "thumbnail": {"url": f"https://images.zsxq.com/t/{image_id}", "width": 200, "height": 200},
+        "large": {"url": f"https://images.zsxq.com/l/{image_id}", "width": 800, "height": 800},
+        "original": {"url": f"https://images.zsxq.com/o/{image_id}", "size": 1234},
+    }
+
+
+def _talk_topic(topic_id: int, text: str, likes_count: int = 1) -> dict:
+    return {
+        "topic_id": topic_id,
+        "group": {"group_id": 9, "name": "g", "type": "pay"},
+        "type": "talk",
+        "title": f"topic {topic_id}",
+        "create_time": f"2024-03-0{topic_id % 9 + 1}T10:00:00.000+0800",
+        "likes_count": likes_count,
+        "comments_count": 2,
+        "talk": {
+            "owner": _user(topic_id % 3 + 1),
+            "text": f'{text} <e type="hashtag" hid="{topic_id % 2 + 1}" title="%23tag{topic_id % 2 + 1}%23" />',
+            "images": [_image(topic_id * 10 + 1), _image(topic_id * 10 + 2)],
+            "files": [{"file_id": topic_id * 100, "name": f"f{topic_id}.pdf", "hash": "h", "size": 10,
+                       "download_count": 1, "create_time": "2024-03-01T10:00:00.000+0800"}],
+            "article": {"title": f"article {topic_id}", "article_id": f"a{topic_id}",
+                        "article_url": f"https://articles.zsxq.com/a{topic_id}.html"},
+        },
+        "latest_likes": [{"owner": _user(4), "create_time": "2024-03-01T11:00:00.000+0800"}],
+        "likes_detail": {"emojis": [{"emoji_key": "[赞]", "likes_count": likes_count}]},
+        "user_specific": {"liked_emojis": ["[赞]"]},
+        "show_comments": [
+            {"comment_id": topic_id * 1000 + 1, "owner": _user(5), "text": "first",
+             "create_time": "2024-03-01T12:00:00.000+0800", "likes_count": 1,
+             "images": [_image(topic_id * 10 + 3)]},
+            {"comment_id": topic_id * 1000 + 2, "owner": _user(6), "text": "reply",
+             "parent_comment_id": topic_id * 1000 + 1, "repliee": _user(5),
+             "create_time": "2024-03-01T12:30:00.000+0800"},
+        ],
+    }
+
+
+def _qa_topic(topic_id: int) -> dict:
+    return {
+        "topic_id": topic_id,
+        "group": {"group_id": 9, "name": "g", "type": "pay"},
+        "type": "q&a",
+        "create_time": "2024-03-02T10:00:00.000+0800",
+        "question": {"owner": _user(7), "questionee": _user(1), "text": "why?", "anonymous": False,
+                     "owner_detail": {"questions_count": 3, "join_time": "2023-01-01T00:00:00.000+0800"}},
+        "answer": {"owner": _user(1), "text": "because"},
+    }
+
+
+def _page(text: str, likes_count: int = 1) -> list:
+    return [_talk_topic(topic_id, f"{text} {topic_id}", likes_count) for topic_id in (1, 2, 3)] + [_qa_topic(4)]
+
+
+def _snapshot(db_path: str) -> dict:
+    conn = sqlite3.connect(db_path)
+    try:
+        snapshot = {}
+        for table in _TABLES:
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")
+                       if row[1] not in _VOLATILE_COLUMNS]
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall()
+            snapshot[table] = sorted(rows, key=repr)
+        return snapshot
+    finally:
+        conn.close()
+
+
+def _import_one_by_one(db_path: str, pages) -> None:
+    db = ZSXQDatabase(db_path)
+    try:
+        for topics in pages:
+            for topic_data in topics:
+                db.import_topic_data(topic_data)
+            db.conn.commit()
+    finally:
+        db.close()
+
+
+def test_batch_import_matches_one_by_one_import(tmp_path):
+    pages = [_page("original"), _page("edited", likes_count=5)]
+    one_by_one = str(tmp_path / "one_by_one.db")
+    batch = str(tmp_path / "batch.db")
+    _import_one_by_one(one_by_one, pages)
+
+    db = ZSXQDatabase(batch)
+    try:
+        first = db.import_topics_batch(pages[0])
+        second = db.import_topics_batch(pages[1])
+        assert db.get_existing_topic_ids([1, 2, 3, 4, 5]) == {1, 2, 3, 4}
+    finally:
+        db.close()
+
+    assert (first["new_topics"], first["updated_topics"], first["errors"]) == (4, 0, 0)
+    assert (second["new_topics"], second["updated_topics"], second["errors"]) == (0, 4, 0)
+    assert first["rows"] > len(pages[0])
+
+    expected = _snapshot(one_by_one)
+    actual = _snapshot(batch)
+    assert expected["topics"] and expected["comments"] and expected["answers"]
+    for table in _TABLES:
+        assert actual[table] == expected[table], table